@@ -378,15 +378,24 @@ import re
 import sqlite3
 import time
 import threading
+import tracemalloc
 import warnings
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 import multiprocessing as mp
+import tempfile
+import contextlib
+import hashlib
+import weakref
+import heapq
+import queue
 print("✅ [Bot] Basic imports completed")
 import glob
 import shutil
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, Union
-from collections import deque
+from collections import deque, OrderedDict
+from numpy.lib.stride_tricks import sliding_window_view
 from datetime import datetime, timedelta
 
 # ==============================================================================
@@ -1913,6 +1922,7 @@ from sklearn.calibration import CalibratedClassifierCV, calibration_curve
 from sklearn.ensemble import RandomForestClassifier, VotingClassifier
 from sklearn.exceptions import NotFittedError
 from sklearn.linear_model import LogisticRegression
+from sklearn.isotonic import IsotonicRegression
 from sklearn.metrics import accuracy_score, f1_score, roc_auc_score, brier_score_loss, precision_score, recall_score
 from sklearn.model_selection import cross_val_score, TimeSeriesSplit
 from sklearn.neighbors import KNeighborsClassifier
@@ -2100,6 +2110,90 @@ def create_calibrated_classifier(estimator, method='isotonic', cv=3):
             # Returifncalibrated estimator as last resort
             return estimator
 
+class OOFCalibrator:
+    """
+    Isotonic or Platt (sigmoid) mapping fitted on out-of-fold probabilities and applied to a
+    fitted model's class-1 probability as a NumPy post-transform. Unlike
+    CalibratedClassifierCV(cv=3) it never refits the underlying model.
+    """
+
+    def __init__(self, method="isotonic"):
+        self.method = method
+        self.x_thresholds_ = None
+        self.y_thresholds_ = None
+        self.coef_ = 1.0
+        self.intercept_ = 0.0
+        self.n_samples_ = 0
+
+    @staticmethod
+    def _logit(p):
+        p = np.clip(np.asarray(p, dtype=np.float64), 1e-6, 1 - 1e-6)
+        return np.log(p / (1.0 - p))
+
+    def fit(self, proba, y):
+        proba = np.asarray(proba, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        mask = np.isfinite(proba)
+        proba, y = proba[mask], y[mask]
+        if self.method == "isotonic":
+            isotonic = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip").fit(proba, y)
+            self.x_thresholds_ = np.asarray(isotonic.X_thresholds_, dtype=np.float64)
+            self.y_thresholds_ = np.asarray(isotonic.y_thresholds_, dtype=np.float64)
+        else:
+            platt = LogisticRegression(C=1e4, max_iter=1000).fit(self._logit(proba).reshape(-1, 1), y)
+            self.coef_, self.intercept_ = float(platt.coef_[0, 0]), float(platt.intercept_[0])
+        self.n_samples_ = int(len(proba))
+        return self
+
+    def transform(self, proba):
+        proba = np.asarray(proba, dtype=np.float64)
+        if self.method == "isotonic":
+            return np.interp(proba, self.x_thresholds_, self.y_thresholds_)
+        return 1.0 / (1.0 + np.exp(-(self.coef_ * self._logit(proba) + self.intercept_)))
+
+
+class PostCalibratedClassifier:
+    """A fitted binary classifier whose class-1 probability goes through an OOFCalibrator."""
+
+    def __init__(self, estimator, calibrator):
+        self.estimator = estimator
+        self.calibrator = calibrator
+        self.classes_ = getattr(estimator, "classes_", np.array([0, 1]))
+
+    def predict_proba(self, X):
+        p = self.calibrator.transform(self.estimator.predict_proba(X)[:, 1])
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] >= 0.5).astype(int)]
+
+
+def fit_oof_calibrator(oof_proba, y):
+    """
+    OOFCalibrator for a member from its out-of-fold probabilities, or None when
+    calibration is disabled or there are too few rows / a single class. Returns (calibrator, report).
+    """
+    cfg = OOF_CALIBRATION_CONFIG
+    if not cfg.get("ENABLED", False) or oof_proba is None:
+        return None, {}
+    oof_proba = np.asarray(oof_proba, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    mask = np.isfinite(oof_proba)
+    if mask.sum() < cfg.get("MIN_ROWS", 200) or len(np.unique(y[mask])) < 2:
+        return None, {"skipped": f"{int(mask.sum())} OOF rows"}
+    method = cfg.get("METHOD", "auto")
+    if method == "auto":
+        method = "isotonic" if mask.sum() >= cfg.get("ISOTONIC_MIN_ROWS", 1000) else "sigmoid"
+    calibrator = OOFCalibrator(method).fit(oof_proba[mask], y[mask])
+    report = {
+        "method": method,
+        "rows": calibrator.n_samples_,
+        "brier_raw": float(brier_score_loss(y[mask], np.clip(oof_proba[mask], 0.0, 1.0))),
+        "brier_calibrated": float(brier_score_loss(y[mask], calibrator.transform(oof_proba[mask]))),
+    }
+    return calibrator, report
+
+
 class EnhancedPurgedGroupTimeSeriesSplit:
     """
     Enhanced Purged Group Time Series Split with proper label-based purging
@@ -2115,6 +2209,13 @@ class EnhancedPurgedGroupTimeSeriesSplit:
 
     def split(self, X, y=None, groups=None):
         """Generate indices to split data into training and test set with proper purging"""
+        params = dict(n_splits=self.n_splits, embargo_period=self.embargo_period, label_horizon=self.label_horizon,
+                      gap=self.gap, max_train_size=self.max_train_size)
+        plan = FOLD_PLAN_CACHE.get_plan("enhanced_purged", X, y, groups=groups,
+                                        builder=lambda: self._build_splits(X, y, groups), **params)
+        return plan.split(X, y, groups)
+
+    def _build_splits(self, X, y=None, groups=None):
         n_samples = len(X)
         indices = np.arange(n_samples)
 
@@ -2270,6 +2371,151 @@ class PurgedGroupTimeSeriesSplit:
         """Returns the number of splitting iterations"""
         return self.n_splits
 
+
+_FINGERPRINT_MEMO = {}
+
+
+def dataset_fingerprint(X, y=None):
+    """
+    Content hash of a feature frame (values, index and columns) and optional target.
+    Memoized per live object, so repeated calls on the same training frame are free.
+    """
+    memo_key = (id(X), id(y))
+    cached = _FINGERPRINT_MEMO.get(memo_key)
+    if cached is not None:
+        x_ref, y_ref, shape, fingerprint = cached
+        if x_ref() is X and (y is None or (y_ref is not None and y_ref() is y)) and getattr(X, "shape", None) == shape:
+            return fingerprint
+
+    digest = hashlib.sha1()
+    if isinstance(X, (pd.DataFrame, pd.Series)):
+        digest.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+        if isinstance(X, pd.DataFrame):
+            digest.update("|".join(map(str, X.columns)).encode())
+    else:
+        arr = np.ascontiguousarray(X)
+        digest.update(str((arr.shape, arr.dtype.str)).encode())
+        digest.update(arr.tobytes())
+    if y is not None:
+        y_arr = pd.Series(np.asarray(y)) if not isinstance(y, pd.Series) else y
+        digest.update(pd.util.hash_pandas_object(y_arr, index=False).to_numpy().tobytes())
+    fingerprint = digest.hexdigest()
+
+    try:
+        x_ref = weakref.ref(X)
+        y_ref = weakref.ref(y) if y is not None else None
+        if len(_FINGERPRINT_MEMO) > 256:
+            _FINGERPRINT_MEMO.clear()
+        _FINGERPRINT_MEMO[memo_key] = (x_ref, y_ref, getattr(X, "shape", None), fingerprint)
+    except TypeError:
+        pass  # e.g. plain lists cannot be weak-referenced
+    return fingerprint
+
+
+class FoldPlan:
+    """
+    Precomputed CV folds as compact int32 index arrays. Usable anywhere a scikit-learn
+    splitter is (split / get_n_splits), and can cache contiguous per-fold matrices.
+    """
+
+    def __init__(self, key, folds, n_samples):
+        self.key = key
+        self.n_samples = n_samples
+        self.folds = [(np.asarray(tr, dtype=np.int32), np.asarray(te, dtype=np.int32)) for tr, te in folds]
+        self._frames = {}
+
+    def __len__(self):
+        return len(self.folds)
+
+    def __iter__(self):
+        return iter(self.folds)
+
+    def split(self, X=None, y=None, groups=None):
+        for tr, te in self.folds:
+            yield tr, te
+
+    def get_n_splits(self, X=None, y=None, groups=None):
+        return len(self.folds)
+
+    def nbytes(self):
+        return sum(tr.nbytes + te.nbytes for tr, te in self.folds)
+
+    def fold_frames(self, X, y):
+        """
+        Per-fold (X_train, y_train, X_test, y_test) built from contiguous copies; cached per
+        column set when FOLD_PLAN_CONFIG['CACHE_MATRICES'] is on, else sliced on demand.
+        """
+        cache = FOLD_PLAN_CONFIG.get("CACHE_MATRICES", False)
+        columns = tuple(map(str, X.columns))
+        if cache and columns in self._frames:
+            return self._frames[columns]
+
+        values = X.to_numpy()
+        y_values = np.asarray(y)
+        frames = []
+        for tr, te in self.folds:
+            X_tr = pd.DataFrame(np.ascontiguousarray(values[tr]), columns=X.columns)
+            X_te = pd.DataFrame(np.ascontiguousarray(values[te]), columns=X.columns)
+            frames.append((X_tr, y_values[tr], X_te, y_values[te]))
+        if cache:
+            self._frames[columns] = frames
+        return frames
+
+
+class FoldPlanCache:
+    """LRU of FoldPlan objects keyed by (dataset fingerprint, splitter kind, parameters)."""
+
+    def __init__(self, max_plans=64):
+        self.max_plans = max_plans
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_plan(self, kind, X, y=None, groups=None, builder=None, **params):
+        """Cached plan for `kind`; `builder` returns an iterable of (train, test) index pairs."""
+        if not FOLD_PLAN_CONFIG.get("ENABLED", True):
+            return FoldPlan(None, builder(), len(X))
+
+        fingerprint = dataset_fingerprint(X, y)
+        if groups is not None:
+            fingerprint += dataset_fingerprint(np.asarray(groups))
+        key = (fingerprint, kind, tuple(sorted(params.items())))
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return plan
+        plan = FoldPlan(key, builder(), len(X))
+        with self._lock:
+            self.misses += 1
+            self._plans[key] = plan
+            while len(self._plans) > FOLD_PLAN_CONFIG.get("MAX_PLANS", self.max_plans):
+                self._plans.popitem(last=False)
+        return plan
+
+    def purged(self, X, y=None, n_splits=5, gap=0, max_train_size=None):
+        splitter = PurgedGroupTimeSeriesSplit(n_splits=n_splits, gap=gap, max_train_size=max_train_size)
+        return self.get_plan("purged", X, y, builder=lambda: splitter.split(np.arange(len(X))),
+                             n_splits=n_splits, gap=gap, max_train_size=max_train_size)
+
+    def time_series(self, X, y=None, n_splits=5):
+        splitter = TimeSeriesSplit(n_splits=n_splits)
+        return self.get_plan("time_series", X, y, builder=lambda: splitter.split(np.arange(len(X))), n_splits=n_splits)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"plans": len(self._plans), "hits": self.hits, "misses": self.misses,
+                    "index_bytes": sum(plan.nbytes() for plan in self._plans.values())}
+
+
+FOLD_PLAN_CACHE = FoldPlanCache()
+
 def safe_cross_val_score(estimator, X, y, cv=5, scoring='f1', n_jobs=None):
     """Safe cross-validation with error handling"""
     try:
@@ -2847,6 +3093,13 @@ except ImportError:
     OPTIONAL_PACKAGES['newsapi'] = False
     logging.warning("newsapi package not available. NewsAPI provider will be disabled.")
 
+try:
+    import psutil
+    OPTIONAL_PACKAGES['psutil'] = True
+except ImportError:
+    OPTIONAL_PACKAGES['psutil'] = False
+    logging.warning("psutil not available. Training scheduler will run without resource governing.")
+
 # Utilities
 import time
 import joblib
@@ -4037,6 +4290,54 @@ ML_CONFIG = {
     "NOISE_INJECTION": 0.01  # Noise injection level for regularization
 }
 
+# === CROSS-SYMBOL PANEL FEATURES ===
+FEATURE_PANEL_CONFIG = {
+    "ENABLED": True,      # Build features for all symbols in one panel pass
+    "MIN_SYMBOLS": 2,     # Below this, the per-symbol path is cheaper
+}
+
+# === PROCESS-POOL FEATURE STAGE ===
+FEATURE_POOL_CONFIG = {
+    "ENABLED": True,          # Fan symbol feature builds out over worker processes
+    "MAX_WORKERS": None,      # None -> min(cpu_count - 1, number of symbols)
+    "MIN_SYMBOLS": 3,         # Below this, pool overhead outweighs the gain
+    "START_METHOD": "spawn",  # fork is unsafe once the bot holds OpenMP/TF threads, locks or broker sockets
+    "SCRATCH_DIR": "/dev/shm" if os.path.isdir("/dev/shm") else None,  # memmap exchange dir (RAM-backed on Linux)
+    "TASK_TIMEOUT_SEC": 300,  # Per-chunk timeout before falling back in-process
+    "SHUTDOWN_TIMEOUT_SEC": 30,  # Bot stop: wait this long for running chunks, then terminate workers
+}
+
+# === INFERENCE FEATURE MODE ===
+FEATURE_INFERENCE_CONFIG = {
+    "WARMUP_BARS": None,       # None -> derived from the longest indicator lookback
+    "EMA_SETTLE_FACTOR": 5,    # EMA(p) needs ~5*p bars before the seed weight drops below 1e-4
+    "MIN_WARMUP_BARS": 300,    # Floor covering rolling(100) ranks + ADX/Wyckoff windows
+    "CONTEXT_REFRESH_BARS": 24,  # Reuse a symbol's full-history context (zones, regime terciles) for this many new bars
+}
+
+# === FEATURE PROFILING ===
+FEATURE_PROFILING_CONFIG = {
+    "ENABLED": False,                        # Instrument feature generators (off: plain function calls)
+    "TRACK_MEMORY": True,                    # Peak allocation via tracemalloc (adds overhead while enabled)
+    "REPORT_DIR": "logs/feature_profiles",   # One JSON report per bot cycle
+    "PRINT_TABLE": True,                     # Console summary at the end of each cycle
+    "INCLUDE_CALLS": False,                  # Also dump every individual call into the JSON report
+}
+
+# === TRIPLE-BARRIER LABELS ===
+TRIPLE_BARRIER_CONFIG = {
+    # Off by default: signal thresholds (BUY > 0.6 / SELL < 0.4) assume the balanced
+    # up/down target `label_3`; TP-before-SL targets are usually imbalanced.
+    "USE_AS_TARGET": False,
+    "TARGET_COLUMN": "label_tb",   # 1 = TP touched before SL within the horizon
+    "HORIZON_BARS": 24,            # Vertical (time) barrier
+    "ATR_PERIOD": 14,              # Used when the frame has no `atr` column
+    "DEFAULT_TP_MULT": 3.0,        # Fallbacks for symbols missing from ENTRY_TP_SL_CONFIG
+    "DEFAULT_SL_MULT": 2.0,
+    "TIE_BREAK": "sl",             # Both barriers inside the same bar: "sl" (conservative) or "tp"
+    "CHUNK_ROWS": 20000,           # Rows per vectorized block (bounds the rows x horizon matrices)
+}
+
 # === RISK MANAGEMENT BY ASSET CLASS ===
 # (Configuration moved to top of file to avoid duplication)
 
@@ -4113,6 +4414,219 @@ OPTUNA_CONFIG = {
     "STUDY_CLEANUP": False        # Cleanup old studies
 }
 
+# === OPTUNA PARALLEL SEARCH ===
+# Worker processes pull trials from the same study through the shared RDB
+# storage. CPU_BUDGET is split evenly between workers and every model inside
+# a worker is pinned to its share instead of n_jobs=-1.
+OPTUNA_PARALLEL_CONFIG = {
+    "ENABLED": True,
+    "N_WORKERS": OPTUNA_CONFIG["PARALLEL_TRIALS"],
+    "CPU_BUDGET": None,          # Cores for the whole search; None -> os.cpu_count()
+    "START_METHOD": "spawn",     # fork is unsafe once xgboost/lightgbm OpenMP threads exist
+    "SQLITE_TIMEOUT_SEC": 60,    # Busy timeout so concurrent SQLite writers wait instead of failing
+    "JOIN_GRACE_SEC": 120,       # Extra wait on top of TIMEOUT_SEC (worker start-up) before giving up
+    "SHUTDOWN_TIMEOUT_SEC": 60,  # Then wait this long for workers to finish their trial before terminating them
+}
+
+# === OPTUNA WARM START ===
+# Retrains open a fresh study per symbol/regime/model and enqueue the best
+# trials of the previous one (or the params saved in model metadata). Only the
+# newest KEEP_STUDIES retrain studies per symbol/regime/model stay in storage.
+OPTUNA_WARM_START_CONFIG = {
+    "ENABLED": True,
+    "KEEP_STUDIES": 3,           # Older retrain studies of the same key are deleted after a search
+    "TOP_N": 5,                  # Prior best trials enqueued as initial points
+    "NARROW_RANGES": False,      # Shrink numeric search ranges around the seeds
+    "RANGE_MARGIN": 0.25,        # Fraction of the original range kept on each side of the seeds' span
+    "MIN_SEEDS_TO_NARROW": 3,    # Too few seeds say little about where the optimum is
+}
+
+# === OPTUNA PRUNING ===
+# The objective runs a purged CV and reports the running mean F1 after every
+# fold; boosting models report it every few iterations instead (the current
+# fold scored at that iteration) on a fold-major step axis
+# (step = fold * FOLD_STEP_STRIDE + iteration). Pruned and completed trials
+# therefore carry values on the same scale.
+OPTUNA_PRUNING_CONFIG = {
+    "CV_SPLITS": 3,                # PurgedGroupTimeSeriesSplit folds inside the objective
+    "EMBARGO": 5,                  # Bars purged between train and validation
+    "PRUNER_STARTUP_TRIALS": 5,    # Finished trials before MedianPruner may prune
+    "BOOSTING_PRUNING": True,      # Per-iteration pruning for XGBoost/LightGBM
+    "BOOSTING_REPORT_EVERY": 25,   # Iterations between reports (each report is a storage write)
+    "BOOSTING_WARMUP_ITERS": 50,   # Iterations before a boosting fold may be pruned
+    "FOLD_STEP_STRIDE": 10000,     # > max n_estimators so fold step ranges never overlap
+}
+
+# === PURGED CV FOLD EXECUTOR ===
+# evaluate_model_with_purged_cv fits folds concurrently through joblib; fold
+# matrices reach the workers as memory-mapped arrays and every worker writes
+# its OOF probabilities straight into one shared memmap.
+PURGED_CV_PARALLEL_CONFIG = {
+    "ENABLED": True,
+    "MAX_WORKERS": None,       # None -> min(n_folds, os.cpu_count())
+    "BACKEND": "loky",
+    "MIN_ROWS": 2000,          # Smaller datasets are faster in-process than paying worker start-up
+    "BASE_SEED": 42,           # Fold k uses BASE_SEED + k for its noise injection
+    "MAX_NBYTES": "1M",        # joblib memmaps arguments above this size instead of pickling them
+}
+
+# === FOLD PLANS ===
+# CV split indices are computed once per (dataset fingerprint, splitter, params)
+# and reused by every model and Optuna trial of a training session.
+FOLD_PLAN_CONFIG = {
+    "ENABLED": True,
+    "MAX_PLANS": 64,           # LRU bound on cached plans
+    "CACHE_MATRICES": False,   # Also keep contiguous per-fold train/test copies (~n_splits x dataset memory)
+}
+
+# === INCREMENTAL BOOSTING ===
+# Stale-data and auto retrains first try to continue the existing XGBoost /
+# LightGBM boosters on the bars that arrived since the last fit; the policy
+# falls back to a full retrain every FULL_RETRAIN_EVERY increments, on drift,
+# or when the validation gate rejects the update.
+INCREMENTAL_TRAINING_CONFIG = {
+    "ENABLED": True,
+    "EXTRA_ROUNDS": 50,                # Boosting rounds added per increment
+    "LEARNING_RATE_SCALE": 0.2,        # Shrinks the members' learning rate for the added rounds
+    "MIN_NEW_BARS": 24,                # Fewer labelled new bars -> keep the current model as is
+    "MAX_NEW_BARS": 2000,              # More than this since the last fit -> full retrain
+    "VALIDATION_BARS": 48,             # Newest labelled bars held out for the gate (trained next time)
+    "MAX_LOGLOSS_INCREASE": 0.01,      # Gate: candidate ensemble log-loss may exceed the current by at most this
+    "FULL_RETRAIN_EVERY": 5,           # Increments before a full retrain is forced
+    "DRIFT_PSI_THRESHOLD": 0.25,       # Per-feature PSI counted as drifted
+    "MAX_DRIFTED_FEATURE_SHARE": 0.3,  # Share of drifted features that forces a full retrain
+    "DRIFT_REFERENCE_BARS": 2000,      # Trained bars used as the PSI reference
+}
+
+# === TRAINING DATASET FINGERPRINT ===
+# load_or_train_models skips a (stale-flag / missing-model) retrain when the saved model
+# was trained on the same candles, feature set and label spec.
+TRAINING_FINGERPRINT_CONFIG = {
+    "ENABLED": True,
+    "CANDLE_COLUMNS": ["open", "high", "low", "close", "volume"],
+    # ML_CONFIG keys that change which features reach the models
+    "FEATURE_CONFIG_KEYS": ["MAX_CORRELATION_THRESHOLD", "FEATURE_SELECTION_TOP_K",
+                            "FEATURE_IMPORTANCE_THRESHOLD", "ENSEMBLE_MODELS"],
+    "LABEL_HORIZONS": [1, 3, 5],
+}
+
+# === MODEL REGISTRY ===
+# load_latest_model / load_latest_model_metadata are served from a resident index of
+# MODEL_DIR instead of listing the directory and unpickling the newest file on every call.
+MODEL_REGISTRY_CONFIG = {
+    "ENABLED": True,
+}
+
+# "split": the .pkl only holds a shell of model_data; each ensemble member lives in
+# <artefact>.members/ (XGBoost as a native .ubj booster, the rest as uncompressed joblib so
+# numpy buffers can be memory-mapped) and is read on first use. Exported tree arrays are
+# stored as .npy files and memory-mapped, so processes scoring the same model share pages.
+# "single" keeps the old one-pickle layout. Older artefacts are never removed, so every
+# saved model stays available for rollback.
+MODEL_ARTEFACT_CONFIG = {
+    "LAYOUT": "single",
+    "MMAP_MODE": "r",
+    "NATIVE_XGBOOST": True,
+}
+
+# === LSTM INPUT PIPELINE ===
+# LSTMModel.train streams windows from the scaled 2-D feature matrix with tf.data instead of
+# materialising every (sequence_length x features) window: memory stays O(rows x features).
+LSTM_PIPELINE_CONFIG = {
+    "STREAMING": True,
+    "CACHE_DIR": None,      # Set to a directory to cache generated batches on disk between epochs (per-fit scratch dir, removed afterwards)
+    "EPOCHS": 200,
+}
+
+# Live scoring of the single newest window goes through a tf.function with a fixed
+# (1, sequence_length, features) signature instead of Keras predict().
+LSTM_INFERENCE_CONFIG = {
+    "COMPILED": True,
+    "BENCHMARK_REPEATS": 100,
+}
+
+# EnsembleModel.predict_proba gathers the cleaned last row straight into a preallocated
+# float32 vector per base model via cached column-index maps (legacy DataFrame path as fallback).
+INFERENCE_PROJECTION_CONFIG = {
+    "ENABLED": True,
+    "MAX_LAYOUTS": 32,   # Cached input column layouts per ensemble
+}
+
+# After training, the RF / XGBoost / LightGBM members are flattened into plain arrays
+# (feature, threshold, children, leaf value) and scored together by one vectorized NumPy
+# traversal. A member is only used this way if it matches its native predict_proba on
+# VERIFY_ROWS training rows within TOLERANCE; anything else keeps the native runtime.
+# Live scoring uses the arrays only with USE_FOR_INFERENCE; training-time scoring always may.
+TREE_EXPORT_CONFIG = {
+    "ENABLED": True,
+    "USE_FOR_INFERENCE": False,
+    "VERIFY_ROWS": 256,
+    "TOLERANCE": 1e-4,
+}
+
+# Base-model probabilities are calibrated with isotonic / Platt mappings fitted on the
+# out-of-fold predictions train_ensemble already produces (no CalibratedClassifierCV refits).
+# "auto" picks isotonic from ISOTONIC_MIN_ROWS OOF rows, sigmoid below.
+OOF_CALIBRATION_CONFIG = {
+    "ENABLED": False,
+    "METHOD": "auto",   # "auto" | "isotonic" | "sigmoid"
+    "MIN_ROWS": 200,
+    "ISOTONIC_MIN_ROWS": 1000,
+    # When the prefit Level 2 calibration fails: Platt post-transform on the held-out slice
+    # (True) instead of refitting the meta-learner with CalibratedClassifierCV(cv=3)
+    "META_POST_TRANSFORM": False,
+}
+
+# After the base models are trained, members are dropped (lowest MEMBER_WEIGHTS first) while
+# the blended OOF log-loss stays within MAX_LOGLOSS_INCREASE and F1 within MAX_F1_DROP of the
+# full ensemble. Pruned members are not kept in the saved model, so live scoring never runs them.
+# Off by default: the kept set is chosen on the same OOF rows the meta-learner is fitted on.
+ENSEMBLE_PRUNING_CONFIG = {
+    "ENABLED": False,
+    "MAX_LOGLOSS_INCREASE": 0.002,
+    "MAX_F1_DROP": 0.005,
+    "MIN_MEMBERS": 1,
+}
+
+# Optional last step of train_ensemble: a shallow LightGBM student is fitted on the blended
+# out-of-fold member probabilities (what the ensemble outputs on bars it has not seen) and,
+# when its fidelity on the held-out OOF tail passes the gates, scores live signals on its own.
+# The full ensemble stays loaded for audit (predict_proba(..., use_student=False)) and as fallback.
+DISTILLATION_CONFIG = {
+    "ENABLED": False,
+    "USE_FOR_INFERENCE": False,
+    "HOLDOUT_SHARE": 0.2,          # Newest OOF rows used only to measure fidelity
+    "MIN_TRAIN_ROWS": 500,
+    "MAX_MAE": 0.03,               # Mean |student - OOF ensemble| on the holdout
+    "MIN_SIGNAL_AGREEMENT": 0.95,  # Same BUY/SELL/HOLD bucket (0.6 / 0.4 cut-offs)
+    "STUDENT_PARAMS": {"n_estimators": 400, "num_leaves": 15, "max_depth": 4,
+                       "learning_rate": 0.05, "min_child_samples": 20, "verbose": -1},
+}
+
+# === TRAINING SCHEDULER ===
+# Per-(symbol, regime) training jobs run on a background worker pool instead of inline in
+# the trading loop. Before each job starts the resource governor samples CPU / memory via
+# psutil: above MEMORY_THRESHOLD (or the RSS limit) new jobs pause, above CPU_THRESHOLD
+# concurrency drops to one worker. Symbols without a valid model are queued first.
+TRAINING_SCHEDULER_CONFIG = {
+    "ENABLED": True,
+    "MAX_WORKERS": 2,
+    "CPU_THRESHOLD": ML_CONFIG["CPU_THRESHOLD"],        # % system CPU
+    "MEMORY_THRESHOLD": ML_CONFIG["MEMORY_THRESHOLD"],  # % system memory
+    "RSS_LIMIT_MB": None,           # Optional cap on this process' resident memory
+    "POLL_SEC": 5.0,                # Re-check interval while throttled / paused
+    "PAUSE_WARN_SEC": 300,          # Log when jobs have been paused this long
+    "PRIORITY_NO_MODEL": 0,         # Lower runs first
+    "PRIORITY_REFRESH": 10,
+    # Jobs train in separate worker processes; finished artefacts are announced to the main loop,
+    # which swaps the live model dicts between cycles.
+    "PROCESS_WORKERS": False,
+    "START_METHOD": "spawn",
+    "MAX_TASKS_PER_CHILD": 4,       # Recycle worker processes to hand memory back
+    "WORKER_TIMEOUT_SEC": 4 * 3600, # A worker job running longer is cancelled and its pool restarted
+    "SHUTDOWN_TIMEOUT_SEC": 60,     # Pool teardown (broken pool, bot stop): wait this long, then terminate
+}
+
 class OptunaStudyManager:
     """Manage Optuna studies with SQLite storage"""
     
@@ -4142,7 +4656,11 @@ class OptunaStudyManager:
         """Khởi tạo storage"""
         try:
             import optuna
-            self.storage = optuna.storages.RDBStorage(self.storage_url)
+            engine_kwargs = None
+            if self.storage_url.startswith("sqlite"):
+                # Parallel Optuna workers write to the same file
+                engine_kwargs = {"connect_args": {"timeout": OPTUNA_PARALLEL_CONFIG.get("SQLITE_TIMEOUT_SEC", 60)}}
+            self.storage = optuna.storages.RDBStorage(self.storage_url, engine_kwargs=engine_kwargs)
             print(f"✅ [Optuna Manager] Storage initialized: {self.storage_url}")
         except Exception as e:
             print(f"❌ [Optuna Manager] Storage initialization failed: {e}")
@@ -6122,6 +6640,146 @@ class DynamicEnsembleManager:
         
         return None
 
+class ResourceGovernor:
+    """Samples CPU / memory with psutil and decides how many training jobs may run."""
+
+    def __init__(self, cpu_threshold=80, memory_threshold=85, rss_limit_mb=None):
+        self.cpu_threshold = cpu_threshold
+        self.memory_threshold = memory_threshold
+        self.rss_limit_mb = rss_limit_mb
+        self._process = psutil.Process() if OPTIONAL_PACKAGES.get('psutil') else None
+        if self._process is not None:
+            psutil.cpu_percent(interval=None)  # Prime the non-blocking CPU counter
+
+    def sample(self):
+        if self._process is None:
+            return {"cpu": 0.0, "memory": 0.0, "rss_mb": 0.0}
+        return {
+            "cpu": psutil.cpu_percent(interval=None),
+            "memory": psutil.virtual_memory().percent,
+            "rss_mb": self._process.memory_info().rss / 1e6,
+        }
+
+    def allowed_workers(self, max_workers):
+        """(workers allowed to run now, sample); 0 pauses new jobs, 1 throttles."""
+        usage = self.sample()
+        if usage["memory"] > self.memory_threshold or (
+                self.rss_limit_mb and usage["rss_mb"] > self.rss_limit_mb):
+            return 0, usage
+        if usage["cpu"] > self.cpu_threshold:
+            return 1, usage
+        return max_workers, usage
+
+
+class TrainingScheduler:
+    """
+    Priority queue of per-(symbol, regime) training jobs drained by a thread pool.
+    A dispatcher thread starts queued jobs only while the ResourceGovernor allows it;
+    running jobs are never interrupted. Re-submitting a queued or running job is a no-op.
+    """
+
+    def __init__(self, governor=None, max_workers=None, config=None):
+        self.config = config or TRAINING_SCHEDULER_CONFIG
+        self.max_workers = max(1, int(max_workers or self.config.get("MAX_WORKERS", 2)))
+        self.governor = governor or ResourceGovernor(
+            self.config.get("CPU_THRESHOLD", 80), self.config.get("MEMORY_THRESHOLD", 85),
+            self.config.get("RSS_LIMIT_MB"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="train")
+        self._queue = []                 # heap of (priority, seq, key, fn)
+        self._seq = 0
+        self._keys = set()               # queued or running
+        self._running = set()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "throttled": 0, "paused": 0}
+        self._stats_lock = threading.Lock()  # Job threads finish outside self._cond
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="training-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, symbol, regime, fn, priority=None):
+        """Queue `fn()` for (symbol, regime). Returns False if that job is already queued/running."""
+        key = (symbol, regime)
+        if priority is None:
+            priority = self.config.get("PRIORITY_REFRESH", 10)
+        with self._cond:
+            if key in self._keys or self._stopped:
+                return False
+            self._keys.add(key)
+            heapq.heappush(self._queue, (priority, self._seq, key, fn))
+            self._seq += 1
+            self._count("submitted")
+            self._cond.notify()
+        print(f"🗓️ [Training Scheduler] Queued {symbol} {regime} (priority {priority}, {len(self._queue)} waiting)")
+        return True
+
+    def is_scheduled(self, symbol, regime=None):
+        with self._cond:
+            return any(k[0] == symbol and (regime is None or k[1] == regime) for k in self._keys)
+
+    def has_pending(self):
+        with self._cond:
+            return bool(self._keys)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def stats_snapshot(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def _dispatch_loop(self):
+        paused_since = None
+        while True:
+            with self._cond:
+                while not self._stopped and (not self._queue or len(self._running) >= self.max_workers):
+                    self._cond.wait()
+                if self._stopped:
+                    return
+
+            allowed, usage = self.governor.allowed_workers(self.max_workers)
+            with self._cond:
+                if len(self._running) >= allowed:
+                    self._count("paused" if allowed == 0 else "throttled")
+                    if allowed == 0:
+                        paused_since = paused_since or time.time()
+                        if time.time() - paused_since >= self.config.get("PAUSE_WARN_SEC", 300):
+                            logging.warning(f"[Training Scheduler] Jobs paused for {time.time() - paused_since:.0f}s "
+                                            f"(memory {usage['memory']:.0f}%, RSS {usage['rss_mb']:.0f} MB)")
+                            paused_since = time.time()
+                    self._cond.wait(timeout=self.config.get("POLL_SEC", 5.0))
+                    continue
+                paused_since = None
+                priority, _, key, fn = heapq.heappop(self._queue)
+                self._running.add(key)
+            logging.info(f"[Training Scheduler] Starting {key[0]} {key[1]} "
+                         f"(CPU {usage['cpu']:.0f}%, memory {usage['memory']:.0f}%, {len(self._running)} running)")
+            self._executor.submit(self._run_job, key, fn)
+
+    def _run_job(self, key, fn):
+        started = time.time()
+        try:
+            fn()
+            self._count("completed")
+            print(f"✅ [Training Scheduler] {key[0]} {key[1]} finished in {time.time() - started:.0f}s")
+        except Exception as e:
+            self._count("failed")
+            logging.error(f"[Training Scheduler] {key[0]} {key[1]} failed: {e}", exc_info=True)
+        finally:
+            with self._cond:
+                self._running.discard(key)
+                self._keys.discard(key)
+                self._cond.notify()
+
+    def shutdown(self, wait=False):
+        with self._cond:
+            self._stopped = True
+            self._queue.clear()
+            self._keys.intersection_update(self._running)
+            self._cond.notify_all()
+        self._executor.shutdown(wait=wait)
+
+
 class AutoRetrainManager:
     """Enhanced manager for automatic retraining with concept drift detection"""
     
@@ -6409,6 +7067,12 @@ class AutoRetrainManager:
                     print(f"📊 [Auto-Retrain] Data fetch result for {symbol}: {type(df_retrain)}, length: {len(df_retrain) if df_retrain is not None else 'None'}")
                     if df_retrain is not None and len(df_retrain) >= 100:
                         print(f"[Auto-Retrain] Data fetched: {len(df_retrain)} candles for {symbol}")
+                        # Drift invalidates the old trees; everything else may continue boosting
+                        force_full = "drift" in str(reason).lower()
+                        if self.bot.incremental_retrain_symbol(symbol, df_retrain, force_full=force_full):
+                            self.last_retrain_time[symbol] = datetime.now()
+                            print(f"[Auto-Retrain] Incremental update completed for {symbol}")
+                            return True
                         result = self.bot.train_enhanced_model(symbol, df_retrain)
                         if result is None:
                             print(f"[Auto-Retrain] train_enhanced_model returned None for {symbol}")
@@ -8555,6 +9219,333 @@ class LLMSentimentAnalyzer:
             return {"score": 0.0, "reasoning": "LLM processing error."}
 
 
+# ==============================================================================
+# FEATURE GENERATION PROFILER
+# ==============================================================================
+
+class _NullProfileSection:
+    """Shared no-op section handed out while profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        # Drop `section.output = df` so the singleton never keeps frames alive
+        pass
+
+
+_NULL_PROFILE_SECTION = _NullProfileSection()
+
+
+class _ProfileSection:
+    """One timed generator call; nested sections propagate their peak to the parent."""
+
+    def __init__(self, profiler, group, symbol, df):
+        self.profiler = profiler
+        self.group = group
+        self.symbol = symbol
+        self.columns_in = len(df.columns) if hasattr(df, "columns") else 0
+        self.output = None
+        self.start_wall = 0.0
+        self.start_cpu = 0.0
+        self.start_mem = 0
+        self.peak = 0
+        self.depth = 0
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler._exit(self, failed=exc_type is not None)
+        return False
+
+
+class FeatureProfiler:
+    """
+    Records wall time, CPU time, peak allocation and output column count per
+    feature-generator call, aggregated per symbol and per bot cycle.
+    Disabled by default; when off, `call` is a direct function call.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or FEATURE_PROFILING_CONFIG
+        self.enabled = bool(self.config.get("ENABLED", False))
+        self._records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cycle_index = 0
+        self._cycle_started = None
+        self._owns_tracemalloc = False
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+        if not enabled and self._owns_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def section(self, group, symbol=None, df=None):
+        """Context manager for a block; set `section.output` to the produced frame."""
+        if not self.enabled:
+            return _NULL_PROFILE_SECTION
+        return _ProfileSection(self, group, symbol, df)
+
+    def call(self, group, symbol, func, df, *args, **kwargs):
+        """Run `func(df, *args, **kwargs)` under a profiling section."""
+        if not self.enabled:
+            return func(df, *args, **kwargs)
+        with _ProfileSection(self, group, symbol, df) as section:
+            section.output = func(df, *args, **kwargs)
+        return section.output
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, section):
+        stack = self._stack()
+        if self.config.get("TRACK_MEMORY", True):
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracemalloc = True
+            current, peak = tracemalloc.get_traced_memory()
+            for parent in stack:
+                parent.peak = max(parent.peak, peak)
+            tracemalloc.reset_peak()
+            section.start_mem = section.peak = current
+        section.depth = len(stack)
+        stack.append(section)
+        section.start_cpu = time.process_time()
+        section.start_wall = time.perf_counter()
+
+    def _exit(self, section, failed=False):
+        wall = time.perf_counter() - section.start_wall
+        cpu = time.process_time() - section.start_cpu
+        stack = self._stack()
+        if stack and stack[-1] is section:
+            stack.pop()
+
+        peak_bytes = 0
+        if self.config.get("TRACK_MEMORY", True) and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            section.peak = max(section.peak, peak)
+            peak_bytes = max(0, section.peak - section.start_mem)
+            for parent in stack:
+                parent.peak = max(parent.peak, section.peak)
+            tracemalloc.reset_peak()
+
+        columns_out = len(section.output.columns) if hasattr(section.output, "columns") else None
+        record = {
+            "cycle": self._cycle_index,
+            "group": section.group,
+            "symbol": section.symbol or "ALL",
+            "depth": section.depth,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "peak_alloc_mb": peak_bytes / (1024 * 1024),
+            "columns_out": columns_out,
+            "columns_added": (columns_out - section.columns_in) if columns_out is not None else None,
+            "failed": failed,
+        }
+        with self._lock:
+            self._records.append(record)
+
+    def begin_cycle(self):
+        """Start a new aggregation window (one bot cycle)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._records = []
+        self._cycle_index += 1
+        self._cycle_started = datetime.now()
+
+    @staticmethod
+    def _aggregate(records):
+        summary = {}
+        for rec in records:
+            entry = summary.setdefault(rec["group"], {
+                "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_alloc_mb": 0.0,
+                "columns_added": 0, "failed": 0, "depth": rec["depth"],
+            })
+            entry["calls"] += 1
+            entry["wall_s"] += rec["wall_s"]
+            entry["cpu_s"] += rec["cpu_s"]
+            entry["peak_alloc_mb"] = max(entry["peak_alloc_mb"], rec["peak_alloc_mb"])
+            entry["columns_added"] += rec["columns_added"] or 0
+            entry["failed"] += int(rec["failed"])
+            entry["depth"] = min(entry["depth"], rec["depth"])
+        return summary
+
+    def build_report(self):
+        """Structured report for the current cycle."""
+        with self._lock:
+            records = list(self._records)
+
+        by_symbol = {}
+        for rec in records:
+            by_symbol.setdefault(rec["symbol"], []).append(rec)
+
+        report = {
+            "cycle": self._cycle_index,
+            "started_at": self._cycle_started.isoformat() if self._cycle_started else None,
+            "generated_at": datetime.now().isoformat(),
+            "calls": len(records),
+            "groups": self._aggregate(records),
+            "symbols": {symbol: self._aggregate(recs) for symbol, recs in by_symbol.items()},
+        }
+        if self.config.get("INCLUDE_CALLS", False):
+            report["records"] = records
+        return report
+
+    def format_table(self, report):
+        """Console table of per-group totals, most expensive first (indent = nesting depth)."""
+        lines = [f"{'group':<28}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'peak MB':>10}{'cols':>7}"]
+        groups = sorted(report["groups"].items(), key=lambda item: item[1]["wall_s"], reverse=True)
+        for group, stats in groups:
+            label = ("  " * stats["depth"] + group)[:27]
+            lines.append(
+                f"{label:<28}{stats['calls']:>7}{stats['wall_s']:>10.3f}{stats['cpu_s']:>10.3f}"
+                f"{stats['peak_alloc_mb']:>10.1f}{stats['columns_added']:>7}"
+            )
+        return "\n".join(lines)
+
+    def end_cycle(self):
+        """Emit the cycle report (JSON file + console table) and return it."""
+        if not self.enabled:
+            return None
+        report = self.build_report()
+        if not report["calls"]:
+            return report
+
+        if self.config.get("PRINT_TABLE", True):
+            print(f"📊 [Feature Profiler] Cycle {report['cycle']} ({report['calls']} calls)")
+            print(self.format_table(report))
+
+        report_dir = self.config.get("REPORT_DIR")
+        if report_dir:
+            try:
+                os.makedirs(report_dir, exist_ok=True)
+                stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                path = os.path.join(report_dir, f"feature_profile_cycle{report['cycle']}_{stamp}.json")
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(report, f, indent=2, default=str)
+            except Exception as e:
+                logging.warning(f"⚠️ [Feature Profiler] Could not write report: {e}")
+        return report
+
+
+FEATURE_PROFILER = FeatureProfiler()
+
+
+# ==============================================================================
+# PANEL (CROSS-SYMBOL) INDICATOR KERNELS
+# ==============================================================================
+# OHLCV for N symbols is stacked into (symbols x bars) arrays, right-aligned on
+# the latest bar. Every column of the resulting wide frame is one symbol's own
+# contiguous history with leading NaN padding only, so each rolling/ewm kernel
+# runs once for the whole panel and still matches the per-symbol `ta` output.
+
+PANEL_OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+def _stack_panel(frames):
+    """Stack per-symbol OHLCV frames into right-aligned wide frames (bars x symbols)."""
+    symbols = list(frames.keys())
+    n_bars = max(len(df) for df in frames.values())
+    offsets = np.array([n_bars - len(frames[s]) for s in symbols], dtype=np.int64)
+
+    panel = {}
+    for col in PANEL_OHLCV_COLUMNS:
+        stacked = np.full((len(symbols), n_bars), np.nan)
+        for k, symbol in enumerate(symbols):
+            stacked[k, offsets[k]:] = frames[symbol][col].to_numpy(dtype=float)
+        panel[col] = pd.DataFrame(stacked.T, columns=symbols)
+    return panel, offsets
+
+
+def _panel_ema(values, window):
+    """EMA identical to ta's `_ema(series, window)` (min_periods=window, adjust=False)."""
+    return values.ewm(span=window, min_periods=window, adjust=False).mean()
+
+
+def _panel_wilder(values, window, start_rows):
+    """
+    Wilder smoothing seeded with the mean of the first `window` values of each column.
+    `start_rows` holds the first usable row per column; rows before the seed are NaN.
+    """
+    arr = values.to_numpy(dtype=float, copy=True)
+    n_rows = arr.shape[0]
+    for k, start in enumerate(start_rows):
+        seed_row = int(start) + window - 1
+        if seed_row >= n_rows:
+            arr[:, k] = np.nan
+            continue
+        seed = np.nanmean(arr[start:seed_row + 1, k])
+        arr[:seed_row, k] = np.nan
+        arr[seed_row, k] = seed
+    seeded = pd.DataFrame(arr, index=values.index, columns=values.columns)
+    return seeded.ewm(alpha=1.0 / window, adjust=False).mean()
+
+
+def _panel_true_range(high, low, close):
+    prev_close = close.shift(1)
+    return np.fmax(high - low, np.fmax((high - prev_close).abs(), (low - prev_close).abs()))
+
+
+def _panel_atr(high, low, close, window, offsets):
+    """ATR matching ta's AverageTrueRange (zeros during warm-up)."""
+    valid = close.notna()
+    atr = _panel_wilder(_panel_true_range(high, low, close), window, offsets)
+    return atr.fillna(0.0).where(valid)
+
+
+def _panel_rsi(close, window):
+    """RSI matching ta's RSIIndicator."""
+    valid = close.notna()
+    diff = close.diff(1)
+    up = diff.where(diff > 0, 0.0).where(valid)
+    down = (-diff.where(diff < 0, 0.0)).where(valid)
+    emaup = up.ewm(alpha=1.0 / window, min_periods=window, adjust=False).mean()
+    emadn = down.ewm(alpha=1.0 / window, min_periods=window, adjust=False).mean()
+    return (100 - (100 / (1 + emaup / emadn))).where(emadn != 0, 100.0)
+
+
+def _panel_adx(high, low, close, window, offsets):
+    """ADX matching ta's ADXIndicator.adx (zeros until the 2*window-1 warm-up completes)."""
+    valid = close.notna()
+    prev_close = close.shift(1)
+    directional_range = np.maximum(high, prev_close) - np.minimum(low, prev_close)
+
+    diff_up = high - high.shift(1)
+    diff_down = low.shift(1) - low
+    pos = (((diff_up > diff_down) & (diff_up > 0)) * diff_up).abs()
+    neg = (((diff_down > diff_up) & (diff_down > 0)) * diff_down).abs()
+
+    trs = _panel_wilder(directional_range, window, offsets + 1)
+    dip = (100 * _panel_wilder(pos, window, offsets + 1) / trs).where(trs != 0, 0.0)
+    din = (100 * _panel_wilder(neg, window, offsets + 1) / trs).where(trs != 0, 0.0)
+    dx = (100 * (dip - din).abs() / (dip + din)).where((dip + din) != 0, 0.0)
+
+    adx = _panel_wilder(dx, window, offsets + window)
+    return adx.fillna(0.0).where(valid)
+
+
+def _panel_rsi_divergence(close, rsi, lookback=20):
+    """Rolling-window form of AdvancedFeatureEngineer._detect_rsi_divergence."""
+    prior_close = close.shift(1)
+    prior_rsi = rsi.shift(1)
+    divergence = (
+        (prior_close.rolling(5).min() < prior_close.rolling(lookback).min()) &
+        (prior_rsi.rolling(5).min() > prior_rsi.rolling(lookback).min())
+    )
+    return divergence.astype(int)
+
+
 # L p this not thay d i
 class AdvancedFeatureEngineer:
     def __init__(self):
@@ -8578,6 +9569,7 @@ class AdvancedFeatureEngineer:
 
         # Initialize symbol configurations
         self.symbol_configs = self._initialize_symbol_configs()
+        self._inference_contexts = {}  # symbol -> full-history context for live rows (see inference_context)
     def _get_default_data(self, api_type):
         """Trvdata mc dnh data nh khi API fail"""
         defaults = {
@@ -9342,25 +10334,29 @@ class AdvancedFeatureEngineer:
 
     # Bn in clasfixdvancedFeatureEngineer
 
-    # <<< fix L I Function this in L P AdvancedFeatureEngineer >>>
-    def create_all_features(self, df):
-        """Create all features"""
-        df = self.create_technical_features(df)
-        df = self.create_statistical_features(df)
-        df = self.create_pattern_features(df)
-        df = self.create_volume_features(df)
-        df = self.create_market_microstructure_features(df)
-        df = self.create_wyckoff_features(df)
+    def inference_warmup_bars(self):
+        """Trailing bars needed so the latest row matches a full-history computation."""
+        if FEATURE_INFERENCE_CONFIG.get("WARMUP_BARS"):
+            return int(FEATURE_INFERENCE_CONFIG["WARMUP_BARS"])
+        config = self.symbol_configs["SPX500"]
+        longest_ema = max(list(config["ema_periods"]) + [DEFAULT_EMA_PERIOD])
+        return max(
+            int(FEATURE_INFERENCE_CONFIG.get("EMA_SETTLE_FACTOR", 5) * longest_ema),
+            int(FEATURE_INFERENCE_CONFIG.get("MIN_WARMUP_BARS", 300)),
+        )
 
-        # <<< C I money FEATURE ENGINEERING: G i Function to feature tempty thi thtru ng >>>
-        df = self.create_market_regime_feature(df)
+    # <<< fix L I Function this in L P AdvancedFeatureEngineer >>>
+    def create_all_features(self, df, mode="training", rows=1):
+        """
+        Create all features.
+        mode="training": full history plus label_1/3/5.
+        mode="inference": indicators over the trailing warm-up window, no labels, and
+        just the latest `rows` feature vectors are returned (see _create_inference_features).
+        """
+        if mode == "inference":
+            return self._create_inference_features(df, rows=rows)
 
-        zones = self._find_sd_zones(df)
-        print(
-            f"   Found total public {len(zones)} zones for {df.name if hasattr(df, 'name') else 'current symbol'}."
-        )
-        df = self.create_supply_demand_features(df, zones)
-        df = self.create_market_structure_signals(df)
+        df = self._build_all_features(df)
 
         for horizon in [1, 3, 5]:
             df[f"label_{horizon}"] = (df["close"].shift(-horizon) > df["close"]).astype(
@@ -9368,95 +10364,514 @@ class AdvancedFeatureEngineer:
             )
 
         return df
-    #  t bn in clasfixdvancedFeatureEngineer
-    def _find_sd_zones(self, df, atr_multiplier=1.2):
+
+    def _create_inference_features(self, history, rows=1):
         """
-        Function to identify all supply and demand zones.
-        Includes all reversal and continuation zones.
+        Latest feature row(s) for live scoring (rows > 1 for sequence models).
+        Rolling/EWM indicators run on the trailing warm-up window only; the pieces that
+        depend on the whole history (volatility_regime tercile edges, S/D zones and
+        their distances) come from the symbol's cached full-history context, so the row
+        matches the last row of a training-mode run.
         """
-        if "atr" not in df.columns or df["atr"].isnull().all():
-            # print("   [Zones] ATR is null or invalid. Skip zone detection.")
-            return []
+        name = getattr(history, "name", None)
+        rows = max(1, int(rows))
+        window = self.inference_warmup_bars() + rows - 1
+        cached = self.inference_context(history, max_age=window - rows - 2)
+        while True:
+            df = history.iloc[-window:].copy()
+            if name is not None:
+                df.name = name
+            context = self._window_feature_context(df, cached, history.index[0], rows)
+            df = self._build_all_features(df, context=context)
+
+            # Same inf/ffill cleaning the enhanced pipeline applies over the full history
+            df = df.replace([np.inf, -np.inf], np.nan).ffill()
+            latest = df.iloc[-rows:]
+            # A gap the window cannot fill may still be filled further back: widen and retry
+            # (context columns are already filled over the full history)
+            gaps = latest.drop(columns=list(context["zones"].columns), errors="ignore").isna()
+            if window >= len(history) or not gaps.to_numpy().any():
+                return latest
+            window *= 2
+
+    def inference_context(self, history, max_age=None):
+        """
+        Full-history context for live rows of `history`, cached per symbol (history.name).
+        Rebuilt when missing, when the cached bar is no longer in `history`, or after
+        CONTEXT_REFRESH_BARS (capped by `max_age`) newer bars.
+        """
+        key = getattr(history, "name", None)
+        refresh = int(FEATURE_INFERENCE_CONFIG.get("CONTEXT_REFRESH_BARS", 24))
+        if max_age is not None:
+            refresh = min(refresh, int(max_age))
+        cached = self._inference_contexts.get(key) if key is not None else None
+        if cached is not None and cached["until"] in history.index:
+            if len(history) - 1 - history.index.get_loc(cached["until"]) <= refresh:
+                return cached
+        context = self._history_feature_context(history)
+        if key is not None:
+            self._inference_contexts[key] = context
+        return context
+
+    def _history_feature_context(self, history):
+        """
+        Full-history pass for the window-dependent features: ATR-percentile tercile edges,
+        the S/D zone list and the forward-filled zone distances.
+        """
+        # create_all_features builds technical features with the default config
+        config = self.symbol_configs["SPX500"]
+        frame = history[["open", "high", "low", "close"]].copy()
+        frame["atr"] = AverageTrueRange(
+            frame["high"], frame["low"], frame["close"], window=config["atr_period"]
+        ).average_true_range()
+
+        context = {"until": history.index[-1], "zone_until": history.index[-2] if len(history) > 1 else None}
+        if config["volatility_adjustment"]:
+            atr_percentile = (frame["atr"] / frame["close"]).rolling(100).rank(pct=True)
+            _, context["regime_bins"] = pd.qcut(atr_percentile, q=3, labels=["low", "normal", "high"], retbins=True)
 
-        zones = []
-        # Start from 2nd candle and end before last candle to access i-1 and i+1
-        for i in range(1, len(df) - 1):
-            # Xhas data receive n "base" (thn nh )
-            is_base_candle = (
-                abs(df["close"].iloc[i] - df["open"].iloc[i])
-                < (df["high"].iloc[i] - df["low"].iloc[i]) * 0.6
+        context["zone_list"] = self._find_sd_zones(frame)
+        zone_features = self.create_supply_demand_features(frame, context["zone_list"], start=len(frame))
+        distance_columns = [c for c in zone_features.columns if c.startswith("distance_to_")]
+        context["zone_distances"] = zone_features[distance_columns].replace([np.inf, -np.inf], np.nan).ffill()
+        return context
+
+    def _window_feature_context(self, window, cached, history_start, rows=1):
+        """
+        Per-call context for `window` (the trailing bars being featurized) from a cached
+        full-history context: regime labels from the cached tercile edges, zones found in
+        bars newer than the cache added to the cached ones, and zone distances continued
+        from the cached forward fill. In-zone flags are only evaluated for the `rows` returned bars.
+        """
+        config = self.symbol_configs["SPX500"]
+        frame = window[["open", "high", "low", "close"]].copy()
+        frame["atr"] = AverageTrueRange(
+            frame["high"], frame["low"], frame["close"], window=config["atr_period"]
+        ).average_true_range()
+
+        context = {}
+        if "regime_bins" in cached:
+            bins = np.array(cached["regime_bins"], dtype=float)
+            bins[0], bins[-1] = -np.inf, np.inf
+            atr_percentile = (frame["atr"] / frame["close"]).rolling(100).rank(pct=True)
+            context["volatility_regime"] = pd.cut(atr_percentile, bins=bins, labels=["low", "normal", "high"])
+
+        # A full-history run only finds zones after the first bar of `history`
+        zones = [z for z in cached["zone_list"] if z["index"] > history_start]
+        zone_until = cached["zone_until"]
+        zones += [z for z in self._find_sd_zones(frame) if zone_until is None or z["index"] > zone_until]
+        # Older zones are pinned to the first window bar: same nearest-zone maps and in-zone
+        # checks for every later bar, without widening the window index
+        start = frame.index[0]
+        pinned = [dict(z, index=start) if z["index"] < start else z for z in zones]
+        zone_features = self.create_supply_demand_features(frame, pinned, start=max(1, len(frame) - rows))
+        zone_columns = [c for c in zone_features.columns if c.startswith(("in_", "distance_to_"))]
+        zone_features = zone_features[zone_columns].replace([np.inf, -np.inf], np.nan)
+
+        distances = cached["zone_distances"]
+        prior = distances[distances.index < start].iloc[-1:]
+        distance_columns = list(distances.columns)
+        zone_features[distance_columns] = (
+            pd.concat([prior, zone_features[distance_columns]]).ffill().iloc[len(prior):]
+        )
+        context["zone_count"] = len(zones)
+        context["zones"] = zone_features
+        return context
+
+    def _build_all_features(self, df, context=None):
+        """Feature generators shared by training and inference; `context` comes from _window_feature_context."""
+        profiler = FEATURE_PROFILER
+        symbol = getattr(df, "name", None)
+
+        df = profiler.call("technical", symbol, self.create_technical_features, df)
+        if context is not None and "volatility_regime" in context:
+            df["volatility_regime"] = context["volatility_regime"].reindex(df.index)
+        df = profiler.call("statistical", symbol, self.create_statistical_features, df)
+        df = profiler.call("pattern", symbol, self.create_pattern_features, df)
+        df = profiler.call("volume", symbol, self.create_volume_features, df)
+        df = profiler.call("microstructure", symbol, self.create_market_microstructure_features, df)
+        df = profiler.call("wyckoff", symbol, self.create_wyckoff_features, df)
+
+        # <<< C I money FEATURE ENGINEERING: G i Function to feature tempty thi thtru ng >>>
+        df = profiler.call("market_regime", symbol, self.create_market_regime_feature, df)
+
+        with profiler.section("sd_zones", symbol, df) as section:
+            if context is not None:
+                zone_count = context["zone_count"]
+                for column, values in context["zones"].reindex(df.index).items():
+                    df[column] = values
+            else:
+                zones = self._find_sd_zones(df)
+                zone_count = len(zones)
+                df = self.create_supply_demand_features(df, zones)
+            print(
+                f"   Found total public {zone_count} zones for {df.name if hasattr(df, 'name') else 'current symbol'}."
             )
-            if not is_base_candle:
+            section.output = df
+        df = profiler.call("divergence", symbol, self.create_market_structure_signals, df)
+        return df
+
+    def create_panel_features(self, frames):
+        """
+        Cross-symbol version of create_all_features.
+        `frames` maps symbol -> OHLCV DataFrame; every indicator is computed once over
+        the stacked panel and split back, producing the same columns (and values)
+        create_all_features would return for each symbol.
+        """
+        results = {}
+        panel_frames = {}
+        for symbol, df in frames.items():
+            if df is None or df.empty:
                 continue
+            if all(col in df.columns for col in PANEL_OHLCV_COLUMNS):
+                panel_frames[symbol] = df
+            else:
+                # Missing OHLCV columns -> per-symbol path handles its own fallbacks
+                results[symbol] = self.create_all_features(df)
 
-            # Xhas data receive n m nh before v sau n n base
-            move_before = abs(df["close"].iloc[i - 1] - df["open"].iloc[i - 1])
-            move_after = abs(df["close"].iloc[i + 1] - df["open"].iloc[i + 1])
+        if not panel_frames:
+            return results
 
-            # Chỉ lấy ATR hợp lệ 
-            atr_value = df["atr"].iloc[i]
-            if pd.isna(atr_value) or atr_value == 0:
-                continue
-            atr_threshold = atr_value * atr_multiplier
+        panel, offsets = _stack_panel(panel_frames)
+        o, h, l, c, v = (panel[col] for col in PANEL_OHLCV_COLUMNS)
+        valid = c.notna()
+        config = self.symbol_configs["SPX500"]  # create_all_features uses the default config
 
-            is_sin_move_before = move_before > atr_threshold
-            is_sin_move_after = move_after > atr_threshold
+        # Ordered column name -> wide frame (bars x symbols), or callable(built, index)
+        # for columns that depend on each symbol's own index.
+        stage = {}
 
-            if is_sin_move_before and is_sin_move_after:
-                # Xhas data nh hu ng of cneeds n m nh
-                is_bullish_before = df["close"].iloc[i - 1] > df["open"].iloc[i - 1]
-                is_bullish_after = df["close"].iloc[i + 1] > df["open"].iloc[i + 1]
+        # --- Technical features ---
+        stage["hl2"] = (h + l) / 2
+        stage["hlc3"] = (h + l + c) / 3
+        stage["ohlc4"] = (o + h + l + c) / 4
 
-                # --- levelonfiguration  O CHI U ---
-                # Drop-Base-Rally -> Vng C u  o chi u (Demand Reversal)
-                if not is_bullish_before and is_bullish_after:
-                    zones.append(
-                        {
-                            "type": "demand_reversal",
-                            "high": df["high"].iloc[i],
-                            "low": df["low"].iloc[i],
-                            "index": df.index[i],
-                        }
-                    )
-                # Rally-Base-Drop -> Vng cung  o chi u (Supply Reversal)
-                elif is_bullish_before and not is_bullish_after:
-                    zones.append(
-                        {
-                            "type": "supply_reversal",
-                            "high": df["high"].iloc[i],
-                            "low": df["low"].iloc[i],
-                            "index": df.index[i],
-                        }
-                    )
+        atr = _panel_atr(h, l, c, config["atr_period"], offsets)
+        stage["atr"] = atr
+        stage["atr_normalized"] = atr / c
 
-                # --- levelonfiguration TI P DI N ---
-                # Rally-Base-Rally -> Vng Cu Tip din (Demand continuation)
-                elif is_bullish_before and is_bullish_after:
-                    zones.append(
-                        {
-                            "type": "demand_continuation",
-                            "high": df["high"].iloc[i],
-                            "low": df["low"].iloc[i],
-                            "index": df.index[i],
-                        }
-                    )
-                # Drop-Base-Drop -> Vng cung Ti p di n (Supply Continuation)
-                elif not is_bullish_before and not is_bullish_after:
-                    zones.append(
-                        {
-                            "type": "supply_continuation",
-                            "high": df["high"].iloc[i],
-                            "low": df["low"].iloc[i],
-                            "index": df.index[i],
-                        }
-                    )
-        return zones
+        if config["volatility_adjustment"]:
+            stage["atr_percentile"] = stage["atr_normalized"].rolling(100).rank(pct=True)
+            stage["volatility_regime"] = lambda built, index: pd.qcut(
+                built["atr_percentile"], q=3, labels=["low", "normal", "high"]
+            )
 
-    def create_supply_demand_features(self, df, zones):
-        """
-        Create all supply/demand features.
-        PHIN B N T I UU HA HI U NANG equal allh vector ha.
-        """
+        if config.get("use_bollinger", True):
+            for period in config.get("bb_periods", [20]):
+                mavg = c.rolling(period).mean()
+                mstd = c.rolling(period).std(ddof=0)
+                upper = mavg + 2 * mstd
+                lower = mavg - 2 * mstd
+                width = (upper - lower) / mavg * 100
+                stage[f"bb_upper_{period}"] = upper
+                stage[f"bb_lower_{period}"] = lower
+                stage[f"bb_width_{period}"] = width
+                stage[f"bb_position_{period}"] = (c - lower) / (upper - lower)
+                stage[f"bb_squeeze_{period}"] = (width < width.rolling(20).mean() * 0.8).astype(int)
+
+        for period in config["ema_periods"]:
+            ema = _panel_ema(c, period)
+            stage[f"ema_{period}"] = ema
+            if period > 5:
+                stage[f"ema_ratio_{period}"] = c / ema
+                stage[f"ema_distance_{period}"] = (c - ema) / atr
+
+        if len(config["ema_periods"]) >= 2:
+            fast_period = min(config["ema_periods"])
+            slow_period = max([p for p in config["ema_periods"] if p > fast_period])
+            fast_ema = stage[f"ema_{fast_period}"]
+            slow_ema = stage[f"ema_{slow_period}"]
+            stage[f"ema_cross_{fast_period}_{slow_period}"] = (
+                (fast_ema > slow_ema) & (fast_ema.shift(1) <= slow_ema.shift(1))
+            ).astype(int)
+
+        for period in config["rsi_periods"]:
+            rsi = _panel_rsi(c, period)
+            stage[f"rsi_{period}"] = rsi
+            stage[f"rsi_oversold_{period}"] = (rsi < 30).astype(int)
+            stage[f"rsi_overbought_{period}"] = (rsi > 70).astype(int)
+            stage[f"rsi_divergence_{period}"] = _panel_rsi_divergence(c, rsi)
+
+        primary_rsi_period = config["rsi_periods"][0]
+        stage["rsi"] = stage[f"rsi_{primary_rsi_period}"]
+        stage["rsi_oversold"] = stage[f"rsi_oversold_{primary_rsi_period}"]
+        stage["rsi_overbought"] = stage[f"rsi_overbought_{primary_rsi_period}"]
+
+        macd_params = config["macd_params"]
+        macd = _panel_ema(c, macd_params["fast"]) - _panel_ema(c, macd_params["slow"])
+        macd_signal = _panel_ema(macd, macd_params["signal"])
+        stage["macd"] = macd
+        stage["macd_signal"] = macd_signal
+        stage["macd_histogram"] = macd - macd_signal
+        stage["macd_cross"] = ((macd > macd_signal) & (macd.shift(1) <= macd_signal.shift(1))).astype(int)
+
+        adx = None
+        if config.get("use_adx", True):
+            adx = _panel_adx(h, l, c, 14, offsets)
+            stage["adx"] = adx
+            stage["adx_trending"] = (adx > 25).astype(int)
+            stage["adx_sin_trend"] = (adx > 50).astype(int)
+
+        if config.get("use_stochastic", True):
+            stoch_params = config.get("stoch_params", {"k": 14, "d": 3})
+            lowest_low = l.rolling(stoch_params["k"]).min()
+            highest_high = h.rolling(stoch_params["k"]).max()
+            stoch_k = 100 * (c - lowest_low) / (highest_high - lowest_low)
+            stage["stoch_k"] = stoch_k
+            stage["stoch_d"] = stoch_k.rolling(stoch_params["d"]).mean()
+            stage["stoch_oversold"] = (stoch_k < 20).astype(int)
+            stage["stoch_overbought"] = (stoch_k > 80).astype(int)
+
+        for indicator in ["rsi", "atr", "macd", "adx"]:
+            if indicator not in stage:
+                stage[indicator] = pd.DataFrame(0, index=c.index, columns=c.columns)
+
+        # --- Statistical features ---
+        for period in [1, 3, 5, 10, 20]:
+            stage[f"returns_{period}"] = c.pct_change(period, fill_method=None)
+            stage[f"log_returns_{period}"] = np.log(c / c.shift(period))
+
+        for window in [10, 20, 50]:
+            rolling_close = c.rolling(window)
+            rolling_mean = rolling_close.mean()
+            rolling_std = rolling_close.std()
+            stage[f"rolling_mean_{window}"] = rolling_mean
+            stage[f"rolling_std_{window}"] = rolling_std
+            stage[f"rolling_skew_{window}"] = rolling_close.skew()
+            stage[f"rolling_kurt_{window}"] = rolling_close.kurt()
+            stage[f"zscore_{window}"] = (c - rolling_mean) / rolling_std
+
+        for period in [5, 10, 20]:
+            period_high = h.rolling(period).max()
+            period_low = l.rolling(period).min()
+            stage[f"high_low_ratio_{period}"] = period_high / period_low
+            stage[f"close_position_{period}"] = (c - period_low) / (period_high - period_low)
+
+        # --- Pattern features ---
+        candle_range = h - l
+        stage["doji"] = ((o - c).abs() <= candle_range * 0.1).astype(int)
+        stage["hammer"] = (
+            (c > o) & ((c - o) <= candle_range * 0.3) & ((o - l) >= candle_range * 0.6)
+        ).astype(int)
+
+        prev_open = o.shift(1)
+        prev_close = c.shift(1)
+        prev_body = (prev_open - prev_close).abs()
+        current_body = (o - c).abs()
+        stage["bullish_engulfing"] = (
+            (c > o) & (prev_close < prev_open) & (c > prev_open) & (o < prev_close) & (current_body > prev_body)
+        ).astype(int)
+        stage["bearish_engulfing"] = (
+            (c < o) & (prev_close > prev_open) & (c < prev_open) & (o > prev_close) & (current_body > prev_body)
+        ).astype(int)
+
+        support = l.rolling(20).min()
+        resistance = h.rolling(20).max()
+        stage["support_level"] = support
+        stage["resistance_level"] = resistance
+        stage["near_support"] = ((c - support).abs() <= stage["atr"]).astype(int)
+        stage["near_resistance"] = ((c - resistance).abs() <= stage["atr"]).astype(int)
+
+        # Mask the padding so boolean windows do not count rows before a symbol's history
+        higher_highs = (h > h.shift(1)).astype(float).where(valid).rolling(5).sum()
+        lower_lows = (l < l.shift(1)).astype(float).where(valid).rolling(5).sum()
+        stage["higher_highs"] = higher_highs
+        stage["lower_lows"] = lower_lows
+        stage["trend_strength"] = higher_highs - lower_lows
+
+        # --- Volume features ---
+        volume_ema = v.ewm(span=20, adjust=False).mean()
+        stage["volume_ema"] = volume_ema
+        stage["volume_ratio"] = v / volume_ema
+        pv_trend = pd.DataFrame(np.where(c > prev_close, v, -v), index=c.index, columns=c.columns)
+        stage["pv_trend"] = pv_trend
+        stage["pv_cumulative"] = pv_trend.where(valid).rolling(20).sum()
+
+        # --- Market microstructure features ---
+        spread_proxy = candle_range / c
+        stage["spread_proxy"] = spread_proxy
+        stage["spread_volatility"] = spread_proxy.rolling(20).std()
+
+        def _index_field(field):
+            def build(built, index):
+                if isinstance(index, pd.DatetimeIndex):
+                    return np.asarray(getattr(index, field))
+                return np.zeros(len(index), dtype=int)
+            return build
+
+        def _session(start_hour, end_hour):
+            return lambda built, index: ((built["hour"] >= start_hour) & (built["hour"] < end_hour)).astype(int)
+
+        stage["hour"] = _index_field("hour")
+        stage["day_of_week"] = _index_field("dayofweek")
+        stage["asian_session"] = _session(0, 8)
+        stage["european_session"] = _session(8, 16)
+        stage["american_session"] = _session(16, 24)
+
+        # --- Wyckoff features ---
+        range_window = DEFAULT_RANGE_WINDOW
+        rolling_max = h.rolling(window=range_window).max()
+        rolling_min = l.rolling(window=range_window).min()
+        is_in_range = (c < rolling_max) & (c > rolling_min)
+        stage["rolling_max"] = rolling_max
+        stage["rolling_min"] = rolling_min
+        stage["is_in_range"] = is_in_range
+
+        was_in_range = is_in_range.shift(1) == True
+        stage["spring_signal"] = (
+            was_in_range & (l < rolling_min.shift(1)) & (c > rolling_min.shift(1))
+        ).astype(int)
+        stage["upthrust_signal"] = (
+            was_in_range & (h > rolling_max.shift(1)) & (c < rolling_max.shift(1))
+        ).astype(int)
+
+        price_spread = h - l
+        volume_ema_50 = v.ewm(span=50, adjust=False).mean()
+        narrow_spread = price_spread < price_spread.rolling(20).mean() * 0.7
+        low_volume = v < volume_ema_50 * 0.8
+        stage["price_spread"] = price_spread
+        stage["volume_ema_50"] = volume_ema_50
+        stage["is_high_volume"] = (v > volume_ema_50 * 2).astype(int)
+        stage["no_demand_signal"] = ((c > o) & narrow_spread & low_volume).astype(int)
+        stage["no_supply_signal"] = ((c < o) & narrow_spread & low_volume).astype(int)
+
+        atr_normalized = stage["atr"] / c
+        stage["atr_normalized"] = atr_normalized
+        stage["low_volatility_phase"] = (
+            atr_normalized < atr_normalized.rolling(range_window).quantile(0.25)
+        ).astype(int)
+        stage["high_volatility_phase"] = (
+            atr_normalized > atr_normalized.rolling(range_window).quantile(0.75)
+        ).astype(int)
+
+        # --- Market regime ---
+        adx_regime = adx if adx is not None else _panel_adx(h, l, c, 14, offsets)
+        ema_regime = _panel_ema(c, DEFAULT_EMA_PERIOD)
+        regime = np.select(
+            [
+                (adx_regime > DEFAULT_ADX_THRESHOLD) & (c > ema_regime),
+                (adx_regime > DEFAULT_ADX_THRESHOLD) & (c < ema_regime),
+            ],
+            [1, -1],
+            default=0,
+        )
+        stage["market_regime"] = pd.DataFrame(regime, index=c.index, columns=c.columns)
+
+        # --- Market structure inputs (Bollinger 20 exhaustion + RSI 14) ---
+        bb_mavg = c.rolling(20).mean()
+        bb_mstd = c.rolling(20).std(ddof=0)
+        bb_upper = bb_mavg + 2 * bb_mstd
+        bb_lower = bb_mavg - 2 * bb_mstd
+        structure = {
+            "bb_upper": bb_upper,
+            "bb_lower": bb_lower,
+            "bb_exhaustion_sell": ((prev_close > bb_upper.shift(1)) & (c < bb_upper)).astype(int),
+            "bb_exhaustion_buy": ((prev_close < bb_lower.shift(1)) & (c > bb_lower)).astype(int),
+        }
+        if "rsi_14" not in stage:
+            structure["rsi_14"] = _panel_rsi(c, 14)
+
+        labels = {
+            f"label_{horizon}": (c.shift(-horizon) > c).astype(int) for horizon in [1, 3, 5]
+        }
+
+        def _columns_for(k, df, columns):
+            start = offsets[k]
+            built = {}
+            for name, value in columns.items():
+                if callable(value):
+                    built[name] = value(built, df.index)
+                else:
+                    built[name] = value.to_numpy()[start:, k]
+            return built
+
+        for k, (symbol, df) in enumerate(panel_frames.items()):
+            try:
+                generated = pd.DataFrame(_columns_for(k, df, stage), index=df.index)
+                base = df.drop(columns=generated.columns.intersection(df.columns))
+                out = pd.concat([base, generated], axis=1)
+
+                with FEATURE_PROFILER.section("sd_zones", symbol, out) as section:
+                    zones = self._find_sd_zones(out)
+                    print(f"   Found total public {len(zones)} zones for {symbol}.")
+                    out = self.create_supply_demand_features(out, zones)
+                    section.output = out
+
+                for name, values in _columns_for(k, df, structure).items():
+                    out[name] = values
+                out = FEATURE_PROFILER.call("divergence", symbol, calculate_rsi_divergence_vectorized, out)
+                cols_to_drop = ['price_peak', 'price_trough', 'rsi_peak', 'rsi_trough', 'rsi_14']
+                out.drop(columns=[col for col in cols_to_drop if col in out.columns], inplace=True, errors='ignore')
+
+                # Right alignment keeps the forward-shifted labels inside each symbol's own bars
+                for name, values in _columns_for(k, df, labels).items():
+                    out[name] = values
+                results[symbol] = out
+            except Exception as e:
+                logging.error(f"Panel feature split failed for {symbol}: {e}")
+                results[symbol] = self.create_all_features(df.copy())
+
+        return results
+    #  t bn in clasfixdvancedFeatureEngineer
+    def _find_sd_zones(self, df, atr_multiplier=1.2):
+        """
+        Function to identify all supply and demand zones.
+        Includes all reversal and continuation zones.
+        A base candle (body < 60% of its range) flanked by two strong candles
+        (body > ATR * atr_multiplier); the flank directions give the zone type.
+        Vectorized over all bars; zones are returned in index order.
+        """
+        if "atr" not in df.columns or df["atr"].isnull().all():
+            # print("   [Zones] ATR is null or invalid. Skip zone detection.")
+            return []
+        if len(df) < 3:
+            return []
+
+        open_ = df["open"].to_numpy(dtype=float)
+        high = df["high"].to_numpy(dtype=float)
+        low = df["low"].to_numpy(dtype=float)
+        close = df["close"].to_numpy(dtype=float)
+        atr = df["atr"].to_numpy(dtype=float)
+        body = np.abs(close - open_)
+
+        # Start from 2nd candle and end before last candle to access i-1 and i+1
+        i = np.arange(1, len(df) - 1)
+        is_base_candle = body[i] < (high[i] - low[i]) * 0.6
+        # Chỉ lấy ATR hợp lệ
+        valid_atr = ~np.isnan(atr[i]) & (atr[i] != 0)
+        atr_threshold = atr[i] * atr_multiplier
+        is_sin_move = (body[i - 1] > atr_threshold) & (body[i + 1] > atr_threshold)
+        idx = i[is_base_candle & valid_atr & is_sin_move]
+        if len(idx) == 0:
+            return []
+
+        is_bullish_before = close[idx - 1] > open_[idx - 1]
+        is_bullish_after = close[idx + 1] > open_[idx + 1]
+        # Drop-Base-Rally / Rally-Base-Drop reverse, Rally-Base-Rally / Drop-Base-Drop continue
+        zone_types = np.select(
+            [
+                ~is_bullish_before & is_bullish_after,
+                is_bullish_before & ~is_bullish_after,
+                is_bullish_before & is_bullish_after,
+            ],
+            ["demand_reversal", "supply_reversal", "demand_continuation"],
+            default="supply_continuation",
+        )
+
+        zone_high = df["high"].iloc[idx]
+        zone_low = df["low"].iloc[idx]
+        return [
+            {"type": str(zone_type), "high": h, "low": l, "index": ts}
+            for zone_type, h, l, ts in zip(zone_types, zone_high.to_numpy(), zone_low.to_numpy(), df.index[idx])
+        ]
+
+    def create_supply_demand_features(self, df, zones, start=0):
+        """
+        Create all supply/demand features.
+        PHIN B N T I UU HA HI U NANG equal allh vector ha.
+        `start`: first row whose in-zone flags are evaluated (earlier rows stay 0);
+        inference only needs the warm-up tail.
+        """
         # --- Part 1: Calculate "in_zone" (keep original loop logic complexity) ---
         in_sr = np.zeros(len(df))
         in_dr = np.zeros(len(df))
@@ -9466,7 +10881,7 @@ class AdvancedFeatureEngineer:
         close_prices_np = df["close"].to_numpy()
         df_index_np = df.index
 
-        for i in range(len(df)):
+        for i in range(start, len(df)):
             current_price = close_prices_np[i]
             current_time = df_index_np[i]
             for zone in [z for z in zones if z["index"] < current_time]:
@@ -9582,6 +10997,259 @@ class AdvancedFeatureEngineer:
         logging.info("   [Features] Market state feature creation completed.")
         return df
 
+
+# ==============================================================================
+# PROCESS-POOL FEATURE STAGE
+# ==============================================================================
+# Candles go to the workers and feature matrices come back as .npy files that
+# are opened as memory maps (RAM-backed under /dev/shm), so only small metadata
+# dicts cross the process boundary instead of pickled DataFrames.
+
+_POOL_FEATURE_ENGINEER = None
+
+
+def _pool_feature_engineer():
+    """One AdvancedFeatureEngineer per worker process."""
+    global _POOL_FEATURE_ENGINEER
+    if _POOL_FEATURE_ENGINEER is None:
+        _POOL_FEATURE_ENGINEER = AdvancedFeatureEngineer()
+    return _POOL_FEATURE_ENGINEER
+
+
+def _frame_to_memmap(df, path_prefix):
+    """Write the OHLCV block and index of `df` to .npy files; return what a worker needs to map them."""
+    values_path = f"{path_prefix}_ohlcv.npy"
+    index_path = f"{path_prefix}_index.npy"
+    np.save(values_path, df[list(PANEL_OHLCV_COLUMNS)].to_numpy(dtype=np.float64))
+
+    if isinstance(df.index, pd.DatetimeIndex):
+        np.save(index_path, df.index.values)  # UTC wall times in the index's own unit
+        tz = str(df.index.tz) if df.index.tz is not None else None
+    else:
+        np.save(index_path, df.index.to_numpy())
+        tz = None
+
+    return {
+        "values_path": values_path,
+        "index_path": index_path,
+        "is_datetime": isinstance(df.index, pd.DatetimeIndex),
+        "tz": tz,
+        "index_name": df.index.name,
+    }
+
+
+def _memmap_to_frame(meta):
+    """Rebuild an OHLCV DataFrame inside a worker from the memory-mapped inputs."""
+    values = np.load(meta["values_path"], mmap_mode="r")
+    index_values = np.load(meta["index_path"], mmap_mode="r")
+    if meta["is_datetime"]:
+        index = pd.DatetimeIndex(np.asarray(index_values), name=meta["index_name"])
+        if meta["tz"]:
+            index = index.tz_localize("UTC").tz_convert(meta["tz"])
+    else:
+        index = pd.Index(np.asarray(index_values), name=meta["index_name"])
+    # Copy out of the read-only map: feature builders add columns in place
+    return pd.DataFrame(np.array(values), index=index, columns=list(PANEL_OHLCV_COLUMNS))
+
+
+def _features_to_memmap(df, path):
+    """Store generated feature columns as one column-major float64 matrix; return the decode metadata."""
+    feature_cols = [col for col in df.columns if col not in PANEL_OHLCV_COLUMNS]
+    matrix = np.empty((len(df), len(feature_cols)), dtype=np.float64, order="F")
+    dtypes = {}
+    categories = {}
+    for j, col in enumerate(feature_cols):
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories[col] = (list(series.cat.categories), bool(series.cat.ordered))
+            matrix[:, j] = series.cat.codes.to_numpy(dtype=np.float64)
+        else:
+            matrix[:, j] = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        dtypes[col] = str(series.dtype)
+    np.save(path, matrix)
+    return {"path": path, "columns": feature_cols, "dtypes": dtypes, "categories": categories}
+
+
+def _memmap_to_features(base_df, meta):
+    """Attach the feature matrix written by a worker to the caller's original frame."""
+    matrix = np.load(meta["path"], mmap_mode="r")
+    data = {}
+    for j, col in enumerate(meta["columns"]):
+        column = np.array(matrix[:, j])
+        if col in meta["categories"]:
+            cats, ordered = meta["categories"][col]
+            data[col] = pd.Categorical.from_codes(column.astype(np.int64), categories=cats, ordered=ordered)
+        else:
+            data[col] = column.astype(meta["dtypes"][col])
+    del matrix
+
+    generated = pd.DataFrame(data, index=base_df.index)
+    base = base_df.drop(columns=generated.columns.intersection(base_df.columns))
+    return pd.concat([base, generated], axis=1)
+
+
+def _feature_pool_worker(task):
+    """Worker entry point: build features for one chunk of symbols."""
+    frames = {symbol: _memmap_to_frame(meta) for symbol, meta in task["inputs"].items()}
+    feature_engineer = _pool_feature_engineer()
+    if task["use_panel"]:
+        features = feature_engineer.create_panel_features(frames)
+    else:
+        features = {}
+        for symbol, df in frames.items():
+            df.name = symbol
+            features[symbol] = feature_engineer.create_all_features(df)
+
+    outputs = {}
+    for k, (symbol, df) in enumerate(features.items()):
+        out_path = os.path.join(task["scratch_dir"], f"out_{task['chunk_id']}_{k}.npy")
+        outputs[symbol] = _features_to_memmap(df, out_path)
+    return outputs
+
+
+def shutdown_executor(executor, timeout=None):
+    """
+    Cancel queued work and wait at most `timeout` seconds (None: no limit) for running
+    tasks; worker processes still alive after that are terminated. True if everything
+    stopped in time.
+    """
+    if executor is None:
+        return True
+    # shutdown(wait=False) drops these references, so take them first
+    threads = [getattr(executor, "_executor_manager_thread", None)] + list(getattr(executor, "_threads", ()))
+    threads = [t for t in threads if t is not None]
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for thread in threads:
+        thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+    if not any(t.is_alive() for t in threads):
+        return True
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for thread in threads:
+        thread.join(5)
+    return False
+
+
+class ParallelFeatureStage:
+    """
+    Fans feature generation for several symbols out over a process pool.
+    Falls back to in-process computation when the pool is disabled, too few
+    symbols are requested, or a worker fails.
+    """
+
+    def __init__(self, feature_engineer, config=None):
+        self.feature_engineer = feature_engineer
+        self.config = config or FEATURE_POOL_CONFIG
+        self._executor = None
+        self._executor_workers = 0
+
+    def _worker_count(self, n_symbols):
+        configured = self.config.get("MAX_WORKERS")
+        if configured is None:
+            configured = max(1, (os.cpu_count() or 1) - 1)
+        return max(1, min(int(configured), n_symbols))
+
+    def _get_executor(self, workers):
+        if self._executor is not None and self._executor_workers >= workers:
+            return self._executor
+        self.shutdown()
+        try:
+            context = mp.get_context(self.config.get("START_METHOD"))
+        except ValueError:
+            context = mp.get_context()
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        self._executor_workers = workers
+        return self._executor
+
+    def shutdown(self, timeout=0):
+        """
+        Stop the worker processes (they are recreated on the next run). timeout > 0 waits
+        that long for running chunks before terminating them (bot stop path).
+        """
+        if self._executor is not None:
+            executor, self._executor, self._executor_workers = self._executor, None, 0
+            if timeout:
+                shutdown_executor(executor, timeout)
+            else:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def _use_panel(self, n_symbols):
+        return FEATURE_PANEL_CONFIG.get("ENABLED", True) and n_symbols >= FEATURE_PANEL_CONFIG.get("MIN_SYMBOLS", 2)
+
+    def compute_in_process(self, frames):
+        """Build features in the current process (panel pass when enabled)."""
+        if self._use_panel(len(frames)):
+            return FEATURE_PROFILER.call("panel_features", None, self.feature_engineer.create_panel_features, frames)
+        results = {}
+        for symbol, df in frames.items():
+            df.name = symbol
+            results[symbol] = self.feature_engineer.create_all_features(df)
+        return results
+
+    def run(self, frames):
+        """Build features for {symbol: OHLCV DataFrame}; returns {symbol: feature DataFrame}."""
+        eligible = {
+            symbol: df for symbol, df in frames.items()
+            if df is not None and not df.empty
+            and all(col in df.columns for col in PANEL_OHLCV_COLUMNS)
+            and (isinstance(df.index, pd.DatetimeIndex) or pd.api.types.is_numeric_dtype(df.index))
+        }
+        workers = self._worker_count(len(eligible))
+        if not self.config.get("ENABLED", True) or len(eligible) < self.config.get("MIN_SYMBOLS", 3) or workers < 2:
+            return self.compute_in_process(frames)
+
+        results = {}
+        pending = dict(eligible)
+        scratch_dir = tempfile.mkdtemp(prefix="bot_features_", dir=self.config.get("SCRATCH_DIR"))
+        try:
+            symbols = list(eligible)
+            chunks = [symbols[k::workers] for k in range(workers)]
+            executor = self._get_executor(workers)
+
+            futures = {}
+            for chunk_id, chunk in enumerate(chunks):
+                task = {
+                    "inputs": {
+                        symbol: _frame_to_memmap(eligible[symbol], os.path.join(scratch_dir, f"in_{chunk_id}_{k}"))
+                        for k, symbol in enumerate(chunk)
+                    },
+                    "scratch_dir": scratch_dir,
+                    "chunk_id": chunk_id,
+                    "use_panel": self._use_panel(len(chunk)),
+                }
+                futures[executor.submit(_feature_pool_worker, task)] = chunk
+
+            timeout = self.config.get("TASK_TIMEOUT_SEC")
+            for future, chunk in futures.items():
+                try:
+                    outputs = future.result(timeout=timeout)
+                    for symbol, meta in outputs.items():
+                        results[symbol] = _memmap_to_features(eligible[symbol], meta)
+                        pending.pop(symbol, None)
+                except BrokenProcessPool as e:
+                    logging.warning(f"⚠️ [Feature Pool] Worker pool broke ({e}); finishing in-process.")
+                    self.shutdown()
+                    break
+                except Exception as e:
+                    logging.warning(f"⚠️ [Feature Pool] Chunk {chunk} failed in worker: {e}. Computing in-process.")
+        except Exception as e:
+            logging.warning(f"⚠️ [Feature Pool] Process pool unavailable ({e}); computing in-process.")
+            self.shutdown()
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+        if pending:
+            results.update(self.compute_in_process(pending))
+        leftovers = {symbol: df for symbol, df in frames.items() if symbol not in eligible}
+        if leftovers:
+            results.update(self.compute_in_process(leftovers))
+        return results
+
+
 class EnhancedEnsembleModel:
     """Enhanced ensemble with advanced CV, CPCV, and explainability"""
 
@@ -9637,33 +11305,37 @@ class EnhancedEnsembleModel:
 
     def combinatorial_purged_cv(self, X, y, n_splits=5, n_test_splits=2, gap=24):
         """Combinatorial Purged Cross-Validation for financial data"""
-        n_samples = len(X)
+        plan = FOLD_PLAN_CACHE.get_plan(
+            "combinatorial_purged", X, y,
+            builder=lambda: self._build_combinatorial_splits(len(X), n_splits, n_test_splits, gap),
+            n_splits=n_splits, n_test_splits=n_test_splits, gap=gap,
+        )
+        return list(plan.folds)
+
+    @staticmethod
+    def _build_combinatorial_splits(n_samples, n_splits, n_test_splits, gap):
         test_size = n_samples // n_splits
 
         # Generate all possible test set combinations
         test_starts = [i * test_size for i in range(n_splits)]
         test_combinations = []
+        positions = np.arange(n_samples)
 
         from itertools import combinations
         for combo in combinations(range(n_splits), n_test_splits):
-            test_indices = []
-            for i in combo:
-                start_idx = test_starts[i]
-                end_idx = min(start_idx + test_size, n_samples)
-                test_indices.extend(range(start_idx, end_idx))
-
-            # Remove overlapping periodfixnd apply gap
-            test_indices = sorted(set(test_indices))
-
-            # Create train indices with purging
-            train_indices = []
-            for i in range(n_samples):
-                # Check if index is far enough from any test index
-                min_distance = min([abs(i - t) for t in test_indices]) if test_indices else gap + 1
-                if min_distance > gap:
-                    train_indices.append(i)
-
-            if len(train_indices) > 0 and len(test_indices) > 0:
+            test_indices = np.unique(np.concatenate([
+                np.arange(test_starts[i], min(test_starts[i] + test_size, n_samples)) for i in combo
+            ]))
+            if len(test_indices) == 0:
+                continue
+
+            # Purge: keep only samples further than `gap` from every test sample
+            right = np.searchsorted(test_indices, positions)
+            dist_right = np.abs(test_indices[np.minimum(right, len(test_indices) - 1)] - positions)
+            dist_left = np.abs(positions - test_indices[np.maximum(right - 1, 0)])
+            train_indices = positions[np.minimum(dist_left, dist_right) > gap]
+
+            if len(train_indices) > 0:
                 test_combinations.append((train_indices, test_indices))
 
         return test_combinations
@@ -9976,6 +11648,57 @@ class LSTMModel:
         self.features_dim = features_dim
         self.model = None
         self.scaler = StandardScaler()
+        self._forward = None  # Compiled single-window inference function (built lazily)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_forward"] = None  # tf.function objects do not pickle
+        return state
+
+    def compiled_forward(self):
+        """tf.function over model(x, training=False) traced once for one (1, seq_len, features) window."""
+        if getattr(self, "_forward", None) is None:
+            model = self.model
+            signature = [tf.TensorSpec([1, *model.input_shape[1:]], tf.float32)]
+            self._forward = tf.function(lambda x: model(x, training=False), input_signature=signature)
+        return self._forward
+
+    def predict_window(self, X_seq):
+        """Probability for one prepared window: compiled path, Keras predict as fallback."""
+        if LSTM_INFERENCE_CONFIG.get("COMPILED", False):
+            try:
+                return float(self.compiled_forward()(tf.constant(X_seq, dtype=tf.float32)).numpy()[-1, -1])
+            except (TypeError, ValueError, tf.errors.OpError) as e:
+                logging.warning(f"LSTMModel: compiled inference unavailable ({e}); using model.predict")
+                self._forward = None
+        return float(self.model.predict(X_seq, verbose=0)[-1, -1])
+
+    def benchmark_inference(self, X, repeats=None):
+        """Per-window latency of model.predict vs the compiled path on the newest window of X."""
+        repeats = repeats or LSTM_INFERENCE_CONFIG.get("BENCHMARK_REPEATS", 100)
+        X_seq = self.prepare_last_window(X)
+        if self.model is None or X_seq is None:
+            return None
+        forward = self.compiled_forward()
+        x = tf.constant(X_seq, dtype=tf.float32)
+        keras_prob = float(self.model.predict(X_seq, verbose=0)[-1, -1])
+        compiled_prob = float(forward(x).numpy()[-1, -1])  # First call traces
+
+        started = time.perf_counter()
+        for _ in range(repeats):
+            self.model.predict(X_seq, verbose=0)
+        keras_ms = (time.perf_counter() - started) * 1000 / repeats
+        started = time.perf_counter()
+        for _ in range(repeats):
+            forward(x).numpy()
+        compiled_ms = (time.perf_counter() - started) * 1000 / repeats
+
+        result = {"keras_ms": keras_ms, "compiled_ms": compiled_ms,
+                  "speedup": keras_ms / compiled_ms if compiled_ms else float("inf"),
+                  "abs_diff": abs(keras_prob - compiled_prob)}
+        print(f"⏱️ [LSTM Inference] predict(): {keras_ms:.3f} ms, compiled: {compiled_ms:.3f} ms "
+              f"({result['speedup']:.0f}x), |diff| = {result['abs_diff']:.2e}")
+        return result
 
     def build_model(self):
         """Build LSTM model with enhanced anti-overfitting mechanisms"""
@@ -10029,6 +11752,7 @@ class LSTMModel:
         output = Dense(1, activation="sigmoid")(dropout2)
 
         self.model = Model(inputs=input_layer, outputs=output)
+        self._forward = None
 
         # Enhanced optimizer with gradient clipping
         optimizer = Adam(
@@ -10044,35 +11768,43 @@ class LSTMModel:
         )
         return self.model
 
-    def prepare_sequences(self, X, y=None):
-        """Prepare sequences for LSTM"""
+    def _scale(self, X, fit):
+        """Fit the scaler on training data; at inference reuse it read-only (transform only)."""
+        values = X.to_numpy(dtype=np.float64) if isinstance(X, (pd.DataFrame, pd.Series)) else np.asarray(X, dtype=np.float64)
+        if values.ndim == 1:
+            values = values.reshape(-1, 1)
+        if fit or not hasattr(self.scaler, "mean_"):
+            if not fit:
+                logging.warning("   [LSTM PreSeq] Scaler was never fitted; fitting on inference data")
+            try:
+                return self.scaler.fit_transform(values)
+            except ValueError as e:  # c th xy ra if X ch c 1 sample khi fit_transform
+                print(f"   [LSTM PreSeq] Error scaling X (len {len(values)}): {e}. Using X as is for now.")
+                return values
+        return self.scaler.transform(values)
+
+    def sequence_windows(self, X_scaled, n_windows=None):
+        """
+        Window i = rows [i, i + sequence_length) as a strided (n, sequence_length, features)
+        view of X_scaled; nothing is copied. By default the last window ends one row before
+        the end, matching targets y[sequence_length:].
+        """
+        windows = sliding_window_view(X_scaled, self.sequence_length, axis=0).transpose(0, 2, 1)
+        max_windows = len(X_scaled) - self.sequence_length
+        return windows[:max_windows if n_windows is None else min(n_windows, max_windows)]
+
+    def prepare_sequences(self, X, y=None, fit_scaler=None):
+        """
+        Prepare sequences for LSTM. The scaler is fitted only when fit_scaler is True
+        (default: when targets are given, i.e. training).
+        """
         if X.empty or (y is not None and y.empty):
             logging.warning("   [LSTM PreSeq] Input X or y is empty.")
             return None, None if y is not None else None
 
-        try:
-            X_scaled = self.scaler.fit_transform(X)
-        except ValueError as e:  # c th xy ra if X ch c 1 sample khi fit_transform
-            print(
-                f"   [LSTM PreSeq] Error scaling X (len {len(X)}): {e}. Using X as is for now."
-            )
-            if len(X.shape) == 1:  # if X l 1D array
-                X_scaled = (
-                    X.to_numpy().reshape(-1, 1)
-                    if isinstance(X, pd.Series)
-                    else np.array(X).reshape(-1, 1)
-                )
-            else:
-                X_scaled = X.to_numpy() if isinstance(X, pd.DataFrame) else np.array(X)
-            # Hoc transform nu scaler d fit before vi d liu
-            # try:
-            #    X_scaled = self.scaler.transform(X)
-            # except NotFittedError:
-            #    print("    Scaler not fitted, and cannot fit with current X. Returning None.")
-            #    return None, None
-
-        sequences = []
-        targets = [] if y is not None else None
+        if fit_scaler is None:
+            fit_scaler = y is not None
+        X_scaled = self._scale(X, fit=fit_scaler)
 
         max_length = len(X_scaled)
         if y is not None:
@@ -10080,31 +11812,115 @@ class LSTMModel:
 
         # condition for sequence creation: max_length > self.sequence_length
         if max_length <= self.sequence_length:
-            # print(f"   [LSTM PreSeq] Not enough data (max_length {max_length}) for sequence_length {self.sequence_length}. Need max_length > sequence_length.")
             return np.array([]), np.array([]) if y is not None else np.array([])
 
-        for i in range(self.sequence_length, max_length):
-            sequences.append(X_scaled[i - self.sequence_length : i])
-            if y is not None:
-                # Quan tempty: y l y_train_ensemble, n l pd.Series
-                # needs d m b o index of y tuong  ng with allh l y X_scaled
-                # if X l DataFrame v y l Series, X.iloc[i] v y.iloc[i] l ok
-                targets.append(y.iloc[i])
-
-        sequences = np.array(sequences)
-        if targets is not None:
-            targets = np.array(targets)
-            if len(sequences) == 0:  # Double check
-                return np.array([]), np.array([])
+        sequences = self.sequence_windows(X_scaled[:max_length])
+        if y is not None:
+            # Quan tempty: y l y_train_ensemble, n l pd.Series
+            targets = np.asarray(y)[self.sequence_length:max_length]
             return sequences, targets
-
-        if len(sequences) == 0:  # Double check
-            return np.array([])
         return sequences
 
+    def prepare_last_window(self, X):
+        """
+        Only the newest window (the one predict_proba scores), shape (1, sequence_length, features).
+        Scales just the rows it needs with the training-time scaler. None if X is too short.
+        """
+        if X is None or len(X) <= self.sequence_length:
+            return None
+        rows = X.iloc[-(self.sequence_length + 1):-1] if isinstance(X, (pd.DataFrame, pd.Series)) \
+            else np.asarray(X)[-(self.sequence_length + 1):-1]
+        return self._scale(rows, fit=False)[np.newaxis, :, :]
+
     # TM V THAY THFunction this in L P LSTMModel
 
+    def _training_callbacks(self):
+        return [
+            EarlyStopping(
+                monitor="val_accuracy",
+                patience=ML_CONFIG.get("EARLY_STOPPING_PATIENCE", 15),
+                restore_best_weights=True,
+                verbose=1
+            ),
+            ReduceLROnPlateau(
+                monitor="val_accuracy",
+                patience=5,
+                factor=ML_CONFIG.get("LEARNING_RATE_DECAY", 0.95),
+                min_lr=1e-7,
+                verbose=1
+            ),
+        ]
+
+    @staticmethod
+    def window_rows(idx, offsets):
+        """Base-row indices for a batch of window ids: row [k, j] = idx[k] + offsets[j] (NumPy or TF)."""
+        return idx[:, None] + offsets[None, :]
+
+    def window_dataset(self, base, targets, start, stop, batch_size, cache_path=None):
+        """
+        tf.data pipeline over windows start..stop-1 (window i = base rows [i, i + sequence_length),
+        label targets[i]). Windows are gathered per batch from `base`, so only one batch of
+        3-D windows exists at a time. cache_path: file prefix for dataset.cache().
+        """
+        offsets = tf.range(self.sequence_length, dtype=tf.int64)
+        dataset = tf.data.Dataset.range(start, stop).batch(batch_size)
+        dataset = dataset.map(
+            lambda idx: (tf.gather(base, self.window_rows(idx, offsets)), tf.gather(targets, idx)),
+            num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+        if cache_path:
+            dataset = dataset.cache(cache_path)
+        return dataset.prefetch(tf.data.AUTOTUNE)
+
+    def _train_streaming(self, X, y):
+        X_scaled = self._scale(X, fit=True).astype(np.float32)
+        max_length = min(len(X_scaled), len(y))
+        n_windows = max_length - self.sequence_length
+        if n_windows < 10: # needs ti thiu 10 sequence d training
+            print(f"   [LSTM] Not enough sequence data for training. Skipping.")
+            self.model = None
+            return None
+
+        if self.model is None:
+            self.build_model()
+
+        # Same last-TimeSeriesSplit train/validation windows as the dense path
+        n_lstm_splits = 5 if n_windows >= 5 else max(2, n_windows - 1)
+        train_idx, val_idx = list(TimeSeriesSplit(n_splits=n_lstm_splits).split(np.empty((n_windows, 1))))[-1]
+
+        base = tf.constant(X_scaled[:max_length])
+        targets = tf.constant(np.asarray(y, dtype=np.float32)[self.sequence_length:max_length])
+        batch_size = ML_CONFIG.get("BATCH_SIZE", 64)
+
+        # The on-disk cache lives in a scratch directory owned by this call, so windows cached
+        # for another symbol/regime/dataset are never replayed; it is removed after fitting
+        scratch_dir = None
+        cache_dir = LSTM_PIPELINE_CONFIG.get("CACHE_DIR")
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            scratch_dir = tempfile.mkdtemp(prefix="lstm_windows_", dir=cache_dir)
+        try:
+            train_ds = self.window_dataset(base, targets, int(train_idx[0]), int(train_idx[-1]) + 1, batch_size,
+                                           scratch_dir and os.path.join(scratch_dir, "train"))
+            val_ds = self.window_dataset(base, targets, int(val_idx[0]), int(val_idx[-1]) + 1, batch_size,
+                                         scratch_dir and os.path.join(scratch_dir, "val"))
+
+            logging.info(f"   [LSTM] Starting streaming training with {len(train_idx)} train samplefixnd {len(val_idx)} validation samples "
+                         f"({X_scaled[:max_length].nbytes / 1e6:.1f} MB base matrix)...")
+            return self.model.fit(
+                train_ds,
+                validation_data=val_ds,
+                epochs=LSTM_PIPELINE_CONFIG.get("EPOCHS", 200),
+                callbacks=self._training_callbacks(),
+                verbose=1,
+            )
+        finally:
+            if scratch_dir:
+                shutil.rmtree(scratch_dir, ignore_errors=True)
+
     def train(self, X, y):
+        if LSTM_PIPELINE_CONFIG.get("STREAMING", False):
+            return self._train_streaming(X, y)
+
         X_seq, y_seq = self.prepare_sequences(X, y)
         if X_seq is None or len(X_seq) < 10: # needs ti thiu 10 sequence d training
             print(f"   [LSTM] Not enough sequence data for training. Skipping.")
@@ -10129,27 +11945,13 @@ class LSTMModel:
         y_train_lstm, y_val_lstm = y_seq[train_idx_lstm], y_seq[val_idx_lstm]
         # <<< K T THC C I money >>>
 
-        callbacks = [
-            EarlyStopping(
-                monitor="val_accuracy",
-                patience=ML_CONFIG.get("EARLY_STOPPING_PATIENCE", 15),
-                restore_best_weights=True,
-                verbose=1
-            ),
-            ReduceLROnPlateau(
-                monitor="val_accuracy",
-                patience=5,
-                factor=ML_CONFIG.get("LEARNING_RATE_DECAY", 0.95),
-                min_lr=1e-7,
-                verbose=1
-            ),
-        ]
+        callbacks = self._training_callbacks()
 
         logging.info(f"   [LSTM] Starting training with {len(X_train_lstm)} train samplefixnd {len(X_val_lstm)} validation samples...")
         history = self.model.fit(
             X_train_lstm, y_train_lstm,
             validation_data=(X_val_lstm, y_val_lstm),
-            epochs=200,
+            epochs=LSTM_PIPELINE_CONFIG.get("EPOCHS", 200),
             batch_size=ML_CONFIG.get("BATCH_SIZE", 64),
             callbacks=callbacks,
             verbose=1,
@@ -10172,41 +11974,609 @@ class LSTMModel:
                 logging.warning("LSTMModel.predict_proba: Model not yet trained")
                 return 0.5  # probability trung tnh
 
-            # Chu n bsequence data tDataFrame d u vo
-            X_seq = self.prepare_sequences(X, y=None)
+            # Only the newest window is scored; the scaler from training is reused as is
+            X_seq = self.prepare_last_window(X)
 
             # Check if unable to create sequences (due to insufficient data)
             if X_seq is None or len(X_seq) == 0:
                 logging.warning("LSTMModel.predict_proba: Cannot create data sequence")
                 return 0.5  # probability trung tnh
 
-            # Equal equal model LSTM d training
-            # Return from model ng contains probability cho allc sequence
-            predictions = self.model.predict(X_seq, verbose=0)
-            
-            # processing k t quEqual
-            if predictions is None or len(predictions) == 0:
-                logging.warning("LSTMModel.predict_proba: Model trvk t quempty")
-                return 0.5
-            
-            # Tr v probability cung (t array hoc scalar)
-            if isinstance(predictions, np.ndarray):
-                if len(predictions.shape) > 1:
-                    # if l 2D array, l y ph n tcu cng
-                    return float(predictions[-1, -1])
-                else:
-                    # if l 1D array, l y ph n tcu cng
-                    return float(predictions[-1])
-            else:
-                # if l scalar
-                return float(predictions)
-                
+            # Equal equal model LSTM d training (compiled single-window path)
+            return self.predict_window(X_seq)
+
         except Exception as e:
             logging.error(f"LSTMModel.predict_proba: Li nghim trng - {e}")
             return 0.5  # probability trung tnh an ton
 
+
+def sequence_rows_needed(model):
+    """
+    Trailing feature rows a live prediction needs: sequence_length + 1 for a sequence
+    model (or an ensemble holding one, see LSTMModel.prepare_last_window), else 1.
+    """
+    candidates = [model]
+    members = getattr(model, "models", None)
+    if isinstance(members, dict):
+        candidates += [member for _, member in raw_members(members)]
+    lengths = [getattr(m, "sequence_length", None) for m in candidates if m is not None]
+    lengths = [int(n) for n in lengths if isinstance(n, (int, np.integer))]
+    return max(lengths) + 1 if lengths else 1
+
 # L p this not thay d i
+class _BoundedTrial:
+    """Proxy for an Optuna trial that clips numeric suggest ranges to warm-start bounds."""
+
+    def __init__(self, trial, bounds):
+        self._trial = trial
+        self._bounds = bounds
+
+    def __getattr__(self, item):
+        return getattr(self._trial, item)
+
+    def _clip(self, name, low, high, log=False, step=None):
+        if name not in self._bounds:
+            return low, high
+        seed_low, seed_high = self._bounds[name]
+        margin = OPTUNA_WARM_START_CONFIG.get("RANGE_MARGIN", 0.25)
+        if log and low > 0:
+            width = np.log(high) - np.log(low)
+            new_low = float(np.exp(np.log(max(seed_low, low)) - margin * width))
+            new_high = float(np.exp(np.log(min(seed_high, high)) + margin * width))
+        else:
+            width = high - low
+            new_low, new_high = seed_low - margin * width, seed_high + margin * width
+        if step:
+            # Keep the grid of the original distribution
+            new_low = low + np.floor((new_low - low) / step) * step
+            new_high = low + np.ceil((new_high - low) / step) * step
+        new_low, new_high = max(low, new_low), min(high, new_high)
+        if new_low > new_high:
+            return low, high
+        return new_low, new_high
+
+    def suggest_float(self, name, low, high, *, step=None, log=False):
+        low, high = self._clip(name, low, high, log=log, step=step)
+        return self._trial.suggest_float(name, low, high, step=step, log=log)
+
+    def suggest_int(self, name, low, high, step=1, log=False):
+        low, high = self._clip(name, low, high, log=log, step=step)
+        return self._trial.suggest_int(name, int(round(low)), int(round(high)), step=step, log=log)
+
+
+def _boosting_f1(y_true, proba):
+    """Validation F1 at the 0.5 cut-off predict() uses: the objective's metric, per boosting iteration."""
+    return float(f1_score(np.asarray(y_true), (np.asarray(proba) >= 0.5).astype(int), zero_division=0))
+
+
+def _lgb_f1_metric(y_true, proba):
+    return "f1", _boosting_f1(y_true, proba), True
+
+
+def _boosting_pruning_callback(trial, model_name, fold_idx, progress):
+    """
+    Per-iteration pruning callback for one boosting fold. Reports the running mean F1 (finished
+    folds in progress["fold_scores"] plus this fold at the current iteration), the value the
+    objective returns, and raises optuna.TrialPruned; progress["fold_iters"] tracks the iterations run.
+    """
+    every = max(1, int(OPTUNA_PRUNING_CONFIG.get("BOOSTING_REPORT_EVERY", 25)))
+    warmup = int(OPTUNA_PRUNING_CONFIG.get("BOOSTING_WARMUP_ITERS", 50))
+    offset = fold_idx * int(OPTUNA_PRUNING_CONFIG.get("FOLD_STEP_STRIDE", 10000))
+
+    def _check(iteration, score):
+        progress["fold_iters"] = iteration + 1
+        if iteration < warmup or iteration % every:
+            return
+        finished = progress.get("fold_scores", [])
+        running = (sum(finished) + float(score)) / (len(finished) + 1)
+        trial.report(running, step=offset + iteration)
+        if trial.should_prune():
+            raise optuna.TrialPruned(f"fold {fold_idx} iteration {iteration}: running F1 {running:.4f}")
+
+    if model_name in ("lightgbm", "lgb"):
+        def _lgb_callback(env):
+            for _, eval_name, value, _ in env.evaluation_result_list:
+                if eval_name == "f1":
+                    _check(env.iteration, value)
+                    break
+        return _lgb_callback
+
+    class _XGBPruningCallback(xgb.callback.TrainingCallback):
+        def after_iteration(self, model, epoch, evals_log):
+            history = evals_log.get("validation_0", {}).get(_boosting_f1.__name__)
+            if history:
+                _check(epoch, history[-1])
+            return False
+
+    return _XGBPruningCallback()
+
+
+def _optuna_study_worker(task):
+    """Worker entry point: pull trials for one shared study until its share is done."""
+    X, y = joblib.load(task["data_path"], mmap_mode="r")
+    ensemble = EnsembleModel()
+    ensemble.n_jobs = task["n_threads"]
+    ensemble._search_bounds = task.get("search_bounds")
+    sampler, pruner = ensemble._build_optuna_sampler_pruner(seed=task["seed"])
+    storage = OptunaStudyManager(task["storage_url"]).storage
+    study = optuna.load_study(study_name=task["study_name"], storage=storage, sampler=sampler, pruner=pruner)
+
+    try:
+        # Also caps BLAS/OpenMP pools that the estimators' n_jobs does not reach
+        from threadpoolctl import threadpool_limits
+        limiter = threadpool_limits(limits=task["n_threads"])
+    except ImportError:
+        limiter = contextlib.nullcontext()
+
+    finished = []
+    deadline = time.time() + task["timeout"]
+    with limiter:
+        # One retry per trial at most: _objective catches its own errors, so these mean two
+        # workers popped the same enqueued trial (SQLite has no row locks) and the other
+        # one already finished it.
+        for _ in range(task["n_trials"]):
+            remaining = task["n_trials"] - len(finished)
+            if remaining <= 0 or time.time() >= deadline:
+                break
+            try:
+                study.optimize(
+                    lambda trial: ensemble._objective(trial, X, y, task["model_name"]),
+                    n_trials=remaining,
+                    timeout=max(1.0, deadline - time.time()),
+                    gc_after_trial=True,
+                    callbacks=[lambda _, trial: finished.append(trial.number)],
+                )
+                break
+            except (ValueError, optuna.exceptions.UpdateFinishedTrialError) as e:
+                logging.warning(f"      -> Optuna worker {task['worker_id']}: {e} (trial shared with another worker)")
+    return task["worker_id"]
+
+
+def _fit_purged_fold(model, X, y_values, columns, fold_id, tr, te, noise_level, seed, n_jobs, oof_out):
+    """
+    Fit one purged-CV fold and write its OOF probabilities into oof_out[te].
+    X is the original DataFrame in-process, or a (memory-mapped) float array in a worker.
+    """
+    if isinstance(X, pd.DataFrame):
+        X_tr, X_te = X.iloc[tr], X.iloc[te]
+    else:
+        X_tr = pd.DataFrame(X[tr], columns=columns)
+        X_te = pd.DataFrame(X[te], columns=columns)
+    y_tr, y_te = y_values[tr], y_values[te]
+
+    # TFunction noise injection cho training data dch ng overfitting
+    if noise_level > 0:
+        noise = np.random.default_rng(seed).normal(0, noise_level, X_tr.shape)
+        X_tr = X_tr + noise
+
+    # Clone model dtrnh side effects
+    mdl = clone(model)
+    if n_jobs is not None and "n_jobs" in mdl.get_params():
+        mdl.set_params(n_jobs=n_jobs)
+
+    try:
+        if mdl.__class__.__name__ in ['XGBClassifier', 'LGBMClassifier']:
+            try:
+                mdl.fit(X_tr, y_tr, eval_set=[(X_te, y_te)], verbose=False)
+            except TypeError:
+                # Fallback if not htreval_set
+                mdl.fit(X_tr, y_tr)
+        else:
+            mdl.fit(X_tr, y_tr)
+
+        if hasattr(mdl, "predict_proba"):
+            p = mdl.predict_proba(X_te)[:, 1]
+            y_hat = (p >= 0.5).astype(int)
+        else:
+            y_hat = mdl.predict(X_te)
+            p = y_hat.astype(float)
+
+        f1 = f1_score(y_te, y_hat, average='weighted')
+        accuracy = accuracy_score(y_te, y_hat)
+        precision = precision_score(y_te, y_hat, average='weighted', zero_division=0)
+        recall = recall_score(y_te, y_hat, average='weighted', zero_division=0)
+        oof_out[te] = p
+        return fold_id, (f1, accuracy, precision, recall)
+    except Exception as e:
+        logging.error(f"Error in model training fold {fold_id}: {e}")
+        # Use default values if training fails
+        oof_out[te] = 0.0
+        return fold_id, (0.0, 0.0, 0.0, 0.0)
+
+
+def population_stability_index(reference, live, n_bins=10):
+    """PSI of `live` against decile bins of `reference` (both 1-D)."""
+    reference = pd.Series(reference).replace([np.inf, -np.inf], np.nan).dropna().to_numpy()
+    live = pd.Series(live).replace([np.inf, -np.inf], np.nan).dropna().to_numpy()
+    if len(reference) < n_bins or len(live) == 0:
+        return 0.0
+    edges = np.unique(np.quantile(reference, np.linspace(0, 1, n_bins + 1)))
+    if len(edges) < 3:
+        return 0.0
+    edges[0], edges[-1] = -np.inf, np.inf
+    ref_dist = np.histogram(reference, bins=edges)[0] / len(reference)
+    live_dist = np.histogram(live, bins=edges)[0] / len(live)
+    ref_dist = np.clip(ref_dist, 1e-4, None)
+    live_dist = np.clip(live_dist, 1e-4, None)
+    return float(np.sum((live_dist - ref_dist) * np.log(live_dist / ref_dist)))
+
+
+class LazyMember:
+    """
+    Ensemble member saved in its own file and read on first use: XGBoost as a native .ubj
+    booster, anything else as an uncompressed joblib dump loaded with MMAP_MODE. Feature
+    names and class name are kept on the placeholder so inference planning need not load it.
+    """
+
+    def __init__(self, filename, kind, class_name, feature_names=None, params=None):
+        self.filename = filename
+        self.kind = kind
+        self.class_name = class_name
+        self.feature_names_in_ = None if feature_names is None else np.asarray(feature_names, dtype=object)
+        self.params = params or {}
+        self.base_dir = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_model"] = None
+        state["_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def dump(cls, model, directory, name):
+        columns = getattr(model, "feature_names_in_", None)
+        columns = None if columns is None else [str(c) for c in columns]
+        if hasattr(model, "get_booster") and MODEL_ARTEFACT_CONFIG.get("NATIVE_XGBOOST", True):
+            filename = f"{name}.ubj"
+            model.save_model(os.path.join(directory, filename))
+            params = {k: v for k, v in model.get_params().items() if isinstance(v, (bool, int, float, str))}
+            member = cls(filename, "xgboost", model.__class__.__name__, columns, params)
+        else:
+            filename = f"{name}.joblib"
+            joblib.dump(model, os.path.join(directory, filename))  # Uncompressed: arrays stay mmap-able
+            member = cls(filename, "joblib", model.__class__.__name__, columns)
+        member.base_dir = directory
+        return member
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    path = os.path.join(self.base_dir or MODEL_DIR, self.filename)
+                    if self.kind == "xgboost":
+                        model = xgb.XGBClassifier(**self.params)
+                        model.load_model(path)
+                    else:
+                        model = joblib.load(path, mmap_mode=MODEL_ARTEFACT_CONFIG.get("MMAP_MODE", "r"))
+                    logging.info(f"[Model Artefacts] Loaded member {self.filename} from {self.base_dir}")
+                    self._model = model
+        return self._model
+
+
+class LazyMemberDict(dict):
+    """EnsembleModel.models whose LazyMember values load on item access; raw_items() never loads."""
+
+    def __getitem__(self, name):
+        value = dict.__getitem__(self, name)
+        return value.load() if isinstance(value, LazyMember) else value
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def items(self):
+        return [(name, self[name]) for name in dict.keys(self)]
+
+    def values(self):
+        return [self[name] for name in dict.keys(self)]
+
+    def raw_items(self):
+        return dict.items(self)
+
+    def __reduce__(self):
+        return (self.__class__, (dict(dict.items(self)),))
+
+
+def raw_members(models):
+    """(name, model or LazyMember) pairs of an ensemble's models without loading anything."""
+    return models.raw_items() if isinstance(models, LazyMemberDict) else models.items()
+
+
+class CompiledTreeEnsemble:
+    """
+    Tree members of an EnsembleModel in flat array form, evaluated in NumPy only.
+
+    All trees of all members share one node table; child pointers are global node ids and
+    leaves point to themselves. Feature ids index the member matrices stacked side by side
+    in `member_names` order. Each member is either an averaging forest ("mean", leaf values
+    are class-1 probabilities) or a boosted model ("sigmoid", leaf values are margins).
+    """
+
+    MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2  # LightGBM missing_type semantics
+    ZERO_THRESHOLD = 1e-35
+
+    def __init__(self):
+        self.member_names = []
+        self.members = {}   # name -> {"columns", "offset", "trees": (start, stop), "kind", "base", "scale"}
+        self._nodes = {k: [] for k in ("feature", "threshold", "left", "right", "value", "default_left", "missing")}
+        self._roots = []
+        self._node_count = 0
+        self.max_depth = 0
+
+    # --- export -------------------------------------------------------------------------
+    @classmethod
+    def from_models(cls, models):
+        """Export every supported member of `models` (name -> fitted estimator); others are skipped."""
+        compiled = cls()
+        for name, model in models.items():
+            if model is None:
+                continue
+            try:
+                compiled._add_member(name, model)
+            except Exception as e:
+                logging.info(f"CompiledTreeEnsemble: {name} not exported ({e})")
+        compiled._finalize()
+        return compiled
+
+    def _add_member(self, name, model):
+        columns = getattr(model, "feature_names_in_", None)
+        if columns is None:
+            raise ValueError("unknown feature order")
+        offset = sum(len(m["columns"]) for m in self.members.values())
+        first_tree, first_node = len(self._roots), self._node_count
+        parts_before = {k: len(v) for k, v in self._nodes.items()}
+        try:
+            if hasattr(model, "estimators_") and all(hasattr(t, "tree_") for t in model.estimators_):
+                kind, base, scale = self._add_sklearn_forest(model, offset)
+            elif hasattr(model, "get_booster"):
+                kind, base, scale = self._add_xgboost(model, offset)
+            elif hasattr(model, "booster_"):
+                kind, base, scale = self._add_lightgbm(model, offset)
+            else:
+                raise ValueError(f"unsupported model type {model.__class__.__name__}")
+        except Exception:
+            for k, n in parts_before.items():
+                del self._nodes[k][n:]
+            del self._roots[first_tree:]
+            self._node_count = first_node
+            raise
+        self.member_names.append(name)
+        self.members[name] = {"columns": tuple(map(str, columns)), "offset": offset,
+                              "trees": (first_tree, len(self._roots)), "kind": kind,
+                              "base": float(base), "scale": float(scale)}
+
+    def _append_tree(self, feature, threshold, left, right, value, default_left, missing):
+        """Append one tree given node-local arrays (leaves: feature < 0)."""
+        start = self._node_count
+        feature = np.asarray(feature, dtype=np.int64)
+        is_leaf = feature < 0
+        local = np.arange(len(feature))
+        left = np.where(is_leaf, local, np.asarray(left, dtype=np.int64)) + start
+        right = np.where(is_leaf, local, np.asarray(right, dtype=np.int64)) + start
+        for key, values in (("feature", feature), ("threshold", threshold), ("left", left), ("right", right),
+                            ("value", value), ("default_left", default_left), ("missing", missing)):
+            self._nodes[key].append(np.asarray(values))
+        self._roots.append(start)
+        self._node_count += len(feature)
+        self._tree_depth(left - start, right - start, is_leaf)
+
+    def _tree_depth(self, left, right, is_leaf):
+        depth, frontier = 0, np.array([0])
+        while not is_leaf[frontier].all():
+            frontier = frontier[~is_leaf[frontier]]
+            frontier = np.concatenate([left[frontier], right[frontier]])
+            depth += 1
+        self.max_depth = max(self.max_depth, depth)
+
+    def _add_sklearn_forest(self, model, offset):
+        classes = list(getattr(model, "classes_", [0, 1]))
+        positive = 1 if len(classes) > 1 else 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1)
+            value = np.divide(counts[:, positive], totals, out=np.zeros(len(totals)), where=totals > 0)
+            is_leaf = tree.children_left < 0
+            go_left = getattr(tree, "missing_go_to_left", None)
+            default_left = np.ones(tree.node_count, dtype=bool) if go_left is None else np.asarray(go_left, dtype=bool)
+            self._append_tree(np.where(is_leaf, -1, tree.feature + offset), tree.threshold,
+                              tree.children_left, tree.children_right, value, default_left,
+                              np.full(tree.node_count, self.MISSING_NAN))
+        return "mean", 0.0, 1.0
+
+    def _add_xgboost(self, model, offset):
+        booster = model.get_booster()
+        dump = json.loads(booster.save_raw("json"))
+        learner = dump["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in ("binary:logistic", "reg:logistic"):
+            raise ValueError(f"objective {objective}")
+        gbm = learner["gradient_booster"]
+        if gbm.get("name") != "gbtree":
+            raise ValueError(f"booster {gbm.get('name')}")
+        trees = gbm["model"]["trees"]
+        try:
+            best_iteration = model.best_iteration
+        except AttributeError:
+            best_iteration = None
+        if best_iteration is not None:
+            per_round = int(gbm["model"]["gbtree_model_param"].get("num_parallel_tree", 1) or 1)
+            trees = trees[:(int(best_iteration) + 1) * per_round]
+        names = booster.feature_names
+        columns = list(map(str, model.feature_names_in_))
+        remap = None if names is None else np.array([columns.index(n) for n in names], dtype=np.int64)
+        for tree in trees:
+            if tree.get("categories"):
+                raise ValueError("categorical splits")
+            left = np.asarray(tree["left_children"], dtype=np.int64)
+            is_leaf = left < 0
+            feature = np.asarray(tree["split_indices"], dtype=np.int64)
+            if remap is not None:
+                feature = remap[np.where(is_leaf, 0, feature)]
+            condition = np.asarray(tree["split_conditions"], dtype=np.float32)
+            # XGBoost goes left on x < c in float32, i.e. x <= the float32 just below c
+            threshold = np.nextafter(condition, np.float32(-np.inf)).astype(np.float64)
+            self._append_tree(np.where(is_leaf, -1, feature + offset), threshold, left, tree["right_children"],
+                              condition.astype(np.float64), np.asarray(tree["default_left"], dtype=bool),
+                              np.full(len(left), self.MISSING_NAN))
+        base_score = str(learner["learner_model_param"]["base_score"]).strip("[]")
+        base_score = float(base_score.split(",")[0])
+        return "sigmoid", np.log(base_score / (1.0 - base_score)), 1.0
+
+    def _add_lightgbm(self, model, offset):
+        dump = model.booster_.dump_model(num_iteration=getattr(model, "best_iteration_", None) or None)
+        objective = str(dump.get("objective", ""))
+        if not objective.startswith(("binary", "cross_entropy")):
+            raise ValueError(f"objective {objective}")
+        scale = 1.0
+        for token in objective.split():
+            if token.startswith("sigmoid:"):
+                scale = float(token.split(":", 1)[1])
+        missing_codes = {"None": self.MISSING_NONE, "Zero": self.MISSING_ZERO, "NaN": self.MISSING_NAN}
+        for info in dump["tree_info"]:
+            feature, threshold, left, right, value, default_left, missing = [], [], [], [], [], [], []
+
+            def visit(node):
+                idx = len(feature)
+                for column in (feature, threshold, left, right, value, default_left, missing):
+                    column.append(0)
+                if "leaf_value" in node:
+                    feature[idx], value[idx] = -1, node["leaf_value"]
+                    return idx
+                if node.get("decision_type", "<=") != "<=":
+                    raise ValueError("categorical splits")
+                feature[idx] = node["split_feature"] + offset
+                threshold[idx] = node["threshold"]
+                default_left[idx] = bool(node.get("default_left", True))
+                missing[idx] = missing_codes.get(node.get("missing_type", "None"), self.MISSING_NONE)
+                left[idx] = visit(node["left_child"])
+                right[idx] = visit(node["right_child"])
+                return idx
+
+            visit(info["tree_structure"])
+            self._append_tree(feature, np.asarray(threshold, dtype=np.float64), left, right,
+                              np.asarray(value, dtype=np.float64), np.asarray(default_left, dtype=bool), missing)
+        return "sigmoid", 0.0, scale
+
+    def _finalize(self):
+        dtypes = {"feature": np.int64, "threshold": np.float64, "left": np.int64, "right": np.int64,
+                  "value": np.float64, "default_left": bool, "missing": np.int8}
+        for key, dtype in dtypes.items():
+            parts = self._nodes[key]
+            self._nodes[key] = np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+        self._roots = np.asarray(self._roots, dtype=np.int64)
+
+    # --- evaluation ---------------------------------------------------------------------
+    @property
+    def n_features(self):
+        return sum(len(m["columns"]) for m in self.members.values())
+
+    def predict_members(self, matrices):
+        """
+        Class-1 probability per member for {name: (n_rows, n_features) matrix}, all members
+        in one traversal. Only names in `member_names` are scored.
+        """
+        names = [name for name in self.member_names if name in matrices]
+        if not names:
+            return {}
+        if len(names) < len(self.member_names):
+            X = np.zeros((len(matrices[names[0]]), self.n_features))
+            for name in names:
+                m = self.members[name]
+                X[:, m["offset"]:m["offset"] + len(m["columns"])] = matrices[name]
+        else:
+            X = np.hstack([np.asarray(matrices[name], dtype=np.float64) for name in names])
+        leaf_values = self._leaf_values(X)
+
+        probabilities = {}
+        for name in names:
+            m = self.members[name]
+            values = leaf_values[:, m["trees"][0]:m["trees"][1]]
+            if m["kind"] == "mean":
+                probabilities[name] = values.mean(axis=1) if values.shape[1] else np.full(len(X), 0.5)
+            else:
+                margin = m["scale"] * (values.sum(axis=1) + m["base"])
+                probabilities[name] = 1.0 / (1.0 + np.exp(-margin))
+        return probabilities
+
+    def _leaf_values(self, X):
+        nodes_feature = self._nodes["feature"]
+        threshold, left, right = self._nodes["threshold"], self._nodes["left"], self._nodes["right"]
+        default_left, missing = self._nodes["default_left"], self._nodes["missing"]
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self._roots, (len(X), len(self._roots))).copy()
+        for _ in range(self.max_depth):
+            feature = nodes_feature[nodes]
+            internal = feature >= 0
+            if not internal.any():
+                break
+            x = X[rows, np.where(internal, feature, 0)]
+            kind = missing[nodes]
+            is_nan = np.isnan(x)
+            x = np.where(is_nan & (kind != self.MISSING_NAN), 0.0, x)
+            is_missing = np.where(kind == self.MISSING_NAN, is_nan,
+                                  (kind == self.MISSING_ZERO) & (np.abs(x) <= self.ZERO_THRESHOLD))
+            go_left = np.where(is_missing, default_left[nodes], x <= threshold[nodes])
+            nodes = np.where(go_left, left[nodes], right[nodes])
+        return self._nodes["value"][nodes]
+
+    def verify(self, models, X):
+        """Max abs difference to the native predict_proba on X, per member."""
+        matrices = {name: X.reindex(columns=list(self.members[name]["columns"]), fill_value=0.0)
+                    .to_numpy(dtype=np.float32) for name in self.member_names}
+        compiled = self.predict_members(matrices)
+        errors = {}
+        for name in self.member_names:
+            if hasattr(models[name], "predict_proba"):
+                native = models[name].predict_proba(matrices[name])
+                native = native[:, 1] if native.shape[1] > 1 else native[:, 0]
+            else:  # probability regressors, e.g. a cross-entropy student
+                native = models[name].predict(matrices[name])
+            errors[name] = float(np.max(np.abs(native - compiled[name]))) if len(native) else 0.0
+        return errors
+
+    # --- persistence --------------------------------------------------------------------
+    def save(self, path):
+        """
+        Write to directory `path`: one uncompressed .npy per array plus members.json, so the
+        arrays can be memory-mapped and read without sklearn/xgboost/lightgbm.
+        """
+        os.makedirs(path, exist_ok=True)
+        meta = {"member_names": self.member_names, "members": self.members, "max_depth": self.max_depth}
+        np.save(os.path.join(path, "roots.npy"), self._roots)
+        for key, values in self._nodes.items():
+            np.save(os.path.join(path, f"node_{key}.npy"), values)
+        with open(os.path.join(path, "members.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        compiled = cls()
+        with open(os.path.join(path, "members.json")) as f:
+            meta = json.load(f)
+        compiled._roots = np.load(os.path.join(path, "roots.npy"), mmap_mode=mmap_mode)
+        compiled._nodes = {key: np.load(os.path.join(path, f"node_{key}.npy"), mmap_mode=mmap_mode)
+                           for key in compiled._nodes}
+        compiled.member_names = meta["member_names"]
+        compiled.members = {name: dict(m, columns=tuple(m["columns"]), trees=tuple(m["trees"]))
+                            for name, m in meta["members"].items()}
+        compiled.max_depth = int(meta["max_depth"])
+        return compiled
+
+
 class EnsembleModel:
+    # Blend weights of the base models in predict_proba (others get 0.33)
+    MEMBER_WEIGHTS = {'rf': 0.3, 'xgb': 0.4, 'lgb': 0.3}
+
     def __init__(self):
         self.validation_threshold = 0.02  # Ultra-strict: from test results
         self.early_stopping_patience = 3   # Very early stopping
@@ -10226,6 +12596,17 @@ class EnsembleModel:
         self.overfitting_detection = True  # Enable overfitting detection
         self.validation_requirements = "STRICT"  # Strict validation
         self.model_weights = {}  # Dictionary dluu trweights of modelsodels
+        self.n_jobs = -1      # Threads per estimator; parallel Optuna workers pin this to their CPU share
+        self.study_context = None      # {"symbol", "regime"} set by the trainer; keys the Optuna studies
+        self.optuna_best_params = {}   # Best params per base model, persisted in model metadata
+        self.optuna_warm_start = {}    # Warm-start report per base model
+        self.optuna_pruning = {}       # Pruning / compute-saved summary per base model
+        self._search_bounds = None
+        self.trained_until = None        # Index label of the last bar the base models were fit on
+        self.incremental_updates = 0     # Boosting increments since the last full train
+        self.last_full_train = None
+        self._inference_plan = None      # Per-member feature order + float32 row buffer (prepare_inference)
+        self._projections = {}           # (member, input columns, feature_columns) -> column index maps
     def _objective(self, trial, X, y, model_name):
         """
         Function m fromiu dOptuna ti uu ha.
@@ -10234,6 +12615,9 @@ class EnsembleModel:
         try:
             # Debug logging
             logging.info(f"      -> _objective called for {model_name} with X.shape={X.shape}, y.shape={y.shape}")
+            n_jobs = getattr(self, "n_jobs", -1)
+            if getattr(self, "_search_bounds", None):
+                trial = _BoundedTrial(trial, self._search_bounds)
 
             # Tch ring numeric v categorical columns
             numeric_columns = X.select_dtypes(include=[np.number]).columns
@@ -10262,7 +12646,7 @@ class EnsembleModel:
                     "scale_pos_weight": trial.suggest_float("scale_pos_weight", 0.8, 1.2),  # Class balancing
                     "max_leaves": trial.suggest_int("max_leaves", 0, 50),  # Gi i h n leaves
                     # ===================================================
-                    "random_state": 42, "n_jobs": -1
+                    "random_state": 42, "n_jobs": n_jobs
                 }
                 # TFunction early stopping cho XGBoost
                 model = xgb.XGBClassifier(**params)
@@ -10288,7 +12672,7 @@ class EnsembleModel:
                     "max_bin": trial.suggest_int("max_bin", 200, 500),  # Gi i h n bins
                     "min_data_in_leaf": trial.suggest_int("min_data_in_leaf", 10, 50),  # Tang dch ng overfitting
                     # ===================================================
-                    "random_state": 42, "verbose": -1, "n_jobs": -1
+                    "random_state": 42, "verbose": -1, "n_jobs": n_jobs
                 }
                 # TFunction early stopping cho LightGBM
                 model = lgb.LGBMClassifier(**params)
@@ -10305,7 +12689,7 @@ class EnsembleModel:
                     "bootstrap": bootstrap,
                     "max_leaf_nodes": trial.suggest_int("max_leaf_nodes", 10, 100),  # Gi i h n leaves
                     "min_impurity_decrease": trial.suggest_float("min_impurity_decrease", 0.0, 0.01),  # Gi mimpurity
-                    "random_state": 42, "n_jobs": -1
+                    "random_state": 42, "n_jobs": n_jobs
                 }
                 # ChAdd modelax_samples if bootstrap=True
                 if bootstrap:
@@ -10338,7 +12722,7 @@ class EnsembleModel:
                     "algoritFunction": trial.suggest_categorical("algoritFunction", ["auto", "ball_tree", "kd_tree", "brute"]),
                     "leaf_size": trial.suggest_int("leaf_size", 10, 50),
                     "p": trial.suggest_int("p", 1, 3),  # Power parameter for Minkowski metric
-                    "n_jobs": -1
+                    "n_jobs": n_jobs
                 }
                 model = KNeighborsClassifier(**params)
             else:
@@ -10371,97 +12755,135 @@ class EnsembleModel:
 
             logging.info(f"      -> Training {model_name} with {X_to_use.shape[1]} features")
 
-            tscv = TimeSeriesSplit(n_splits=3)
-            scores = safe_cross_val_score(model, X_to_use, y, cv=tscv, scoring="f1", n_jobs=-1)
-
-            mean_score = np.mean(scores)
+            # Plan keyed on the caller's X: the same object for every trial, so it is fingerprinted once
+            plan = FOLD_PLAN_CACHE.purged(X, y, n_splits=OPTUNA_PRUNING_CONFIG.get("CV_SPLITS", 3),
+                                          gap=OPTUNA_PRUNING_CONFIG.get("EMBARGO", 5))
+            mean_score = self._purged_cv_score(trial, model, X_to_use, y, model_name, plan)
             logging.info(f"      -> {model_name} CV score: {mean_score:.4f}")
 
             return mean_score
 
+        except optuna.TrialPruned:
+            raise
         except Exception as e:
             logging.error(f"      -> Error in _objective for {model_name}: {e}")
             return 0.0
 
-    def evaluate_model_with_purged_cv(self, model, X, y, n_splits=5, embargo=5):
+    def _purged_cv_score(self, trial, model, X, y, model_name, plan=None):
         """
-        Enhanced Purgedross-Validation with better anti-overfitting measures
+        Mean F1 over PurgedGroupTimeSeriesSplit folds, reporting to the trial as it goes so
+        the pruner can stop hopeless parameter sets. Work done vs planned (folds, or boosting
+        iterations) is stored in the trial's "cv_work" user attr.
         """
-        X_idx = np.arange(len(X))
+        report = OPTUNA_CONFIG.get("INTERMEDIATE_VALUES", True)
+        boosting = (report and OPTUNA_PRUNING_CONFIG.get("BOOSTING_PRUNING", True)
+                    and model_name in ("xgboost", "xgb", "lightgbm", "lgb"))
+        n_iter = int(model.get_params().get("n_estimators") or 100) if boosting else 1
+
+        if plan is None:
+            plan = FOLD_PLAN_CACHE.purged(X, y, n_splits=OPTUNA_PRUNING_CONFIG.get("CV_SPLITS", 3),
+                                          gap=OPTUNA_PRUNING_CONFIG.get("EMBARGO", 5))
+        if len(X.select_dtypes(include=[np.number, 'bool']).columns) == X.shape[1]:
+            fold_data = plan.fold_frames(X, y)
+        else:
+            fold_data = [(X.iloc[tr], y.iloc[tr], X.iloc[te], y.iloc[te]) for tr, te in plan]
+        scores = []
+        progress = {"done": 0, "planned": len(fold_data) * n_iter, "fold_iters": 0, "fold_scores": scores}
+        try:
+            for fold_idx, (X_tr, y_tr, X_te, y_te) in enumerate(fold_data):
+                mdl = clone(model)
+                progress["fold_iters"] = 0
+
+                if boosting:
+                    callback = _boosting_pruning_callback(trial, model_name, fold_idx, progress)
+                    if model_name in ("lightgbm", "lgb"):
+                        mdl.fit(X_tr, y_tr, eval_set=[(X_te, y_te)], eval_metric=_lgb_f1_metric, callbacks=[callback])
+                    else:
+                        mdl.set_params(eval_metric=_boosting_f1, callbacks=[callback])
+                        mdl.fit(X_tr, y_tr, eval_set=[(X_te, y_te)], verbose=False)
+                else:
+                    mdl.fit(X_tr, y_tr)
+                    progress["fold_iters"] = 1
+                progress["done"] += progress["fold_iters"]
+                progress["fold_iters"] = 0
+
+                scores.append(f1_score(y_te, mdl.predict(X_te), zero_division=0))
+                if report and not boosting:
+                    trial.report(float(np.mean(scores)), step=fold_idx)
+                    if trial.should_prune():
+                        raise optuna.TrialPruned(f"fold {fold_idx}: running F1 {np.mean(scores):.4f}")
+        except optuna.TrialPruned:
+            progress["done"] += progress["fold_iters"]
+            raise
+        finally:
+            trial.set_user_attr("cv_work", [progress["done"], progress["planned"]])
+
+        return float(np.mean(scores)) if scores else 0.0
+
+    def _purged_cv_workers(self, X, n_folds):
+        """Worker count for the fold executor; 1 means run the folds in this process."""
+        cfg = PURGED_CV_PARALLEL_CONFIG
+        if not cfg.get("ENABLED", False) or n_folds < 2 or len(X) < cfg.get("MIN_ROWS", 2000):
+            return 1
+        if len(X.select_dtypes(include=[np.number, 'bool']).columns) != X.shape[1]:
+            return 1  # fold matrices are shipped as one float array
+        workers = cfg.get("MAX_WORKERS") or os.cpu_count() or 1
+        return max(1, min(int(workers), n_folds))
+
+    def _run_folds_parallel(self, model, X, y_values, folds, noise_level, workers):
+        """Fit folds concurrently; returns (fold_metrics, oof) or None if the executor failed."""
+        cfg = PURGED_CV_PARALLEL_CONFIG
+        n_threads = max(1, (os.cpu_count() or 1) // workers)
+        base_seed = cfg.get("BASE_SEED", 42)
+        scratch_root = FEATURE_POOL_CONFIG.get("SCRATCH_DIR")
+        scratch_dir = tempfile.mkdtemp(prefix="purged_cv_", dir=scratch_root if scratch_root and os.path.isdir(scratch_root) else None)
+        try:
+            X_values = np.ascontiguousarray(X.to_numpy(dtype=np.float64))
+            oof_out = np.memmap(os.path.join(scratch_dir, "oof.dat"), dtype=np.float64, mode="w+", shape=(len(X),))
+            oof_out[:] = np.nan
+            results = joblib.Parallel(n_jobs=workers, backend=cfg.get("BACKEND", "loky"),
+                                      temp_folder=scratch_dir, max_nbytes=cfg.get("MAX_NBYTES", "1M"))(
+                joblib.delayed(_fit_purged_fold)(model, X_values, y_values, list(X.columns), fold_id, tr, te,
+                                                 noise_level, base_seed + fold_id, n_threads, oof_out)
+                for fold_id, tr, te in folds
+            )
+            oof_pred = np.array(oof_out)
+            del oof_out
+            return [metrics for _, metrics in sorted(results, key=lambda r: r[0])], oof_pred
+        except Exception as e:
+            logging.warning(f"   [PurgedCV] Parallel fold executor failed ({type(e).__name__}: {e}), running folds in-process")
+            return None
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
 
+    def evaluate_model_with_purged_cv(self, model, X, y, n_splits=5, embargo=5):
+        """
+        Enhanced Purgedross-Validation with better anti-overfitting measures.
+        Folds run concurrently when PURGED_CV_PARALLEL_CONFIG allows; noise seeds are per fold,
+        so both paths give the same result.
+        """
         # Using PurgedGroupTimeSeriesSplit thay v TimeSeriesSplit thng thu ng
-        pgts = PurgedGroupTimeSeriesSplit(n_splits=n_splits, gap=embargo)
-        oof_pred = np.full(len(X), np.nan)
-        fold_metrics = []
+        plan = FOLD_PLAN_CACHE.purged(X, y, n_splits=n_splits, gap=embargo)
+        folds = [(fold_id, tr, te) for fold_id, (tr, te) in enumerate(plan, 1) if len(tr) > 0]
+        y_values = np.asarray(y)
 
         # TFunction noise injection dregularization
         noise_level = ML_CONFIG.get("NOISE_INJECTION", 0.01)
 
-        for fold_id, (tr, te) in enumerate(pgts.split(X_idx), 1):
-            if len(tr) == 0: continue
-
-            X_tr, y_tr = X.iloc[tr], y.iloc[tr]
-            X_te, y_te = X.iloc[te], y.iloc[te]
-
-            # TFunction noise injection cho training data dch ng overfitting
-            if noise_level > 0:
-                noise = np.random.normal(0, noise_level, X_tr.shape)
-                X_tr_noisy = X_tr + noise
-            else:
-                X_tr_noisy = X_tr
-
-            # Clone model dtrnh side effects
-            mdl = clone(model)
-
-            # Fit with early stopping if model htr 
-            try:
-                if hasattr(mdl, 'fit') and hasattr(mdl, 'predict_proba'):
-                    # Check type model d p early stopping suitable
-                    model_name = mdl.__class__.__name__
-
-                    if model_name in ['XGBClassifier', 'LGBMClassifier']:
-                        #  i with XGBoost v LightGBM, early stopping d handle khneedshau
-                        try:
-                            mdl.fit(X_tr_noisy, y_tr,
-                                   eval_set=[(X_te, y_te)],
-                                   verbose=False)
-                        except TypeError:
-                            # Fallback if not htreval_set
-                            mdl.fit(X_tr_noisy, y_tr)
-                    else:
-                        # modelsodel khc
-                        mdl.fit(X_tr_noisy, y_tr)
-
-                    # Predict with uncertainty quantification
-                    if hasattr(mdl, "predict_proba"):
-                        p = mdl.predict_proba(X_te)[:, 1]
-                        y_hat = (p >= 0.5).astype(int)
-                    else:
-                        y_hat = mdl.predict(X_te)
-                        p = y_hat.astype(float)
-
-                    # Calculate metrics with class balancing
-                    f1 = f1_score(y_te, y_hat, average='weighted')
-                    accuracy = accuracy_score(y_te, y_hat)
-
-                    # TFunction precision v recall ddnh gi ton di n
-                    try:
-                        from sklearn.metrics import precision_score, recall_score
-                        precision = precision_score(y_te, y_hat, average='weighted', zero_division=0)
-                        recall = recall_score(y_te, y_hat, average='weighted', zero_division=0)
-                    except (NameError, ImportError):
-                        # Fallback if import not successful
-                        precision = 0.0
-                        recall = 0.0
-
-                    fold_metrics.append((f1, accuracy, precision, recall))
-                    oof_pred[te] = p
-
-            except Exception as e:
-                logging.error(f"Error in model training fold {fold_id}: {e}")
-                # Use default values if training fails
-                fold_metrics.append((0.0, 0.0, 0.0, 0.0))
-                oof_pred[te] = np.zeros(len(te))
+        outcome = None
+        workers = self._purged_cv_workers(X, len(folds))
+        if workers > 1:
+            outcome = self._run_folds_parallel(model, X, y_values, folds, noise_level, workers)
+        if outcome is not None:
+            fold_metrics, oof_pred = outcome
+        else:
+            oof_pred = np.full(len(X), np.nan)
+            base_seed = PURGED_CV_PARALLEL_CONFIG.get("BASE_SEED", 42)
+            fold_metrics = [
+                _fit_purged_fold(model, X, y_values, list(X.columns), fold_id, tr, te,
+                                 noise_level, base_seed + fold_id, None, oof_pred)[1]
+                for fold_id, tr, te in folds
+            ]
 
         if not fold_metrics:
             return {"mean_f1": 0.0, "mean_accuracy": 0.0, "std_f1": 0.0, "std_accuracy": 0.0}
@@ -10508,6 +12930,8 @@ class EnsembleModel:
         self.models = {}
         self.cv_results = {}
         self.base_model_feature_importance = {}
+        self.member_calibrators = {}
+        self.calibration_report = {}
 
         # Tch ring numeric v categorical columns
         numeric_columns = X.select_dtypes(include=[np.number]).columns
@@ -10552,12 +12976,15 @@ class EnsembleModel:
         X_to_use.columns = X_to_use.columns.astype(str)  #  m b o column names l string
         X_to_use = X_to_use.loc[:, ~X_to_use.columns.duplicated()]  # type bduplicate columns
 
+        # Fold indices shared by every base model (and cached for the purged CV / Optuna trials)
+        oof_plan = FOLD_PLAN_CACHE.time_series(X_to_use, y, n_splits=ML_CONFIG["CV_N_SPLITS"])
+
         for name in base_model_names:
             logging.info(f"      -> Training and getting OOF predictions for {name}...")
             model = self._get_optimized_model(name, X, y)
             oof_preds_for_model = np.full(len(X), np.nan)
 
-            for train_idx, val_idx in tscv.split(X_to_use):
+            for train_idx, val_idx in oof_plan:
                 X_train, y_train = X_to_use.iloc[train_idx], y.iloc[train_idx]
                 X_val = X_to_use.iloc[val_idx]
                 model_clone = clone(model)
@@ -10568,6 +12995,16 @@ class EnsembleModel:
             model.fit(X_to_use, y)
             self.models[name] = model
             self.cv_results[name] = self.evaluate_model_with_purged_cv(model, X_to_use, y)
+            # Fit on the same TimeSeriesSplit OOF the calibrator transforms below (the purged-CV
+            # oof_proba comes from differently noised/purged fits and is only partially aligned)
+            calibrator, report = fit_oof_calibrator(oof_preds_for_model, y)
+            if calibrator is not None:
+                self.member_calibrators[name] = calibrator
+                self.calibration_report[name] = report
+                # Level 1 / pruning see the same calibrated scale the live blend uses
+                oof_predictions[name] = self._calibrated(name, oof_preds_for_model)
+                print(f"   [OOF Calibration] {name}: {report['method']} on {report['rows']} OOF rows, "
+                      f"Brier {report['brier_raw']:.4f} -> {report['brier_calibrated']:.4f}")
 
             if hasattr(model, 'feature_importances_'):
                 # Using used columns cho feature importance
@@ -10575,6 +13012,8 @@ class EnsembleModel:
                 importances = pd.Series(model.feature_importances_, index=feature_columns)
                 self.base_model_feature_importance[name] = importances.nlargest(5).to_dict()
 
+        oof_predictions = self.prune_members(oof_predictions, y)
+
         # === Level 1: Meta-Model tOOF ===
         meta_features_df = pd.DataFrame(oof_predictions, index=X.index).dropna()
         y_for_meta = y.reindex(meta_features_df.index)
@@ -10595,6 +13034,24 @@ class EnsembleModel:
         logging.info("   [Stacking] Starting Level 2: Probability calibration...")
         print("🚀 [Ensemble Training] Level 2: Starting calibration training...")
 
+        self._fit_meta_model(meta_features_df, y_for_meta)
+
+        self.trained_until = X.index[-1] if len(X) else None
+        self.incremental_updates = 0
+        self.last_full_train = datetime.now().isoformat()
+        self.compile_trees(X_to_use)
+        self.distill_student(X_to_use, oof_predictions)
+
+        logging.info("Stacking ensemble training (Level 0 + Level 1 + Level 2) completed!")
+        print(" [Ensemble Training] Hon thnh training ensemble model!")
+        print(" [Tm t t Training Results]:")
+        print(f"    Level 0 (Base Models): {list(self.models.keys())}")
+        print(f"    Level 1 (Meta Learners): {list(self.meta_learners.keys()) if hasattr(self, 'meta_learners') else 'None'}")
+        print(f"    Level 2 (Calibration): {'Completed' if hasattr(self, 'meta_model') else 'Failed'}")
+        print(f"    CV Results: {list(self.cv_results.keys())}")
+
+    def _fit_meta_model(self, meta_features_df, y_for_meta):
+        """Level 2: fit the meta-estimator on the older 80% of the OOF rows and calibrate it on the rest."""
         # Chia theo th i gian: 80% train meta, 20% calibrate
         split_idx = int(len(meta_features_df) * 0.8)
         if split_idx < 1 or split_idx >= len(meta_features_df):
@@ -10620,22 +13077,34 @@ class EnsembleModel:
             logging.info("   [Stacking] Calibration (sigmoid, prefit) completed.")
             print(" [Ensemble Training] Level 2 completed: Calibration (sigmoid, prefit)")
         except Exception as e:
-            # Fallback: used k-foldalibration if prefit th t b i (data t/kh)
-            logging.warning(f"   [Stacking]  Calibration prefit error: {e}. Using cv=3 for auto fit + calibrate.")
-            calibrated = create_calibrated_classifier(LogisticRegression(max_iter=1000, C=0.1),
-                                        method='sigmoid', cv=3)
-            calibrated.fit(meta_features_df, y_for_meta)
-            self.meta_model = calibrated
-            logging.info("   [Stacking] Calibration (isotonic, cv=3) completed.")
-            print(" [Ensemble Training] Level 2 completed: Calibration (isotonic, cv=3)")
+            logging.warning(f"   [Stacking]  Calibration prefit error: {e}.")
+            self.meta_model = self._fallback_meta_calibration(base_meta, meta_features_df, y_for_meta,
+                                                              X_meta_cal, y_meta_cal)
 
-        logging.info("Stacking ensemble training (Level 0 + Level 1 + Level 2) completed!")
-        print(" [Ensemble Training] Hon thnh training ensemble model!")
-        print(" [Tm t t Training Results]:")
-        print(f"    Level 0 (Base Models): {list(self.models.keys())}")
-        print(f"    Level 1 (Meta Learners): {list(self.meta_learners.keys()) if hasattr(self, 'meta_learners') else 'None'}")
-        print(f"    Level 2 (Calibration): {'Completed' if hasattr(self, 'meta_model') else 'Failed'}")
-        print(f"    CV Results: {list(self.cv_results.keys())}")
+    def _fallback_meta_calibration(self, base_meta, meta_features_df, y_for_meta, X_meta_cal, y_meta_cal):
+        """
+        Level 2 when the prefit calibration fails. With OOF_CALIBRATION_CONFIG["META_POST_TRANSFORM"]
+        a Platt mapping is fitted on the held-out calibration slice (no refits); otherwise the
+        meta-learner is refitted with CalibratedClassifierCV(cv=3) on all meta rows.
+        """
+        if OOF_CALIBRATION_CONFIG.get("META_POST_TRANSFORM", False):
+            try:
+                calibrator = OOFCalibrator("sigmoid").fit(base_meta.predict_proba(X_meta_cal)[:, 1], y_meta_cal)
+                logging.info("   [Stacking] Calibration (sigmoid post-transform) completed.")
+                print(" [Ensemble Training] Level 2 completed: Calibration (sigmoid post-transform)")
+                return PostCalibratedClassifier(base_meta, calibrator)
+            except Exception as cal_error:
+                logging.warning(f"   [Stacking] Post-transform calibration failed ({cal_error}); meta model left uncalibrated")
+                return base_meta
+
+        # Fallback: used k-foldalibration if prefit th t b i (data t/kh)
+        logging.warning("   [Stacking] Using cv=3 for auto fit + calibrate.")
+        calibrated = create_calibrated_classifier(LogisticRegression(max_iter=1000, C=0.1),
+                                    method='sigmoid', cv=3)
+        calibrated.fit(meta_features_df, y_for_meta)
+        logging.info("   [Stacking] Calibration (isotonic, cv=3) completed.")
+        print(" [Ensemble Training] Level 2 completed: Calibration (isotonic, cv=3)")
+        return calibrated
 
     def _train_stacking_model(self, X, y, oof_predictions):
         """Enhanced stacking with multiple meta-learners"""
@@ -10721,37 +13190,242 @@ class EnsembleModel:
         top_5_text = ", ".join([f"{feat.replace('_', ' ')} ({val:.2f})" for feat, val in sorted_influence[:5]])
         return top_5_text
 
+    def _build_optuna_sampler_pruner(self, seed=42):
+        """Sampler/pruner pair shared by the in-process search and parallel workers."""
+        sampler = None
+        pruner = None
+
+        # Samplers and pruners ship with core optuna; only the framework callbacks need optuna.integration
+        # Check v Using TPESampler if c
+        if OPTUNA_CONFIG.get("SAMPLER") == "TPE" and OPTIONAL_PACKAGES.get('optuna', False):
+            try:
+                from optuna.samplers import TPESampler
+                sampler = TPESampler(seed=seed)
+            except ImportError:
+                logging.warning("TPESampler not available, using default sampler")
+
+        # Check v Using MedianPruner if c
+        if OPTUNA_CONFIG.get("PRUNING_ENABLED", True) and OPTIONAL_PACKAGES.get('optuna', False):
+            try:
+                from optuna.pruners import MedianPruner
+                pruner = MedianPruner(n_startup_trials=OPTUNA_PRUNING_CONFIG.get("PRUNER_STARTUP_TRIALS", 5))
+            except ImportError:
+                logging.warning("MedianPruner not available, using default pruner")
+
+        return sampler, pruner
+
+    def _optuna_worker_plan(self):
+        """(workers, threads per worker) for the parallel search within OPTUNA_PARALLEL_CONFIG['CPU_BUDGET']."""
+        budget = int(OPTUNA_PARALLEL_CONFIG.get("CPU_BUDGET") or os.cpu_count() or 1)
+        workers = int(OPTUNA_PARALLEL_CONFIG.get("N_WORKERS") or 1)
+        workers = max(1, min(workers, budget, OPTUNA_CONFIG["N_TRIALS"]))
+        return workers, max(1, budget // workers)
+
+    def _run_parallel_study(self, study, study_manager, study_name, name, X, y):
+        """
+        Spread the study's trials over worker processes sharing its RDB storage.
+        Returns False when the search should run serially in this process instead.
+        """
+        if not OPTUNA_PARALLEL_CONFIG.get("ENABLED", False) or study_manager.storage is None:
+            return False
+        workers, n_threads = self._optuna_worker_plan()
+        if workers < 2:
+            return False
+
+        n_trials = OPTUNA_CONFIG["N_TRIALS"]
+        timeout = OPTUNA_CONFIG["TIMEOUT_SEC"]
+        per_worker = -(-n_trials // workers)
+        def _completed_count():
+            return sum(1 for t in study.trials if t.state == optuna.trial.TrialState.COMPLETE)
+        completed_before = _completed_count()
+
+        scratch_root = FEATURE_POOL_CONFIG.get("SCRATCH_DIR")
+        scratch_dir = tempfile.mkdtemp(prefix="optuna_", dir=scratch_root if scratch_root and os.path.isdir(scratch_root) else None)
+        executor = None
+        try:
+            data_path = os.path.join(scratch_dir, "xy.joblib")
+            joblib.dump((X, y), data_path)
+            tasks = [{
+                "worker_id": k,
+                "study_name": study_name,
+                "storage_url": study_manager.storage_url,
+                "model_name": name,
+                "data_path": data_path,
+                "n_trials": min(per_worker, n_trials - k * per_worker),
+                "timeout": timeout,
+                "n_threads": n_threads,
+                "seed": 42 + k,  # distinct TPE streams so workers do not propose identical trials
+                "search_bounds": self._search_bounds,
+            } for k in range(workers) if n_trials - k * per_worker > 0]
+
+            logging.info(f"      -> Parallel Optuna for {name}: {len(tasks)} workers x {n_threads} threads, {n_trials} trials")
+            try:
+                context = mp.get_context(OPTUNA_PARALLEL_CONFIG.get("START_METHOD"))
+            except ValueError:
+                context = mp.get_context()
+            executor = ProcessPoolExecutor(max_workers=len(tasks), mp_context=context)
+            futures = [executor.submit(_optuna_study_worker, task) for task in tasks]
+            deadline = time.time() + timeout + OPTUNA_PARALLEL_CONFIG.get("JOIN_GRACE_SEC", 120)
+            for future in futures:
+                future.result(timeout=max(1.0, deadline - time.time()))
+        except Exception as e:
+            logging.warning(f"      -> Parallel Optuna for {name} failed ({type(e).__name__}: {e}), keeping finished trials")
+        finally:
+            # Workers must be gone before best_params is read: a live one keeps writing trials
+            if not shutdown_executor(executor, OPTUNA_PARALLEL_CONFIG.get("SHUTDOWN_TIMEOUT_SEC", 60)):
+                self._fail_orphaned_trials(study, name)
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+        # Counted by state: enqueued warm-start trials sit before this run in study.trials
+        if _completed_count() == completed_before:
+            logging.warning(f"      -> Parallel Optuna for {name} finished no trials, running serially")
+            return False
+        return True
+
+    @staticmethod
+    def _fail_orphaned_trials(study, name):
+        """Mark trials left RUNNING by terminated workers as FAIL so the study is finished."""
+        try:
+            for trial in study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.RUNNING,)):
+                study._storage.set_trial_state_values(trial._trial_id, state=optuna.trial.TrialState.FAIL)
+                logging.warning(f"      -> Parallel Optuna for {name}: trial {trial.number} was cut off, marked FAIL")
+        except Exception as e:
+            logging.warning(f"      -> Parallel Optuna for {name}: could not close running trials: {e}")
+
+    def _optuna_study_key(self, name):
+        """Study name prefix for this symbol/regime/model (the old shared name without a context)."""
+        base = OPTUNA_CONFIG.get('STUDY_NAME', 'trading_bot')
+        context = getattr(self, "study_context", None) or {}
+        if not context.get("symbol"):
+            return f"{base}_{name}"
+        return f"{base}_{context['symbol']}_{context.get('regime') or 'ALL'}_{name}"
+
+    @staticmethod
+    def _retrain_study_names(study_manager, study_key):
+        """Names of the per-retrain studies "<study_key>_YYYYmmdd_HHMMSS" in storage, oldest first."""
+        pattern = re.compile(re.escape(study_key) + r"_\d{8}_\d{6}")
+        return sorted(name for name in optuna.get_all_study_names(study_manager.storage) if pattern.fullmatch(name))
+
+    def _delete_old_studies(self, study_manager, study_key, current_name):
+        """Keep the newest KEEP_STUDIES retrain studies of study_key (always including current_name)."""
+        keep = max(1, int(OPTUNA_WARM_START_CONFIG.get("KEEP_STUDIES", 3)))
+        if study_manager.storage is None:
+            return []
+        deleted = []
+        try:
+            names = [name for name in self._retrain_study_names(study_manager, study_key) if name != current_name]
+            for name in names[:max(0, len(names) - (keep - 1))]:
+                optuna.delete_study(study_name=name, storage=study_manager.storage)
+                deleted.append(name)
+        except Exception as e:
+            logging.warning(f"      -> Could not delete old Optuna studies for {study_key}: {e}")
+        if deleted:
+            logging.info(f"      -> Deleted {len(deleted)} old Optuna studies for {study_key}")
+        return deleted
+
+    def _collect_warm_start_seeds(self, study_manager, study_key, name):
+        """
+        Best params of the previous study for this key, best first, plus its best value as the target.
+        Falls back to the params stored in the latest model metadata when storage has no prior study.
+        """
+        top_n = int(OPTUNA_WARM_START_CONFIG.get("TOP_N", 5))
+        if study_manager.storage is not None:
+            try:
+                for study_name in reversed(self._retrain_study_names(study_manager, study_key)):
+                    previous = optuna.load_study(study_name=study_name, storage=study_manager.storage)
+                    completed = [t for t in previous.trials if t.state == optuna.trial.TrialState.COMPLETE and t.value is not None]
+                    if not completed:
+                        continue
+                    completed.sort(key=lambda t: t.value, reverse=True)
+                    return [dict(t.params) for t in completed[:top_n]], previous.best_value
+            except Exception as e:
+                logging.warning(f"      -> Warm start lookup in storage failed for {study_key}: {e}")
+
+        context = getattr(self, "study_context", None) or {}
+        if context.get("symbol") and context.get("regime"):
+            metadata = load_latest_model_metadata(context["symbol"], f"ensemble_{context['regime'].lower()}")
+            params = (metadata or {}).get("optuna_best_params", {}).get(name)
+            if params:
+                return [dict(params)], None
+        return [], None
+
+    def _compute_search_bounds(self, seeds):
+        """Per-parameter (min, max) over the seeds for numeric params; None when too few seeds."""
+        if not OPTUNA_WARM_START_CONFIG.get("NARROW_RANGES", False):
+            return None
+        if len(seeds) < int(OPTUNA_WARM_START_CONFIG.get("MIN_SEEDS_TO_NARROW", 3)):
+            return None
+        bounds = {}
+        for param in set().union(*[seed.keys() for seed in seeds]):
+            values = [seed.get(param) for seed in seeds]
+            if all(isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, (bool, np.bool_)) for v in values):
+                bounds[param] = (float(min(values)), float(max(values)))
+        return bounds or None
+
+    def _pruning_summary(self, study, first_trial_number):
+        """Pruned trials and CV work saved for the trials run from first_trial_number on."""
+        trials = [t for t in study.trials if t.number >= first_trial_number and "cv_work" in t.user_attrs]
+        work_done = sum(t.user_attrs["cv_work"][0] for t in trials)
+        work_planned = sum(t.user_attrs["cv_work"][1] for t in trials)
+        pruned = [t for t in trials if t.state == optuna.trial.TrialState.PRUNED]
+        seconds_saved = 0.0
+        for t in pruned:
+            done, planned = t.user_attrs["cv_work"]
+            if done > 0 and t.duration is not None:
+                # Extrapolate the pruned trial's runtime to the full CV
+                seconds_saved += t.duration.total_seconds() * (planned / done - 1.0)
+        return {
+            "trials": len(trials),
+            "pruned": len(pruned),
+            "work_done": int(work_done),
+            "work_planned": int(work_planned),
+            "compute_saved_pct": round(100.0 * (1.0 - work_done / work_planned), 1) if work_planned else 0.0,
+            "est_seconds_saved": round(seconds_saved, 1),
+        }
+
+    def _warm_start_report(self, study, target, n_seeds):
+        """Trials (in run order) needed to reach the previous best value."""
+        completed = sorted(
+            (t for t in study.trials if t.state == optuna.trial.TrialState.COMPLETE and t.value is not None),
+            key=lambda t: t.number,
+        )
+        trials_to_target = None
+        if target is not None:
+            trials_to_target = next((k + 1 for k, t in enumerate(completed) if t.value >= target), None)
+        return {
+            "study_name": study.study_name,
+            "seeded_trials": n_seeds,
+            "narrowed_ranges": bool(self._search_bounds),
+            "target_value": target,
+            "trials_to_target": trials_to_target,
+            "completed_trials": len(completed),
+            "best_value": study.best_value if completed else None,
+        }
+
     # <<< TFunction Function HELPER this VO L P EnsembleModel >>>
     def _get_optimized_model(self, name, X, y):
         """Helper function to run Optuna and return model with best parameters."""
         logging.info(f"      -> Optimizing for {name}...")
 
         # Enhanced studuc configuration with fallback for missing integrations
-        sampler = None
-        pruner = None
-
-        # Check v Using TPESampler if c
-        if OPTUNA_CONFIG.get("SAMPLER") == "TPE" and OPTIONAL_PACKAGES.get('optuna_integrations', False):
-            try:
-                from optuna.samplers import TPESampler
-                sampler = TPESampler(seed=42)
-            except ImportError:
-                logging.warning("TPESampler not available, using default sampler")
-
-        # Check v Using MedianPruner if c
-        if OPTUNA_CONFIG.get("PRUNING_ENABLED", True) and OPTIONAL_PACKAGES.get('optuna_integrations', False):
-            try:
-                from optuna.pruners import MedianPruner
-                pruner = MedianPruner()
-            except ImportError:
-                logging.warning("MedianPruner not available, using default pruner")
+        sampler, pruner = self._build_optuna_sampler_pruner()
 
         # To study vi SQLite storage d luu tr
         storage_url = OPTUNA_CONFIG.get("STORAGE_URL", "sqlite:///optuna_study.db")
-        study_name = f"{OPTUNA_CONFIG.get('STUDY_NAME', 'trading_bot')}_{name}"
+        study_key = self._optuna_study_key(name)
+        study_name = study_key
         
         # Using OptunaStudyManager
         study_manager = OptunaStudyManager(storage_url)
+        seeds, target = [], None
+        self._search_bounds = None
+        first_trial_number = None
+        warm_start = OPTUNA_WARM_START_CONFIG.get("ENABLED", False) and bool((self.study_context or {}).get("symbol"))
+        if warm_start:
+            # One study per retrain so scores are comparable; history comes in through the seeds
+            seeds, target = self._collect_warm_start_seeds(study_manager, study_key, name)
+            self._search_bounds = self._compute_search_bounds(seeds)
+            study_name = f"{study_key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         study = study_manager.create_or_load_study(
             study_name=study_name,
             direction="maximize",
@@ -10759,15 +13433,52 @@ class EnsembleModel:
             pruner=pruner
         )
         try:
-            study.optimize(
-                lambda trial: self._objective(trial, X, y, name),
-                n_trials=OPTUNA_CONFIG["N_TRIALS"],
-                timeout=OPTUNA_CONFIG["TIMEOUT_SEC"],
-            )
+            first_trial_number = len(study.trials)
+        except Exception:
+            first_trial_number = 0
+        for params in seeds:
+            try:
+                study.enqueue_trial(params, skip_if_exists=True)
+            except Exception as e:
+                logging.warning(f"      -> Could not enqueue warm-start trial for {name}: {e}")
+        if seeds:
+            print(f"   [Optuna] Warm start {study_name}: {len(seeds)} seeded trials"
+                  f"{', narrowed ranges' if self._search_bounds else ''}"
+                  f"{f', target {target:.4f}' if target is not None else ''}")
+        try:
+            if not self._run_parallel_study(study, study_manager, study_name, name, X, y):
+                study.optimize(
+                    lambda trial: self._objective(trial, X, y, name),
+                    n_trials=OPTUNA_CONFIG["N_TRIALS"],
+                    timeout=OPTUNA_CONFIG["TIMEOUT_SEC"],
+                )
             best_params = study.best_params
+            self.optuna_best_params[name] = dict(best_params)
+            pruning = self._pruning_summary(study, first_trial_number)
+            self.optuna_pruning[name] = pruning
+            try:
+                study.set_user_attr("pruning", pruning)
+            except Exception:
+                pass
+            print(f"   [Optuna] {name}: pruned {pruning['pruned']}/{pruning['trials']} trials, "
+                  f"saved {pruning['compute_saved_pct']:.0f}% of CV work (~{pruning['est_seconds_saved']:.0f}s)")
+            if warm_start:
+                report = self._warm_start_report(study, target, len(seeds))
+                self.optuna_warm_start[name] = report
+                try:
+                    study.set_user_attr("warm_start", report)
+                except Exception:
+                    pass
+                if target is not None:
+                    reached = report["trials_to_target"]
+                    print(f"   [Optuna] {name}: best {report['best_value']:.4f} vs target {target:.4f} -> "
+                          f"{f'reached after {reached}' if reached else 'not reached in'} / {report['completed_trials']} trials")
+                self._delete_old_studies(study_manager, study_key, study_name)
         except Exception as e: # <<< TFunction EXCEPT
             print(f"   [Optuna Warning] Li in qu trnh ti uu ha cho {name}: {e}. Using tham s mc dnh data nh.")
             best_params = {} # Using dict empty dmodel used tham s mc dnh data nh
+        finally:
+            self._search_bounds = None
 
         if name == "xgboost" or name == "xgb":
             # Ensure random_state is not duplicated
@@ -10808,7 +13519,201 @@ class EnsembleModel:
 
 # ###  T Function this VO in CLASS EnsembleModel ###
     # ### THAY THHON TON Function predict_proba old of N ###
-    def predict_proba(self, X, feature_columns=None):
+    def prepare_inference(self, feature_columns=None):
+        """
+        Precompute, per base model, the feature order it expects and a contiguous float32
+        (1, n_features) buffer. Called at load time; predict_proba builds it lazily otherwise.
+        """
+        plan = {}
+        for name, model in raw_members(getattr(self, "models", {})):
+            if model is None:
+                continue
+            columns = feature_columns if feature_columns is not None else getattr(model, "feature_names_in_", None)
+            if columns is None:
+                continue  # Unknown order: the legacy path feeds the frame as is
+            columns = tuple(map(str, columns))
+            plan[name] = (columns, np.zeros((1, len(columns)), dtype=np.float32))
+        compiled = getattr(self, "compiled_trees", None)
+        compiled_members = []
+        if compiled is not None and TREE_EXPORT_CONFIG.get("USE_FOR_INFERENCE", False):
+            compiled_members = [name for name in compiled.member_names
+                                if name in plan and plan[name][0] == compiled.members[name]["columns"]]
+        student_plan = None
+        if self.student_in_use():
+            columns = feature_columns if feature_columns is not None else self.student.feature_names_in_
+            columns = tuple(map(str, columns))
+            student_plan = (columns, np.zeros((1, len(columns)), dtype=np.float32))
+        self._inference_plan = {"feature_columns": None if feature_columns is None else tuple(feature_columns),
+                                "members": plan, "compiled_members": compiled_members, "student": student_plan}
+        self._projections = {}
+        return plan
+
+    def _projection(self, name, columns, input_columns, input_key):
+        """(src, dst) int arrays: input column src[k] fills model feature dst[k]; others stay 0."""
+        key = (name, input_key)
+        if not hasattr(self, "_projections"):
+            self._projections = {}
+        projection = self._projections.get(key)
+        if projection is None:
+            position = {col: i for i, col in enumerate(map(str, input_columns))}
+            pairs = [(position[col], j) for j, col in enumerate(columns) if col in position]
+            src = np.array([p[0] for p in pairs], dtype=np.intp)
+            dst = np.array([p[1] for p in pairs], dtype=np.intp)
+            if len(self._projections) >= INFERENCE_PROJECTION_CONFIG.get("MAX_LAYOUTS", 32) * max(1, len(self.models)):
+                self._projections.clear()
+            projection = self._projections[key] = (src, dst)
+        return projection
+
+    @staticmethod
+    def _last_clean_values(X, col_idx):
+        """
+        Last row of X[:, col_idx] as it would be after inf->NaN, ffill, bfill, fillna(0):
+        the last finite value of each column, 0 for columns with none.
+        """
+        row = X.iloc[-1].iloc[col_idx].to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+        bad = ~np.isfinite(row)
+        if bad.any():
+            block = X.iloc[:, col_idx[bad]].to_numpy(dtype=np.float64, na_value=np.nan)
+            finite = np.isfinite(block)
+            last = len(block) - 1 - np.argmax(finite[::-1], axis=0)
+            row[bad] = np.where(finite.any(axis=0), block[last, np.arange(block.shape[1])], 0.0)
+        return row
+
+    def _project_last_rows(self, frames, feature_columns=None, student=False):
+        """
+        Per base model (or only the student), a float32 (len(frames), n_features) matrix holding
+        each frame's cleaned last row in that model's feature order (a single frame reuses the
+        preallocated buffer). None when some member has no known feature order.
+        """
+        fc_key = None if feature_columns is None else tuple(feature_columns)
+        if getattr(self, "_inference_plan", None) is None or self._inference_plan["feature_columns"] != fc_key:
+            self.prepare_inference(feature_columns)
+        if student:
+            student_plan = self._inference_plan.get("student")
+            members = {"student": student_plan} if student_plan is not None else {}
+            if not members:
+                return None
+        else:
+            members = self._inference_plan["members"]
+            if not members or len(members) != sum(m is not None for _, m in raw_members(self.models)):
+                return None
+
+        if len(frames) == 1:
+            matrices = {name: buffer for name, (_, buffer) in members.items()}
+            for buffer in matrices.values():
+                buffer.fill(0.0)
+        else:
+            matrices = {name: np.zeros((len(frames), len(columns)), dtype=np.float32)
+                        for name, (columns, _) in members.items()}
+
+        for i, X in enumerate(frames):
+            input_key = (tuple(X.columns), fc_key)
+            projections = {name: self._projection(name, columns, X.columns, input_key)
+                           for name, (columns, _) in members.items()}
+            used = np.unique(np.concatenate([src for src, _ in projections.values()]))
+            values = np.zeros(X.shape[1])
+            if used.size:
+                values[used] = self._last_clean_values(X, used)
+            for name, (src, dst) in projections.items():
+                matrices[name][i, dst] = values[src]
+        return matrices
+
+    def _member_probabilities(self, matrices):
+        """
+        Probabilities per base model over its whole matrix: exported tree members in one
+        NumPy pass, the rest with one native predict_proba (or predict) call each.
+        """
+        probabilities = {}
+        compiled_members = self._inference_plan.get("compiled_members")
+        if compiled_members:
+            probabilities = self.compiled_trees.predict_members({name: matrices[name] for name in compiled_members})
+        for name, matrix in matrices.items():
+            if name in probabilities:
+                continue
+            model = self.models.get(name)
+            if hasattr(model, "predict_proba"):
+                proba = model.predict_proba(matrix)
+                probabilities[name] = proba[:, 1] if proba.shape[1] > 1 else proba[:, 0]
+            else:
+                probabilities[name] = np.asarray(model.predict(matrix), dtype=np.float64).ravel()
+        return {name: self._calibrated(name, p) for name, p in probabilities.items()}
+
+    def _predict_members_projected(self, X, feature_columns=None):
+        """Base-model probabilities for the last row of X using the precomputed projections."""
+        matrices = self._project_last_rows([X], feature_columns)
+        if matrices is None:
+            return None
+        return {name: float(p[0]) for name, p in self._member_probabilities(matrices).items()}
+
+    def predict_proba_batch(self, frames, feature_columns=None):
+        """
+        Last-row probabilities for several frames scored by this ensemble (e.g. every symbol
+        sharing it): each base model runs once on the stacked rows. `frames` maps key ->
+        DataFrame; returns key -> probability.
+        """
+        keys = [k for k, X in frames.items() if isinstance(X, pd.DataFrame) and not X.empty]
+        if not keys:
+            return {}
+        matrices = None
+        if INFERENCE_PROJECTION_CONFIG.get("ENABLED", False):
+            if self.student_in_use():
+                try:
+                    return dict(zip(keys, self._student_last_rows([frames[k] for k in keys], feature_columns).astype(float)))
+                except Exception as e:
+                    logging.warning(f"EnsembleModel.predict_proba_batch: student failed ({e}); using full ensemble")
+            try:
+                matrices = self._project_last_rows([frames[k] for k in keys], feature_columns)
+            except Exception as e:
+                logging.warning(f"EnsembleModel.predict_proba_batch: projection failed ({e}); scoring frames one by one")
+        if matrices is None:
+            return {k: self.predict_proba(frames[k], feature_columns) for k in keys}
+
+        probabilities = self._member_probabilities(matrices)
+        weights = {name: self.MEMBER_WEIGHTS.get(name, 0.33) for name in probabilities}
+        total_weight = sum(weights.values())
+        blended = (sum(weights[name] * p for name, p in probabilities.items()) / total_weight
+                   if total_weight > 0 else np.full(len(keys), 0.5))
+        return dict(zip(keys, np.clip(blended, 0.0, 1.0).astype(float)))
+
+    def _blend_member_predictions(self, base_predictions):
+        """Weighted average (MEMBER_WEIGHTS, others 0.33) clipped to [0, 1]."""
+        weights = self.MEMBER_WEIGHTS  # Default weights
+        weighted_sum = 0.0
+        total_weight = 0.0
+
+        for name, pred in base_predictions.items():
+            weight = weights.get(name, 0.33)  # Tempty smc dnh data nh
+            weighted_sum += pred * weight
+            total_weight += weight
+
+        final_prediction = weighted_sum / total_weight if total_weight > 0 else 0.5
+
+        #  m b o k t quin kho ng [0, 1]
+        return max(0.0, min(1.0, final_prediction))
+
+    def predict_proba(self, X, feature_columns=None, use_student=True):
+        """
+        Probability for the last row of X: the distilled student when one is in use, else the
+        projected float32 fast path, with the DataFrame-based path as fallback (unknown feature
+        order, non-numeric inputs, errors). use_student=False always scores the full ensemble.
+        """
+        if INFERENCE_PROJECTION_CONFIG.get("ENABLED", False) and isinstance(X, pd.DataFrame) and not X.empty:
+            if use_student and self.student_in_use():
+                try:
+                    return float(self._student_last_rows([X], feature_columns)[0])
+                except Exception as e:
+                    logging.warning(f"EnsembleModel.predict_proba: student failed ({e}); using full ensemble")
+            try:
+                base_predictions = self._predict_members_projected(X, feature_columns)
+                if base_predictions and len(base_predictions) == sum(m is not None for _, m in raw_members(self.models)):
+                    return self._blend_member_predictions(base_predictions)
+            except Exception as e:
+                if not getattr(self, '_projection_error_logged', False):
+                    logging.warning(f"EnsembleModel.predict_proba: projected path failed ({e}); using DataFrame path")
+                    self._projection_error_logged = True
+        return self._predict_proba_frame(X, feature_columns)
+
+    def _predict_proba_frame(self, X, feature_columns=None):
         """
         Equal probability cu cng equal allh l y trung bnh fromempty s .
         REFACTORED: TFunction error handling ton di n v processing edge cases.
@@ -10834,8 +13739,8 @@ class EnsembleModel:
                 if model is None: 
                     continue
                 try:
-                    # Chneeds used data cu cng cho Equal live
-                    X_pred = X_clean.tail(1)
+                    # Chneeds used data cu cng cho Equal live (sequence members score their own window)
+                    X_pred = X_clean if sequence_rows_needed(model) > 1 else X_clean.tail(1)
                     
                     # Equal with model con
                     if hasattr(model, 'predict_proba'):
@@ -10911,26 +13816,321 @@ class EnsembleModel:
                 return 0.5
 
             # Calculate weighted average
-            weights = {'rf': 0.3, 'xgb': 0.4, 'lgb': 0.3}  # Default weights
-            weighted_sum = 0.0
-            total_weight = 0.0
-            
-            for name, pred in base_predictions.items():
-                weight = weights.get(name, 0.33)  # Tempty smc dnh data nh
-                weighted_sum += pred * weight
-                total_weight += weight
-            
-            final_prediction = weighted_sum / total_weight if total_weight > 0 else 0.5
-            
-            #  m b o k t quin kho ng [0, 1]
-            final_prediction = max(0.0, min(1.0, final_prediction))
-            
-            return final_prediction
+            base_predictions = {name: float(self._calibrated(name, [p])[0]) for name, p in base_predictions.items()}
+            return self._blend_member_predictions(base_predictions)
             
         except Exception as e:
             logging.error(f"EnsembleModel.predict_proba: Li nghim trng - {e}")
             return 0.5
 
+    def _calibrated(self, name, proba):
+        """Member probability through its OOF calibrator (unchanged if it has none); NaNs stay NaN."""
+        calibrator = getattr(self, "member_calibrators", {}).get(name)
+        if calibrator is None:
+            return proba
+        proba = np.asarray(proba, dtype=np.float64)
+        finite = np.isfinite(proba)
+        if finite.all():
+            return calibrator.transform(proba)
+        out = proba.copy()
+        out[finite] = calibrator.transform(proba[finite])
+        return out
+
+    def _weighted_member_proba(self, models, X, member_proba=None):
+        """
+        Vectorised predict_proba blend (MEMBER_WEIGHTS) of `models` over every row of X.
+        Calibrated per-member probabilities already in `member_proba` are reused and the rest
+        are added to it. Members of self.models that were exported to compiled_trees are scored
+        from the arrays; a lazy member is loaded only when it still has to be scored natively.
+        """
+        member_proba = {} if member_proba is None else member_proba
+        names = [name for name, model in raw_members(models) if model is not None]
+        pending = [name for name in names if name not in member_proba]
+        compiled = getattr(self, "compiled_trees", None) if models is self.models else None
+        if compiled is not None and pending:
+            matrices = {name: X.reindex(columns=list(compiled.members[name]["columns"]), fill_value=0.0)
+                        .to_numpy(dtype=np.float32) for name in pending if name in compiled.members}
+            for name, proba in compiled.predict_members(matrices).items():
+                member_proba[name] = self._calibrated(name, proba)
+        for name in pending:
+            if name in member_proba:
+                continue
+            model = models[name]
+            if not hasattr(model, "predict_proba"):
+                continue
+            columns = getattr(model, "feature_names_in_", None)
+            X_model = X.reindex(columns=list(columns), fill_value=0.0) if columns is not None else X
+            member_proba[name] = self._calibrated(name, model.predict_proba(X_model.values)[:, 1])
+
+        total, weight_sum = np.zeros(len(X)), 0.0
+        for name in names:
+            if name in member_proba:
+                weight = self.MEMBER_WEIGHTS.get(name, 0.33)
+                total += weight * member_proba[name]
+                weight_sum += weight
+        return total / weight_sum if weight_sum else np.full(len(X), 0.5)
+
+    def attach_artefacts(self, directory):
+        """Point lazy members at `directory` and memory-map the exported trees saved there."""
+        for _, model in raw_members(self.models):
+            if isinstance(model, LazyMember):
+                model.base_dir = directory
+        compiled_dir = getattr(self, "compiled_trees_dir", None)
+        if compiled_dir and getattr(self, "compiled_trees", None) is None:
+            try:
+                self.compiled_trees = CompiledTreeEnsemble.load(
+                    os.path.join(directory, compiled_dir), mmap_mode=MODEL_ARTEFACT_CONFIG.get("MMAP_MODE", "r"))
+            except Exception as e:
+                logging.warning(f"[Model Artefacts] Exported trees unavailable in {directory}: {e}")
+        self._inference_plan = None
+
+    def prune_members(self, oof_predictions, y):
+        """
+        Drop base models whose removal barely changes the blended OOF log-loss / F1 (see
+        ENSEMBLE_PRUNING_CONFIG). Updates self.models, model_weights, pruned_members and
+        pruning_report, and forgets the pruned members' cv_results / calibrators (the quality
+        gates read the first cv_results entry); returns the OOF predictions of the kept members.
+        """
+        cfg = ENSEMBLE_PRUNING_CONFIG
+        self.pruned_members = []
+        kept = [name for name in oof_predictions if self.models.get(name) is not None]
+        self.pruning_report = {"enabled": bool(cfg.get("ENABLED", False))}
+
+        if cfg.get("ENABLED", False) and len(kept) > cfg.get("MIN_MEMBERS", 1):
+            oof = pd.DataFrame({name: oof_predictions[name] for name in kept})
+            mask = oof.notna().all(axis=1).to_numpy()
+            oof, y_true = oof[mask], np.asarray(y)[mask]
+            if len(oof) and len(np.unique(y_true)) > 1:
+                def _scores(names):
+                    weights = np.array([self.MEMBER_WEIGHTS.get(name, 0.33) for name in names])
+                    p = np.clip(oof[names].to_numpy() @ weights / weights.sum(), 1e-6, 1 - 1e-6)
+                    logloss = float(-np.mean(y_true * np.log(p) + (1 - y_true) * np.log(1 - p)))
+                    return logloss, float(f1_score(y_true, (p >= 0.5).astype(int), zero_division=0))
+
+                base_logloss, base_f1 = _scores(kept)
+                self.pruning_report.update(oof_rows=int(len(oof)), logloss_full=base_logloss, f1_full=base_f1)
+                for name in sorted(kept, key=lambda n: self.MEMBER_WEIGHTS.get(n, 0.33)):
+                    if len(kept) <= cfg.get("MIN_MEMBERS", 1):
+                        break
+                    candidate = [n for n in kept if n != name]
+                    logloss, f1 = _scores(candidate)
+                    if (logloss - base_logloss <= cfg.get("MAX_LOGLOSS_INCREASE", 0.002)
+                            and base_f1 - f1 <= cfg.get("MAX_F1_DROP", 0.005)):
+                        kept = candidate
+                        self.pruned_members.append(name)
+                        self.pruning_report.update(logloss_kept=logloss, f1_kept=f1)
+                        print(f"   [Ensemble Pruning] Dropped {name}: OOF log-loss {base_logloss:.4f} -> {logloss:.4f}, "
+                              f"F1 {base_f1:.4f} -> {f1:.4f}")
+
+        for name in self.pruned_members:
+            self.models.pop(name, None)
+            for per_member in ("cv_results", "member_calibrators", "calibration_report",
+                               "base_model_feature_importance"):
+                getattr(self, per_member, {}).pop(name, None)
+        weights = {name: self.MEMBER_WEIGHTS.get(name, 0.33) for name in kept}
+        total = sum(weights.values())
+        self.model_weights = {name: w / total for name, w in weights.items()} if total else {}
+        self.pruning_report.update(kept=kept, pruned=list(self.pruned_members))
+        self._inference_plan = None
+        return {name: oof_predictions[name] for name in kept}
+
+    def student_in_use(self):
+        return (DISTILLATION_CONFIG.get("USE_FOR_INFERENCE", False) and getattr(self, "student", None) is not None
+                and getattr(self, "distillation", {}).get("accepted", False))
+
+    def _student_last_rows(self, frames, feature_columns=None):
+        matrices = self._project_last_rows(frames, feature_columns, student=True)
+        if matrices is None:
+            raise ValueError("student feature order unknown")
+        if getattr(self, "student_trees", None) is not None and TREE_EXPORT_CONFIG.get("USE_FOR_INFERENCE", False):
+            return np.clip(self.student_trees.predict_members(matrices)["student"], 0.0, 1.0)
+        return np.clip(self.student.predict(matrices["student"]), 0.0, 1.0)
+
+    def distill_student(self, X, oof_predictions):
+        """
+        Fit a shallow LightGBM student (cross-entropy on soft targets) to the blend of the
+        out-of-fold member probabilities (positionally aligned with X; rows some fold did not
+        score are dropped). The full-fit members have seen every row of X, so their in-sample
+        output is not what the student has to reproduce live. The newest HOLDOUT_SHARE OOF rows
+        only measure fidelity; the student is used live only if it passes MAX_MAE and
+        MIN_SIGNAL_AGREEMENT.
+        """
+        cfg = DISTILLATION_CONFIG
+        self.student = None
+        self.student_trees = None
+        self.distillation = {"accepted": False}
+        self._inference_plan = None
+        if not cfg.get("ENABLED", False):
+            return self.distillation
+        members = {name: self.models[name] for name in (oof_predictions or {}) if name in self.models}
+        if not members:
+            self.distillation["reason"] = "no out-of-fold predictions"
+            return self.distillation
+        oof = {name: np.asarray(oof_predictions[name], dtype=float) for name in members}
+        scored = np.logical_and.reduce([np.isfinite(proba) for proba in oof.values()])
+        n_holdout = int(scored.sum() * cfg.get("HOLDOUT_SHARE", 0.2))
+        if scored.sum() - n_holdout < cfg.get("MIN_TRAIN_ROWS", 500) or n_holdout < 1:
+            self.distillation["reason"] = f"not enough out-of-fold rows ({int(scored.sum())})"
+            return self.distillation
+        try:
+            X = X.iloc[np.flatnonzero(scored)]
+            teacher = self._weighted_member_proba(members, X, {name: proba[scored] for name, proba in oof.items()})
+            X_fit, X_hold = X.iloc[:-n_holdout], X.iloc[-n_holdout:]
+            student = lgb.LGBMRegressor(objective="cross_entropy", random_state=42, n_jobs=1,
+                                        **cfg.get("STUDENT_PARAMS", {}))
+            student.fit(X_fit, teacher[:-n_holdout])
+
+            def _bucket(p):
+                return np.where(p > 0.6, 1, np.where(p < 0.4, -1, 0))
+
+            started = time.perf_counter()
+            predicted = np.clip(student.predict(X_hold), 0.0, 1.0)
+            student_ms = (time.perf_counter() - started) * 1000.0 / len(X_hold)
+            started = time.perf_counter()
+            self._weighted_member_proba(self.models, X_hold)
+            ensemble_ms = (time.perf_counter() - started) * 1000.0 / len(X_hold)
+            expected = teacher[-n_holdout:]
+            errors = np.abs(predicted - expected)
+            fidelity = {
+                "holdout_rows": int(n_holdout),
+                "mae": float(errors.mean()),
+                "max_abs_error": float(errors.max()),
+                "signal_agreement": float(np.mean(_bucket(predicted) == _bucket(expected))),
+                "correlation": float(np.corrcoef(predicted, expected)[0, 1]) if np.std(expected) > 0 else 1.0,
+                "student_ms_per_row": student_ms,
+                "ensemble_ms_per_row": ensemble_ms,
+            }
+            accepted = (fidelity["mae"] <= cfg.get("MAX_MAE", 0.03)
+                        and fidelity["signal_agreement"] >= cfg.get("MIN_SIGNAL_AGREEMENT", 0.95))
+            self.student = student
+            self.distillation = {"accepted": bool(accepted), "fidelity": fidelity,
+                                 "reason": "accepted" if accepted else "fidelity gate"}
+            if accepted and TREE_EXPORT_CONFIG.get("ENABLED", False):
+                student_trees = CompiledTreeEnsemble.from_models({"student": student})
+                errors = student_trees.verify({"student": student}, X_hold) if student_trees.member_names else {}
+                if errors and errors["student"] <= TREE_EXPORT_CONFIG.get("TOLERANCE", 1e-4):
+                    self.student_trees = student_trees
+            self.distillation["compiled"] = self.student_trees is not None
+            print(f"   [Distillation] Student {'in use' if accepted else 'rejected'}: MAE {fidelity['mae']:.4f}, "
+                  f"signal agreement {fidelity['signal_agreement']:.1%}")
+        except Exception as e:
+            logging.warning(f"   [Distillation] Student training failed, full ensemble stays in use: {e}")
+            self.distillation = {"accepted": False, "reason": str(e)}
+        return self.distillation
+
+    def compile_trees(self, X_verify):
+        """
+        Export the tree members to a CompiledTreeEnsemble, keeping only members that match
+        their native predict_proba on the last VERIFY_ROWS of X_verify.
+        """
+        cfg = TREE_EXPORT_CONFIG
+        self.compiled_trees = None
+        self._inference_plan = None
+        if not cfg.get("ENABLED", False) or not getattr(self, "models", None):
+            return None
+        try:
+            X_verify = X_verify.tail(int(cfg.get("VERIFY_ROWS", 256)))
+            compiled = CompiledTreeEnsemble.from_models(self.models)
+            errors = compiled.verify(self.models, X_verify)
+            accepted = [name for name, error in errors.items() if error <= cfg.get("TOLERANCE", 1e-4)]
+            for name in set(errors) - set(accepted):
+                logging.warning(f"   [Tree Export] {name} differs from native by {errors[name]:.2e}; keeping native runtime")
+            if len(accepted) < len(errors):
+                compiled = CompiledTreeEnsemble.from_models({name: self.models[name] for name in accepted})
+            if compiled.member_names:
+                self.compiled_trees = compiled
+                worst = max(errors[name] for name in accepted)
+                print(f"   [Tree Export] Compiled {compiled.member_names} "
+                      f"({len(compiled._roots)} trees, max |diff| {worst:.1e})")
+        except Exception as e:
+            logging.warning(f"   [Tree Export] Export failed, native runtimes stay in use: {e}")
+        return self.compiled_trees
+
+    def boosting_members(self):
+        return [name for name, model in raw_members(getattr(self, "models", {}))
+                if model is not None and getattr(model, "class_name", model.__class__.__name__)
+                in ("XGBClassifier", "LGBMClassifier")]
+
+    def incremental_update(self, X_new, y_new):
+        """
+        Continue boosting the XGBoost/LightGBM members on newly arrived bars only.
+        The newest VALIDATION_BARS are held out: the update is kept only if the blended
+        ensemble's log-loss on them does not rise by more than MAX_LOGLOSS_INCREASE.
+        Other members and the meta-model are left as they are.
+        """
+        cfg = INCREMENTAL_TRAINING_CONFIG
+        n_val = int(cfg.get("VALIDATION_BARS", 48))
+        report = {"accepted": False, "new_bars": int(len(X_new)), "updated_members": []}
+        if len(X_new) <= n_val:
+            report["reason"] = "not enough bars for the validation gate"
+            return report
+
+        X_fit, y_fit = X_new.iloc[:-n_val], np.asarray(y_new)[:-n_val]
+        X_val, y_val = X_new.iloc[-n_val:], np.asarray(y_new)[-n_val:]
+        if len(np.unique(y_fit)) < 2:
+            report["reason"] = "new bars contain a single class"
+            return report
+
+        # Untouched members stay as they are (lazy placeholders are not loaded)
+        candidates = (LazyMemberDict(raw_members(self.models)) if isinstance(self.models, LazyMemberDict)
+                      else dict(self.models))
+        extra_rounds = int(cfg.get("EXTRA_ROUNDS", 50))
+        for name in self.boosting_members():
+            model = self.models[name]
+            columns = getattr(model, "feature_names_in_", None)
+            X_model = X_fit.reindex(columns=list(columns), fill_value=0.0) if columns is not None else X_fit
+            candidate = clone(model).set_params(n_estimators=extra_rounds)
+            # The increment has no eval_set: early stopping would raise, and callbacks left from
+            # tuning (e.g. an Optuna pruning callback) belong to a finished trial
+            params = candidate.get_params()
+            candidate.set_params(**{key: None for key in ("early_stopping_rounds", "early_stopping_round", "callbacks")
+                                    if params.get(key) is not None})
+            learning_rate = model.get_params().get("learning_rate")
+            candidate.set_params(learning_rate=(learning_rate or 0.1) * cfg.get("LEARNING_RATE_SCALE", 1.0))
+            try:
+                if model.__class__.__name__ == "XGBClassifier":
+                    booster = model.get_booster()
+                    best_iteration = getattr(model, "best_iteration", None)
+                    if best_iteration is not None and best_iteration + 1 < booster.num_boosted_rounds():
+                        booster = booster[: best_iteration + 1]  # Only the rounds that were served
+                    candidate.fit(X_model, y_fit, xgb_model=booster, verbose=False)
+                    # best_iteration is inherited from xgb_model and would cap predict() before the new rounds
+                    candidate.get_booster().set_attr(best_iteration=None, best_score=None)
+                else:
+                    candidate.fit(X_model, y_fit, init_model=model.booster_)
+            except Exception as e:
+                report["reason"] = f"{name} increment failed: {e}"
+                return report
+            candidates[name] = candidate
+            report["updated_members"].append(name)
+
+        def _log_loss(p):
+            p = np.clip(p, 1e-6, 1 - 1e-6)
+            return float(-np.mean(y_val * np.log(p) + (1 - y_val) * np.log(1 - p)))
+
+        # Members that were not updated are scored once and shared by both blends
+        member_proba = {}
+        before = _log_loss(self._weighted_member_proba(self.models, X_val, member_proba))
+        for name in report["updated_members"]:
+            member_proba.pop(name, None)
+        after = _log_loss(self._weighted_member_proba(candidates, X_val, member_proba))
+        report.update(logloss_before=before, logloss_after=after)
+        if after > before + cfg.get("MAX_LOGLOSS_INCREASE", 0.01):
+            report["reason"] = f"validation gate: log-loss {before:.4f} -> {after:.4f}"
+            return report
+
+        self.models = candidates
+        self.compile_trees(X_new)
+        if getattr(self, "distillation", {}).get("accepted"):
+            # The student mimics the old members; score with the full ensemble until the next full train
+            self.distillation = dict(self.distillation, accepted=False, reason="stale after incremental update")
+        self.incremental_updates = getattr(self, "incremental_updates", 0) + 1
+        # The held-out validation bars were only scored, not fitted: the next increment starts
+        # right after the last fitted bar so it trains on them
+        self.trained_until = X_fit.index[-1]
+        report.update(accepted=True, reason="accepted")
+        return report
+
     def predict_proba_on_df(self, X, feature_columns=None):
         """
         Equal probability cho TON BDataFrame d u vo (used cho training).
@@ -10949,8 +14149,9 @@ class EnsembleModel:
             X_clean.fillna(method='bfill', inplace=True)
             X_clean.fillna(0, inplace=True)
 
-            # 2. Equal with total model con
+            # 2. Equal with total model con (one call per base model over every time step)
             predictions = []
+            prediction_names = []
             for name, model in self.models.items():
                 if model is None:
                     continue
@@ -10960,22 +14161,8 @@ class EnsembleModel:
                         try:
                             # KH C PH C L I:  m b o feature ordering nh t qun
                             if feature_columns is not None:
-                                # T o DataFrame with used thtfrom nhu khi training
-                                X_clean_ordered = pd.DataFrame(index=X_clean.index)
-                                
-                                # TFunction t t cfeatures theo used tht 
-                                for col in feature_columns:
-                                    if col in X_clean.columns:
-                                        X_clean_ordered[col] = X_clean[col]
-                                    else:
-                                        # TFunction gi trmc dnh data nh cho missing features
-                                        X_clean_ordered[col] = 0.0
-                                
-                                #  m b o not needsaN values
-                                X_clean_ordered = X_clean_ordered.fillna(0.0)
-                                
-                                # Chuy n d i threceiveumpy array dtrnh feature name issues
-                                X_array = X_clean_ordered.values
+                                # All time steps at once, in training feature order (missing -> 0.0)
+                                X_array = X_clean.reindex(columns=feature_columns, fill_value=0.0).fillna(0.0).values
                                 pred_proba = model.predict_proba(X_array)
                             else:
                                 # Fallback: Using reindex dd m b o thtfrom
@@ -11011,20 +14198,24 @@ class EnsembleModel:
                                 pred_proba = pred_proba.flatten()
                             
                             predictions.append(pred_proba)
+                            prediction_names.append(name)
                         else:
                             # Chlog warning m t l n dtrnh spam
                             if not hasattr(self, '_ensemble_warning_logged_df'):
                                 logging.warning(f"EnsembleModel.predict_proba_on_df: Model {name} trߦ v+ None")
                                 self._ensemble_warning_logged_df = True
                             predictions.append(np.full(len(X_clean), 0.5))
+                            prediction_names.append(name)
                     else:
                         # Fallback cho model not c predict_proba
                         pred = model.predict(X_clean)
                         predictions.append(pred.flatten())
+                        prediction_names.append(name)
                         
                 except Exception as e:
                     logging.error(f"EnsembleModel.predict_proba_on_df: Li with model {name}: {e}")
                     predictions.append(np.full(len(X_clean), 0.5))
+                    prediction_names.append(name)
                     continue
 
             # 3. Calculate weighted average
@@ -11032,15 +14223,14 @@ class EnsembleModel:
                 logging.warning("EnsembleModel.predict_proba_on_df: No valid predictions from this model")
                 return np.full(len(X_clean), 0.5)
 
-            # Calculate weighted average
-            weights = {'rf': 0.3, 'xgb': 0.4, 'lgb': 0.3}  # Default weights
+            # Calculate weighted average (weights looked up by the member that produced each prediction)
+            weights = self.MEMBER_WEIGHTS  # Default weights
             weighted_sum = np.zeros(len(X_clean))
             total_weight = 0.0
             
-            for i, pred in enumerate(predictions):
-                model_name = list(self.models.keys())[i] if i < len(self.models) else f"model_{i}"
+            for model_name, pred in zip(prediction_names, predictions):
                 weight = weights.get(model_name, 0.33)  # Tempty smc dnh data nh
-                weighted_sum += pred * weight
+                weighted_sum += self._calibrated(model_name, pred) * weight
                 total_weight += weight
             
             final_predictions = weighted_sum / total_weight if total_weight > 0 else np.full(len(X_clean), 0.5)
@@ -11061,6 +14251,8 @@ class EnhancedDataManager:
         
         # Initialize feature engineer
         self.feature_engineer = AdvancedFeatureEngineer()
+        # Multi-symbol feature builds (process pool with in-process fallback)
+        self.feature_stage = ParallelFeatureStage(self.feature_engineer)
         
         # Performance optimization: Cache for feature creation
         self._feature_cache = {}
@@ -11535,150 +14727,276 @@ class EnhancedDataManager:
     # Function this has d fix dqu n l vi has data i tn from 'rsi' v ghp data
     # m t allh chnh xc, d m b o not cn l i trng l p.
 
-    def create_enhanced_features(self, symbol):
-            """
-            T o features nng cao tmulti-timeframe data.
-            """
-            # Check if market is open before fetching data
-            if not is_market_open(symbol):
-                print(f"   [Market Status] Market for {symbol} is closed. Skipping feature creation.")
-                return None
-                
-            primary_tf = PRIMARY_TIMEFRAME_BY_SYMBOL.get(symbol, PRIMARY_TIMEFRAME_DEFAULT)
-            timeframes_to_use = TIMEFRAME_SET_BY_PRIMARY.get(primary_tf)
-
-            multi_tf_data = self.fetch_multi_timeframe_data(symbol, 5000, timeframes_to_use)
-            logging.info(f"[Sanity] weekend={is_weekend()} sym={symbol} crypto={is_crypto_symbol(symbol)} primary_tf={primary_tf}")
-            # This call is now correct.
-            if not data_freshness_manager.validate_with_recovery(multi_tf_data, primary_tf, symbol):
-                print(f"data for {symbol} is too old. Skipping feature creation.")
-                # <<< TreceiveANG M I: nhn d liu symbol needs retrain >>>
-                self._mark_symbol_for_retrain(symbol, "stale_data")
-                return None
+    def create_enhanced_features(self, symbol, mode="training", rows=1):
+        """
+        T o features nng cao tmulti-timeframe data.
+        mode="inference" returns only the latest `rows` feature vectors (no labels), computed
+        over a trailing warm-up window instead of the full history.
+        """
+        loaded = FEATURE_PROFILER.call("load_data", symbol, self._load_primary_frame, symbol)
+        if loaded is None:
+            return None
+        df_primary, multi_tf_data, primary_tf, timeframes_to_use = loaded
 
-            # <<< K T THfromHAY  I >>>
-            # ========================
-            if primary_tf not in multi_tf_data:
-                print(f"⚠️ No data found for primary timeframe {primary_tf} of {symbol}")
-                return None
+        # 2. Start with primary timeframe ANdREATE ALL FEATURES FOR IT
+        # Inference mode windows the frame itself and needs the full history for zones/terciles
+        df_enhanced = df_primary.copy()
+        df_enhanced.name = symbol
 
-            # 2. Start with primary timeframe ANdREATE ALL FEATURES FOR IT
-            df_enhanced = multi_tf_data[primary_tf].copy()
-            df_enhanced.name = symbol
-
-            df_enhanced = self.feature_engineer.create_all_features(df_enhanced)
-
-            if 'rsi' in df_enhanced.columns:
-                df_enhanced.rename(columns={'rsi': f'rsi_{primary_tf}'}, inplace=True)
-
-            for htf in timeframes_to_use:
-                if htf != primary_tf and htf in multi_tf_data:
-                    df_htf = multi_tf_data[htf].copy()
-
-                    ema20_htf = EMAIndicator(df_htf["close"], 20).ema_indicator()
-                    ema50_htf = EMAIndicator(df_htf["close"], 50).ema_indicator()
-                    rsi_htf = RSIIndicator(df_htf["close"]).rsi()
-
-                    htf_features = pd.DataFrame({
-                        f"ema20_{htf}": ema20_htf,
-                        f"ema50_{htf}": ema50_htf,
-                        f"rsi_{htf}": rsi_htf,
-                        f"trend_{htf}": (ema20_htf > ema50_htf).astype(int),
-                    }, index=df_htf.index)
-
-                    htf_resampled = htf_features.reindex(df_enhanced.index, method="ffill").bfill()
-                    df_enhanced = df_enhanced.join(htf_resampled)
-
-            df_enhanced.replace([np.inf, -np.inf], np.nan, inplace=True)
-            df_enhanced.fillna(method='ffill', inplace=True)
-            df_enhanced.fillna(method='bfill', inplace=True)
-
-            # processing fillna an ton cOrategorical columns
-            categorical_columns = []
-            for col in df_enhanced.columns:
-                if df_enhanced[col].dtype.name == 'category':
-                    categorical_columns.append(col)
-
-            # Fillna cOrc from not must categorical
-            non_categorical_cols = [col for col in df_enhanced.columns if col not in categorical_columns]
-            if non_categorical_cols:
-                df_enhanced[non_categorical_cols] = df_enhanced[non_categorical_cols].fillna(0)
-
-            # processing ring cOrategorical columns
-            for col in categorical_columns:
-                # L y categories current
-                current_categories = df_enhanced[col].cat.categories
-                # Add 0 to categories if not present
-                if 0 not in current_categories:
-                    df_enhanced[col] = df_enhanced[col].cat.add_categories([0])
-                # Fillna with mode Or gi trd u tin in categories
-                if df_enhanced[col].isna().any():
-                    mode_value = df_enhanced[col].mode()
-                    if len(mode_value) > 0:
-                        df_enhanced[col] = df_enhanced[col].fillna(mode_value[0])
-                    else:
-                        df_enhanced[col] = df_enhanced[col].fillna(current_categories[0])
-            # <<< TFunction ENCODING COrATEGORICAL COLUMNS >>>
-            df_enhanced = self._encode_categorical_features(df_enhanced, symbol)
+        df_enhanced = FEATURE_PROFILER.call("all_features", symbol, self.feature_engineer.create_all_features,
+                                            df_enhanced, mode=mode, rows=rows)
 
-            # <<< KH C PH C L I: TFunction NEWS SENTIMENT FEATURES >>>
-            #  m b o news features dufrom o in qu trnh Equal th i gian th c
-            try:
-                print(f" [Features] Checking news_manager for {symbol}...")
+        df_enhanced = self._finalize_enhanced_features(symbol, df_enhanced, multi_tf_data, primary_tf, timeframes_to_use)
+        if df_enhanced is not None:
+            df_enhanced.attrs["feature_mode"] = mode
+        return df_enhanced
+
+    def _load_primary_frame(self, symbol):
+        """
+        Fetch and validate multi-timeframe data for a symbol.
+        Returns (primary_df, multi_tf_data, primary_tf, timeframes_to_use) or None.
+        """
+        # Check if market is open before fetching data
+        if not is_market_open(symbol):
+            print(f"   [Market Status] Market for {symbol} is closed. Skipping feature creation.")
+            return None
+            
+        primary_tf = PRIMARY_TIMEFRAME_BY_SYMBOL.get(symbol, PRIMARY_TIMEFRAME_DEFAULT)
+        timeframes_to_use = TIMEFRAME_SET_BY_PRIMARY.get(primary_tf)
+
+        multi_tf_data = self.fetch_multi_timeframe_data(symbol, 5000, timeframes_to_use)
+        logging.info(f"[Sanity] weekend={is_weekend()} sym={symbol} crypto={is_crypto_symbol(symbol)} primary_tf={primary_tf}")
+        # This call is now correct.
+        if not data_freshness_manager.validate_with_recovery(multi_tf_data, primary_tf, symbol):
+            print(f"data for {symbol} is too old. Skipping feature creation.")
+            # <<< TreceiveANG M I: nhn d liu symbol needs retrain >>>
+            self._mark_symbol_for_retrain(symbol, "stale_data")
+            return None
+
+        # <<< K T THfromHAY  I >>>
+        # ========================
+        if primary_tf not in multi_tf_data:
+            print(f"⚠️ No data found for primary timeframe {primary_tf} of {symbol}")
+            return None
+
+        return multi_tf_data[primary_tf], multi_tf_data, primary_tf, timeframes_to_use
+
+    def _finalize_enhanced_features(self, symbol, df_enhanced, multi_tf_data, primary_tf, timeframes_to_use):
+        """
+        Join higher-timeframe context, clean NaNs, encode categoricals and add
+        news/economic features on top of the primary-timeframe feature frame.
+        """
+        profiler = FEATURE_PROFILER
+        df_enhanced = profiler.call("htf_join", symbol, self._join_higher_timeframes,
+                                    df_enhanced, multi_tf_data, primary_tf, timeframes_to_use)
+        df_enhanced = profiler.call("cleanup", symbol, self._clean_enhanced_frame, df_enhanced, symbol)
+        df_enhanced = profiler.call("news", symbol, self._add_news_features, df_enhanced, symbol)
+        df_enhanced = profiler.call("economic", symbol, self._add_economic_features, df_enhanced, symbol)
+        return df_enhanced
+
+    def _join_higher_timeframes(self, df_enhanced, multi_tf_data, primary_tf, timeframes_to_use):
+        """Rename the primary RSI and join EMA/RSI/trend context from higher timeframes."""
+        if 'rsi' in df_enhanced.columns:
+            df_enhanced.rename(columns={'rsi': f'rsi_{primary_tf}'}, inplace=True)
+
+        for htf in timeframes_to_use:
+            if htf != primary_tf and htf in multi_tf_data:
+                df_htf = multi_tf_data[htf].copy()
+
+                ema20_htf = EMAIndicator(df_htf["close"], 20).ema_indicator()
+                ema50_htf = EMAIndicator(df_htf["close"], 50).ema_indicator()
+                rsi_htf = RSIIndicator(df_htf["close"]).rsi()
+
+                htf_features = pd.DataFrame({
+                    f"ema20_{htf}": ema20_htf,
+                    f"ema50_{htf}": ema50_htf,
+                    f"rsi_{htf}": rsi_htf,
+                    f"trend_{htf}": (ema20_htf > ema50_htf).astype(int),
+                }, index=df_htf.index)
+
+                htf_resampled = htf_features.reindex(df_enhanced.index, method="ffill").bfill()
+                df_enhanced = df_enhanced.join(htf_resampled)
+
+        return df_enhanced
+
+    def _clean_enhanced_frame(self, df_enhanced, symbol):
+        """Replace infinities, fill gaps and encode categorical columns."""
+        df_enhanced.replace([np.inf, -np.inf], np.nan, inplace=True)
+        df_enhanced.fillna(method='ffill', inplace=True)
+        df_enhanced.fillna(method='bfill', inplace=True)
+
+        # processing fillna an ton cOrategorical columns
+        categorical_columns = []
+        for col in df_enhanced.columns:
+            if df_enhanced[col].dtype.name == 'category':
+                categorical_columns.append(col)
+
+        # Fillna cOrc from not must categorical
+        non_categorical_cols = [col for col in df_enhanced.columns if col not in categorical_columns]
+        if non_categorical_cols:
+            df_enhanced[non_categorical_cols] = df_enhanced[non_categorical_cols].fillna(0)
+
+        # processing ring cOrategorical columns
+        for col in categorical_columns:
+            # L y categories current
+            current_categories = df_enhanced[col].cat.categories
+            # Add 0 to categories if not present
+            if 0 not in current_categories:
+                df_enhanced[col] = df_enhanced[col].cat.add_categories([0])
+            # Fillna with mode Or gi trd u tin in categories
+            if df_enhanced[col].isna().any():
+                mode_value = df_enhanced[col].mode()
+                if len(mode_value) > 0:
+                    df_enhanced[col] = df_enhanced[col].fillna(mode_value[0])
+                else:
+                    df_enhanced[col] = df_enhanced[col].fillna(current_categories[0])
+        # <<< TFunction ENCODING COrATEGORICAL COLUMNS >>>
+        df_enhanced = self._encode_categorical_features(df_enhanced, symbol)
+
+        return df_enhanced
+
+    def _add_news_features(self, df_enhanced, symbol):
+        """Add news sentiment features (defaults when the news manager is unavailable)."""
+        # <<< KH C PH C L I: TFunction NEWS SENTIMENT FEATURES >>>
+        #  m b o news features dufrom o in qu trnh Equal th i gian th c
+        try:
+            print(f" [Features] Checking news_manager for {symbol}...")
+            print(f"   - hasattr(self, 'news_manager'): {hasattr(self, 'news_manager')}")
+            print(f"   - news_manager is not None: {self.news_manager is not None if hasattr(self, 'news_manager') else 'N/A'}")
+            print(f"   - news_manager type: {type(self.news_manager) if hasattr(self, 'news_manager') and self.news_manager is not None else 'N/A'}")
+            
+            if hasattr(self, 'news_manager') and self.news_manager is not None:
+                print(f" [Features] Adding news sentiment features for {symbol}")
+                print(f"   - news_manager type: {type(self.news_manager)}")
+                print(f"   - news_manager has_add_news_sentiment_features: {hasattr(self.news_manager, 'add_news_sentiment_features')}")
+                
+                # Test call to add_news_sentiment_features
+                df_enhanced = self.news_manager.add_news_sentiment_features(df_enhanced, symbol)
+                print(f"[Features] News sentiment feature added for {symbol}")
+            else:
+                # T o all from news features mc dnh data receiveu not needsews_manager
+                print(f" [Features] News manager not available for {symbol}, using default features")
                 print(f"   - hasattr(self, 'news_manager'): {hasattr(self, 'news_manager')}")
                 print(f"   - news_manager is not None: {self.news_manager is not None if hasattr(self, 'news_manager') else 'N/A'}")
-                print(f"   - news_manager type: {type(self.news_manager) if hasattr(self, 'news_manager') and self.news_manager is not None else 'N/A'}")
-                
-                if hasattr(self, 'news_manager') and self.news_manager is not None:
-                    print(f" [Features] Adding news sentiment features for {symbol}")
-                    print(f"   - news_manager type: {type(self.news_manager)}")
-                    print(f"   - news_manager has_add_news_sentiment_features: {hasattr(self.news_manager, 'add_news_sentiment_features')}")
-                    
-                    # Test call to add_news_sentiment_features
-                    df_enhanced = self.news_manager.add_news_sentiment_features(df_enhanced, symbol)
-                    print(f"[Features] News sentiment feature added for {symbol}")
-                else:
-                    # T o all from news features mc dnh data receiveu not needsews_manager
-                    print(f" [Features] News manager not available for {symbol}, using default features")
-                    print(f"   - hasattr(self, 'news_manager'): {hasattr(self, 'news_manager')}")
-                    print(f"   - news_manager is not None: {self.news_manager is not None if hasattr(self, 'news_manager') else 'N/A'}")
-                    print(f"   - Reason: {'news_manager is None' if hasattr(self, 'news_manager') and self.news_manager is None else 'news_manager attribute does not exist'}")
-                    news_columns = ['news_sentiment_score', 'news_sentiment_volume', 'news_quality_score', 
-                                   'news_timing_score', 'news_sentiment_trend', 'news_impact_score']
-                    for col in news_columns:
-                        if col not in df_enhanced.columns:
-                            df_enhanced[col] = 0.0
-                    logging.info(f"News manager not available, using default news features for {symbol}")
-            except Exception as e:
-                logging.error(f"Error adding news features for {symbol}: {e}")
-                print(f"[Features] Error adding news features for {symbol}: {e}")
-                import traceback
-                traceback.print_exc()
-                # T o all from news features mc dnh data nh khi c l i
+                print(f"   - Reason: {'news_manager is None' if hasattr(self, 'news_manager') and self.news_manager is None else 'news_manager attribute does not exist'}")
                 news_columns = ['news_sentiment_score', 'news_sentiment_volume', 'news_quality_score', 
                                'news_timing_score', 'news_sentiment_trend', 'news_impact_score']
                 for col in news_columns:
                     if col not in df_enhanced.columns:
                         df_enhanced[col] = 0.0
+                logging.info(f"News manager not available, using default news features for {symbol}")
+        except Exception as e:
+            logging.error(f"Error adding news features for {symbol}: {e}")
+            print(f"[Features] Error adding news features for {symbol}: {e}")
+            import traceback
+            traceback.print_exc()
+            # T o all from news features mc dnh data nh khi c l i
+            news_columns = ['news_sentiment_score', 'news_sentiment_volume', 'news_quality_score', 
+                           'news_timing_score', 'news_sentiment_trend', 'news_impact_score']
+            for col in news_columns:
+                if col not in df_enhanced.columns:
+                    df_enhanced[col] = 0.0
+
+        return df_enhanced
+
+    def _add_economic_features(self, df_enhanced, symbol):
+        """Add economic event features (basic fallback when the news manager is unavailable)."""
+        # <<< ADD ECONOMIC EVENT FEATURES >>>
+        # Add economic features that are required by the model
+        try:
+            print(f" [Features] Adding economic event features for {symbol}...")
+            if hasattr(self, 'news_manager') and self.news_manager is not None:
+                df_enhanced = self.news_manager.add_economic_event_features(df_enhanced, symbol)
+                print(f"[Features] Economic event features added for {symbol}")
+            else:
+                # Add basic economic features if news_manager is not available
+                print(f" [Features] News manager not available, adding basic economic features for {symbol}")
+                self._add_basic_economic_features_direct(df_enhanced, symbol)
+        except Exception as e:
+            logging.error(f"Error adding economic features for {symbol}: {e}")
+            print(f"[Features] Error adding economic features for {symbol}: {e}")
+            # Add basic economic features as fallback
+            self._add_basic_economic_features_direct(df_enhanced, symbol)
+
+        return df_enhanced
+
+    def create_enhanced_features_panel(self, symbols):
+        """
+        Same output as create_enhanced_features, but the primary-timeframe indicators
+        for all symbols are built together (process pool and/or cross-symbol panel pass).
+        Returns {symbol: DataFrame or None}.
+        """
+        results = {}
+        loaded = {}
+        for symbol in symbols:
+            try:
+                loaded_frame = FEATURE_PROFILER.call("load_data", symbol, self._load_primary_frame, symbol)
+            except Exception as e:
+                logging.error(f"Error loading data for {symbol}: {e}")
+                loaded_frame = None
+            if loaded_frame is None:
+                results[symbol] = None
+            else:
+                loaded[symbol] = loaded_frame
+
+        if not loaded:
+            return results
+
+        frames = {symbol: item[0].copy() for symbol, item in loaded.items()}
+        panel_features = FEATURE_PROFILER.call("feature_stage", None, self.feature_stage.run, frames)
 
-            # <<< ADD ECONOMIC EVENT FEATURES >>>
-            # Add economic features that are required by the model
+        for symbol, (_, multi_tf_data, primary_tf, timeframes_to_use) in loaded.items():
+            df_enhanced = panel_features.get(symbol)
+            if df_enhanced is None:
+                results[symbol] = None
+                continue
             try:
-                print(f" [Features] Adding economic event features for {symbol}...")
-                if hasattr(self, 'news_manager') and self.news_manager is not None:
-                    df_enhanced = self.news_manager.add_economic_event_features(df_enhanced, symbol)
-                    print(f"[Features] Economic event features added for {symbol}")
-                else:
-                    # Add basic economic features if news_manager is not available
-                    print(f" [Features] News manager not available, adding basic economic features for {symbol}")
-                    self._add_basic_economic_features_direct(df_enhanced, symbol)
+                df_enhanced.name = symbol
+                results[symbol] = self._finalize_enhanced_features(
+                    symbol, df_enhanced, multi_tf_data, primary_tf, timeframes_to_use
+                )
             except Exception as e:
-                logging.error(f"Error adding economic features for {symbol}: {e}")
-                print(f"[Features] Error adding economic features for {symbol}: {e}")
-                # Add basic economic features as fallback
-                self._add_basic_economic_features_direct(df_enhanced, symbol)
+                logging.error(f"Error finalizing panel features for {symbol}: {e}")
+                results[symbol] = None
+
+        return results
+
+    def create_enhanced_features_batch(self, symbols, mode="training", rows=1):
+        """
+        Create enhanced features for several symbols.
+        Uses the multi-symbol path when FEATURE_PANEL_CONFIG or FEATURE_POOL_CONFIG
+        allows it, otherwise falls back to create_enhanced_features per symbol.
+        Inference mode always goes per symbol: its windows are already small. `rows` (an int
+        or a {symbol: rows} mapping, default 1) is how many latest rows each symbol returns.
+        """
+        symbols = list(symbols)
+        if mode == "inference":
+            results = {}
+            for symbol in symbols:
+                symbol_rows = rows.get(symbol, 1) if isinstance(rows, dict) else rows
+                try:
+                    results[symbol] = self.create_enhanced_features(symbol, mode="inference", rows=symbol_rows)
+                except Exception as e:
+                    logging.error(f"Error creating inference features for {symbol}: {e}")
+                    results[symbol] = None
+            return results
+
+        use_panel = FEATURE_PANEL_CONFIG.get("ENABLED", True) and len(symbols) >= FEATURE_PANEL_CONFIG.get("MIN_SYMBOLS", 2)
+        use_pool = FEATURE_POOL_CONFIG.get("ENABLED", True) and len(symbols) >= FEATURE_POOL_CONFIG.get("MIN_SYMBOLS", 3)
+        if use_panel or use_pool:
+            try:
+                return self.create_enhanced_features_panel(symbols)
+            except Exception as e:
+                logging.error(f"Multi-symbol feature computation failed, falling back to per-symbol path: {e}")
 
-            return df_enhanced
+        results = {}
+        for symbol in symbols:
+            try:
+                results[symbol] = self.create_enhanced_features(symbol)
+            except Exception as e:
+                logging.error(f"Error creating features for {symbol}: {e}")
+                results[symbol] = None
+        return results
 
     def _encode_categorical_features(self, df, symbol):
         """
@@ -11921,6 +15239,198 @@ class EnhancedDataManager:
 
         print("Data cycle starting.")
         return full_data_cache
+def fit_ensemble_on_frame(symbol, df, target_col, regime=None):
+    """
+    Cleaning, correlation pruning, feature selection and ensemble training on a frame that
+    already carries news features and labels. Returns (model_data, X_selected) or (None, None).
+    Module level so background training processes can run it without the bot instance.
+    """
+    # Pipeline clean data original as old
+    df.replace([np.inf, -np.inf], np.nan, inplace=True)
+    df.dropna(subset=[target_col], inplace=True)
+
+    feature_cols = [col for col in df.columns if not col.startswith("label")]
+    X = df[feature_cols].copy()
+    y = df[target_col].astype(int)
+
+    X.fillna(method="ffill", inplace=True)
+    X.fillna(method="bfill", inplace=True)
+
+    cols_to_drop = X.columns[X.isna().all()].tolist()
+    if cols_to_drop:
+        X.drop(columns=cols_to_drop, inplace=True)
+        feature_cols = [col for col in feature_cols if col not in cols_to_drop]
+
+    y = y.reindex(X.index)
+    all_data = pd.concat([X, y], axis=1)
+    all_data.dropna(inplace=True)
+    X = all_data[feature_cols]
+    y = all_data[target_col]
+
+    # Enhanced minimum samples check
+    min_samples = ML_CONFIG.get("MIN_SAMPLES_FOR_TRAINING", 300)
+    if len(X) < min_samples:
+        print(
+            f"not ddata s ch cho {symbol}: chc {len(X)} records (yu c u {min_samples})."
+        )
+        return None, None
+
+    # ... (code type btuong quan, ch n feature, training ensemble)
+    print(
+        f" l+m sߦch data, cn l i {len(X)} records dtraining cho {symbol}."
+    )
+
+    # Enhancedorrelation removal with stricter threshold
+    correlation_threshold = ML_CONFIG.get("MAX_CORRELATION_THRESHOLD", 0.90)
+
+    # processing all from not must numerifromruc khi tnh correlation
+    numeric_columns = X.select_dtypes(include=[np.number]).columns
+    X_numeric = X[numeric_columns]
+
+    # Check v processing all from categorical
+    categorical_columns = X.select_dtypes(include=['object', 'category']).columns
+    if len(categorical_columns) > 0:
+        print(f"   [Warning] Detected {len(categorical_columns)} categorical columns: {list(categorical_columns)}")
+        print(f"   [Info] Only using {len(numeric_columns)} numeric columns for correlation calculation")
+
+    # Chtnh correlation trn all from numeric
+    if len(X_numeric.columns) > 1:
+        correlation_matrix = X_numeric.corr().abs()
+        upper_triangle = correlation_matrix.where(
+            np.triu(np.ones(correlation_matrix.shape), k=1).astype(bool)
+        )
+        high_corr_features = [
+            column
+            for column in upper_triangle.columns
+            if any(upper_triangle[column] > correlation_threshold)
+        ]
+
+        # type ball features c correlation cao tX_numeric
+        X_numeric = X_numeric.drop(columns=high_corr_features)
+
+        # Update X with all filtered numeric features
+        X = pd.concat([X_numeric, X[categorical_columns]], axis=1)
+    else:
+        print(f"   [Warning] not dfrom numerihas datatnh correlation cho {symbol}")
+        X = X_numeric if len(X_numeric.columns) > 0 else X
+
+    # Enhanced feature selection with multiple algoritFunctions
+    # ChUsing all from numeric cho feature selection
+    X_for_selection = X.select_dtypes(include=[np.number])
+
+    if len(X_for_selection.columns) == 0:
+        print(f"⚠️ No numeric columns available for feature selection for {symbol}")
+        return None, None
+
+    rf_temp = RandomForestClassifier(
+        n_estimators=100,
+        max_depth=10,
+        min_samples_split=5,
+        random_state=42,
+        n_jobs=-1
+    )
+    rf_temp.fit(X_for_selection, y)
+
+    # Get feature importance from Random Forest
+    rf_importance = pd.DataFrame({
+        "feature": X_for_selection.columns,
+        "rf_importance": rf_temp.feature_importances_
+    })
+
+    # Also get feature importance from XGBoost for comparison
+    try:
+        xgb_temp = xgb.XGBClassifier(
+            n_estimators=50,
+            max_depth=6,
+            random_state=42,
+            n_jobs=-1
+        )
+        xgb_temp.fit(X_for_selection, y)
+        xgb_importance = pd.DataFrame({
+            "feature": X_for_selection.columns,
+            "xgb_importance": xgb_temp.feature_importances_
+        })
+
+        # Combine importances
+        feature_importance = rf_importance.merge(xgb_importance, on="feature")
+        feature_importance["combined_importance"] = (
+            feature_importance["rf_importance"] * 0.6 +
+            feature_importance["xgb_importance"] * 0.4
+        )
+    except:
+        feature_importance = rf_importance
+        feature_importance["combined_importance"] = feature_importance["rf_importance"]
+
+    # Filter by minimumimportance threshold
+    min_importance = ML_CONFIG.get("FEATURE_IMPORTANCE_THRESHOLD", 0.01)
+    feature_importance = feature_importance[
+        feature_importance["combined_importance"] >= min_importance
+    ]
+
+    # Select top features
+    top_features = feature_importance.nlargest(
+        ML_CONFIG["FEATURE_SELECTION_TOP_K"],
+        "combined_importance"
+    )["feature"].tolist()
+
+    # TFunction encoded features vo top_features (categorical g c has d type b )
+    encoded_cols = [col for col in X.columns if col.endswith('_encoded') or
+                   col.startswith('asset_class_') or col.startswith('volatility_profile_') or
+                   col.startswith('volatility_regime_') or col.startswith('prefers_') or
+                   col.startswith('asset_') or col.endswith('_interaction')]
+
+    # TFunction encoded features
+    top_features.extend(encoded_cols)
+
+    # Check if v n cn categorical columns (not nn c)
+    remaining_categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
+    if len(remaining_categorical_cols) > 0:
+        print(f"   [Warning] V n cn {len(remaining_categorical_cols)} from categorical: {list(remaining_categorical_cols)}")
+        top_features.extend(remaining_categorical_cols)
+
+    # type bduplicates v d m b o features t n t i
+    top_features = list(dict.fromkeys([f for f in top_features if f in X.columns]))
+
+    X_selected = X[top_features]
+
+    logging.info(f" Training with {len(top_features)} best features for {symbol}")
+    ensemble = EnsembleModel()
+    ensemble.study_context = {"symbol": symbol, "regime": regime}
+    ensemble.train_ensemble(X_selected, y)  # Function this sdnng c p bu c 2
+    model_data = {"ensemble": ensemble, "feature_columns": top_features}
+    return model_data, X_selected
+
+
+def _artefact_member_dir(pkl_file):
+    return pkl_file[:-len(".pkl")] + ".members"
+
+
+def _dump_split_artefact(filename, model_data):
+    """
+    Write model_data as a shell pickle at `filename` plus one file per ensemble member (and the
+    exported tree arrays) under <artefact>.members/. The caller's objects are left untouched.
+    """
+    ensemble = model_data["ensemble"]
+    member_dir = _artefact_member_dir(filename)
+    os.makedirs(member_dir, exist_ok=True)
+    placeholders = {}
+    for name, model in raw_members(ensemble.models):
+        if isinstance(model, LazyMember):
+            model = model.load()
+        placeholders[name] = None if model is None else LazyMember.dump(model, member_dir, name)
+
+    shell = copy.copy(ensemble)
+    shell.models = LazyMemberDict(placeholders)
+    shell._inference_plan = None
+    shell._projections = {}
+    compiled = getattr(ensemble, "compiled_trees", None)
+    if compiled is not None:
+        compiled.save(os.path.join(member_dir, "compiled_trees"))
+        shell.compiled_trees = None
+        shell.compiled_trees_dir = "compiled_trees"
+    joblib.dump(dict(model_data, ensemble=shell), filename)
+
+
 def save_model_with_metadata(symbol, model_data, model_type="ensemble"):
     """
     Luu model v metadata.
@@ -11937,7 +15447,12 @@ def save_model_with_metadata(symbol, model_data, model_type="ensemble"):
     metadata_file = filename.replace(".pkl", ".json")
 
     try:
-        joblib.dump(model_data, filename)
+        if MODEL_ARTEFACT_CONFIG.get("LAYOUT", "single") == "split":
+            _dump_split_artefact(filename, model_data)
+        else:
+            if isinstance(ensemble_model.models, LazyMemberDict):
+                ensemble_model.models = dict(ensemble_model.models.items())
+            joblib.dump(model_data, filename)
 
         first_model_name = list(ensemble_model.cv_results.keys())[0] if ensemble_model.cv_results else "unknown"
         cv_info = ensemble_model.cv_results.get(first_model_name, {})
@@ -11952,8 +15467,21 @@ def save_model_with_metadata(symbol, model_data, model_type="ensemble"):
             "cv_mean_accuracy": cv_info.get("mean_accuracy") or cv_info.get("mean_accuracy") or 0.0,
             # ======================
             "model_weights": getattr(ensemble_model, 'model_weights', {}),  # Fallback if not c model_weights
+            "optuna_best_params": getattr(ensemble_model, 'optuna_best_params', {}),
+            "optuna_warm_start": getattr(ensemble_model, 'optuna_warm_start', {}),
+            "optuna_pruning": getattr(ensemble_model, 'optuna_pruning', {}),
+            "trained_until": str(getattr(ensemble_model, 'trained_until', None)),
+            "incremental_updates": getattr(ensemble_model, 'incremental_updates', 0),
+            "last_full_train": getattr(ensemble_model, 'last_full_train', None),
+            "oof_calibration": getattr(ensemble_model, 'calibration_report', {}),
+            "pruned_members": getattr(ensemble_model, 'pruned_members', []),
+            "ensemble_pruning": getattr(ensemble_model, 'pruning_report', {}),
+            "distillation": getattr(ensemble_model, 'distillation', {}),
+            "compiled_tree_members": list(getattr(getattr(ensemble_model, 'compiled_trees', None), 'member_names', [])),
+            "dataset_fingerprint": model_data.get("dataset_fingerprint"),
             "model_type": model_type,
             "model_file": filename,
+            "artefact_layout": MODEL_ARTEFACT_CONFIG.get("LAYOUT", "single"),
         }
 
         with open(metadata_file, "w") as f:
@@ -11965,9 +15493,55 @@ def save_model_with_metadata(symbol, model_data, model_type="ensemble"):
         cv_accuracy = metadata['cv_mean_accuracy'] or 0.0
         print(f"   - CV F1-Score: {cv_f1:.3f} +/- {cv_std:.3f}")
         print(f"   - CV Accuracy: {cv_accuracy:.3f}")
+        if MODEL_REGISTRY_CONFIG.get("ENABLED", False):
+            MODEL_REGISTRY.put(symbol, model_type, filename, model_data)
+        return filename
     except Exception as e:
         print(f"Error saving model for {symbol} ({model_type}): {e}")
 
+
+def ensemble_cv_quality(model_data):
+    """(mean_f1, std_f1, accuracy) from the first cv_results entry, or None."""
+    ensemble = (model_data or {}).get("ensemble")
+    cv_results = getattr(ensemble, "cv_results", None)
+    if not cv_results:
+        return None
+    res = next(iter(cv_results.values()))
+    try:
+        return res["mean_f1"], res["std_f1"], res.get("mean_accuracy", res.get("accuracy", 0.5))
+    except KeyError:
+        return None
+
+
+def _regime_training_worker(task):
+    """
+    Training-process entry point: fits one regime model from a dumped, labelled frame
+    (best of MAX_RETRAIN_ATTEMPTS), applies the quality gates and saves the artefact.
+    Only the file path travels back to the main process.
+    """
+    symbol, regime = task["symbol"], task["regime"]
+    df = joblib.load(task["data_path"])
+    best_model, best_f1 = None, -1
+    for attempt in range(MAX_RETRAIN_ATTEMPTS):
+        model_data, _ = fit_ensemble_on_frame(symbol, df.copy(), task["target_col"], regime=regime)
+        quality = ensemble_cv_quality(model_data)
+        if quality is None:
+            continue
+        if quality[0] > best_f1:
+            best_model, best_f1 = model_data, quality[0]
+        if best_f1 >= MIN_F1_SCORE_GATE:
+            break
+
+    quality = ensemble_cv_quality(best_model)
+    result = {"symbol": symbol, "regime": regime, "model_file": None, "quality": quality}
+    if quality is None:
+        return result
+    f1, std_f1, accuracy = quality
+    if f1 >= MIN_F1_SCORE_GATE and std_f1 <= MAX_STD_F1_GATE and accuracy >= MIN_ACCURACY_GATE:
+        best_model["dataset_fingerprint"] = task.get("fingerprint")
+        result["model_file"] = save_model_with_metadata(symbol, best_model, f"ensemble_{regime.lower()}")
+    return result
+
 # <<< TFunction Function M I this VO FILE BOT >>>
 
 
@@ -11976,6 +15550,9 @@ def save_model_with_metadata(symbol, model_data, model_type="ensemble"):
 # EnhancedTradingBot class
 
 def load_latest_model(symbol, model_type="ensemble"):
+    if MODEL_REGISTRY_CONFIG.get("ENABLED", False):
+        return MODEL_REGISTRY.get(symbol, model_type)
+
     if not os.path.exists(MODEL_DIR): return None
 
     pattern = f"{model_type}_model_{symbol}"
@@ -11983,7 +15560,34 @@ def load_latest_model(symbol, model_type="ensemble"):
     if not files: return None
 
     files.sort(reverse=True)
-    latest_pkl_file = os.path.join(MODEL_DIR, files[0])
+    return _load_validated_model(os.path.join(MODEL_DIR, files[0]), symbol, model_type)
+
+def model_file_matches(model_file, symbol, model_type):
+    """True when `model_file` is a `model_type` artefact of `symbol` (file name and saved metadata agree)."""
+    if not model_file or not os.path.basename(model_file).startswith(f"{model_type}_model_{symbol}_"):
+        return False
+    metadata_file = model_file.replace(".pkl", ".json")
+    if not os.path.exists(metadata_file):
+        return True
+    try:
+        with open(metadata_file) as f:
+            metadata = json.load(f)
+    except Exception as e:
+        logging.warning(f"Could not read model metadata {metadata_file}: {e}")
+        return False
+    return metadata.get("symbol", symbol) == symbol and metadata.get("model_type", model_type) == model_type
+
+
+def load_model_file(model_file, symbol, model_type="ensemble"):
+    """Load one specific artefact (e.g. the file a training job announced), not just the newest one."""
+    if MODEL_REGISTRY_CONFIG.get("ENABLED", False):
+        return MODEL_REGISTRY.load(model_file, symbol, model_type)
+    if not os.path.exists(model_file):
+        return None
+    return _load_validated_model(model_file, symbol, model_type)
+
+def _load_validated_model(latest_pkl_file, symbol, model_type):
+    """joblib-load a model artefact; incompatible (non-stacking) files are deleted and None returned."""
     metadata_file = latest_pkl_file.replace(".pkl", ".json")
 
     try:
@@ -11998,6 +15602,11 @@ def load_latest_model(symbol, model_type="ensemble"):
 
         if is_valid:
             logging.info(f" Loaded_compatible model ({model_type}) for {symbol} from: {latest_pkl_file}")
+            member_dir = _artefact_member_dir(latest_pkl_file)
+            if hasattr(ensemble_model, "attach_artefacts") and os.path.isdir(member_dir):
+                ensemble_model.attach_artefacts(member_dir)
+            if hasattr(ensemble_model, "prepare_inference"):
+                ensemble_model.prepare_inference(model_data.get("feature_columns"))
             return model_data
         else:
             logging.warning(f"⚠️ Detected incompatible model (missing 'meta_model') for {symbol}.")
@@ -12006,6 +15615,7 @@ def load_latest_model(symbol, model_type="ensemble"):
                 os.remove(latest_pkl_file)
                 if os.path.exists(metadata_file):
                     os.remove(metadata_file)
+                shutil.rmtree(_artefact_member_dir(latest_pkl_file), ignore_errors=True)
             except OSError as e:
                 print(f"   Error deleting old file: {e}")
             return None # trߦ v+ None dactivate training l i
@@ -12014,6 +15624,187 @@ def load_latest_model(symbol, model_type="ensemble"):
         logging.error(f"Error loading or checking model at {latest_pkl_file}: {e}")
         return None
 
+def _config_hash(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def training_data_fingerprint(df, target_col=None):
+    """
+    Fingerprint of a regime training frame: candle range + candle content, feature-config
+    hash and label spec. `hash` combines the three and is what retrain decisions compare.
+    """
+    cfg = TRAINING_FINGERPRINT_CONFIG
+    if df is None or df.empty:
+        return None
+    if target_col is None:
+        target_col = (TRIPLE_BARRIER_CONFIG.get("TARGET_COLUMN", "label_tb")
+                      if TRIPLE_BARRIER_CONFIG.get("USE_AS_TARGET", False) else "label_3")
+
+    candle_cols = [c for c in cfg["CANDLE_COLUMNS"] if c in df.columns]
+    candles = {
+        "start": str(df.index[0]),
+        "end": str(df.index[-1]),
+        "rows": int(len(df)),
+        "content": dataset_fingerprint(df[candle_cols]) if candle_cols else None,
+    }
+    feature_config = _config_hash({
+        "columns": sorted(map(str, df.columns)),
+        "ml_config": {k: ML_CONFIG.get(k) for k in cfg["FEATURE_CONFIG_KEYS"]},
+    })
+    label_spec = _config_hash({
+        "target": target_col,
+        "horizons": cfg["LABEL_HORIZONS"],
+        "triple_barrier": TRIPLE_BARRIER_CONFIG if TRIPLE_BARRIER_CONFIG.get("USE_AS_TARGET", False) else None,
+    })
+    return {
+        "candles": candles,
+        "feature_config": feature_config,
+        "label_spec": label_spec,
+        "hash": _config_hash([candles, feature_config, label_spec]),
+    }
+
+
+def load_latest_model_metadata(symbol, model_type="ensemble"):
+    """Metadata JSON of the latest saved model, or None."""
+    if MODEL_REGISTRY_CONFIG.get("ENABLED", False):
+        return MODEL_REGISTRY.metadata(symbol, model_type)
+
+    if not os.path.exists(MODEL_DIR): return None
+
+    pattern = f"{model_type}_model_{symbol}_"
+    files = sorted(f for f in os.listdir(MODEL_DIR) if f.startswith(pattern) and f.endswith(".json"))
+    if not files: return None
+
+    try:
+        with open(os.path.join(MODEL_DIR, files[-1])) as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(f"Could not read model metadata for {symbol} ({model_type}): {e}")
+        return None
+
+class ModelRegistry:
+    """
+    Resident index of MODEL_DIR. The directory is re-listed only when its mtime changes
+    (a model was saved or deleted), and an artefact is unpickled only when a newer file
+    than the one already in memory appears for that (symbol, model_type).
+    """
+
+    def __init__(self, model_dir=MODEL_DIR):
+        self.model_dir = model_dir
+        self.generation = 0              # Bumped on every re-listing of the directory
+        self._dir_mtime = None
+        self._files = []
+        self._latest = {}                # filename prefix -> newest .pkl path
+        self._resident = {}              # (symbol, model_type) -> (path, file mtime_ns, model_data)
+        self._metadata = {}              # .json path -> (mtime_ns, dict)
+        self._lock = threading.RLock()
+        self.stats = {"scans": 0, "loads": 0, "hits": 0}
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.model_dir).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime == self._dir_mtime:
+            return
+        self._dir_mtime = mtime
+        self._files = sorted(f for f in os.listdir(self.model_dir) if f.endswith(".pkl")) if mtime is not None else []
+        self._latest.clear()
+        self.generation += 1
+        self.stats["scans"] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._dir_mtime = None
+
+    def latest_path(self, symbol, model_type="ensemble"):
+        pattern = f"{model_type}_model_{symbol}"
+        with self._lock:
+            self._refresh()
+            if pattern not in self._latest:
+                matches = [f for f in self._files if f.startswith(pattern)]
+                self._latest[pattern] = os.path.join(self.model_dir, matches[-1]) if matches else None
+            return self._latest[pattern]
+
+    def get(self, symbol, model_type="ensemble"):
+        key = (symbol, model_type)
+        with self._lock:
+            path = self.latest_path(symbol, model_type)
+            if path is None:
+                self._resident.pop(key, None)
+                return None
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                self.invalidate()
+                return None
+            cached = self._resident.get(key)
+            if cached and cached[0] == path and cached[1] == mtime:
+                self.stats["hits"] += 1
+                return cached[2]
+
+            model_data = _load_validated_model(path, symbol, model_type)
+            self.stats["loads"] += 1
+            if model_data is None:
+                self._resident.pop(key, None)
+                self.invalidate()  # The file may have been deleted as incompatible
+                return None
+            self._resident[key] = (path, mtime, model_data)
+            return model_data
+
+    def load(self, path, symbol, model_type="ensemble"):
+        """Load a specific artefact; it becomes resident only while it is the newest for its key."""
+        key = (symbol, model_type)
+        with self._lock:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                return None
+            cached = self._resident.get(key)
+            if cached and cached[0] == path and cached[1] == mtime:
+                self.stats["hits"] += 1
+                return cached[2]
+
+            model_data = _load_validated_model(path, symbol, model_type)
+            self.stats["loads"] += 1
+            if model_data is None:
+                self.invalidate()
+                return None
+            if path == self.latest_path(symbol, model_type):
+                self._resident[key] = (path, mtime, model_data)
+            return model_data
+
+    def put(self, symbol, model_type, path, model_data):
+        """Register an artefact this process just saved, so it is not unpickled again."""
+        with self._lock:
+            try:
+                self._resident[(symbol, model_type)] = (path, os.stat(path).st_mtime_ns, model_data)
+            except OSError:
+                return
+            self.invalidate()
+
+    def metadata(self, symbol, model_type="ensemble"):
+        path = self.latest_path(symbol, model_type)
+        if path is None:
+            return None
+        metadata_file = path.replace(".pkl", ".json")
+        with self._lock:
+            try:
+                mtime = os.stat(metadata_file).st_mtime_ns
+                cached = self._metadata.get(metadata_file)
+                if cached and cached[0] == mtime:
+                    return cached[1]
+                with open(metadata_file) as f:
+                    metadata = json.load(f)
+            except Exception as e:
+                logging.warning(f"Could not read model metadata for {symbol} ({model_type}): {e}")
+                return None
+            self._metadata[metadata_file] = (mtime, metadata)
+            return metadata
+
+
+MODEL_REGISTRY = ModelRegistry()
+
 def save_open_positions(
     open_positions, filename=f"open_positions_{PRIMARY_TIMEFRAME.lower()}.json"
 ):
@@ -17509,6 +21300,15 @@ class EnhancedTradingBot:
             
             self.auto_retrain_manager = AutoRetrainManager(self)  # Auto-retrain manager
             print(" [Bot Init] Auto Retrain Manager initialized")
+
+            self.training_scheduler = TrainingScheduler() if TRAINING_SCHEDULER_CONFIG.get("ENABLED", False) else None
+            self.training_pool = None           # Lazily started training worker processes
+            self._training_pool_lock = threading.Lock()
+            # In-process training (inline or scheduler fallback) replaces drift_monitor and
+            # mutates the model dicts; one trainer at a time
+            self._training_state_lock = threading.RLock()
+            self.model_updates = queue.Queue()  # (symbol, regime, model_file) from finished jobs
+            print(" [Bot Init] Training Scheduler initialized")
             
             self.api_monitor = APIMonitoringSystem()  # API monitoring system
             print(" [Bot Init] API Monitor initialized")
@@ -19259,7 +23059,8 @@ class EnhancedTradingBot:
 
             for attempt in range(MAX_RETRAIN_ATTEMPTS):
                 print(f"   -> ang training model {model_type} cho {symbol_to_train} l n {attempt + 1}/{MAX_RETRAIN_ATTEMPTS}...")
-                model_data_new = self.train_enhanced_model(symbol_to_train, df_filtered)
+                with self._training_state_lock:
+                    model_data_new = self.train_enhanced_model(symbol_to_train, df_filtered, regime=model_type)
 
                 if model_data_new and "ensemble" in model_data_new:
                     try:
@@ -19330,10 +23131,26 @@ class EnhancedTradingBot:
 
             # processing model Trending
             model_trending = load_latest_model(symbol, "ensemble_trending")
-            if is_forced or not model_trending:
+            retrain_trending = is_forced or not model_trending
+            df_trending = fingerprint_trending = None
+            if retrain_trending:
+                # Only a (possible) retrain needs the regime slice and its fingerprint
                 df_trending = df_full_for_symbol[df_full_for_symbol['market_regime'] != 0].copy()
+                fingerprint_trending = training_data_fingerprint(df_trending)
+            if is_forced and self._reuse_if_unchanged(symbol, model_trending, fingerprint_trending, "TRENDING"):
+                retrain_trending = False
+            elif is_forced and model_trending:
+                # Forced (stale-data) retrains first try to extend the existing boosters
+                updated = self._try_incremental_update(symbol, model_trending, df_trending, "TRENDING")
+                if updated is not None:
+                    model_trending, retrain_trending = updated, False
+            if retrain_trending and self._schedule_regime_training(
+                    symbol, "TRENDING", df_trending, fingerprint_trending, _train_and_evaluate, _check_quality_gates):
+                retrain_trending = False  # Trains in the background; the current model keeps serving meanwhile
+            if retrain_trending:
                 best_trending_model = _train_and_evaluate(symbol, df_trending, "TRENDING")
                 if _check_quality_gates(best_trending_model, symbol, "TRENDING"):
+                    best_trending_model["dataset_fingerprint"] = fingerprint_trending
                     self.trending_models[symbol] = best_trending_model
                     save_model_with_metadata(symbol, best_trending_model, "ensemble_trending")
                     is_symbol_active = True
@@ -19343,11 +23160,25 @@ class EnhancedTradingBot:
 
             # processing model Ranging
             model_ranging = load_latest_model(symbol, "ensemble_ranging")
-            if is_forced or not model_ranging:
+            retrain_ranging = is_forced or not model_ranging
+            df_ranging = fingerprint_ranging = None
+            if retrain_ranging:
                 df_ranging = df_full_for_symbol[df_full_for_symbol['market_regime'] == 0].copy()
+                fingerprint_ranging = training_data_fingerprint(df_ranging)
+            if is_forced and self._reuse_if_unchanged(symbol, model_ranging, fingerprint_ranging, "RANGING"):
+                retrain_ranging = False
+            elif is_forced and model_ranging:
+                updated = self._try_incremental_update(symbol, model_ranging, df_ranging, "RANGING")
+                if updated is not None:
+                    model_ranging, retrain_ranging = updated, False
+            if retrain_ranging and self._schedule_regime_training(
+                    symbol, "RANGING", df_ranging, fingerprint_ranging, _train_and_evaluate, _check_quality_gates):
+                retrain_ranging = False
+            if retrain_ranging:
                 logging.debug(f"Starting training RANGING for {symbol} with {len(df_ranging)} samples")
                 best_ranging_model = _train_and_evaluate(symbol, df_ranging, "RANGING")
                 if _check_quality_gates(best_ranging_model, symbol, "RANGING"):
+                    best_ranging_model["dataset_fingerprint"] = fingerprint_ranging
                     self.ranging_models[symbol] = best_ranging_model
                     save_model_with_metadata(symbol, best_ranging_model, "ensemble_ranging")
                     is_symbol_active = True
@@ -19549,14 +23380,155 @@ class EnhancedTradingBot:
                 logging.info(f"   [Final Test] Li nhu n trn t p test: {performance_test:.2f}%")
                 self.send_discord_alert(f"🎯 **New RL Training Results** 🎯\n- Profit on test set (unseen data): **{performance_test:.2f}%**")
                 # <<< K T THC KH I LOGIC training RL >>>
-    def train_enhanced_model(self, symbol, df_to_train): # <--- TFunction df_to_train
-        """This function now takefix pre-filtered DataFrame."""
-        print(f"Starting model training for {symbol}...")
-        df = df_to_train # <--- Using DataFrame dufromruy n vo
+    def _schedule_regime_training(self, symbol, model_type, df_regime, fingerprint, train_fn, gate_fn):
+        """
+        Queue training of one regime model on the training scheduler. The job trains (in a worker
+        process when PROCESS_WORKERS is on), applies the quality gates, saves the artefact and posts
+        it to `model_updates`; the live dicts are swapped in by _apply_model_updates between cycles.
+        False when no scheduler is running (train inline).
+        """
+        scheduler = getattr(self, "training_scheduler", None)
+        if scheduler is None:
+            return False
+        registry = self.trending_models if model_type == "TRENDING" else self.ranging_models
+        priority = (TRAINING_SCHEDULER_CONFIG["PRIORITY_REFRESH"] if symbol in registry
+                    else TRAINING_SCHEDULER_CONFIG["PRIORITY_NO_MODEL"])
 
-        if df is None or df.empty:
-            print(f"⚠️ No data available for training {symbol}.")
-            return None
+        def _job():
+            model_file = None
+            if TRAINING_SCHEDULER_CONFIG.get("PROCESS_WORKERS", False):
+                try:
+                    model_file = self._train_in_worker_process(symbol, model_type, df_regime, fingerprint)
+                except FuturesTimeoutError:
+                    # Already cancelled and its pool stopped; retraining in-process would stall even longer
+                    logging.error(f"[Training Scheduler] {symbol} {model_type} exceeded WORKER_TIMEOUT_SEC; job dropped")
+                    return
+                except (BrokenProcessPool, OSError, RuntimeError) as e:
+                    logging.warning(f"[Training Scheduler] Worker process unavailable ({e}); training {symbol} {model_type} in-process")
+                    with self._training_pool_lock:
+                        pool, self.training_pool = self.training_pool, None
+                    shutdown_executor(pool, TRAINING_SCHEDULER_CONFIG.get("SHUTDOWN_TIMEOUT_SEC", 60))
+                else:
+                    if model_file:
+                        self.model_updates.put((symbol, model_type, model_file))
+                    return
+            # train_fn -> train_enhanced_model swaps drift_monitor; gate_fn reads the result
+            with self._training_state_lock:
+                best_model = train_fn(symbol, df_regime, model_type)
+                if not gate_fn(best_model, symbol, model_type):
+                    return
+            best_model["dataset_fingerprint"] = fingerprint
+            model_file = save_model_with_metadata(symbol, best_model, f"ensemble_{model_type.lower()}")
+            if model_file:
+                self.model_updates.put((symbol, model_type, model_file))
+
+        if not scheduler.submit(symbol, model_type, _job, priority=priority):
+            print(f"   [Training Scheduler] {symbol} {model_type} already queued or training")
+        return True
+
+    def _train_in_worker_process(self, symbol, model_type, df_regime, fingerprint):
+        """Prepare labels here (news manager lives in this process), train in the pool; returns the saved file."""
+        with self._training_pool_lock:
+            if self.training_pool is None:
+                cfg = TRAINING_SCHEDULER_CONFIG
+                self.training_pool = ProcessPoolExecutor(
+                    max_workers=cfg.get("MAX_WORKERS", 2),
+                    mp_context=mp.get_context(cfg.get("START_METHOD", "spawn")),
+                    max_tasks_per_child=cfg.get("MAX_TASKS_PER_CHILD"))
+            pool = self.training_pool
+        df, target_col = self._prepare_training_frame(symbol, df_regime.copy())
+        scratch = tempfile.mkdtemp(prefix="bot_train_", dir=FEATURE_POOL_CONFIG.get("SCRATCH_DIR"))
+        try:
+            data_path = os.path.join(scratch, f"{symbol}_{model_type}.joblib")
+            joblib.dump(df, data_path)
+            future = pool.submit(_regime_training_worker, {
+                "symbol": symbol, "regime": model_type, "data_path": data_path,
+                "target_col": target_col, "fingerprint": fingerprint,
+            })
+            try:
+                result = future.result(timeout=TRAINING_SCHEDULER_CONFIG.get("WORKER_TIMEOUT_SEC"))
+            except FuturesTimeoutError:
+                # A running task cannot be cancelled: stop this pool so its worker is terminated
+                future.cancel()
+                with self._training_pool_lock:
+                    if self.training_pool is pool:
+                        self.training_pool = None
+                shutdown_executor(pool, timeout=0)
+                raise
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        if not result["model_file"]:
+            quality = result.get("quality")
+            print(f"  ⚠️ [Training Scheduler] {symbol} {model_type} did not pass quality gates"
+                  + (f" (F1:{quality[0]:.3f}, STD:{quality[1]:.3f}, Accuracy:{quality[2]:.3f})" if quality else ""))
+        return result["model_file"]
+
+    def shutdown_worker_pools(self):
+        """Bot stop path: stop the feature-stage and training worker processes with a bounded wait."""
+        feature_stage = getattr(getattr(self, "data_manager", None), "feature_stage", None)
+        if feature_stage is not None:
+            feature_stage.shutdown(timeout=FEATURE_POOL_CONFIG.get("SHUTDOWN_TIMEOUT_SEC", 30))
+            print("🔄 [Feature Pool] Worker processes stopped")
+        if getattr(self, "training_scheduler", None) is not None:
+            self.training_scheduler.shutdown(wait=False)
+        if getattr(self, "training_pool", None) is not None:
+            with self._training_pool_lock:
+                pool, self.training_pool = self.training_pool, None
+            if not shutdown_executor(pool, TRAINING_SCHEDULER_CONFIG.get("SHUTDOWN_TIMEOUT_SEC", 60)):
+                logging.warning("[Training Scheduler] Training workers did not finish in time and were terminated")
+            print("🔄 [Training Scheduler] Worker processes stopped")
+
+    def _apply_model_updates(self):
+        """
+        Install models finished by background training. New dicts are built and rebound in one
+        step, so readers always see either the old or the new complete mapping.
+        """
+        updates = []
+        while True:
+            try:
+                updates.append(self.model_updates.get_nowait())
+            except (queue.Empty, AttributeError):
+                break
+        if not updates:
+            return 0
+
+        trending, ranging = dict(self.trending_models), dict(self.ranging_models)
+        applied = []
+        for symbol, model_type, model_file in updates:
+            # Exactly the announced artefact: a newer or other-regime file must not be swapped in
+            regime_type = f"ensemble_{model_type.lower()}"
+            if not model_file_matches(model_file, symbol, regime_type):
+                logging.error(f"[Model Swap] {model_file} is not a {regime_type} model for {symbol}; skipped")
+                continue
+            model_data = load_model_file(model_file, symbol, regime_type)
+            if model_data is None:
+                logging.error(f"[Model Swap] Could not load {model_file}")
+                continue
+            (trending if model_type == "TRENDING" else ranging)[symbol] = model_data
+            applied.append(f"{symbol} {model_type}")
+        self.trending_models, self.ranging_models = trending, ranging
+        for symbol, _, _ in updates:
+            if symbol in trending or symbol in ranging:
+                self.active_symbols.add(symbol)
+        if applied:
+            print(f"🔁 [Model Swap] Installed {len(applied)} retrained model(s): {', '.join(applied)}")
+        return len(applied)
+
+    def _reuse_if_unchanged(self, symbol, model_data, fingerprint, model_type):
+        """True when the saved `model_type` model was trained on a frame with this fingerprint."""
+        if not TRAINING_FINGERPRINT_CONFIG.get("ENABLED", False) or not model_data or not fingerprint:
+            return False
+        metadata = load_latest_model_metadata(symbol, f"ensemble_{model_type.lower()}") or {}
+        saved = metadata.get("dataset_fingerprint") or model_data.get("dataset_fingerprint") or {}
+        if saved.get("hash") != fingerprint["hash"]:
+            return False
+        print(f"   [Fingerprint] {symbol} {model_type}: training data unchanged since "
+              f"{metadata.get('timestamp', 'last save')} ({fingerprint['candles']['rows']} bars "
+              f"to {fingerprint['candles']['end']}) -> reusing saved model")
+        return True
+
+    def _prepare_training_frame(self, symbol, df):
+        """News/economic features and labels for training; returns (df, target_col)."""
         # --- BU C C I money: TFunction FEATURE KINH TV NEWS SENTIMENT ---
         # Luu : Vi fromFunction sentiment l ch syu c u ngu n data trph.
         # duc chng ta t p trung vo data l ch kinh tc s n.
@@ -19572,240 +23544,251 @@ class EnhancedTradingBot:
                 int
             )
 
-        # Pipeline clean data original as old
-        df.replace([np.inf, -np.inf], np.nan, inplace=True)
-        df.dropna(subset=["label_3"], inplace=True)
+        target_col = "label_3"
+        if TRIPLE_BARRIER_CONFIG.get("USE_AS_TARGET", False):
+            df = add_triple_barrier_labels(df, symbol)
+            target_col = TRIPLE_BARRIER_CONFIG.get("TARGET_COLUMN", "label_tb")
+            print(f"   [Labels] Triple-barrier target '{target_col}' for {symbol}: "
+                  f"{df[target_col].mean():.1%} TP-first of {df[target_col].notna().sum()} labelled bars")
+        return df, target_col
 
-        feature_cols = [col for col in df.columns if not col.startswith("label")]
-        X = df[feature_cols].copy()
-        y = df["label_3"].copy()
-
-        X.fillna(method="ffill", inplace=True)
-        X.fillna(method="bfill", inplace=True)
+    def _try_incremental_update(self, symbol, model_data, df_regime, model_type, force_full=False):
+        """
+        Extend the boosting members of `model_data` with the bars that arrived since it was fit.
+        Returns the model_data to use (updated and saved, or unchanged when too few bars are new),
+        or None when the policy or the validation gate calls for a full retrain.
+        """
+        cfg = INCREMENTAL_TRAINING_CONFIG
+        ensemble = (model_data or {}).get("ensemble")
+        feature_columns = (model_data or {}).get("feature_columns")
+        trained_until = getattr(ensemble, "trained_until", None)
+        tag = f"[Incremental] {symbol} {model_type}"
 
-        cols_to_drop = X.columns[X.isna().all()].tolist()
-        if cols_to_drop:
-            X.drop(columns=cols_to_drop, inplace=True)
-            feature_cols = [col for col in feature_cols if col not in cols_to_drop]
-
-        y = y.reindex(X.index)
-        all_data = pd.concat([X, y], axis=1)
-        all_data.dropna(inplace=True)
-        X = all_data[feature_cols]
-        y = all_data["label_3"]
-
-        # Enhanced minimum samples check
-        min_samples = ML_CONFIG.get("MIN_SAMPLES_FOR_TRAINING", 300)
-        if len(X) < min_samples:
-            print(
-                f"not ddata s ch cho {symbol}: chc {len(X)} records (yu c u {min_samples})."
-            )
+        if not cfg.get("ENABLED", False) or force_full or df_regime is None or df_regime.empty:
             return None
-
-        # ... (code type btuong quan, ch n feature, training ensemble)
-        print(
-            f" l+m sߦch data, cn l i {len(X)} records dtraining cho {symbol}."
-        )
-
-        # Enhancedorrelation removal with stricter threshold
-        correlation_threshold = ML_CONFIG.get("MAX_CORRELATION_THRESHOLD", 0.90)
-
-        # processing all from not must numerifromruc khi tnh correlation
-        numeric_columns = X.select_dtypes(include=[np.number]).columns
-        X_numeric = X[numeric_columns]
-
-        # Check v processing all from categorical
-        categorical_columns = X.select_dtypes(include=['object', 'category']).columns
-        if len(categorical_columns) > 0:
-            print(f"   [Warning] Detected {len(categorical_columns)} categorical columns: {list(categorical_columns)}")
-            print(f"   [Info] Only using {len(numeric_columns)} numeric columns for correlation calculation")
-
-        # Chtnh correlation trn all from numeric
-        if len(X_numeric.columns) > 1:
-            correlation_matrix = X_numeric.corr().abs()
-            upper_triangle = correlation_matrix.where(
-                np.triu(np.ones(correlation_matrix.shape), k=1).astype(bool)
-            )
-            high_corr_features = [
-                column
-                for column in upper_triangle.columns
-                if any(upper_triangle[column] > correlation_threshold)
-            ]
-
-            # type ball features c correlation cao tX_numeric
-            X_numeric = X_numeric.drop(columns=high_corr_features)
-
-            # Update X with all filtered numeric features
-            X = pd.concat([X_numeric, X[categorical_columns]], axis=1)
-        else:
-            print(f"   [Warning] not dfrom numerihas datatnh correlation cho {symbol}")
-            X = X_numeric if len(X_numeric.columns) > 0 else X
-
-        # Enhanced feature selection with multiple algoritFunctions
-        # ChUsing all from numeric cho feature selection
-        X_for_selection = X.select_dtypes(include=[np.number])
-
-        if len(X_for_selection.columns) == 0:
-            print(f"⚠️ No numeric columns available for feature selection for {symbol}")
+        if ensemble is None or trained_until is None or not feature_columns or not ensemble.boosting_members():
+            print(f"   {tag}: no incremental state on the saved model -> full retrain")
+            return None
+        if getattr(ensemble, "incremental_updates", 0) >= cfg.get("FULL_RETRAIN_EVERY", 5):
+            print(f"   {tag}: {ensemble.incremental_updates} increments since the last full train -> full retrain")
             return None
 
-        rf_temp = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
-            random_state=42,
-            n_jobs=-1
-        )
-        rf_temp.fit(X_for_selection, y)
-
-        # Get feature importance from Random Forest
-        rf_importance = pd.DataFrame({
-            "feature": X_for_selection.columns,
-            "rf_importance": rf_temp.feature_importances_
-        })
-
-        # Also get feature importance from XGBoost for comparison
         try:
-            xgb_temp = xgb.XGBClassifier(
-                n_estimators=50,
-                max_depth=6,
-                random_state=42,
-                n_jobs=-1
-            )
-            xgb_temp.fit(X_for_selection, y)
-            xgb_importance = pd.DataFrame({
-                "feature": X_for_selection.columns,
-                "xgb_importance": xgb_temp.feature_importances_
-            })
+            df, target_col = self._prepare_training_frame(symbol, df_regime[df_regime.index > trained_until].copy())
+            # The last bars have no realised label yet
+            horizon = int(target_col.split("_")[-1]) if target_col.split("_")[-1].isdigit() else TRIPLE_BARRIER_CONFIG.get("HORIZON_BARS", 24)
+            df = df.iloc[:-horizon] if len(df) > horizon else df.iloc[:0]
+            df = df.replace([np.inf, -np.inf], np.nan).dropna(subset=[target_col])
+        except Exception as e:
+            print(f"   {tag}: could not prepare new bars ({e}) -> full retrain")
+            return None
 
-            # Combine importances
-            feature_importance = rf_importance.merge(xgb_importance, on="feature")
-            feature_importance["combined_importance"] = (
-                feature_importance["rf_importance"] * 0.6 +
-                feature_importance["xgb_importance"] * 0.4
-            )
-        except:
-            feature_importance = rf_importance
-            feature_importance["combined_importance"] = feature_importance["rf_importance"]
+        if len(df) < cfg.get("MIN_NEW_BARS", 24):
+            print(f"   {tag}: only {len(df)} new labelled bars, keeping the current model")
+            return model_data
+        if len(df) > cfg.get("MAX_NEW_BARS", 2000):
+            print(f"   {tag}: {len(df)} new bars since the last fit -> full retrain")
+            return None
 
-        # Filter by minimumimportance threshold
-        min_importance = ML_CONFIG.get("FEATURE_IMPORTANCE_THRESHOLD", 0.01)
-        feature_importance = feature_importance[
-            feature_importance["combined_importance"] >= min_importance
-        ]
+        X_new = df.reindex(columns=feature_columns).ffill().bfill().fillna(0.0)
+        y_new = df[target_col].astype(int)
 
-        # Select top features
-        top_features = feature_importance.nlargest(
-            ML_CONFIG["FEATURE_SELECTION_TOP_K"],
-            "combined_importance"
-        )["feature"].tolist()
+        reference = df_regime[df_regime.index <= trained_until].tail(int(cfg.get("DRIFT_REFERENCE_BARS", 2000)))
+        numeric = [c for c in feature_columns if c in reference.columns and pd.api.types.is_numeric_dtype(reference[c])]
+        if numeric:
+            drifted = [c for c in numeric
+                       if population_stability_index(reference[c], X_new[c]) >= cfg.get("DRIFT_PSI_THRESHOLD", 0.25)]
+            if len(drifted) / len(numeric) > cfg.get("MAX_DRIFTED_FEATURE_SHARE", 0.3):
+                print(f"   {tag}: drift in {len(drifted)}/{len(numeric)} features -> full retrain")
+                return None
 
-        # TFunction encoded features vo top_features (categorical g c has d type b )
-        encoded_cols = [col for col in X.columns if col.endswith('_encoded') or
-                       col.startswith('asset_class_') or col.startswith('volatility_profile_') or
-                       col.startswith('volatility_regime_') or col.startswith('prefers_') or
-                       col.startswith('asset_') or col.endswith('_interaction')]
+        started = time.time()
+        report = ensemble.incremental_update(X_new, y_new)
+        if not report["accepted"]:
+            print(f"   {tag}: rejected ({report['reason']}) -> full retrain")
+            return None
 
-        # TFunction encoded features
-        top_features.extend(encoded_cols)
+        print(f"   {tag}: +{INCREMENTAL_TRAINING_CONFIG['EXTRA_ROUNDS']} rounds on {report['new_bars']} bars for "
+              f"{report['updated_members']} in {time.time() - started:.1f}s "
+              f"(log-loss {report['logloss_before']:.4f} -> {report['logloss_after']:.4f}, "
+              f"increment {ensemble.incremental_updates}/{cfg.get('FULL_RETRAIN_EVERY', 5)})")
+        model_data["dataset_fingerprint"] = training_data_fingerprint(df_regime)
+        save_model_with_metadata(symbol, model_data, f"ensemble_{model_type.lower()}")
+        return model_data
 
-        # Check if v n cn categorical columns (not nn c)
-        remaining_categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
-        if len(remaining_categorical_cols) > 0:
-            print(f"   [Warning] V n cn {len(remaining_categorical_cols)} from categorical: {list(remaining_categorical_cols)}")
-            top_features.extend(remaining_categorical_cols)
+    def incremental_retrain_symbol(self, symbol, df_features, force_full=False):
+        """
+        Incremental update of both regime models of `symbol`. True when no full retrain is
+        needed (updated or nothing new), False when at least one regime needs it.
+        """
+        if df_features is None or df_features.empty or "market_regime" not in df_features.columns:
+            return False
+        regimes = (("TRENDING", self.trending_models, df_features["market_regime"] != 0),
+                   ("RANGING", self.ranging_models, df_features["market_regime"] == 0))
+        handled = True
+        for model_type, registry, mask in regimes:
+            model_data = registry.get(symbol) or load_latest_model(symbol, f"ensemble_{model_type.lower()}")
+            updated = self._try_incremental_update(symbol, model_data, df_features[mask], model_type, force_full=force_full)
+            if updated is None:
+                handled = False
+            else:
+                registry[symbol] = updated
+        return handled
 
-        # type bduplicates v d m b o features t n t i
-        top_features = list(dict.fromkeys([f for f in top_features if f in X.columns]))
+    def train_enhanced_model(self, symbol, df_to_train, regime=None): # <--- TFunction df_to_train
+        """This function now takefix pre-filtered DataFrame."""
+        print(f"Starting model training for {symbol}...")
+        df = df_to_train # <--- Using DataFrame dufromruy n vo
 
-        X_selected = X[top_features]
+        if df is None or df.empty:
+            print(f"⚠️ No data available for training {symbol}.")
+            return None
+        df, target_col = self._prepare_training_frame(symbol, df)
 
-        logging.info(f" Training with {len(top_features)} best features for {symbol}")
-        ensemble = EnsembleModel()
-        ensemble.train_ensemble(X_selected, y)  # Function this sdnng c p bu c 2
+        model_data, X_selected = fit_ensemble_on_frame(symbol, df, target_col, regime=regime)
+        if model_data is None:
+            return None
         print("   [Drift] Khởi tạo DriftMonitor with data thalevelhi u mới...")
         self.drift_monitor = DriftMonitor(X_selected)
-        model_data = {"ensemble": ensemble, "feature_columns": top_features}
         return model_data
 
     # This ifix helper function, no changes needed
-    def get_enhanced_signal(self, symbol, for_open_position_check=False, df_features=None):
+    def _inference_rows_needed(self, symbol):
+        """Feature rows either regime model of `symbol` needs for one live prediction."""
+        rows = 1
+        for models in (self.trending_models, self.ranging_models):
+            model_data = models.get(symbol) or {}
+            rows = max(rows, sequence_rows_needed(model_data.get("ensemble")))
+        return rows
+
+    def _inference_rows_by_symbol(self, symbols):
+        return {symbol: self._inference_rows_needed(symbol) for symbol in symbols}
+
+    def _prepare_signal_inputs(self, symbol, df_features=None):
         """
-        Lấy tín hiệu và độ tin cậy from model Ensemble suitable with tempty thi thường.
-        REFACTORED: receive df_features tcache dtrnh fetch data nhiều lần.
+        Steps 1-3 of get_enhanced_signal: pick the regime model for the latest bar, clean the
+        features and order them for that model. Returns (model, X_ordered) or None.
         """
-        try:
-            # --- BU C 1: L Y data V XC  NH Tempty THI THTRU NG ---
-            if df_features is None:
-                # Fallback: fetch data if not c cache
-                df_features = self.data_manager.create_enhanced_features(symbol)
-                if df_features is None or len(df_features) < 100:
-                    logging.warning(f"get_enhanced_signal: not ddata danalysis {symbol}")
-                    return None, 0.0, None
-            else:
-                # Using data tcache
-                if len(df_features) < 100:
-                    logging.warning(f"get_enhanced_signal: data tcache not ddanalysis {symbol}")
-                    return None, 0.0, None
+        # --- BU C 1: L Y data V XC  NH Tempty THI THTRU NG ---
+        if df_features is None:
+            # Fallback: only the latest feature vector is needed for a live signal
+            # (a sequence member needs its whole window)
+            df_features = self.data_manager.create_enhanced_features(
+                symbol, mode="inference", rows=self._inference_rows_needed(symbol))
+            if df_features is None or df_features.empty:
+                logging.warning(f"get_enhanced_signal: not ddata danalysis {symbol}")
+                return None
+        else:
+            # Using data tcache
+            min_rows = 1 if df_features.attrs.get("feature_mode") == "inference" else 100
+            if len(df_features) < min_rows:
+                logging.warning(f"get_enhanced_signal: data tcache not ddanalysis {symbol}")
+                return None
+        is_inference_frame = df_features.attrs.get("feature_mode") == "inference"
 
-            current_regime = df_features['market_regime'].iloc[-1]
+        current_regime = df_features['market_regime'].iloc[-1]
 
-            # --- BU C 2: CH N NG MODEL D A TRN Tempty THI ---
-            if current_regime != 0:  # Th trung c xu hung
-                model_data = self.trending_models.get(symbol)
-            else:  # Th trung di ngang
-                model_data = self.ranging_models.get(symbol)
+        # --- BU C 2: CH N NG MODEL D A TRN Tempty THI ---
+        if current_regime != 0:  # Th trung c xu hung
+            model_data = self.trending_models.get(symbol)
+        else:  # Th trung di ngang
+            model_data = self.ranging_models.get(symbol)
 
-            # --- BU C 3: Check MODEL V TI P T C LOGIC ---
-            if model_data is None:
-                logging.warning(f"get_enhanced_signal: No suitable model found for {symbol} (Regime: {current_regime})")
-                return None, 0.0, None
+        # --- BU C 3: Check MODEL V TI P T C LOGIC ---
+        if model_data is None:
+            logging.warning(f"get_enhanced_signal: No suitable model found for {symbol} (Regime: {current_regime})")
+            return None
 
-            model = model_data.get("ensemble")
-            feature_columns = model_data.get("feature_columns")
+        model = model_data.get("ensemble")
+        feature_columns = model_data.get("feature_columns")
 
-            if not model or not feature_columns:
-                logging.warning(f"get_enhanced_signal: Model Or feature_columns not hợp lệ cho {symbol}")
-                return None, 0.0, None
+        if not model or not feature_columns:
+            logging.warning(f"get_enhanced_signal: Model Or feature_columns not hợp lệ cho {symbol}")
+            return None
 
-            # Pipeline clean data more (original logic old of b n)
-            df_features.replace([np.inf, -np.inf], np.nan, inplace=True)
-            df_features.fillna(method="ffill", inplace=True)
-            df_features.fillna(method="bfill", inplace=True)
-            cols_to_drop = df_features.columns[df_features.isna().all()].tolist()
-            if cols_to_drop:
-                df_features.drop(columns=cols_to_drop, inplace=True)
-            df_features.dropna(inplace=True)
-
-            if len(df_features) < 10:
-                logging.warning(f"get_enhanced_signal: data dufromrung qu t sau khi l+m sߦch {symbol} ({len(df_features)} used)")
-                return None, 0.0, None
+        # Pipeline clean data more (original logic old of b n)
+        df_features.replace([np.inf, -np.inf], np.nan, inplace=True)
+        df_features.fillna(method="ffill", inplace=True)
+        df_features.fillna(method="bfill", inplace=True)
+        cols_to_drop = df_features.columns[df_features.isna().all()].tolist()
+        if cols_to_drop:
+            df_features.drop(columns=cols_to_drop, inplace=True)
+        df_features.dropna(inplace=True)
+
+        if len(df_features) < (1 if is_inference_frame else 10):
+            logging.warning(f"get_enhanced_signal: data dufromrung qu t sau khi l+m sߦch {symbol} ({len(df_features)} used)")
+            return None
 
-            #  m b o all from features of model must t n t i in df_features
-            available_columns = [col for col in feature_columns if col in df_features.columns]
-            X = df_features[available_columns]
+        #  m b o all from features of model must t n t i in df_features
+        available_columns = [col for col in feature_columns if col in df_features.columns]
+        X = df_features[available_columns]
 
-            # KH C PH C L I:  m b o feature ordering nh t qun
-            X_ordered = pd.DataFrame(index=X.index)
-            for col in feature_columns:
-                if col in X.columns:
-                    X_ordered[col] = X[col]
+        # KH C PH C L I:  m b o feature ordering nh t qun
+        for col in feature_columns:
+            if col not in X.columns:
+                logging.warning(f"get_enhanced_signal: Missing feature '{col}' for {symbol}, using default value 0.0")
+        X_ordered = X.reindex(columns=feature_columns, fill_value=0.0)
+
+        #  m b o not needsaN values
+        X_ordered = X_ordered.fillna(0.0)
+
+        return model, X_ordered
+
+    def score_signals_batch(self, live_data_cache):
+        """
+        Batch scoring for the live loop: symbols whose latest bar maps to the same ensemble
+        object are stacked and scored with one predict_proba call per base model.
+        Returns {symbol: prob_buy} for every symbol that could be scored.
+        """
+        groups = {}
+        for symbol, df_features in live_data_cache.items():
+            try:
+                prepared = self._prepare_signal_inputs(symbol, df_features)
+            except Exception as e:
+                logging.error(f"score_signals_batch: could not prepare {symbol} - {e}")
+                continue
+            if prepared is None:
+                continue
+            model, X_ordered = prepared
+            groups.setdefault(id(model), (model, {}))[1][symbol] = X_ordered
+
+        probabilities = {}
+        for model, frames in groups.values():
+            try:
+                if hasattr(model, "predict_proba_batch"):
+                    probabilities.update(model.predict_proba_batch(frames))
                 else:
-                    X_ordered[col] = 0.0
-                    logging.warning(f"get_enhanced_signal: Missing feature '{col}' for {symbol}, using default value 0.0")
+                    for symbol, X_ordered in frames.items():
+                        probabilities[symbol] = model.predict_proba(X_ordered)
+            except Exception as e:
+                logging.error(f"score_signals_batch: batch of {len(frames)} symbols failed - {e}")
+        if probabilities:
+            print(f"   [Batch Scoring] {len(probabilities)} symbols scored in {len(groups)} model batches")
+        return probabilities
 
-            #  m b o not needsaN values
-            X_ordered = X_ordered.fillna(0.0)
+    def get_enhanced_signal(self, symbol, for_open_position_check=False, df_features=None, prob_buy=None):
+        """
+        Lấy tín hiệu và độ tin cậy from model Ensemble suitable with tempty thi thường.
+        REFACTORED: receive df_features tcache dtrnh fetch data nhiều lần.
+        prob_buy: probability already computed by score_signals_batch (skips model scoring).
+        """
+        try:
+            if prob_buy is None:
+                prepared = self._prepare_signal_inputs(symbol, df_features)
+                if prepared is None:
+                    return None, 0.0, None
+                model, X_ordered = prepared
 
             # Equal with model
             try:
-                # Check if model l EnsembleModel
-                if hasattr(model, 'predict_proba') and hasattr(model, 'models'):
-                    # EnsembleModel chreceive 1 tham s 
-                    prob_buy = model.predict_proba(X_ordered)
-                else:
-                    # Model thng thu ng
-                    prob_buy = model.predict_proba(X_ordered)
+                if prob_buy is None:
+                    # Check if model l EnsembleModel
+                    if hasattr(model, 'predict_proba') and hasattr(model, 'models'):
+                        # EnsembleModel chreceive 1 tham s 
+                        prob_buy = model.predict_proba(X_ordered)
+                    else:
+                        # Model thng thu ng
+                        prob_buy = model.predict_proba(X_ordered)
                 
                 if prob_buy is None:
                     logging.warning(f"get_enhanced_signal: Model trߦ v+ None cho {symbol}")
@@ -19896,34 +23879,30 @@ class EnhancedTradingBot:
             print(f"   [Data Cache] Fetching data for {len(self.active_symbols)} symbols...")
             print(f"   [Data Cache] Active symbols: {list(self.active_symbols)}")
             
-            # T i uu ha: Fetch song song thay v tu n t 
-            async def fetch_symbol_data(symbol):
+            # Only symbols missing from the cache are rebuilt; CPU-bound feature work goes
+            # through the data manager's process-pool stage off the event loop.
+            symbols_to_fetch = [symbol for symbol in self.active_symbols if symbol not in live_data_cache]
+            if symbols_to_fetch:
+                loop = asyncio.get_running_loop()
                 try:
-                    df_features = self.data_manager.create_enhanced_features(symbol)
-                    if df_features is not None and len(df_features) >= 100:
+                    features_by_symbol = await loop.run_in_executor(
+                        None, functools.partial(self.data_manager.create_enhanced_features_batch, symbols_to_fetch,
+                                                "inference", rows=self._inference_rows_by_symbol(symbols_to_fetch))
+                    )
+                except Exception as e:
+                    print(f"   [Data Cache] Li fetch data - {e}")
+                    features_by_symbol = {}
+
+                for symbol in symbols_to_fetch:
+                    df_features = features_by_symbol.get(symbol)
+                    if df_features is not None and not df_features.empty:
                         print(f"   [Data Cache] {symbol}: {len(df_features)} candles")
-                        return symbol, df_features
+                        live_data_cache[symbol] = df_features
                     else:
                         print(f"   [Data Cache]  {symbol}: data khng d ({len(df_features) if df_features is not None else 0} candles)")
-                        return symbol, None
-                except Exception as e:
-                    print(f"   [Data Cache] {symbol}: Li fetch data - {e}")
-                    return symbol, None
-            
-            # Fetch song song t t csymbols
-            tasks = [fetch_symbol_data(symbol) for symbol in self.active_symbols]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for result in results:
-                if isinstance(result, Exception):
-                    print(f"   [Data Cache]  Exception in fetch: {result}")
-                    continue
-                symbol, df_features = result
-                if df_features is not None:
-                    live_data_cache[symbol] = df_features
             else:
                 print(f"   [Data Cache] Using cached data cho {len(live_data_cache)} symbols")
-            
+
             if not live_data_cache:
                 print("   [Ensemble Strategy] ⚠️ No valid data available for analysis")
                 return
@@ -19932,11 +23911,16 @@ class EnhancedTradingBot:
             print(f"   [Ensemble Strategy] Starting analysis for {len(live_data_cache)} symbols...")
             print(f"   [Ensemble Strategy] Symbols with data: {list(live_data_cache.keys())}")
             print(f"   [Ensemble Strategy] Active symbols: {list(self.active_symbols)}")
+
+            # Score every symbol up front: one predict_proba per base model and shared ensemble
+            batch_probabilities = self.score_signals_batch(live_data_cache)
             
             for symbol, df_features in live_data_cache.items():
                 try:
                     # L y T+n hi+u tEnsemble model
-                    signal, confidence, proba_array = self.get_enhanced_signal(symbol, df_features=df_features)
+                    signal, confidence, proba_array = self.get_enhanced_signal(
+                        symbol, df_features=df_features, prob_buy=batch_probabilities.get(symbol)
+                    )
                     
                     if signal and confidence > ML_CONFIG["MIN_CONFIDENCE_TRADE"]:
                         print(f"   [Ensemble Strategy]  {symbol}: {signal} (Confidence: {confidence:.2%})")
@@ -23270,6 +27254,8 @@ class EnhancedTradingBot:
 
     async def _execute_bot_cycle(self, is_first_run):
         """Execute one complete bot cycle"""
+        FEATURE_PROFILER.begin_cycle()
+
         # 1. System health checks
         await self._perform_system_health_checks()
         
@@ -23297,6 +27283,9 @@ class EnhancedTradingBot:
         # 7. Portfolio summary
         self._display_portfolio_summary()
 
+        # 8. Feature generation cost report (no-op unless FEATURE_PROFILING_CONFIG["ENABLED"])
+        FEATURE_PROFILER.end_cycle()
+
     async def _perform_system_health_checks(self):
         """Perform system health checks"""
         # Check for scheduled retraining
@@ -23337,6 +27326,9 @@ class EnhancedTradingBot:
 
     async def _handle_model_management(self):
         """Handle model loading and training"""
+        # Swap in models finished by background training since the last cycle
+        self._apply_model_updates()
+
         # Load or train models
         self.load_or_train_models()
 
@@ -23346,8 +27338,9 @@ class EnhancedTradingBot:
             print(" [Performance Check] Performing periodic performance check...")
             self.check_and_adjust_performance()
 
-        # Circuit breaker logic
-        if not self.active_symbols:
+        # Circuit breaker logic (no active symbols while models are still training is not a data failure)
+        scheduler = getattr(self, "training_scheduler", None)
+        if not self.active_symbols and not (scheduler and scheduler.has_pending()):
             self.consecutive_data_failures += 1
             if self.consecutive_data_failures >= 3:
                 print(" Circuit breaker activated - too many data failures")
@@ -23365,23 +27358,26 @@ class EnhancedTradingBot:
         
         if all_symbols:
             print(f" [Data Cache] ang fetch data cho {len(all_symbols)} symbols...")
+            # Live scoring only needs the latest rows (a sequence member needs its whole window);
+            # full-history training frames are built by the retraining path only
+            symbols = sorted(all_symbols)
+            features_by_symbol = self.data_manager.create_enhanced_features_batch(
+                symbols, "inference", rows=self._inference_rows_by_symbol(symbols))
             for symbol in all_symbols:
-                try:
-                    print(f"   [Debug] Fetching data for {symbol}...")
-                    df_features = self.data_manager.create_enhanced_features(symbol)
-                    
-                    # Enhanced debug logging
-                    if df_features is not None:
-                        print(f"   [Debug] {symbol} data fetch result: SUCCESS, length: {len(df_features)}")
-                        if len(df_features) >= 20:  # Reduced threshold from 50 to 20
-                            live_data_cache[symbol] = df_features
-                            print(f"   [Data Cache] {symbol}: {len(df_features)} candles")
-                        else:
-                            print(f"   [Data Cache] {symbol}: data insufficient ({len(df_features)} < 20 candles)")
-                            # Add fallback data for testing
-                            self.logging.error(f"[Data Safety] CRITICAL - Skipping symbol due to data failure. No dummy data will be created.")
+                df_features = features_by_symbol.get(symbol)
+
+                # Enhanced debug logging
+                if df_features is not None:
+                    print(f"   [Debug] {symbol} data fetch result: SUCCESS, length: {len(df_features)}")
+                    if not df_features.empty:
+                        live_data_cache[symbol] = df_features
+                        print(f"   [Data Cache] {symbol}: {len(df_features)} candles")
+                    else:
+                        print(f"   [Data Cache] {symbol}: data insufficient (no feature rows)")
+                        logging.error(f"[Data Safety] CRITICAL - Skipping symbol due to data failure. No dummy data will be created.")
+                else:
                     print(f"   [Data Safety] CRITICAL - Data unavailable. Symbol completely disabled.")
-                    continue
+
         # EMERGENCY STOP: Check if too many symbols failed
         symbols_with_data = len([s for s in all_symbols if s in live_data_cache])
         symbols_failed = len(all_symbols) - symbols_with_data
@@ -24946,6 +28942,113 @@ def calculate_rsi_divergence_vectorized(df, window=14, lookback=60):
             df.loc[df_slice.index[price_troughs_idx[-1]], 'bullish_divergence'] = 1
 
     return df
+
+def triple_barrier_labels(high, low, close, atr, tp_mult, sl_mult, horizon,
+                          tie_break="sl", chunk_rows=20000):
+    """
+    Vectorized triple-barrier labelling for a long position opened at each bar's close.
+    Upper barrier = close + tp_mult*ATR, lower = close - sl_mult*ATR, vertical = `horizon` bars.
+
+    Forward windows come from a strided view (no copies), and the first touch per
+    row is an argmax over the (rows x horizon) hit matrix, processed in chunks.
+
+    Returns (side, bars, ret) float arrays:
+      side: 1 = TP first, -1 = SL first, 0 = time barrier, NaN = unknown (short tail / bad ATR)
+      bars: bars until the barrier that closed the trade
+      ret:  return at that barrier
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    atr = np.asarray(atr, dtype=np.float64)
+    n = len(close)
+    horizon = int(horizon)
+
+    side = np.full(n, np.nan)
+    bars = np.full(n, np.nan)
+    ret = np.full(n, np.nan)
+    if n < 2 or horizon < 1:
+        return side, bars, ret
+
+    upper = close + tp_mult * atr
+    lower = close - sl_mult * atr
+
+    # Row i of the windows holds bars i+1 .. i+horizon (NaN past the end)
+    pad = np.full(horizon, np.nan)
+    future_high = np.lib.stride_tricks.sliding_window_view(np.concatenate([high[1:], pad]), horizon)[:n]
+    future_low = np.lib.stride_tricks.sliding_window_view(np.concatenate([low[1:], pad]), horizon)[:n]
+    future_close = np.concatenate([close[horizon:], np.full(horizon, np.nan)])
+
+    valid = np.isfinite(atr) & (atr > 0) & np.isfinite(close)
+    complete = np.arange(n) + horizon <= n - 1
+
+    for start in range(0, n, max(1, int(chunk_rows))):
+        stop = min(n, start + max(1, int(chunk_rows)))
+        with np.errstate(invalid="ignore"):
+            hit_up = future_high[start:stop] >= upper[start:stop, None]
+            hit_down = future_low[start:stop] <= lower[start:stop, None]
+        first_up = np.where(hit_up.any(axis=1), hit_up.argmax(axis=1), horizon)
+        first_down = np.where(hit_down.any(axis=1), hit_down.argmax(axis=1), horizon)
+
+        up_first = first_up < first_down
+        down_first = first_down < first_up
+        tie = (first_up == first_down) & (first_up < horizon)
+        if tie_break == "tp":
+            up_first |= tie
+        else:
+            down_first |= tie
+        timed_out = (first_up == horizon) & (first_down == horizon)
+
+        chunk_side = np.full(stop - start, np.nan)
+        chunk_bars = np.full(stop - start, np.nan)
+        chunk_side[up_first] = 1.0
+        chunk_bars[up_first] = first_up[up_first] + 1
+        chunk_side[down_first] = -1.0
+        chunk_bars[down_first] = first_down[down_first] + 1
+
+        # Time barrier only counts when the whole horizon is observed
+        timed_complete = timed_out & complete[start:stop]
+        chunk_side[timed_complete] = 0.0
+        chunk_bars[timed_complete] = horizon
+
+        side[start:stop] = chunk_side
+        bars[start:stop] = chunk_bars
+
+    side[~valid] = np.nan
+    bars[~valid] = np.nan
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ret = np.where(side == 1, tp_mult * atr / close,
+              np.where(side == -1, -sl_mult * atr / close,
+              np.where(side == 0, future_close / close - 1, np.nan)))
+    return side, bars, ret
+
+
+def add_triple_barrier_labels(df, symbol=None, horizon=None):
+    """
+    Add triple-barrier label columns using the symbol's ATR multipliers from
+    ENTRY_TP_SL_CONFIG. All columns start with "label" so feature selection skips them.
+    """
+    config = TRIPLE_BARRIER_CONFIG
+    symbol_config = ENTRY_TP_SL_CONFIG.get(symbol, {}) if symbol else {}
+    tp_mult = symbol_config.get("atr_multiplier_tp", config["DEFAULT_TP_MULT"])
+    sl_mult = symbol_config.get("atr_multiplier_sl", config["DEFAULT_SL_MULT"])
+    horizon = horizon or config["HORIZON_BARS"]
+
+    if "atr" in df.columns:
+        atr = df["atr"]
+    else:
+        atr = AverageTrueRange(df["high"], df["low"], df["close"], window=config["ATR_PERIOD"]).average_true_range()
+
+    side, bars, ret = triple_barrier_labels(
+        df["high"], df["low"], df["close"], atr, tp_mult, sl_mult, horizon,
+        tie_break=config.get("TIE_BREAK", "sl"), chunk_rows=config.get("CHUNK_ROWS", 20000),
+    )
+    df["label_tb_side"] = side
+    df["label_tb"] = np.where(np.isnan(side), np.nan, (side == 1).astype(float))
+    df["label_tb_bars"] = bars
+    df["label_tb_return"] = ret
+    return df
+
 # 1. fix Function fetch data thnh Function `async`
 async def fetch_symbol_data_async(session, symbol, data_manager):
     """Function bt du bdfetch data cho 1 symbol."""
@@ -27679,28 +31782,32 @@ if __name__ == "__main__":
         traceback.print_exc()
         exit(1)
 
-    # 2. Load optimization configurations from experiment system
-    print(" [MAIN] Loading optimization configurations...")
+    # load_or_train_models may already have started worker processes: every exit path stops them
     try:
-        bot.load_or_train_models()
-        print(" [MAIN] Models loaded/trained successfully")
-    except Exception as e:
-        print(f" [MAIN] Failed to load/train models: {e}")
-        import traceback
-        traceback.print_exc()
-        exit(1)
+        # 2. Load optimization configurations from experiment system
+        print(" [MAIN] Loading optimization configurations...")
+        try:
+            bot.load_or_train_models()
+            print(" [MAIN] Models loaded/trained successfully")
+        except Exception as e:
+            print(f" [MAIN] Failed to load/train models: {e}")
+            import traceback
+            traceback.print_exc()
+            exit(1)
 
-    # 3. Use asyncio.run() to start the async run_enhanced_bot function
-    print(" [MAIN] Starting bot execution...")
-    try:
-        # asyncio.run will automatically create, run and close the event loop
-        asyncio.run(bot.run_enhanced_bot())
-    except KeyboardInterrupt:
-        print("\n [MAIN] Bot has been stopped successfully.")
-    except Exception as e:
-        import traceback
-        # Catch all critical errors not handled in the main loop
-        print(f" [MAIN] UNIDENTIFIED HIGH-LEVEL ERROR: {e}\n{traceback.format_exc()}")
+        # 3. Use asyncio.run() to start the async run_enhanced_bot function
+        print(" [MAIN] Starting bot execution...")
+        try:
+            # asyncio.run will automatically create, run and close the event loop
+            asyncio.run(bot.run_enhanced_bot())
+        except KeyboardInterrupt:
+            print("\n [MAIN] Bot has been stopped successfully.")
+        except Exception as e:
+            import traceback
+            # Catch all critical errors not handled in the main loop
+            print(f" [MAIN] UNIDENTIFIED HIGH-LEVEL ERROR: {e}\n{traceback.format_exc()}")
+    finally:
+        bot.shutdown_worker_pools()
 
 def smoke_test_crypto():
     """Check all configuration crypto has d set up and applied yet."""
@@ -0,0 +1,120 @@
+"""
+Load individual top-level definitions from the bot script.
+
+The bot is a single script with broker/GUI imports at module level, so tests
+pull out just the classes, functions and config dicts they need by name and
+exec them into a namespace pre-populated with the common imports.
+"""
+
+import contextlib
+import json
+import textwrap
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BOT_FILE = Path(__file__).resolve().parent.parent / "Bot-Trading_Swing (1).py"
+
+_SOURCE_LINES = None
+
+
+def _source_lines():
+    global _SOURCE_LINES
+    if _SOURCE_LINES is None:
+        _SOURCE_LINES = BOT_FILE.read_text(encoding="utf-8").split("\n")
+    return _SOURCE_LINES
+
+
+def segment(name):
+    """Source text of the top-level def/class/assignment called `name`."""
+    lines = _source_lines()
+    prefixes = (f"def {name}(", f"class {name}:", f"class {name}(", f"async def {name}(", f"{name} =")
+    for i, line in enumerate(lines):
+        if line.startswith(prefixes):
+            j = i + 1
+            # Column-0 comments do not end a block (several classes have them between methods)
+            while j < len(lines) and not (
+                lines[j] and not lines[j][0].isspace() and not lines[j].startswith((")", "]", "}", "#"))
+            ):
+                j += 1
+            # Drop trailing comments/decorators that belong to the next definition
+            while j > i + 1 and (not lines[j - 1].strip() or lines[j - 1].startswith(("#", "@"))):
+                j -= 1
+            return "\n".join(lines[i:j])
+    raise KeyError(f"{name} not found in {BOT_FILE.name}")
+
+
+def method_segment(class_name, name):
+    """Dedented source of method `name` of top-level class `class_name` (decorators included)."""
+    lines = _source_lines()
+    class_start = next(i for i, line in enumerate(lines) if line.startswith((f"class {class_name}:", f"class {class_name}(")))
+    top_level = ("class ", "def ", "async def ")
+    member = ("    def ", "    async def ", "    @")
+    prefixes = (f"    def {name}(", f"    async def {name}(")
+    for i in range(class_start + 1, len(lines)):
+        if lines[i].startswith(top_level):
+            break
+        if lines[i].startswith(prefixes):
+            start = i
+            while lines[start - 1].startswith("    @"):
+                start -= 1
+            j = i + 1
+            while j < len(lines) and not lines[j].startswith(member + top_level):
+                j += 1
+            # Trailing comments/blank lines belong to whatever follows
+            while j > i + 1 and (not lines[j - 1].strip() or lines[j - 1].lstrip().startswith("#")):
+                j -= 1
+            return textwrap.dedent("\n".join(lines[start:j]))
+    raise KeyError(f"{class_name}.{name} not found in {BOT_FILE.name}")
+
+
+def load_methods(class_name, *names, namespace=None, bases=()):
+    """
+    A stand-in class named `class_name` holding only the listed methods, for classes that
+    cannot be exec'd whole (the bot class has unrelated broken methods).
+    """
+    ns = namespace if namespace is not None else base_namespace()
+    attrs = {}
+    for name in names:
+        local = {}
+        exec(compile(method_segment(class_name, name), f"<{BOT_FILE.name}:{class_name}.{name}>", "exec"), ns, local)
+        attrs[name] = local[name]
+    return type(class_name, bases, attrs)
+
+
+def base_namespace(**extra):
+    ns = dict(
+        np=np, pd=pd, logging=logging, os=os, json=json, time=time, threading=threading,
+        tracemalloc=tracemalloc, contextlib=contextlib,
+        SYMBOL_METADATA={}, DEFAULT_ATR_MULTIPLIER=2.0, DEFAULT_RANGE_WINDOW=50,
+        DEFAULT_EMA_PERIOD=200, DEFAULT_ADX_THRESHOLD=25,
+    )
+    ns.update(extra)
+    return ns
+
+
+def load(*names, namespace=None):
+    """Exec the named definitions (in order) and return the namespace."""
+    ns = namespace if namespace is not None else base_namespace()
+    for name in names:
+        exec(compile(segment(name), f"<{BOT_FILE.name}:{name}>", "exec"), ns)
+    return ns
+
+
+def synthetic_ohlcv(n, seed=0, freq="h", start="2024-01-01"):
+    """Random-walk OHLCV bars with volatility regimes."""
+    rng = np.random.default_rng(seed)
+    vol = np.repeat(rng.choice([0.004, 0.01, 0.02], size=n // 250 + 1), 250)[:n]
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 1, n) * vol))
+    open_ = close * (1 + rng.normal(0, 1, n) * vol * 0.5)
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 1, n)) * vol * 0.4)
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 1, n)) * vol * 0.4)
+    volume = rng.integers(100, 1000, n).astype(float)
+    index = pd.date_range(start, periods=n, freq=freq)
+    return pd.DataFrame(dict(open=open_, high=high, low=low, close=close, volume=volume), index=index)
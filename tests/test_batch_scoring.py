@@ -0,0 +1,131 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+from source_loader import base_namespace, load, load_methods
+
+
+@pytest.fixture
+def ns():
+    return load("TREE_EXPORT_CONFIG", "INFERENCE_PROJECTION_CONFIG", "DISTILLATION_CONFIG", "LazyMember",
+                "LazyMemberDict", "raw_members", "CompiledTreeEnsemble", "EnsembleModel",
+                namespace=base_namespace(json=json))
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(2)
+    X = pd.DataFrame(rng.normal(size=(500, 5)), columns=[f"f{i}" for i in range(5)])
+    y = ((X["f0"] + X["f2"] * X["f4"] + rng.normal(0, 0.5, len(X))) > 0).astype(int)
+    return X, y
+
+
+def _ensemble(ns, data):
+    X, y = data
+    ensemble = ns["EnsembleModel"]()
+    ensemble.models = {
+        "rf": RandomForestClassifier(n_estimators=25, max_depth=6, random_state=0).fit(X, y),
+        "et": ExtraTreesClassifier(n_estimators=15, random_state=1).fit(X[["f4", "f2", "f0"]], y),
+    }
+    return ensemble
+
+
+def _frames(data):
+    X, _ = data
+    frames = {symbol: X.iloc[k * 30:(k + 1) * 30].copy() for k, symbol in enumerate(["EURUSD", "XAUUSD", "BTCUSD"])}
+    frames["XAUUSD"] = frames["XAUUSD"][["f4", "f3", "f2", "f1", "f0"]]  # another column layout
+    frames["BTCUSD"].iloc[-1, 0] = np.nan
+    return frames
+
+
+def test_batch_matches_scoring_each_frame(ns, data):
+    ensemble = _ensemble(ns, data)
+    frames = _frames(data)
+    expected = {symbol: ensemble.predict_proba(X) for symbol, X in frames.items()}
+
+    got = ensemble.predict_proba_batch({**frames, "EMPTY": frames["EURUSD"].iloc[:0]})
+
+    assert list(got) == list(frames)
+    for symbol, value in expected.items():
+        assert got[symbol] == pytest.approx(value, abs=1e-12), symbol
+
+
+def test_batch_runs_each_member_once(ns, data):
+    ensemble = _ensemble(ns, data)
+    calls = {name: 0 for name in ensemble.models}
+    for name, model in ensemble.models.items():
+        native = model.predict_proba
+
+        def counting(matrix, name=name, native=native):
+            calls[name] += 1
+            assert matrix.dtype == np.float32 and matrix.shape[0] == 3
+            return native(matrix)
+        model.predict_proba = counting
+
+    ensemble.predict_proba_batch(_frames(data))
+    assert calls == {"rf": 1, "et": 1}
+
+
+def test_batch_without_projection_scores_frames_one_by_one(ns, data, monkeypatch):
+    monkeypatch.setitem(ns["INFERENCE_PROJECTION_CONFIG"], "ENABLED", False)
+    ensemble = _ensemble(ns, data)
+    ensemble.predict_proba = lambda X, feature_columns=None: float(len(X.columns))
+    assert ensemble.predict_proba_batch(_frames(data)) == {"EURUSD": 5.0, "XAUUSD": 5.0, "BTCUSD": 5.0}
+
+
+class _Recorder:
+    """A model without predict_proba_batch: scored one symbol at a time."""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = []
+
+    def predict_proba(self, X):
+        self.calls.append(len(X))
+        return self.value
+
+
+class _Batched(_Recorder):
+    def predict_proba_batch(self, frames):
+        self.calls.append(sorted(frames))
+        if self.value is None:
+            raise RuntimeError("batch failed")
+        return {symbol: self.value for symbol in frames}
+
+
+@pytest.fixture
+def bot():
+    cls = load_methods("EnhancedTradingBot", "score_signals_batch", "get_enhanced_signal",
+                       namespace=base_namespace())
+    return cls.__new__(cls)
+
+
+def test_symbols_sharing_an_ensemble_are_scored_in_one_batch(bot):
+    shared, single, broken = _Batched(0.7), _Recorder(0.2), _Batched(None)
+    routes = {"EURUSD": shared, "GBPUSD": shared, "XAUUSD": single, "BTCUSD": broken, "USDJPY": None}
+
+    def prepare(symbol, df_features):
+        if symbol == "NZDUSD":
+            raise ValueError("bad frame")
+        model = routes[symbol]
+        return None if model is None else (model, df_features)
+    bot._prepare_signal_inputs = prepare
+
+    frame = pd.DataFrame({"f0": [1.0, 2.0]})
+    probabilities = bot.score_signals_batch({symbol: frame for symbol in [*routes, "NZDUSD"]})
+
+    assert probabilities == {"EURUSD": 0.7, "GBPUSD": 0.7, "XAUUSD": 0.2}
+    assert shared.calls == [["EURUSD", "GBPUSD"]]
+    assert single.calls == [2]
+    assert broken.calls == [["BTCUSD"]]  # its failure does not affect the other batches
+
+
+def test_precomputed_probability_skips_model_scoring(bot):
+    bot._prepare_signal_inputs = lambda symbol, df_features: pytest.fail("inputs prepared again")
+    signal, confidence, raw = bot.get_enhanced_signal("EURUSD", prob_buy=0.99)
+    assert signal == "BUY" and confidence >= 0.9 and raw == 0.99
+    signal, confidence, raw = bot.get_enhanced_signal("EURUSD", prob_buy=0.01)
+    assert signal == "SELL" and confidence >= 0.9 and raw == 0.01
@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+from source_loader import base_namespace, load
+
+
+@pytest.fixture(scope="module")
+def compiled_cls():
+    return load("CompiledTreeEnsemble", namespace=base_namespace(json=json))["CompiledTreeEnsemble"]
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(600, 8)), columns=[f"f{i}" for i in range(8)])
+    y = ((X["f0"] + 0.5 * X["f1"] * X["f2"] + rng.normal(0, 0.5, len(X))) > 0).astype(int)
+    return X, y
+
+
+def _native(model, X):
+    return model.predict_proba(X.to_numpy(dtype=np.float32))[:, 1]
+
+
+def _forests(X, y):
+    return {
+        "rf": RandomForestClassifier(n_estimators=40, max_depth=6, random_state=0).fit(X, y),
+        # A different column subset/order: the member matrices are stacked side by side
+        "et": ExtraTreesClassifier(n_estimators=25, random_state=1).fit(X[["f3", "f0", "f2", "f1"]], y),
+    }
+
+
+def test_compiled_forest_matches_native_predict(compiled_cls, data):
+    X, y = data
+    models = _forests(X, y)
+    compiled = compiled_cls.from_models(models)
+    assert compiled.member_names == ["rf", "et"]
+
+    matrices = {name: X[list(compiled.members[name]["columns"])].to_numpy(dtype=np.float32) for name in models}
+    got = compiled.predict_members(matrices)
+    for name, model in models.items():
+        np.testing.assert_allclose(got[name], _native(model, X[list(model.feature_names_in_)]), atol=1e-12)
+
+    errors = compiled.verify(models, X)
+    assert max(errors.values()) < 1e-12
+    # A single member is scored on its own (the other block stays zero-filled)
+    np.testing.assert_allclose(compiled.predict_members({"et": matrices["et"]})["et"], got["et"], atol=1e-12)
+
+
+def test_compiled_forest_handles_missing_values(compiled_cls, data):
+    X, y = data
+    X_nan = X.copy()
+    X_nan.iloc[::7, 0] = np.nan
+    X_nan.iloc[::11, 2] = np.nan
+    model = RandomForestClassifier(n_estimators=30, max_depth=5, random_state=0).fit(X_nan, y)
+    compiled = compiled_cls.from_models({"rf": model})
+    got = compiled.predict_members({"rf": X_nan.to_numpy(dtype=np.float32)})["rf"]
+    np.testing.assert_allclose(got, _native(model, X_nan), atol=1e-12)
+
+
+def test_saved_arrays_round_trip_memory_mapped(compiled_cls, data, tmp_path):
+    X, y = data
+    models = _forests(X, y)
+    compiled = compiled_cls.from_models(models)
+    compiled.save(str(tmp_path / "trees"))
+    loaded = compiled_cls.load(str(tmp_path / "trees"), mmap_mode="r")
+
+    assert isinstance(loaded._roots, np.memmap)
+    matrices = {name: X[list(compiled.members[name]["columns"])].to_numpy(dtype=np.float32) for name in models}
+    expected = compiled.predict_members(matrices)
+    for name, values in loaded.predict_members(matrices).items():
+        np.testing.assert_array_equal(values, expected[name])
+
+
+@pytest.mark.parametrize("package", ["xgboost", "lightgbm"])
+def test_compiled_boosters_match_native_predict(compiled_cls, data, package):
+    lib = pytest.importorskip(package)
+    X, y = data
+    X_nan = X.copy()
+    X_nan.iloc[::9, 1] = np.nan
+    if package == "xgboost":
+        model = lib.XGBClassifier(n_estimators=30, max_depth=4, verbosity=0).fit(X_nan, y)
+    else:
+        model = lib.LGBMClassifier(n_estimators=30, num_leaves=15, verbose=-1).fit(X_nan, y)
+    compiled = compiled_cls.from_models({"m": model})
+    assert compiled.member_names == ["m"]
+    got = compiled.predict_members({"m": X_nan.to_numpy(dtype=np.float32)})["m"]
+    np.testing.assert_allclose(got, _native(model, X_nan), atol=1e-5)
+
+
+@pytest.mark.parametrize("use_for_inference", [False, True])
+def test_live_plan_uses_compiled_members_only_when_enabled(data, monkeypatch, use_for_inference):
+    ns = load("TREE_EXPORT_CONFIG", "INFERENCE_PROJECTION_CONFIG", "DISTILLATION_CONFIG", "LazyMember",
+              "LazyMemberDict", "raw_members", "CompiledTreeEnsemble", "EnsembleModel",
+              namespace=base_namespace(json=json))
+    assert ns["TREE_EXPORT_CONFIG"]["USE_FOR_INFERENCE"] is False
+    monkeypatch.setitem(ns["TREE_EXPORT_CONFIG"], "USE_FOR_INFERENCE", use_for_inference)
+    X, y = data
+    ensemble = ns["EnsembleModel"]()
+    ensemble.models = _forests(X, y)
+    ensemble.compiled_trees = ns["CompiledTreeEnsemble"].from_models(ensemble.models)
+
+    ensemble.prepare_inference()
+
+    expected = ["rf", "et"] if use_for_inference else []
+    assert ensemble._inference_plan["compiled_members"] == expected
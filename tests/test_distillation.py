@@ -0,0 +1,79 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+lgb = pytest.importorskip("lightgbm")
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from source_loader import base_namespace, load
+
+
+@pytest.fixture()
+def ns(monkeypatch):
+    ns = load(
+        "TREE_EXPORT_CONFIG", "INFERENCE_PROJECTION_CONFIG", "DISTILLATION_CONFIG", "LazyMember", "LazyMemberDict",
+        "raw_members", "CompiledTreeEnsemble", "EnsembleModel", namespace=base_namespace(lgb=lgb, time=time),
+    )
+    monkeypatch.setitem(ns["DISTILLATION_CONFIG"], "ENABLED", True)
+    monkeypatch.setitem(ns["DISTILLATION_CONFIG"], "USE_FOR_INFERENCE", True)
+    monkeypatch.setitem(ns["TREE_EXPORT_CONFIG"], "ENABLED", False)
+    return ns
+
+
+def _ensemble(ns, n=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, 5)), columns=list("abcde"))
+    y = ((X["a"] + 0.5 * X["b"] + rng.normal(0, 1, n)) > 0).astype(int)
+    ensemble = ns["EnsembleModel"]()
+    ensemble.member_calibrators = {}
+    # The full-fit forest memorises its training rows; only OOF output is a fair teacher
+    ensemble.models = {"rf": RandomForestClassifier(50, random_state=0).fit(X, y), "lr": LogisticRegression().fit(X, y)}
+    return ensemble, X, y
+
+
+def _first_fold_unscored(oof, rows=200):
+    for proba in oof.values():
+        proba[:rows] = np.nan
+    return oof
+
+
+def test_student_is_distilled_from_and_gated_on_oof_tail(ns):
+    ensemble, X, _ = _ensemble(ns)
+    sigmoid = lambda v: 1.0 / (1.0 + np.exp(-v))
+    oof = _first_fold_unscored({"rf": sigmoid(X["a"].to_numpy()), "lr": sigmoid(0.5 * X["b"].to_numpy())})
+
+    report = ensemble.distill_student(X, oof)
+
+    assert report["accepted"] and ensemble.student_in_use(), report
+    n_holdout = int((len(X) - 200) * ns["DISTILLATION_CONFIG"]["HOLDOUT_SHARE"])
+    assert report["fidelity"]["holdout_rows"] == n_holdout
+    # Fidelity is measured against the OOF blend on the newest scored rows
+    weights = {name: ensemble.MEMBER_WEIGHTS.get(name, 0.33) for name in oof}
+    blend = sum(w * oof[name] for name, w in weights.items()) / sum(weights.values())
+    predicted = np.clip(ensemble.student.predict(X.tail(n_holdout)), 0.0, 1.0)
+    assert report["fidelity"]["mae"] == pytest.approx(np.abs(predicted - blend[-n_holdout:]).mean())
+
+
+def test_rejected_student_falls_back_to_full_ensemble(ns):
+    ensemble, X, _ = _ensemble(ns)
+    rng = np.random.default_rng(1)
+    # OOF output the features cannot explain: the student cannot match it on the holdout
+    oof = _first_fold_unscored({"rf": rng.uniform(0, 1, len(X)), "lr": rng.uniform(0, 1, len(X))})
+
+    report = ensemble.distill_student(X, oof)
+
+    assert not report["accepted"] and report["reason"] == "fidelity gate"
+    assert not ensemble.student_in_use()
+    ensemble._student_last_rows = lambda *args, **kwargs: pytest.fail("rejected student was scored")
+    assert ensemble.predict_proba(X.tail(5)) == pytest.approx(ensemble.predict_proba(X.tail(5), use_student=False))
+
+
+def test_student_needs_enough_oof_rows(ns):
+    ensemble, X, _ = _ensemble(ns, n=600)
+    report = ensemble.distill_student(X, _first_fold_unscored({"rf": np.full(len(X), 0.5)}))
+    assert not report["accepted"] and "out-of-fold rows" in report["reason"]
+    assert ensemble.distill_student(X, {})["reason"] == "no out-of-fold predictions"
@@ -0,0 +1,187 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import brier_score_loss, f1_score
+
+from source_loader import base_namespace, load
+
+
+@pytest.fixture(scope="module")
+def ensemble_ns():
+    return load("ENSEMBLE_PRUNING_CONFIG", "EnsembleModel", namespace=base_namespace(f1_score=f1_score))
+
+
+def _oof(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 2, n)
+    signal = np.clip(0.5 + (y - 0.5) * 0.4 + rng.normal(0, 0.15, n), 0.01, 0.99)
+    # rf duplicates xgb, so dropping it leaves the blend (and its log-loss) unchanged
+    oof = {"rf": signal.copy(), "xgb": signal,
+           "lgb": np.clip(signal + rng.normal(0, 0.01, n), 0.01, 0.99)}
+    return oof, y
+
+
+def _prunable(ensemble_ns, oof):
+    ensemble = ensemble_ns["EnsembleModel"].__new__(ensemble_ns["EnsembleModel"])
+    names = list(oof)
+    ensemble.models = {name: object() for name in names}
+    ensemble.cv_results = {name: {"mean_f1": 0.6, "std_f1": 0.05} for name in names}
+    ensemble.member_calibrators = {name: object() for name in names}
+    ensemble.calibration_report = {name: {} for name in names}
+    ensemble.base_model_feature_importance = {name: {} for name in names}
+    return ensemble
+
+
+def test_pruning_is_off_by_default(ensemble_ns):
+    oof, y = _oof()
+    ensemble = _prunable(ensemble_ns, oof)
+    assert list(ensemble.prune_members(oof, y)) == list(oof) == list(ensemble.models)
+    assert ensemble.pruned_members == [] and not ensemble.pruning_report["enabled"]
+
+
+def test_prune_members_forgets_pruned_cv_results_and_calibrators(ensemble_ns, monkeypatch):
+    monkeypatch.setitem(ensemble_ns["ENSEMBLE_PRUNING_CONFIG"], "ENABLED", True)
+    oof, y = _oof()
+    ensemble = _prunable(ensemble_ns, oof)
+
+    kept_oof = ensemble.prune_members(oof, y)
+
+    assert "rf" in ensemble.pruned_members
+    kept = ensemble.pruning_report["kept"]
+    assert list(kept_oof) == kept == list(ensemble.models)
+    for per_member in (ensemble.cv_results, ensemble.member_calibrators,
+                       ensemble.calibration_report, ensemble.base_model_feature_importance):
+        assert list(per_member) == kept
+    # The quality gates read the first cv_results entry; it must be a member that is still served
+    assert next(iter(ensemble.cv_results)) in ensemble.models
+    assert sum(ensemble.model_weights.values()) == pytest.approx(1.0)
+
+
+@pytest.fixture(scope="module")
+def calibration_ns():
+    ns = base_namespace(IsotonicRegression=IsotonicRegression, LogisticRegression=LogisticRegression,
+                        brier_score_loss=brier_score_loss)
+    return load("OOF_CALIBRATION_CONFIG", "OOFCalibrator", "fit_oof_calibrator", namespace=ns)
+
+
+def _overconfident(n, seed=0):
+    rng = np.random.default_rng(seed)
+    true_p = rng.uniform(0.2, 0.8, n)
+    y = (rng.random(n) < true_p).astype(int)
+    raw = 1.0 / (1.0 + np.exp(-3.0 * np.log(true_p / (1.0 - true_p))))
+    return raw, y
+
+
+@pytest.fixture()
+def calibration_enabled(calibration_ns, monkeypatch):
+    monkeypatch.setitem(calibration_ns["OOF_CALIBRATION_CONFIG"], "ENABLED", True)
+    return calibration_ns
+
+
+def test_member_calibration_is_off_by_default(calibration_ns):
+    raw, y = _overconfident(3000)
+    assert calibration_ns["fit_oof_calibrator"](raw, y) == (None, {})
+
+
+@pytest.mark.parametrize("n, method", [(3000, "isotonic"), (500, "sigmoid")])
+def test_oof_calibrator_reduces_brier(calibration_enabled, n, method):
+    calibration_ns = calibration_enabled
+    raw, y = _overconfident(n)
+    raw[::50] = np.nan  # rows no fold scored
+    calibrator, report = calibration_ns["fit_oof_calibrator"](raw, y)
+
+    assert report["method"] == method and calibrator.method == method
+    assert report["rows"] == np.isfinite(raw).sum()
+    assert report["brier_calibrated"] < report["brier_raw"]
+    grid = np.linspace(0.0, 1.0, 101)
+    mapped = calibrator.transform(grid)
+    assert np.all((mapped >= 0.0) & (mapped <= 1.0)) and np.all(np.diff(mapped) >= -1e-12)
+
+
+def test_oof_calibrator_skips_thin_or_single_class(calibration_enabled):
+    fit = calibration_enabled["fit_oof_calibrator"]
+    raw, y = _overconfident(3000)
+    assert fit(None, y) == (None, {})
+    assert fit(raw[:100], y[:100])[0] is None
+    assert fit(raw, np.ones_like(y))[0] is None
+
+
+def test_member_calibration_keeps_nan_rows(ensemble_ns, calibration_ns):
+    raw, y = _overconfident(3000)
+    ensemble = ensemble_ns["EnsembleModel"].__new__(ensemble_ns["EnsembleModel"])
+    ensemble.member_calibrators = {"rf": calibration_ns["OOFCalibrator"]("isotonic").fit(raw, y)}
+    proba = raw[:10].copy()
+    proba[3] = np.nan
+    out = ensemble._calibrated("rf", proba)
+    assert np.isnan(out[3]) and np.all(np.isfinite(np.delete(out, 3)))
+    np.testing.assert_allclose(np.delete(out, 3), ensemble.member_calibrators["rf"].transform(np.delete(proba, 3)))
+    assert ensemble._calibrated("xgb", proba) is proba
+
+
+def test_weighted_blend_loads_only_members_it_scores_natively(tmp_path):
+    ns = load("MODEL_ARTEFACT_CONFIG", "LazyMember", "LazyMemberDict", "raw_members", "CompiledTreeEnsemble",
+              "EnsembleModel", namespace=base_namespace(joblib=joblib, MODEL_DIR=str(tmp_path)))
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(400, 5)), columns=list("abcde"))
+    y = (X["a"] + rng.normal(0, 0.5, len(X)) > 0).astype(int)
+    fitted = {"rf": RandomForestClassifier(20, max_depth=4, random_state=0).fit(X, y),
+              "lr": LogisticRegression().fit(X, y)}
+
+    ensemble = ns["EnsembleModel"].__new__(ns["EnsembleModel"])
+    ensemble.member_calibrators = {}
+    ensemble.compiled_trees = ns["CompiledTreeEnsemble"].from_models({"rf": fitted["rf"]})
+    placeholders = {name: ns["LazyMember"].dump(model, str(tmp_path), name) for name, model in fitted.items()}
+    ensemble.models = ns["LazyMemberDict"](placeholders)
+
+    blended = ensemble._weighted_member_proba(ensemble.models, X)
+
+    assert not placeholders["rf"].loaded  # scored from the exported arrays
+    assert placeholders["lr"].loaded
+    weights = {name: ensemble.MEMBER_WEIGHTS.get(name, 0.33) for name in fitted}
+    expected = sum(w * fitted[name].predict_proba(X.values)[:, 1] for name, w in weights.items()) / sum(weights.values())
+    np.testing.assert_allclose(blended, expected, atol=1e-6)
+
+
+@pytest.fixture()
+def meta_ns(monkeypatch):
+    from sklearn.calibration import CalibratedClassifierCV
+
+    ns = base_namespace(IsotonicRegression=IsotonicRegression, LogisticRegression=LogisticRegression,
+                        brier_score_loss=brier_score_loss, CalibratedClassifierCV=CalibratedClassifierCV)
+    load("OOF_CALIBRATION_CONFIG", "create_calibrated_classifier", "OOFCalibrator", "PostCalibratedClassifier",
+         "EnsembleModel", namespace=ns)
+    create = ns["create_calibrated_classifier"]
+
+    def _prefit_unsupported(estimator, method="isotonic", cv=3):
+        if cv == "prefit":
+            raise ValueError("cv='prefit' is not supported")
+        return create(estimator, method=method, cv=cv)
+
+    monkeypatch.setitem(ns, "create_calibrated_classifier", _prefit_unsupported)
+    return ns
+
+
+def _meta_rows(n=1500, seed=0):
+    raw, y = _overconfident(n, seed)
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"rf": raw, "xgb": np.clip(raw + rng.normal(0, 0.05, n), 0.0, 1.0)}), pd.Series(y)
+
+
+@pytest.mark.parametrize("post_transform", [False, True])
+def test_meta_calibration_fallback_when_prefit_fails(meta_ns, monkeypatch, post_transform):
+    monkeypatch.setitem(meta_ns["OOF_CALIBRATION_CONFIG"], "META_POST_TRANSFORM", post_transform)
+    meta_X, meta_y = _meta_rows()
+    ensemble = meta_ns["EnsembleModel"].__new__(meta_ns["EnsembleModel"])
+
+    ensemble._fit_meta_model(meta_X, meta_y)
+
+    expected = meta_ns["PostCalibratedClassifier"] if post_transform else meta_ns["CalibratedClassifierCV"]
+    assert isinstance(ensemble.meta_model, expected)
+    # Calibrated meta output stays a probability and keeps the ordering of the member scores
+    grid = pd.DataFrame({"rf": np.linspace(0, 1, 101), "xgb": np.linspace(0, 1, 101)})
+    p = ensemble.meta_model.predict_proba(grid)[:, 1]
+    assert np.all((p >= 0.0) & (p <= 1.0)) and np.all(np.diff(p) >= -1e-12)
@@ -0,0 +1,135 @@
+import multiprocessing as mp
+import shutil
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("ta")
+pytest.importorskip("scipy")
+
+from scipy.signal import argrelextrema
+from ta.momentum import RSIIndicator, StochasticOscillator
+from ta.trend import ADXIndicator, EMAIndicator, MACD
+from ta.volatility import AverageTrueRange, BollingerBands
+
+from source_loader import base_namespace, load, synthetic_ohlcv
+
+SYMBOLS = {"EURUSD": 420, "XAUUSD": 400, "BTCUSD": 380, "GBPUSD": 410}
+
+
+@pytest.fixture(scope="module")
+def ns():
+    ns = base_namespace(
+        AverageTrueRange=AverageTrueRange, BollingerBands=BollingerBands, EMAIndicator=EMAIndicator,
+        MACD=MACD, ADXIndicator=ADXIndicator, RSIIndicator=RSIIndicator,
+        StochasticOscillator=StochasticOscillator, argrelextrema=argrelextrema,
+        mp=mp, ProcessPoolExecutor=ProcessPoolExecutor, BrokenProcessPool=BrokenProcessPool,
+        tempfile=tempfile, shutil=shutil,
+    )
+    load(
+        "FEATURE_PROFILING_CONFIG", "_NullProfileSection", "_NULL_PROFILE_SECTION", "_ProfileSection",
+        "FeatureProfiler", "FEATURE_PROFILER", "FEATURE_INFERENCE_CONFIG", "FEATURE_PANEL_CONFIG",
+        "FEATURE_POOL_CONFIG", "calculate_rsi_divergence_vectorized", "PANEL_OHLCV_COLUMNS", "_stack_panel",
+        "_panel_ema", "_panel_wilder", "_panel_true_range", "_panel_atr", "_panel_rsi", "_panel_adx",
+        "_panel_rsi_divergence", "AdvancedFeatureEngineer", "_POOL_FEATURE_ENGINEER", "_pool_feature_engineer",
+        "_frame_to_memmap", "_memmap_to_frame", "_features_to_memmap", "_memmap_to_features",
+        "_feature_pool_worker", "shutdown_executor", "ParallelFeatureStage", namespace=ns,
+    )
+    engineer = ns["AdvancedFeatureEngineer"]()
+    # idxmin over the all-NaN RSI warm-up raises on pandas>=3 (see test_inference_features)
+    engineer._detect_rsi_divergence = lambda df, period: pd.Series(0, index=df.index)
+    ns["_POOL_FEATURE_ENGINEER"] = engineer  # What a worker process would build for itself
+    return ns
+
+
+@pytest.fixture()
+def frames():
+    return {symbol: synthetic_ohlcv(n, seed=k) for k, (symbol, n) in enumerate(SYMBOLS.items())}
+
+
+def _threaded_stage(ns, **config):
+    # Worker tasks run on threads: same chunking and memmap exchange, no spawned interpreter
+    stage = ns["ParallelFeatureStage"](ns["_POOL_FEATURE_ENGINEER"],
+                                       config=dict(ns["FEATURE_POOL_CONFIG"], MAX_WORKERS=2, **config))
+    stage.executors = []
+
+    def _get_executor(workers):
+        stage.executors.append(ThreadPoolExecutor(max_workers=workers))
+        return stage.executors[-1]
+
+    stage._get_executor = _get_executor
+    return stage
+
+
+def _assert_same_features(got, expected):
+    assert list(got.columns) == list(expected.columns)
+    pd.testing.assert_index_equal(got.index, expected.index)
+    for col in expected.columns:
+        if isinstance(expected[col].dtype, pd.CategoricalDtype):
+            pd.testing.assert_series_equal(got[col], expected[col])
+        else:
+            assert got[col].dtype == expected[col].dtype, col
+            np.testing.assert_allclose(got[col].to_numpy(dtype=float), expected[col].to_numpy(dtype=float),
+                                       rtol=0, atol=0, equal_nan=True, err_msg=col)
+
+
+def test_memmap_round_trip_keeps_index_dtypes_and_categories(ns, tmp_path):
+    df = synthetic_ohlcv(50, seed=1)
+    df.index = df.index.tz_localize("UTC").tz_convert("Europe/London")
+    df.index.name = "time"
+    frame = ns["_memmap_to_frame"](ns["_frame_to_memmap"](df, str(tmp_path / "in")))
+    pd.testing.assert_frame_equal(frame, df[list(ns["PANEL_OHLCV_COLUMNS"])], check_freq=False)
+
+    features = df.assign(
+        regime=pd.Categorical(np.where(df["close"] > df["close"].median(), "high", "low")),
+        flag=(df["close"] > df["open"]), streak=np.arange(len(df)), ratio=df["close"] / df["open"],
+    )
+    features.loc[features.index[:3], "ratio"] = np.nan
+    meta = ns["_features_to_memmap"](features, str(tmp_path / "out.npy"))
+    assert meta["columns"] == ["regime", "flag", "streak", "ratio"]
+    _assert_same_features(ns["_memmap_to_features"](df, meta), features)
+
+
+def test_chunked_stage_matches_in_process(ns, frames):
+    stage = _threaded_stage(ns)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = stage.compute_in_process({s: df.copy() for s, df in frames.items()})
+        got = stage.run(frames)
+    assert len(stage.executors) == 1 and set(got) == set(frames)
+    for symbol in frames:
+        _assert_same_features(got[symbol], expected[symbol])
+
+
+def test_failed_chunk_is_rebuilt_in_process(ns, frames, monkeypatch):
+    worker = ns["_feature_pool_worker"]
+
+    def _flaky_worker(task):
+        if task["chunk_id"] == 1:
+            raise MemoryError("worker ran out of memory")
+        return worker(task)
+
+    monkeypatch.setitem(ns, "_feature_pool_worker", _flaky_worker)
+    stage = _threaded_stage(ns)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        got = stage.run(frames)
+        expected = stage.compute_in_process({s: df.copy() for s, df in frames.items()})
+    assert set(got) == set(frames)
+    for symbol in frames:
+        _assert_same_features(got[symbol], expected[symbol])
+
+
+@pytest.mark.parametrize("config, n_symbols", [({"ENABLED": False}, 4), ({}, 2)])
+def test_small_or_disabled_runs_stay_in_process(ns, frames, config, n_symbols):
+    stage = _threaded_stage(ns, **config)
+    subset = dict(list(frames.items())[:n_symbols])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        got = stage.run(subset)
+    assert stage.executors == [] and set(got) == set(subset)
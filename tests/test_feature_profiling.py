@@ -0,0 +1,105 @@
+import json
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from source_loader import base_namespace, load
+
+
+@pytest.fixture
+def ns():
+    return load("FEATURE_PROFILING_CONFIG", "_NullProfileSection", "_NULL_PROFILE_SECTION", "_ProfileSection",
+                "FeatureProfiler", namespace=base_namespace(datetime=datetime))
+
+
+def _profiler(ns, tmp_path, **overrides):
+    config = dict(ns["FEATURE_PROFILING_CONFIG"], ENABLED=True, PRINT_TABLE=False,
+                  REPORT_DIR=str(tmp_path / "profiles"))
+    config.update(overrides)
+    return ns["FeatureProfiler"](config)
+
+
+def _add_columns(df, count):
+    out = df.copy()
+    for k in range(count):
+        out[f"x{k}"] = np.arange(len(df), dtype=float)
+    return out
+
+
+def test_disabled_profiler_is_a_plain_call(ns):
+    profiler = ns["FeatureProfiler"]()
+    assert profiler.enabled is False
+    df = pd.DataFrame({"close": [1.0, 2.0]})
+
+    assert profiler.call("g", "EURUSD", _add_columns, df, 2).shape == (2, 3)
+    with profiler.section("g", "EURUSD", df) as section:
+        section.output = df
+    assert section is ns["_NULL_PROFILE_SECTION"]
+    assert not hasattr(section, "output")  # the shared no-op never keeps frames alive
+
+    profiler.begin_cycle()
+    assert profiler.end_cycle() is None
+    assert profiler.build_report()["calls"] == 0
+
+
+def test_report_aggregates_groups_symbols_and_nesting(ns, tmp_path):
+    profiler = _profiler(ns, tmp_path, TRACK_MEMORY=False)
+    df = pd.DataFrame({"close": np.arange(50, dtype=float)})
+    profiler.begin_cycle()
+
+    for symbol in ("EURUSD", "XAUUSD"):
+        with profiler.section("all_features", symbol, df) as outer:
+            inner = profiler.call("divergence", symbol, _add_columns, df, 3)
+            outer.output = inner.assign(zone=1.0)
+    with pytest.raises(ValueError):
+        profiler.call("sd_zones", "EURUSD", lambda frame: (_ for _ in ()).throw(ValueError("boom")), df)
+
+    report = profiler.end_cycle()
+    assert report["cycle"] == 1 and report["calls"] == 5
+    groups = report["groups"]
+    assert groups["all_features"]["calls"] == 2 and groups["all_features"]["depth"] == 0
+    assert groups["divergence"]["depth"] == 1
+    assert groups["divergence"]["columns_added"] == 6
+    assert groups["all_features"]["columns_added"] == 8
+    assert groups["sd_zones"]["failed"] == 1
+    assert set(report["symbols"]) == {"EURUSD", "XAUUSD"}
+    assert report["symbols"]["XAUUSD"]["divergence"]["calls"] == 1
+    assert "records" not in report
+
+    files = list((tmp_path / "profiles").glob("feature_profile_cycle1_*.json"))
+    assert len(files) == 1
+    assert json.loads(files[0].read_text())["groups"]["divergence"]["columns_added"] == 6
+
+    profiler.begin_cycle()  # a new cycle starts from an empty window
+    assert profiler.build_report()["calls"] == 0 and profiler.build_report()["cycle"] == 2
+
+
+def test_nested_peak_propagates_to_parent(ns, tmp_path):
+    profiler = _profiler(ns, tmp_path, INCLUDE_CALLS=True, REPORT_DIR=None)
+    was_tracing = tracemalloc.is_tracing()
+    profiler.begin_cycle()
+    try:
+        with profiler.section("outer", None, None):
+            profiler.call("big", None, lambda _: np.ones(2_000_000), None)  # ~16 MB, freed on return
+    finally:
+        profiler.enable(False)
+
+    records = {rec["group"]: rec for rec in profiler.build_report()["records"]}
+    assert records["big"]["peak_alloc_mb"] > 10
+    assert records["outer"]["peak_alloc_mb"] >= records["big"]["peak_alloc_mb"]
+    assert records["outer"]["symbol"] == "ALL" and records["outer"]["columns_out"] is None
+    # The profiler stops tracemalloc it started itself when switched off
+    assert tracemalloc.is_tracing() == was_tracing
+
+
+def test_format_table_orders_by_wall_time(ns):
+    report = {"groups": {
+        "fast": {"calls": 1, "wall_s": 0.1, "cpu_s": 0.1, "peak_alloc_mb": 0.0, "columns_added": 1, "depth": 1},
+        "slow": {"calls": 2, "wall_s": 2.0, "cpu_s": 1.5, "peak_alloc_mb": 3.0, "columns_added": 4, "depth": 0},
+    }}
+    lines = ns["FeatureProfiler"]().format_table(report).splitlines()
+    assert lines[0].startswith("group")
+    assert lines[1].startswith("slow") and lines[2].startswith("  fast")
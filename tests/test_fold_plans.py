@@ -0,0 +1,100 @@
+import hashlib
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.model_selection import TimeSeriesSplit
+
+from source_loader import base_namespace, load
+
+
+@pytest.fixture
+def ns():
+    return load(
+        "PurgedGroupTimeSeriesSplit", "_FINGERPRINT_MEMO", "dataset_fingerprint", "FoldPlan", "FoldPlanCache",
+        "FOLD_PLAN_CONFIG",
+        namespace=base_namespace(hashlib=hashlib, weakref=weakref, OrderedDict=OrderedDict,
+                                 TimeSeriesSplit=TimeSeriesSplit),
+    )
+
+
+def _frame(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, 3)), columns=["a", "b", "c"],
+                     index=pd.date_range("2024-01-01", periods=n, freq="h"))
+    return X, pd.Series(rng.integers(0, 2, n), index=X.index)
+
+
+def _assert_same_folds(plan, expected):
+    expected = list(expected)
+    assert len(plan) == plan.get_n_splits() == len(expected)
+    for (tr, te), (tr_ref, te_ref) in zip(plan.split(), expected):
+        assert tr.dtype == np.int32 and te.dtype == np.int32
+        np.testing.assert_array_equal(tr, tr_ref)
+        np.testing.assert_array_equal(te, te_ref)
+
+
+def test_plans_match_the_splitters(ns):
+    X, y = _frame()
+    cache = ns["FoldPlanCache"]()
+    _assert_same_folds(cache.purged(X, y, n_splits=4, gap=6),
+                       ns["PurgedGroupTimeSeriesSplit"](n_splits=4, gap=6).split(np.arange(len(X))))
+    _assert_same_folds(cache.time_series(X, y, n_splits=3), TimeSeriesSplit(n_splits=3).split(np.arange(len(X))))
+
+
+def test_cache_hits_on_equal_content_and_misses_on_changes(ns):
+    X, y = _frame()
+    cache = ns["FoldPlanCache"]()
+    plan = cache.purged(X, y, n_splits=4, gap=6)
+
+    assert cache.purged(X.copy(), y.copy(), n_splits=4, gap=6) is plan  # same content, new objects
+    assert cache.purged(X, y, n_splits=4, gap=12) is not plan
+    assert cache.time_series(X, y, n_splits=4) is not plan
+    changed = X.copy()
+    changed.iloc[5, 0] += 1.0
+    assert cache.purged(changed, y, n_splits=4, gap=6) is not plan
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 4 and stats["plans"] == 4
+    assert stats["index_bytes"] > 0
+
+
+def test_least_recently_used_plan_is_evicted(ns, monkeypatch):
+    monkeypatch.setitem(ns["FOLD_PLAN_CONFIG"], "MAX_PLANS", 2)
+    cache = ns["FoldPlanCache"]()
+    frames = [_frame(seed=k) for k in range(3)]
+    first = cache.purged(*frames[0])
+    second = cache.purged(*frames[1])
+    assert cache.purged(*frames[0]) is first  # now the most recently used
+    cache.purged(*frames[2])
+
+    assert cache.stats()["plans"] == 2
+    assert cache.purged(*frames[0]) is first
+    assert cache.purged(*frames[1]) is not second
+
+
+def test_disabled_cache_builds_a_fresh_plan(ns, monkeypatch):
+    monkeypatch.setitem(ns["FOLD_PLAN_CONFIG"], "ENABLED", False)
+    X, y = _frame()
+    cache = ns["FoldPlanCache"]()
+    assert cache.purged(X, y) is not cache.purged(X, y)
+    assert cache.stats() == {"plans": 0, "hits": 0, "misses": 0, "index_bytes": 0}
+
+
+@pytest.mark.parametrize("cache_matrices", [False, True])
+def test_fold_frames_are_copies_cached_per_column_set(ns, monkeypatch, cache_matrices):
+    monkeypatch.setitem(ns["FOLD_PLAN_CONFIG"], "CACHE_MATRICES", cache_matrices)
+    X, y = _frame()
+    plan = ns["FoldPlanCache"]().purged(X, y, n_splits=3, gap=4)
+
+    frames = plan.fold_frames(X, y)
+    assert len(frames) == 3
+    for (X_tr, y_tr, X_te, y_te), (tr, te) in zip(frames, plan):
+        np.testing.assert_array_equal(X_tr.to_numpy(), X.to_numpy()[tr])
+        np.testing.assert_array_equal(y_te, y.to_numpy()[te])
+        assert not np.shares_memory(X_tr.to_numpy(), X.to_numpy()) and list(X_te.columns) == ["a", "b", "c"]
+    assert (plan.fold_frames(X, y) is frames) == cache_matrices
+    # A different column set never reuses the cached matrices
+    assert len(plan.fold_frames(X[["a", "b"]], y)[0][0].columns) == 2
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+xgb = pytest.importorskip("xgboost")
+
+from sklearn.base import clone
+
+from source_loader import base_namespace, load
+
+
+@pytest.fixture(scope="module")
+def ns():
+    return load(
+        "INCREMENTAL_TRAINING_CONFIG", "TREE_EXPORT_CONFIG", "INFERENCE_PROJECTION_CONFIG",
+        "LazyMember", "LazyMemberDict", "raw_members", "CompiledTreeEnsemble", "EnsembleModel",
+        namespace=base_namespace(clone=clone, xgb=xgb),
+    )
+
+
+def test_increment_with_early_stopping_member(ns):
+    rng = np.random.default_rng(0)
+    n, n_val = 1500, ns["INCREMENTAL_TRAINING_CONFIG"].get("VALIDATION_BARS", 48)
+    X = pd.DataFrame(rng.normal(size=(n, 5)), columns=list("abcde"),
+                     index=pd.date_range("2024-01-01", periods=n, freq="h"))
+    y = ((X["a"] + 0.5 * X["b"] + rng.normal(0, 1, n)) > 0).astype(int)
+
+    # Tuned members carry early stopping; the increment has no eval_set to feed it
+    member = xgb.XGBClassifier(n_estimators=200, max_depth=3, early_stopping_rounds=10, verbosity=0)
+    member.fit(X[:1000], y[:1000], eval_set=[(X[1000:1200], y[1000:1200])], verbose=False)
+    ensemble = ns["EnsembleModel"]()
+    ensemble.models = {"xgb": member}
+    ensemble.trained_until = X.index[1199]
+
+    X_new, y_new = X[1200:], y[1200:]
+    report = ensemble.incremental_update(X_new, y_new)
+    assert report["accepted"] and report["updated_members"] == ["xgb"], report
+    updated = ensemble.models["xgb"]
+    assert updated.get_params()["early_stopping_rounds"] is None
+
+    # Continues from the served rounds, and predict() uses the new ones too
+    extra = ns["INCREMENTAL_TRAINING_CONFIG"].get("EXTRA_ROUNDS", 50)
+    assert updated.get_booster().num_boosted_rounds() == member.best_iteration + 1 + extra
+    assert report["logloss_after"] != report["logloss_before"]
+
+    # Validation bars were only scored: the next increment must start on them
+    assert ensemble.trained_until == X_new.index[-n_val - 1]
+    assert (X.index > ensemble.trained_until).sum() == n_val
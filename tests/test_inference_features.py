@@ -0,0 +1,270 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("ta")
+pytest.importorskip("scipy")
+
+from scipy.signal import argrelextrema
+from ta.momentum import RSIIndicator, StochasticOscillator
+from ta.trend import ADXIndicator, EMAIndicator, MACD
+from ta.volatility import AverageTrueRange, BollingerBands
+
+from source_loader import base_namespace, load, load_methods, synthetic_ohlcv
+
+
+@pytest.fixture(scope="module")
+def engineer():
+    ns = base_namespace(
+        AverageTrueRange=AverageTrueRange, BollingerBands=BollingerBands, EMAIndicator=EMAIndicator,
+        MACD=MACD, ADXIndicator=ADXIndicator, RSIIndicator=RSIIndicator,
+        StochasticOscillator=StochasticOscillator, argrelextrema=argrelextrema,
+    )
+    load(
+        "FEATURE_PROFILING_CONFIG", "_NullProfileSection", "_NULL_PROFILE_SECTION", "_ProfileSection",
+        "FeatureProfiler", "FEATURE_PROFILER", "FEATURE_INFERENCE_CONFIG",
+        "calculate_rsi_divergence_vectorized", "AdvancedFeatureEngineer", namespace=ns,
+    )
+    fe = ns["AdvancedFeatureEngineer"]()
+    # idxmin over the all-NaN RSI warm-up raises on pandas>=3; the detector can never
+    # fire anyway (the recent low is part of the slice it is compared against)
+    fe._detect_rsi_divergence = lambda df, period: pd.Series(0, index=df.index)
+    return fe
+
+
+def _with_zones(df, every=83, seed=1, stop=None):
+    """Plant strong-base-strong candle triplets so every zone type shows up."""
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    stop = len(df) - 2 if stop is None else stop
+    for k, i in enumerate(range(every, stop, every)):
+        before_up, after_up = bool(k & 1), bool(k & 2)
+        for j, up in ((i - 1, before_up), (i + 1, after_up)):
+            mid = df["close"].iloc[j - 1]
+            move = mid * 0.04 * (1 + rng.random())
+            df.iloc[j, df.columns.get_loc("open")] = mid - move / 2 if up else mid + move / 2
+            df.iloc[j, df.columns.get_loc("close")] = mid + move / 2 if up else mid - move / 2
+            df.iloc[j, df.columns.get_loc("high")] = mid + move * 0.6
+            df.iloc[j, df.columns.get_loc("low")] = mid - move * 0.6
+        mid = df["close"].iloc[i - 1]
+        df.iloc[i, df.columns.get_loc("open")] = mid
+        df.iloc[i, df.columns.get_loc("close")] = mid * 1.001
+        df.iloc[i, df.columns.get_loc("high")] = mid * 1.01
+        df.iloc[i, df.columns.get_loc("low")] = mid * 0.99
+    return df
+
+
+def _reference_zones(df, atr_multiplier=1.2):
+    """The original per-bar loop."""
+    zones = []
+    for i in range(1, len(df) - 1):
+        if not abs(df["close"].iloc[i] - df["open"].iloc[i]) < (df["high"].iloc[i] - df["low"].iloc[i]) * 0.6:
+            continue
+        atr_value = df["atr"].iloc[i]
+        if pd.isna(atr_value) or atr_value == 0:
+            continue
+        threshold = atr_value * atr_multiplier
+        if not (abs(df["close"].iloc[i - 1] - df["open"].iloc[i - 1]) > threshold
+                and abs(df["close"].iloc[i + 1] - df["open"].iloc[i + 1]) > threshold):
+            continue
+        before = df["close"].iloc[i - 1] > df["open"].iloc[i - 1]
+        after = df["close"].iloc[i + 1] > df["open"].iloc[i + 1]
+        zone_type = {(False, True): "demand_reversal", (True, False): "supply_reversal",
+                     (True, True): "demand_continuation", (False, False): "supply_continuation"}[(before, after)]
+        zones.append({"type": zone_type, "high": df["high"].iloc[i], "low": df["low"].iloc[i], "index": df.index[i]})
+    return zones
+
+
+def test_vectorized_zones_match_loop(engineer):
+    df = _with_zones(synthetic_ohlcv(2000, seed=3))
+    df["atr"] = AverageTrueRange(df["high"], df["low"], df["close"], window=14).average_true_range()
+    zones = engineer._find_sd_zones(df)
+    assert len({z["type"] for z in zones}) == 4
+    assert zones == _reference_zones(df)
+
+
+def test_inference_row_matches_full_history(engineer):
+    # Zones only well before the warm-up window, and the last bars revisit one of them
+    df = _with_zones(synthetic_ohlcv(3000, seed=11), stop=1500)
+    df.name = "SPX500"
+    df["atr"] = AverageTrueRange(df["high"], df["low"], df["close"], window=14).average_true_range()
+    zone = engineer._find_sd_zones(df)[-1]
+    df = df.drop(columns="atr")
+    scale = (zone["high"] + zone["low"]) / 2 / df["close"].iloc[-1]
+    df.iloc[-5:, :4] *= scale
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        full = engineer.create_all_features(df.copy())
+        latest = engineer.create_all_features(df.copy(), mode="inference")
+
+    expected = full.drop(columns=["label_1", "label_3", "label_5"])
+    expected = expected.replace([np.inf, -np.inf], np.nan).ffill().iloc[-1]
+    assert len(latest) == 1 and latest.index[-1] == df.index[-1]
+    assert list(latest.columns) == list(expected.index)
+
+    row = latest.iloc[0]
+    # History-wide features must match exactly
+    assert row["volatility_regime"] == expected["volatility_regime"]
+    zone_columns = [c for c in expected.index if c.startswith(("in_", "distance_to_"))]
+    assert len(zone_columns) == 8
+    np.testing.assert_array_equal(row[zone_columns].astype(float), expected[zone_columns].astype(float))
+
+    # EMA seeds decay to ~1e-4 within the warm-up (FEATURE_INFERENCE_CONFIG EMA_SETTLE_FACTOR)
+    numeric = [c for c in expected.index if c != "volatility_regime"]
+    np.testing.assert_allclose(
+        row[numeric].astype(float).to_numpy(), expected[numeric].astype(float).to_numpy(),
+        rtol=1e-4, atol=1e-9, equal_nan=True,
+    )
+
+
+def test_inference_regime_uses_full_history_terciles(engineer):
+    # Seed where terciles taken over the warm-up window alone label the last bar differently
+    df = synthetic_ohlcv(3000, seed=29)
+    labels = ["low", "normal", "high"]
+
+    def regime(frame):
+        atr = AverageTrueRange(frame["high"], frame["low"], frame["close"], window=14).average_true_range()
+        return pd.qcut((atr / frame["close"]).rolling(100).rank(pct=True), q=3, labels=labels)
+
+    full_regime = regime(df).iloc[-1]
+    assert regime(df.iloc[-engineer.inference_warmup_bars():]).iloc[-1] != full_regime
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        latest = engineer.create_all_features(df.copy(), mode="inference")
+    assert latest["volatility_regime"].iloc[0] == full_regime
+
+
+def test_inference_keeps_sequence_window(engineer):
+    ns = load("LazyMember", "LazyMemberDict", "raw_members", "sequence_rows_needed")
+
+    class _Sequence:
+        sequence_length = 60
+
+    class _Ensemble:
+        models = {"rf": object(), "lstm": _Sequence()}
+
+    rows = ns["sequence_rows_needed"](_Ensemble())
+    assert rows == 61 and ns["sequence_rows_needed"](object()) == 1
+
+    df = synthetic_ohlcv(2500, seed=5)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        window = engineer.create_all_features(df.copy(), mode="inference", rows=rows)
+        latest = engineer.create_all_features(df.copy(), mode="inference")
+    assert len(window) == rows and window.index[-1] == df.index[-1]
+    pd.testing.assert_frame_equal(window.iloc[-1:], latest, check_exact=False, rtol=1e-4, atol=1e-3)
+
+
+def _plant_zone(df, i, up=True):
+    """Strong candle, base, strong candle centred on bar i (same shape as _with_zones)."""
+    df = df.copy()
+    for j in (i - 1, i + 1):
+        mid = df["close"].iloc[j - 1]
+        move = mid * 0.05
+        df.iloc[j, :4] = [mid - move / 2, mid + move * 0.6, mid - move * 0.6, mid + move / 2] if up else \
+            [mid + move / 2, mid + move * 0.6, mid - move * 0.6, mid - move / 2]
+    mid = df["close"].iloc[i - 1]
+    df.iloc[i, :4] = [mid, mid * 1.01, mid * 0.99, mid * 1.001]
+    return df
+
+
+def test_cached_context_is_reused_for_new_bars(engineer, monkeypatch):
+    df = _with_zones(synthetic_ohlcv(3000, seed=11), stop=1500)
+    # A zone completed after the context was cached, revisited by the last bar
+    df = _plant_zone(df, len(df) - 4)
+    df.iloc[-1, :4] = df.iloc[-4, :4].to_numpy() * [1.0, 0.999, 1.001, 1.0]
+    df.name = "SPX500"
+    engineer._inference_contexts.clear()
+
+    calls = []
+    build = engineer._history_feature_context
+    monkeypatch.setattr(engineer, "_history_feature_context", lambda history: calls.append(len(history)) or build(history))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for history in (df.iloc[:-6].copy(), df.copy()):
+            history.name = df.name  # DataFrame.copy() drops the attribute
+            latest = engineer.create_all_features(history, mode="inference")
+        full = engineer.create_all_features(df.copy())
+    assert calls == [len(df) - 6]  # the second call reused the cached context
+
+    expected = full.replace([np.inf, -np.inf], np.nan).ffill().iloc[-1]
+    row = latest.iloc[0]
+    zone_columns = [c for c in latest.columns if c.startswith(("in_", "distance_to_"))]
+    assert row[zone_columns].astype(float).sum() > 0 and row["in_demand_continuation"] == 1
+    np.testing.assert_array_equal(row[zone_columns].astype(float), expected[zone_columns].astype(float))
+    assert row["volatility_regime"] == expected["volatility_regime"]
+
+
+def test_cached_context_refreshes_after_configured_bars(engineer, monkeypatch):
+    df = synthetic_ohlcv(2000, seed=2)
+    df.name = "EURUSD"
+    engineer._inference_contexts.clear()
+    config = type(engineer).inference_context.__globals__["FEATURE_INFERENCE_CONFIG"]
+    calls = []
+    build = engineer._history_feature_context
+    monkeypatch.setattr(engineer, "_history_feature_context", lambda history: calls.append(len(history)) or build(history))
+    monkeypatch.setitem(config, "CONTEXT_REFRESH_BARS", 3)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for extra in (0, 3, 4):
+            history = df.iloc[:len(df) - 10 + extra].copy()
+            history.name = df.name
+            engineer.create_all_features(history, mode="inference")
+    # Rebuilt on the first call and once the cached bar is more than 3 bars old
+    assert calls == [1990, 1994]
+
+
+def test_batch_inference_keeps_each_symbols_sequence_window(engineer):
+    ns = load("LazyMember", "LazyMemberDict", "raw_members", "sequence_rows_needed", "EnhancedDataManager")
+    bot_cls = load_methods("EnhancedTradingBot", "_inference_rows_needed", "_inference_rows_by_symbol", namespace=ns)
+
+    class _Sequence:
+        sequence_length = 60
+
+    class _Ensemble:
+        models = {"rf": object(), "lstm": _Sequence()}
+
+    bot = bot_cls()
+    bot.trending_models = {"EURUSD": {"ensemble": _Ensemble()}}
+    bot.ranging_models = {"XAUUSD": {"ensemble": object()}}
+    rows = bot._inference_rows_by_symbol(["EURUSD", "XAUUSD"])
+    assert rows == {"EURUSD": 61, "XAUUSD": 1}
+
+    history = {"EURUSD": synthetic_ohlcv(2500, seed=5), "XAUUSD": synthetic_ohlcv(2500, seed=6)}
+
+    class _DataManager:
+        def create_enhanced_features(self, symbol, mode="training", rows=1):
+            return engineer.create_all_features(history[symbol].copy(), mode=mode, rows=rows)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        frames = ns["EnhancedDataManager"].create_enhanced_features_batch(
+            _DataManager(), ["EURUSD", "XAUUSD"], "inference", rows=rows)
+        single = ns["EnhancedDataManager"].create_enhanced_features_batch(_DataManager(), ["XAUUSD"], "inference")
+    assert len(frames["EURUSD"]) == 61 and len(frames["XAUUSD"]) == 1 and len(single["XAUUSD"]) == 1
+    assert frames["EURUSD"].index[-1] == history["EURUSD"].index[-1]
+
+
+def test_live_data_cache_is_built_from_inference_frames():
+    import asyncio
+    bot_cls = load_methods("EnhancedTradingBot", "_handle_data_management", namespace=base_namespace())
+    calls = []
+
+    class _DataManager:
+        def create_enhanced_features_batch(self, symbols, mode="training", rows=1):
+            calls.append((list(symbols), mode, rows))
+            return {symbol: synthetic_ohlcv(rows[symbol], seed=k) for k, symbol in enumerate(symbols)}
+
+    bot = bot_cls()
+    bot.data_manager = _DataManager()
+    bot.active_symbols = {"EURUSD"}
+    bot.open_positions = {"XAUUSD": {}}
+    bot._inference_rows_by_symbol = lambda symbols: {symbol: 61 if symbol == "EURUSD" else 1 for symbol in symbols}
+
+    cache = asyncio.run(bot._handle_data_management())
+    assert calls == [(["EURUSD", "XAUUSD"], "inference", {"EURUSD": 61, "XAUUSD": 1})]
+    # A single-row inference frame is enough for scoring and price checks
+    assert len(cache["EURUSD"]) == 61 and len(cache["XAUUSD"]) == 1
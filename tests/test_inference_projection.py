@@ -0,0 +1,118 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+from source_loader import base_namespace, load
+
+
+@pytest.fixture
+def ns():
+    return load("TREE_EXPORT_CONFIG", "INFERENCE_PROJECTION_CONFIG", "DISTILLATION_CONFIG", "LazyMember",
+                "LazyMemberDict", "raw_members", "CompiledTreeEnsemble", "EnsembleModel",
+                namespace=base_namespace(json=json))
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(500, 6)), columns=[f"f{i}" for i in range(6)])
+    y = ((X["f0"] - X["f3"] + rng.normal(0, 0.5, len(X))) > 0).astype(int)
+    return X, y
+
+
+def _ensemble(ns, data):
+    X, y = data
+    ensemble = ns["EnsembleModel"]()
+    ensemble.models = {
+        "rf": RandomForestClassifier(n_estimators=30, max_depth=6, random_state=0).fit(X, y),
+        # A different subset and order of the inputs
+        "et": ExtraTreesClassifier(n_estimators=20, random_state=1).fit(X[["f3", "f5", "f0", "f1"]], y),
+    }
+    return ensemble
+
+
+def _live_frame(data):
+    X, _ = data
+    live = X.iloc[:40][["f5", "f1", "f0", "f2", "f3"]].copy()  # shuffled, f4 missing
+    live["session"] = 1.0                                       # a column no member uses
+    live.iloc[-1, live.columns.get_loc("f0")] = np.nan          # forward-filled from the row before
+    live.iloc[-3:, live.columns.get_loc("f3")] = np.inf
+    live["f5"] = np.nan                                         # never finite -> 0
+    return live
+
+
+def _reference(ensemble, live, feature_columns=None):
+    """What the DataFrame path computes: clean the frame, then feed each member its columns."""
+    clean = live.replace([np.inf, -np.inf], np.nan).ffill().bfill().fillna(0).tail(1)
+    blended, total = 0.0, 0.0
+    for name, model in ensemble.models.items():
+        columns = feature_columns if feature_columns is not None else list(model.feature_names_in_)
+        row = clean.reindex(columns=columns, fill_value=0.0).to_numpy(dtype=np.float32)
+        weight = ensemble.MEMBER_WEIGHTS.get(name, 0.33)
+        blended += weight * model.predict_proba(row)[0, 1]
+        total += weight
+    return blended / total
+
+
+def test_last_clean_values_match_the_cleaned_frame(ns, data):
+    live = _live_frame(data)
+    col_idx = np.arange(live.shape[1])
+    expected = live.replace([np.inf, -np.inf], np.nan).ffill().bfill().fillna(0).iloc[-1].to_numpy()
+    np.testing.assert_array_equal(ns["EnsembleModel"]._last_clean_values(live, col_idx), expected)
+    np.testing.assert_array_equal(ns["EnsembleModel"]._last_clean_values(live, np.array([3, 1])), expected[[3, 1]])
+
+
+def test_projected_prediction_matches_per_member_reindexing(ns, data):
+    ensemble = _ensemble(ns, data)
+    ensemble._predict_proba_frame = lambda X, feature_columns=None: pytest.fail("DataFrame path used")
+    live = _live_frame(data)
+
+    assert ensemble.predict_proba(live) == pytest.approx(_reference(ensemble, live), abs=1e-12)
+    members = ensemble._predict_members_projected(live)
+    assert set(members) == {"rf", "et"}
+    # The preallocated buffers are reused (and zeroed) between calls
+    assert ensemble.predict_proba(live.iloc[:-1]) == pytest.approx(_reference(ensemble, live.iloc[:-1]), abs=1e-12)
+
+
+def test_explicit_feature_columns_order_every_member(ns, data):
+    X, y = data
+    ensemble = ns["EnsembleModel"]()
+    columns = ["f2", "f0", "f4", "f3"]
+    ensemble.models = {"rf": RandomForestClassifier(n_estimators=20, random_state=0).fit(X[columns].to_numpy(), y)}
+    live = _live_frame(data)
+    assert ensemble.predict_proba(live, feature_columns=columns) == pytest.approx(
+        _reference(ensemble, live, feature_columns=columns), abs=1e-12)
+
+
+def test_projections_are_cached_per_input_layout(ns, data, monkeypatch):
+    ensemble = _ensemble(ns, data)
+    live = _live_frame(data)
+    ensemble.predict_proba(live)
+    cached = dict(ensemble._projections)
+    assert len(cached) == 2  # one per member
+
+    ensemble.predict_proba(live.copy())
+    assert all(ensemble._projections[key] is projection for key, projection in cached.items())
+    ensemble.predict_proba(live[live.columns[::-1]])
+    assert len(ensemble._projections) == 4
+
+    monkeypatch.setitem(ns["INFERENCE_PROJECTION_CONFIG"], "MAX_LAYOUTS", 2)
+    ensemble.predict_proba(live.drop(columns="session"))
+    assert len(ensemble._projections) == 2  # the bound was reached, so the cache restarted
+
+
+def test_unknown_feature_order_or_disabled_uses_the_dataframe_path(ns, data, monkeypatch):
+    X, y = data
+    live = _live_frame(data)
+    ensemble = _ensemble(ns, data)
+    ensemble.models["raw"] = RandomForestClassifier(n_estimators=5, random_state=0).fit(X.to_numpy(), y)
+    ensemble._predict_proba_frame = lambda X, feature_columns=None: "frame path"
+    assert ensemble.predict_proba(live) == "frame path"
+
+    ensemble = _ensemble(ns, data)
+    ensemble._predict_proba_frame = lambda X, feature_columns=None: "frame path"
+    monkeypatch.setitem(ns["INFERENCE_PROJECTION_CONFIG"], "ENABLED", False)
+    assert ensemble.predict_proba(live) == "frame path"
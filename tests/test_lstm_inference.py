@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from sklearn.preprocessing import StandardScaler
+from numpy.lib.stride_tricks import sliding_window_view
+
+from source_loader import base_namespace, load
+
+SEQUENCE_LENGTH, FEATURES = 12, 5
+
+
+@pytest.fixture(scope="module")
+def lstm():
+    ns = base_namespace(tf=tf, StandardScaler=StandardScaler, sliding_window_view=sliding_window_view)
+    load("LSTM_INFERENCE_CONFIG", "LSTMModel", namespace=ns)
+    tf.keras.utils.set_random_seed(0)
+    inputs = tf.keras.Input(shape=(SEQUENCE_LENGTH, FEATURES))
+    hidden = tf.keras.layers.LSTM(8)(inputs)
+    outputs = tf.keras.layers.Dense(1, activation="sigmoid")(hidden)
+
+    model = ns["LSTMModel"](sequence_length=SEQUENCE_LENGTH, features_dim=FEATURES)
+    model.model = tf.keras.Model(inputs, outputs)
+    X = pd.DataFrame(np.random.default_rng(0).normal(size=(200, FEATURES)), columns=list("abcde"))
+    model.scaler.fit(X.to_numpy())
+    return model, X
+
+
+def test_compiled_forward_matches_predict(lstm):
+    model, X = lstm
+    X_seq = model.prepare_last_window(X)
+    assert X_seq.shape == (1, SEQUENCE_LENGTH, FEATURES)
+
+    expected = model.model.predict(X_seq, verbose=0)
+    compiled = model.compiled_forward()(tf.constant(X_seq, dtype=tf.float32)).numpy()
+    np.testing.assert_allclose(compiled, expected, rtol=1e-5, atol=1e-6)
+    assert model.predict_proba(X) == pytest.approx(float(expected[-1, -1]), abs=1e-6)
+
+
+def test_benchmark_compiled_forward_against_predict(lstm):
+    model, X = lstm
+    result = model.benchmark_inference(X, repeats=20)
+    assert result["abs_diff"] < 1e-6
+    assert result["keras_ms"] > 0 and result["compiled_ms"] > 0
+    # Keras predict() builds a data adapter per call; the traced function does not
+    assert result["compiled_ms"] < result["keras_ms"]
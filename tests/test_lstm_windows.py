@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("sklearn")
+
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.preprocessing import StandardScaler
+from numpy.lib.stride_tricks import sliding_window_view
+
+from source_loader import base_namespace, load
+
+SEQUENCE_LENGTH = 7
+
+
+def _lstm_ns(**extra):
+    ns = base_namespace(StandardScaler=StandardScaler, sliding_window_view=sliding_window_view,
+                        TimeSeriesSplit=TimeSeriesSplit, **extra)
+    return load("ML_CONFIG", "LSTM_PIPELINE_CONFIG", "LSTMModel", namespace=ns)
+
+
+@pytest.fixture(scope="module")
+def lstm_model():
+    return _lstm_ns()["LSTMModel"](sequence_length=SEQUENCE_LENGTH, features_dim=4)
+
+
+def _dense_sequences(X, y, sequence_length):
+    """The original create_sequences loop: window i-L..i-1 labelled with y[i]."""
+    sequences, targets = [], []
+    for i in range(sequence_length, min(len(X), len(y))):
+        sequences.append(X[i - sequence_length:i])
+        targets.append(y[i])
+    return np.array(sequences), np.array(targets)
+
+
+def test_strided_windows_match_dense(lstm_model):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(120, 4)).astype(np.float32)
+    y = rng.integers(0, 2, size=120)
+    dense, _ = _dense_sequences(X, y, lstm_model.sequence_length)
+    np.testing.assert_array_equal(lstm_model.sequence_windows(X), dense)
+
+
+@pytest.mark.parametrize("n_rows,batch_size", [(120, 16), (83, 64), (18, 5)])
+def test_gathered_batches_match_strided_windows(lstm_model, n_rows, batch_size):
+    X = np.random.default_rng(n_rows).normal(size=(n_rows, 3)).astype(np.float32)
+    windows = lstm_model.sequence_windows(X)
+    offsets = np.arange(lstm_model.sequence_length)
+    ids = np.arange(len(windows))
+    for k in range(0, len(ids), batch_size):
+        batch = ids[k:k + batch_size]
+        np.testing.assert_array_equal(X[lstm_model.window_rows(batch, offsets)], windows[batch])
+
+
+def _materialise(dataset):
+    batches = list(dataset.as_numpy_iterator())
+    return np.concatenate([b[0] for b in batches]), np.concatenate([b[1] for b in batches])
+
+
+class _RecordingKeras:
+    """Stands in for the compiled Keras model: keeps the (X, y) train/validation arrays fit() saw."""
+
+    def fit(self, x, y=None, validation_data=None, **kwargs):
+        # Datasets are drained here: an on-disk cache only exists while fit() runs
+        self.train = _materialise(x) if y is None else (x, y)
+        self.val = _materialise(validation_data) if y is None else validation_data
+        return "history"
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_streaming_training_sees_the_dense_split(tmp_path, monkeypatch, cache):
+    tf = pytest.importorskip("tensorflow")
+    import shutil
+    import tempfile
+
+    ns = _lstm_ns(tf=tf, shutil=shutil, tempfile=tempfile, EarlyStopping=tf.keras.callbacks.EarlyStopping,
+                  ReduceLROnPlateau=tf.keras.callbacks.ReduceLROnPlateau)
+    monkeypatch.setitem(ns["ML_CONFIG"], "BATCH_SIZE", 16)
+    monkeypatch.setitem(ns["LSTM_PIPELINE_CONFIG"], "CACHE_DIR", str(tmp_path) if cache else None)
+    rng = np.random.default_rng(3)
+    X = pd.DataFrame(rng.normal(size=(150, 4)), columns=list("abcd"))
+    y = pd.Series(rng.integers(0, 2, size=150))
+
+    fitted = {}
+    for streaming in (False, True):
+        monkeypatch.setitem(ns["LSTM_PIPELINE_CONFIG"], "STREAMING", streaming)
+        model = ns["LSTMModel"](sequence_length=SEQUENCE_LENGTH, features_dim=4)
+        model.model = _RecordingKeras()
+        assert model.train(X, y) == "history"
+        fitted[streaming] = model.model
+
+    dense, streamed = fitted[False], fitted[True]
+    for got, expected in ((streamed.train, dense.train), (streamed.val, dense.val)):
+        np.testing.assert_allclose(got[0], expected[0], rtol=1e-5, atol=1e-6)
+        np.testing.assert_array_equal(got[1], expected[1])
+    assert list(tmp_path.iterdir()) == []  # Per-fit cache directory removed after fitting
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from source_loader import load
+
+
+@pytest.fixture(scope="module")
+def model_file_matches():
+    return load("model_file_matches")["model_file_matches"]
+
+
+def _write(tmp_path, name, metadata):
+    pkl = tmp_path / name
+    pkl.write_bytes(b"")
+    if metadata is not None:
+        pkl.with_suffix(".json").write_text(json.dumps(metadata))
+    return str(pkl)
+
+
+def test_announced_file_must_match_symbol_and_regime(tmp_path, model_file_matches):
+    trending = _write(tmp_path, "ensemble_trending_model_EURUSD_20260101_000000.pkl",
+                      {"symbol": "EURUSD", "model_type": "ensemble_trending"})
+    assert model_file_matches(trending, "EURUSD", "ensemble_trending")
+    assert not model_file_matches(trending, "EURUSD", "ensemble_ranging")
+    assert not model_file_matches(trending, "EURUSD.m", "ensemble_trending")
+    assert not model_file_matches(None, "EURUSD", "ensemble_trending")
+
+
+def test_metadata_disagreement_is_rejected(tmp_path, model_file_matches):
+    renamed = _write(tmp_path, "ensemble_ranging_model_XAUUSD_20260101_000000.pkl",
+                     {"symbol": "XAUUSD", "model_type": "ensemble_trending"})
+    assert not model_file_matches(renamed, "XAUUSD", "ensemble_ranging")
+    no_metadata = _write(tmp_path, "ensemble_ranging_model_XAUUSD_20260102_000000.pkl", None)
+    assert model_file_matches(no_metadata, "XAUUSD", "ensemble_ranging")
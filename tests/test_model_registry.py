@@ -0,0 +1,118 @@
+import json
+import os
+import shutil
+import types
+
+import joblib
+import pytest
+
+from source_loader import base_namespace, load
+
+
+@pytest.fixture
+def ns(tmp_path):
+    return load("MODEL_REGISTRY_CONFIG", "_artefact_member_dir", "load_latest_model", "load_model_file",
+                "_load_validated_model", "load_latest_model_metadata", "ModelRegistry", "MODEL_REGISTRY",
+                namespace=base_namespace(joblib=joblib, shutil=shutil, MODEL_DIR=str(tmp_path)))
+
+
+def _save(tmp_path, name, tag, valid=True, metadata=None):
+    """Dump a model artefact and bump the directory mtime past filesystem timestamp granularity."""
+    path = tmp_path / name
+    ensemble = types.SimpleNamespace(meta_model="meta", tag=tag) if valid else types.SimpleNamespace(tag=tag)
+    joblib.dump({"ensemble": ensemble, "feature_columns": ["a"]}, path)
+    if metadata is not None:
+        path.with_suffix(".json").write_text(json.dumps(metadata))
+    stamp = max(os.stat(tmp_path).st_mtime_ns, os.stat(path).st_mtime_ns) + 10**9
+    os.utime(path, ns=(stamp, stamp))
+    os.utime(tmp_path, ns=(stamp, stamp))
+    return str(path)
+
+
+def test_newest_artefact_is_loaded_once_and_then_served_resident(ns, tmp_path):
+    _save(tmp_path, "ensemble_trending_model_EURUSD_20260101_000000.pkl", "old")
+    registry = ns["MODEL_REGISTRY"]
+
+    first = ns["load_latest_model"]("EURUSD", "ensemble_trending")
+    assert first["ensemble"].tag == "old"
+    assert ns["load_latest_model"]("EURUSD", "ensemble_trending") is first
+    assert ns["load_latest_model"]("EURUSD", "ensemble_ranging") is None
+    assert registry.stats == {"scans": 1, "loads": 1, "hits": 1}
+
+    _save(tmp_path, "ensemble_trending_model_EURUSD_20260102_000000.pkl", "new")
+    assert ns["load_latest_model"]("EURUSD", "ensemble_trending")["ensemble"].tag == "new"
+    assert registry.stats["scans"] == 2 and registry.stats["loads"] == 2
+
+
+def test_file_replaced_in_place_is_reloaded(ns, tmp_path):
+    name = "ensemble_ranging_model_XAUUSD_20260101_000000.pkl"
+    _save(tmp_path, name, "first")
+    assert ns["load_latest_model"]("XAUUSD", "ensemble_ranging")["ensemble"].tag == "first"
+    _save(tmp_path, name, "rewritten")
+    assert ns["load_latest_model"]("XAUUSD", "ensemble_ranging")["ensemble"].tag == "rewritten"
+
+
+def test_incompatible_newest_file_is_deleted(ns, tmp_path):
+    _save(tmp_path, "ensemble_trending_model_EURUSD_20260101_000000.pkl", "good")
+    bad = _save(tmp_path, "ensemble_trending_model_EURUSD_20260102_000000.pkl", "bad", valid=False, metadata={})
+
+    assert ns["load_latest_model"]("EURUSD", "ensemble_trending") is None
+    assert not os.path.exists(bad) and not os.path.exists(bad.replace(".pkl", ".json"))
+    # The next lookup re-lists the directory and falls back to the remaining artefact
+    assert ns["load_latest_model"]("EURUSD", "ensemble_trending")["ensemble"].tag == "good"
+
+
+def test_saved_model_is_registered_without_unpickling(ns, tmp_path):
+    registry = ns["MODEL_REGISTRY"]
+    path = _save(tmp_path, "ensemble_trending_model_EURUSD_20260101_000000.pkl", "trained")
+    model_data = {"ensemble": types.SimpleNamespace(meta_model="meta", tag="in memory")}
+
+    registry.put("EURUSD", "ensemble_trending", path, model_data)
+
+    assert ns["load_latest_model"]("EURUSD", "ensemble_trending") is model_data
+    assert registry.stats["loads"] == 0 and registry.stats["hits"] == 1
+
+
+def test_announced_older_file_does_not_replace_the_resident_newest(ns, tmp_path):
+    registry = ns["MODEL_REGISTRY"]
+    older = _save(tmp_path, "ensemble_trending_model_EURUSD_20260101_000000.pkl", "older")
+    newest = _save(tmp_path, "ensemble_trending_model_EURUSD_20260102_000000.pkl", "newest")
+
+    assert ns["load_model_file"](older, "EURUSD", "ensemble_trending")["ensemble"].tag == "older"
+    assert ns["load_model_file"](older, "EURUSD", "ensemble_trending")["ensemble"].tag == "older"
+    assert registry.stats["loads"] == 2  # never resident, so read again
+
+    announced = ns["load_model_file"](newest, "EURUSD", "ensemble_trending")
+    assert ns["load_latest_model"]("EURUSD", "ensemble_trending") is announced
+    assert ns["load_model_file"](str(tmp_path / "missing.pkl"), "EURUSD", "ensemble_trending") is None
+
+
+def test_metadata_is_cached_until_the_file_changes(ns, tmp_path, monkeypatch):
+    path = _save(tmp_path, "ensemble_trending_model_EURUSD_20260101_000000.pkl", "m",
+                 metadata={"timestamp": "20260101_000000"})
+    reads = []
+    real_load = json.load
+    monkeypatch.setitem(ns, "json", types.SimpleNamespace(load=lambda f: reads.append(f.name) or real_load(f)))
+
+    assert ns["load_latest_model_metadata"]("EURUSD", "ensemble_trending")["timestamp"] == "20260101_000000"
+    assert ns["load_latest_model_metadata"]("EURUSD", "ensemble_trending")["timestamp"] == "20260101_000000"
+    assert len(reads) == 1
+
+    metadata_file = path.replace(".pkl", ".json")
+    with open(metadata_file, "w") as f:
+        f.write(json.dumps({"timestamp": "edited"}))
+    stamp = os.stat(metadata_file).st_mtime_ns + 10**9
+    os.utime(metadata_file, ns=(stamp, stamp))
+    assert ns["load_latest_model_metadata"]("EURUSD", "ensemble_trending")["timestamp"] == "edited"
+    assert ns["load_latest_model_metadata"]("GBPUSD", "ensemble_trending") is None
+
+
+def test_disabled_registry_scans_the_directory_each_time(ns, tmp_path, monkeypatch):
+    monkeypatch.setitem(ns["MODEL_REGISTRY_CONFIG"], "ENABLED", False)
+    _save(tmp_path, "ensemble_trending_model_EURUSD_20260101_000000.pkl", "old")
+    _save(tmp_path, "ensemble_trending_model_EURUSD_20260102_000000.pkl", "new")
+
+    first = ns["load_latest_model"]("EURUSD", "ensemble_trending")
+    assert first["ensemble"].tag == "new"
+    assert ns["load_latest_model"]("EURUSD", "ensemble_trending") is not first
+    assert ns["MODEL_REGISTRY"].stats == {"scans": 0, "loads": 0, "hits": 0}
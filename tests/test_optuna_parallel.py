@@ -0,0 +1,124 @@
+import contextlib
+import multiprocessing as mp
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pytest
+
+optuna = pytest.importorskip("optuna")
+
+from source_loader import base_namespace, load
+
+
+class _ThreadPool(ThreadPoolExecutor):
+    """Stands in for ProcessPoolExecutor: the exec'd worker function cannot be pickled for spawn."""
+
+    def __init__(self, max_workers=None, mp_context=None):
+        super().__init__(max_workers=max_workers)
+
+
+@pytest.fixture
+def ns(monkeypatch, tmp_path):
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    ns = load(
+        "OPTUNA_CONFIG", "OPTUNA_PARALLEL_CONFIG", "OPTUNA_PRUNING_CONFIG", "FEATURE_POOL_CONFIG",
+        "OptunaStudyManager", "shutdown_executor", "_optuna_study_worker", "EnsembleModel",
+        namespace=base_namespace(optuna=optuna, joblib=joblib, mp=mp, tempfile=tempfile, shutil=shutil,
+                                 contextlib=contextlib, ProcessPoolExecutor=_ThreadPool,
+                                 OPTIONAL_PACKAGES={"optuna": True}),
+    )
+
+    class _QuadraticEnsemble(ns["EnsembleModel"]):
+        def _objective(self, trial, X, y, model_name):
+            assert self.n_jobs == ns["EnsembleModel"]._optuna_worker_plan(self)[1]
+            x = trial.suggest_float("x", -3, 3)
+            return -(x - float(np.mean(X))) ** 2
+
+    # The worker builds its ensemble from the module-level name
+    ns["EnsembleModel"] = _QuadraticEnsemble
+    (tmp_path / "scratch").mkdir()
+    monkeypatch.setitem(ns["FEATURE_POOL_CONFIG"], "SCRATCH_DIR", str(tmp_path / "scratch"))
+    monkeypatch.setitem(ns["OPTUNA_CONFIG"], "N_TRIALS", 7)
+    monkeypatch.setitem(ns["OPTUNA_CONFIG"], "TIMEOUT_SEC", 60)
+    monkeypatch.setitem(ns["OPTUNA_PARALLEL_CONFIG"], "CPU_BUDGET", 4)
+    monkeypatch.setitem(ns["OPTUNA_PARALLEL_CONFIG"], "N_WORKERS", 3)
+    return ns
+
+
+def _study(ns, tmp_path, name="trading_bot_EURUSD_TRENDING_rf"):
+    manager = ns["OptunaStudyManager"](f"sqlite:///{tmp_path / 'optuna.db'}")
+    return manager, manager.create_or_load_study(name, direction="maximize")
+
+
+@pytest.mark.parametrize("budget, workers, n_trials, expected", [
+    (4, 3, 7, (3, 1)),
+    (8, 4, 50, (4, 2)),
+    (8, 4, 2, (2, 4)),   # never more workers than trials
+    (1, 4, 50, (1, 1)),  # a single core runs serially
+])
+def test_worker_plan_splits_the_cpu_budget(ns, monkeypatch, budget, workers, n_trials, expected):
+    monkeypatch.setitem(ns["OPTUNA_PARALLEL_CONFIG"], "CPU_BUDGET", budget)
+    monkeypatch.setitem(ns["OPTUNA_PARALLEL_CONFIG"], "N_WORKERS", workers)
+    monkeypatch.setitem(ns["OPTUNA_CONFIG"], "N_TRIALS", n_trials)
+    assert ns["EnsembleModel"]()._optuna_worker_plan() == expected
+
+
+def test_workers_share_the_study_trials(ns, tmp_path):
+    manager, study = _study(ns, tmp_path)
+    X, y = np.full((40, 3), 0.5), np.zeros(40)
+
+    assert ns["EnsembleModel"]()._run_parallel_study(study, manager, study.study_name, "rf", X, y) is True
+
+    trials = optuna.load_study(study_name=study.study_name, storage=manager.storage).trials
+    assert len(trials) == 7  # 3 + 3 + 1 trials
+    assert all(t.state == optuna.trial.TrialState.COMPLETE for t in trials)
+    assert list((tmp_path / "scratch").iterdir()) == []  # the X/y exchange file is removed
+
+
+def test_workers_survive_racing_for_an_enqueued_seed(ns, tmp_path):
+    manager, study = _study(ns, tmp_path)
+    study.enqueue_trial({"x": 0.5})  # warm-start seed: every worker tries to pop it first
+    X, y = np.full((40, 3), 0.5), np.zeros(40)
+
+    assert ns["EnsembleModel"]()._run_parallel_study(study, manager, study.study_name, "rf", X, y) is True
+
+    trials = optuna.load_study(study_name=study.study_name, storage=manager.storage).trials
+    # A seed run by two workers is one trial in storage but counts against both shares
+    assert len(trials) >= 6
+    assert trials[0].params == {"x": 0.5} and trials[0].state == optuna.trial.TrialState.COMPLETE
+    assert not [t for t in trials if t.state == optuna.trial.TrialState.RUNNING]
+    assert study.best_params == {"x": 0.5}
+
+
+def test_search_falls_back_to_serial_when_no_trial_finishes(ns, tmp_path):
+    def _broken(self, trial, X, y, model_name):
+        raise RuntimeError("objective crashed")
+
+    ns["EnsembleModel"]._objective = _broken
+    manager, study = _study(ns, tmp_path)
+    study.add_trial(optuna.trial.create_trial(params={"x": 0.0}, value=-1.0,
+                                              distributions={"x": optuna.distributions.FloatDistribution(-3, 3)}))
+
+    ensemble = ns["EnsembleModel"]()
+    # Trials finished before this run do not count
+    assert ensemble._run_parallel_study(study, manager, study.study_name, "rf", np.zeros((10, 2)), np.zeros(10)) is False
+    assert list((tmp_path / "scratch").iterdir()) == []
+
+
+def test_parallel_search_is_skipped_without_shared_storage_or_cores(ns, monkeypatch, tmp_path):
+    ensemble = ns["EnsembleModel"]()
+    manager, study = _study(ns, tmp_path)
+    args = (study, manager, study.study_name, "rf", np.zeros((10, 2)), np.zeros(10))
+
+    monkeypatch.setitem(ns["OPTUNA_PARALLEL_CONFIG"], "CPU_BUDGET", 1)
+    assert ensemble._run_parallel_study(*args) is False
+    monkeypatch.setitem(ns["OPTUNA_PARALLEL_CONFIG"], "CPU_BUDGET", 4)
+    monkeypatch.setitem(ns["OPTUNA_PARALLEL_CONFIG"], "ENABLED", False)
+    assert ensemble._run_parallel_study(*args) is False
+    monkeypatch.setitem(ns["OPTUNA_PARALLEL_CONFIG"], "ENABLED", True)
+    manager.storage = None  # in-memory study: workers could not see it
+    assert ensemble._run_parallel_study(*args) is False
+    assert study.trials == []
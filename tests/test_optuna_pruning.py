@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+optuna = pytest.importorskip("optuna")
+
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from sklearn.model_selection import TimeSeriesSplit
+
+from source_loader import base_namespace, load
+
+
+@pytest.fixture(params=["xgb", "lgb"])
+def boosting(request, monkeypatch):
+    package = {"xgb": "xgboost", "lgb": "lightgbm"}[request.param]
+    lib = pytest.importorskip(package)
+    ns = base_namespace(optuna=optuna, clone=clone, f1_score=f1_score, **{request.param: lib})
+    ns.setdefault("xgb", None)
+    load("OPTUNA_CONFIG", "OPTUNA_PRUNING_CONFIG", "FOLD_PLAN_CONFIG", "FoldPlan", "_boosting_f1",
+         "_lgb_f1_metric", "_boosting_pruning_callback", "EnsembleModel", namespace=ns)
+    monkeypatch.setitem(ns["OPTUNA_PRUNING_CONFIG"], "BOOSTING_REPORT_EVERY", 1)
+    monkeypatch.setitem(ns["OPTUNA_PRUNING_CONFIG"], "BOOSTING_WARMUP_ITERS", 0)
+    if request.param == "xgb":
+        model = lib.XGBClassifier(n_estimators=20, max_depth=3, verbosity=0)
+    else:
+        model = lib.LGBMClassifier(n_estimators=20, num_leaves=7, verbose=-1)
+    return request.param, model, ns
+
+
+def test_boosting_reports_the_objectives_running_f1(boosting):
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    name, model, ns = boosting
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(900, 5)), columns=list("abcde"))
+    y = pd.Series(((X["a"] + 0.5 * X["b"] + rng.normal(0, 1, len(X))) > 0).astype(int))
+    plan = ns["FoldPlan"](None, TimeSeriesSplit(n_splits=3).split(X), len(X))
+    ensemble = ns["EnsembleModel"].__new__(ns["EnsembleModel"])
+
+    study = optuna.create_study(direction="maximize", pruner=optuna.pruners.NopPruner())
+    trial = study.ask()
+    value = ensemble._purged_cv_score(trial, model, X, y, name, plan)
+    study.tell(trial, value)
+
+    reported = study.trials[0].intermediate_values
+    stride = ns["OPTUNA_PRUNING_CONFIG"]["FOLD_STEP_STRIDE"]
+    fold_scores = []
+    for fold, (X_tr, y_tr, X_te, y_te) in enumerate(plan.fold_frames(X, y)):
+        fold_scores.append(f1_score(y_te, clone(model).fit(X_tr, y_tr).predict(X_te), zero_division=0))
+        # The last report of each fold is the running mean F1 the objective is built from
+        assert reported[fold * stride + 19] == pytest.approx(np.mean(fold_scores))
+    assert value == pytest.approx(np.mean(fold_scores))
+    assert all(0.0 <= v <= 1.0 for v in reported.values())
@@ -0,0 +1,51 @@
+import re
+import types
+
+import pytest
+
+optuna = pytest.importorskip("optuna")
+
+from source_loader import base_namespace, load
+
+KEY = "trading_bot_EURUSD_TRENDING_xgb"
+
+
+@pytest.fixture()
+def ensemble():
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    ns = load("OPTUNA_WARM_START_CONFIG", "EnsembleModel", namespace=base_namespace(optuna=optuna, re=re))
+    return ns["EnsembleModel"].__new__(ns["EnsembleModel"])
+
+
+def _manager_with(names, values=None):
+    manager = types.SimpleNamespace(storage=optuna.storages.InMemoryStorage())
+    for name in names:
+        study = optuna.create_study(study_name=name, storage=manager.storage, direction="maximize")
+        for value in (values or {}).get(name, []):
+            study.add_trial(optuna.trial.create_trial(params={"max_depth": value}, value=value / 10,
+                                                      distributions={"max_depth": optuna.distributions.IntDistribution(1, 20)}))
+    return manager
+
+
+def test_old_retrain_studies_beyond_keep_are_deleted(ensemble):
+    retrains = [f"{KEY}_2026010{day}_120000" for day in range(1, 6)]
+    others = [KEY, f"{KEY}boost_20260101_120000", "trading_bot_EURUSD_RANGING_xgb_20260101_120000"]
+    manager = _manager_with(retrains + others)
+
+    deleted = ensemble._delete_old_studies(manager, KEY, retrains[-1])
+
+    assert deleted == retrains[:2]
+    remaining = set(optuna.get_all_study_names(manager.storage))
+    assert remaining == set(retrains[2:]) | set(others)
+    assert ensemble._delete_old_studies(manager, KEY, retrains[-1]) == []
+
+
+def test_warm_start_reads_newest_study_with_finished_trials(ensemble):
+    names = [f"{KEY}_20260101_120000", f"{KEY}_20260102_120000", f"{KEY}_20260103_120000"]
+    # The newest study was cut off before finishing a trial
+    manager = _manager_with(names, {names[0]: [3, 9], names[1]: [4, 7, 5]})
+
+    seeds, target = ensemble._collect_warm_start_seeds(manager, KEY, "xgb")
+
+    assert seeds == [{"max_depth": 7}, {"max_depth": 5}, {"max_depth": 4}]
+    assert target == pytest.approx(0.7)
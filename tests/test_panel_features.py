@@ -0,0 +1,88 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("ta")
+pytest.importorskip("scipy")
+
+from scipy.signal import argrelextrema
+from ta.momentum import RSIIndicator, StochasticOscillator
+from ta.trend import ADXIndicator, EMAIndicator, MACD
+from ta.volatility import AverageTrueRange, BollingerBands
+
+from source_loader import base_namespace, load, synthetic_ohlcv
+
+LENGTHS = {"EURUSD": 700, "XAUUSD": 520, "BTCUSD": 380}
+
+
+@pytest.fixture(scope="module")
+def ns():
+    ns = base_namespace(
+        AverageTrueRange=AverageTrueRange, BollingerBands=BollingerBands, EMAIndicator=EMAIndicator,
+        MACD=MACD, ADXIndicator=ADXIndicator, RSIIndicator=RSIIndicator,
+        StochasticOscillator=StochasticOscillator, argrelextrema=argrelextrema,
+    )
+    return load(
+        "FEATURE_PROFILING_CONFIG", "_NullProfileSection", "_NULL_PROFILE_SECTION", "_ProfileSection",
+        "FeatureProfiler", "FEATURE_PROFILER", "FEATURE_INFERENCE_CONFIG", "calculate_rsi_divergence_vectorized",
+        "PANEL_OHLCV_COLUMNS", "_stack_panel", "_panel_ema", "_panel_wilder", "_panel_true_range",
+        "_panel_atr", "_panel_rsi", "_panel_adx", "_panel_rsi_divergence", "AdvancedFeatureEngineer",
+        namespace=ns,
+    )
+
+
+@pytest.fixture(scope="module")
+def frames():
+    # Different lengths and end dates' worth of history, so the panel is ragged on the left
+    return {symbol: synthetic_ohlcv(n, seed=k) for k, (symbol, n) in enumerate(LENGTHS.items())}
+
+
+def _unstack(wide, offsets, frames):
+    return {symbol: wide[symbol].to_numpy()[offsets[k]:] for k, symbol in enumerate(frames)}
+
+
+@pytest.mark.parametrize("window", [14, 20])
+def test_panel_kernels_match_ta(ns, frames, window):
+    panel, offsets = ns["_stack_panel"](frames)
+    assert list(offsets) == [max(LENGTHS.values()) - n for n in LENGTHS.values()]
+    h, l, c = panel["high"], panel["low"], panel["close"]
+
+    kernels = {
+        "atr": _unstack(ns["_panel_atr"](h, l, c, window, offsets), offsets, frames),
+        "rsi": _unstack(ns["_panel_rsi"](c, window), offsets, frames),
+        "adx": _unstack(ns["_panel_adx"](h, l, c, window, offsets), offsets, frames),
+        "ema": _unstack(ns["_panel_ema"](c, window), offsets, frames),
+    }
+    for symbol, df in frames.items():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            reference = {
+                "atr": AverageTrueRange(df["high"], df["low"], df["close"], window=window).average_true_range(),
+                "rsi": RSIIndicator(df["close"], window=window).rsi(),
+                "adx": ADXIndicator(df["high"], df["low"], df["close"], window=window).adx(),
+                "ema": EMAIndicator(df["close"], window=window).ema_indicator(),
+            }
+        for name, expected in reference.items():
+            np.testing.assert_allclose(kernels[name][symbol], expected.to_numpy(), rtol=1e-9, atol=1e-9,
+                                       equal_nan=True, err_msg=f"{name} {symbol}")
+
+
+def test_panel_features_match_per_symbol(ns, frames):
+    fe = ns["AdvancedFeatureEngineer"]()
+    # idxmin over the all-NaN RSI warm-up raises on pandas>=3 (see test_inference_features)
+    fe._detect_rsi_divergence = lambda df, period: pd.Series(0, index=df.index)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        panel = fe.create_panel_features({symbol: df.copy() for symbol, df in frames.items()})
+        for symbol, df in frames.items():
+            expected = fe.create_all_features(df.copy())
+            got = panel[symbol]
+            assert list(got.columns) == list(expected.columns), symbol
+            pd.testing.assert_index_equal(got.index, expected.index)
+            numeric = expected.select_dtypes(include=[np.number]).columns
+            np.testing.assert_allclose(got[numeric].to_numpy(dtype=float), expected[numeric].to_numpy(dtype=float),
+                                       rtol=1e-7, atol=1e-9, equal_nan=True, err_msg=symbol)
+            others = expected.columns.difference(numeric)
+            pd.testing.assert_frame_equal(got[others].astype(object), expected[others].astype(object), check_dtype=False)
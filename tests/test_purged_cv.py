@@ -0,0 +1,94 @@
+import hashlib
+import shutil
+import tempfile
+import weakref
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+from sklearn.model_selection import TimeSeriesSplit
+
+from source_loader import base_namespace, load
+
+
+@pytest.fixture
+def ns(monkeypatch, tmp_path):
+    ns = load(
+        "PurgedGroupTimeSeriesSplit", "_FINGERPRINT_MEMO", "dataset_fingerprint", "FoldPlan", "FoldPlanCache",
+        "FOLD_PLAN_CONFIG", "FOLD_PLAN_CACHE", "FEATURE_POOL_CONFIG", "PURGED_CV_PARALLEL_CONFIG",
+        "_fit_purged_fold", "EnsembleModel",
+        namespace=base_namespace(
+            hashlib=hashlib, weakref=weakref, OrderedDict=OrderedDict, TimeSeriesSplit=TimeSeriesSplit,
+            joblib=joblib, tempfile=tempfile, shutil=shutil, clone=clone, f1_score=f1_score,
+            accuracy_score=accuracy_score, precision_score=precision_score, recall_score=recall_score,
+            ML_CONFIG={"NOISE_INJECTION": 0.05},
+        ),
+    )
+    (tmp_path / "scratch").mkdir()
+    monkeypatch.setitem(ns["FEATURE_POOL_CONFIG"], "SCRATCH_DIR", str(tmp_path / "scratch"))
+    monkeypatch.setitem(ns["PURGED_CV_PARALLEL_CONFIG"], "MIN_ROWS", 500)
+    monkeypatch.setitem(ns["PURGED_CV_PARALLEL_CONFIG"], "MAX_WORKERS", 3)
+    # The exec'd fold function cannot be pickled into loky workers; threads share the memmap the same way
+    monkeypatch.setitem(ns["PURGED_CV_PARALLEL_CONFIG"], "BACKEND", "threading")
+    return ns
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(1200, 6)), columns=[f"f{i}" for i in range(6)],
+                     index=pd.date_range("2024-01-01", periods=1200, freq="h"))
+    y = pd.Series(((X["f0"] + X["f1"] * X["f2"] + rng.normal(0, 0.5, len(X))) > 0).astype(int), index=X.index)
+    return X, y
+
+
+def _evaluate(ns, X, y):
+    model = RandomForestClassifier(n_estimators=20, max_depth=5, random_state=0)
+    return ns["EnsembleModel"]().evaluate_model_with_purged_cv(model, X, y, n_splits=4, embargo=5)
+
+
+def test_worker_count(ns, data, monkeypatch):
+    X, _ = data
+    ensemble = ns["EnsembleModel"]()
+    assert ensemble._purged_cv_workers(X, 4) == 3
+    assert ensemble._purged_cv_workers(X, 2) == 2
+    assert ensemble._purged_cv_workers(X, 1) == 1
+    assert ensemble._purged_cv_workers(X.iloc[:400], 4) == 1
+    assert ensemble._purged_cv_workers(X.assign(session="london"), 4) == 1  # not one float matrix
+    monkeypatch.setitem(ns["PURGED_CV_PARALLEL_CONFIG"], "ENABLED", False)
+    assert ensemble._purged_cv_workers(X, 4) == 1
+
+
+def test_parallel_folds_match_in_process(ns, data, monkeypatch, tmp_path, caplog):
+    X, y = data
+    parallel = _evaluate(ns, X, y)
+    assert "executor failed" not in caplog.text
+    monkeypatch.setitem(ns["PURGED_CV_PARALLEL_CONFIG"], "ENABLED", False)
+    serial = _evaluate(ns, X, y)
+
+    assert parallel["n_folds"] == serial["n_folds"] == 4
+    for key in ("mean_f1", "mean_accuracy", "mean_precision", "mean_recall", "std_f1"):
+        assert parallel[key] == pytest.approx(serial[key], abs=1e-12), key
+    np.testing.assert_array_equal(parallel["oof_proba"], serial["oof_proba"])
+    # Rows before the first test block are never scored
+    assert np.isnan(parallel["oof_proba"][:240]).all() and np.isfinite(parallel["oof_proba"][240:]).all()
+    assert list((tmp_path / "scratch").iterdir()) == []
+
+
+def test_failed_executor_falls_back_in_process(ns, data, monkeypatch, caplog):
+    X, y = data
+    monkeypatch.setitem(ns["PURGED_CV_PARALLEL_CONFIG"], "ENABLED", False)
+    expected = _evaluate(ns, X, y)
+    monkeypatch.setitem(ns["PURGED_CV_PARALLEL_CONFIG"], "ENABLED", True)
+    monkeypatch.setitem(ns["PURGED_CV_PARALLEL_CONFIG"], "BACKEND", "no-such-backend")
+
+    got = _evaluate(ns, X, y)
+
+    assert "running folds in-process" in caplog.text
+    assert got["mean_f1"] == pytest.approx(expected["mean_f1"], abs=1e-12)
+    np.testing.assert_array_equal(got["oof_proba"], expected["oof_proba"])
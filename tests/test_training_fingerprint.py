@@ -0,0 +1,89 @@
+import hashlib
+import weakref
+
+import numpy as np
+import pytest
+
+from source_loader import base_namespace, load, load_methods, synthetic_ohlcv
+
+
+@pytest.fixture
+def ns():
+    ns = base_namespace(hashlib=hashlib, weakref=weakref,
+                        ML_CONFIG={"MAX_CORRELATION_THRESHOLD": 0.9, "FEATURE_SELECTION_TOP_K": 40,
+                                   "FEATURE_IMPORTANCE_THRESHOLD": 0.001, "ENSEMBLE_MODELS": ["rf", "xgb"]})
+    return load("TRIPLE_BARRIER_CONFIG", "TRAINING_FINGERPRINT_CONFIG", "_FINGERPRINT_MEMO",
+                "dataset_fingerprint", "_config_hash", "training_data_fingerprint", namespace=ns)
+
+
+@pytest.fixture
+def frame():
+    df = synthetic_ohlcv(400, seed=3)
+    df["rsi"] = np.linspace(20, 80, len(df))
+    df["label_3"] = (df["close"].shift(-3) > df["close"]).astype(int)
+    return df
+
+
+def test_fingerprint_is_stable_for_equal_frames(ns, frame):
+    fingerprint = ns["training_data_fingerprint"](frame)
+    assert ns["training_data_fingerprint"](frame.copy()) == fingerprint
+    assert fingerprint["candles"]["rows"] == 400
+    assert fingerprint["candles"]["end"] == str(frame.index[-1])
+    assert ns["training_data_fingerprint"](frame.iloc[:0]) is None
+    assert ns["training_data_fingerprint"](None) is None
+
+
+def test_each_component_tracks_its_inputs(ns, frame, monkeypatch):
+    fp = ns["training_data_fingerprint"]
+    base = fp(frame)
+
+    revised = frame.copy()
+    revised.iloc[100, revised.columns.get_loc("close")] *= 1.001  # a broker revised one candle
+    changed = fp(revised)
+    assert changed["candles"]["content"] != base["candles"]["content"] and changed["hash"] != base["hash"]
+    assert changed["feature_config"] == base["feature_config"]
+
+    assert fp(frame.iloc[1:])["candles"]["start"] != base["candles"]["start"]
+    assert fp(frame.assign(macd=0.0))["feature_config"] != base["feature_config"]
+    assert fp(frame, target_col="label_5")["label_spec"] != base["label_spec"]
+
+    monkeypatch.setitem(ns["ML_CONFIG"], "FEATURE_SELECTION_TOP_K", 20)
+    retuned = fp(frame)
+    assert retuned["feature_config"] != base["feature_config"] and retuned["hash"] != base["hash"]
+    assert retuned["candles"] == base["candles"]
+
+
+def test_feature_values_do_not_enter_the_candle_hash(ns, frame):
+    # Feature columns are derived from the candles plus the config, both already covered
+    assert ns["training_data_fingerprint"](frame.assign(rsi=0.0))["hash"] == ns["training_data_fingerprint"](frame)["hash"]
+
+
+@pytest.fixture
+def bot(ns):
+    ns["SAVED_METADATA"] = {}
+    ns["load_latest_model_metadata"] = lambda symbol, model_type="ensemble": ns["SAVED_METADATA"].get((symbol, model_type))
+    cls = load_methods("EnhancedTradingBot", "_reuse_if_unchanged", namespace=ns)
+    return cls.__new__(cls)
+
+
+def test_reuse_only_when_the_saved_fingerprint_matches(ns, bot, frame, monkeypatch):
+    fingerprint = ns["training_data_fingerprint"](frame)
+    model = {"ensemble": object()}
+    ns["SAVED_METADATA"][("EURUSD", "ensemble_trending")] = {"dataset_fingerprint": fingerprint,
+                                                              "timestamp": "20260101_120000"}
+
+    assert bot._reuse_if_unchanged("EURUSD", model, fingerprint, "TRENDING") is True
+    assert bot._reuse_if_unchanged("EURUSD", model, fingerprint, "RANGING") is False  # nothing saved
+    newer = ns["training_data_fingerprint"](frame.iloc[:-1])
+    assert bot._reuse_if_unchanged("EURUSD", model, newer, "TRENDING") is False
+    assert bot._reuse_if_unchanged("EURUSD", None, fingerprint, "TRENDING") is False
+    assert bot._reuse_if_unchanged("EURUSD", model, None, "TRENDING") is False
+
+    monkeypatch.setitem(ns["TRAINING_FINGERPRINT_CONFIG"], "ENABLED", False)
+    assert bot._reuse_if_unchanged("EURUSD", model, fingerprint, "TRENDING") is False
+
+
+def test_reuse_falls_back_to_the_loaded_model_fingerprint(ns, bot, frame):
+    fingerprint = ns["training_data_fingerprint"](frame)
+    model = {"ensemble": object(), "dataset_fingerprint": fingerprint}
+    assert bot._reuse_if_unchanged("XAUUSD", model, fingerprint, "RANGING") is True
@@ -0,0 +1,110 @@
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from source_loader import base_namespace, load
+
+CONFIG = {"MAX_WORKERS": 2, "POLL_SEC": 0.02, "PAUSE_WARN_SEC": 300, "PRIORITY_REFRESH": 10}
+
+
+@pytest.fixture(scope="module")
+def scheduler_cls():
+    ns = base_namespace(heapq=heapq, ThreadPoolExecutor=ThreadPoolExecutor, TRAINING_SCHEDULER_CONFIG=CONFIG)
+    return load("TrainingScheduler", namespace=ns)["TrainingScheduler"]
+
+
+class _Governor:
+    """Allows a fixed number of workers; the real one samples psutil."""
+
+    def __init__(self, allowed):
+        self.allowed = allowed
+
+    def allowed_workers(self, max_workers):
+        return min(self.allowed, max_workers), {"cpu": 0.0, "memory": 0.0, "rss_mb": 0.0}
+
+
+def _wait_until(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class _Jobs:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = self.peak = 0
+        self.order = []
+
+    def job(self, name, seconds=0.05, error=None):
+        def _run():
+            with self.lock:
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+                self.order.append(name)
+            time.sleep(seconds)
+            with self.lock:
+                self.running -= 1
+            if error:
+                raise error
+        return _run
+
+
+@pytest.mark.parametrize("allowed, peak", [(3, 2), (1, 1)])
+def test_running_jobs_stay_within_governor_limit(scheduler_cls, allowed, peak):
+    scheduler = scheduler_cls(governor=_Governor(allowed), config=CONFIG)
+    jobs = _Jobs()
+    try:
+        for k in range(6):
+            assert scheduler.submit(f"S{k}", "TRENDING", jobs.job(k))
+        _wait_until(lambda: not scheduler.has_pending())
+    finally:
+        scheduler.shutdown(wait=True)
+    assert jobs.peak == peak and sorted(jobs.order) == list(range(6))
+    stats = scheduler.stats_snapshot()
+    assert stats["submitted"] == stats["completed"] == 6
+    assert (stats["throttled"] > 0) == (allowed == 1)
+
+
+def test_paused_jobs_stay_queued_and_start_by_priority(scheduler_cls):
+    governor = _Governor(0)
+    scheduler = scheduler_cls(governor=governor, config=CONFIG)
+    jobs = _Jobs()
+    try:
+        scheduler.submit("EURUSD", "TRENDING", jobs.job("refresh"), priority=10)
+        scheduler.submit("XAUUSD", "RANGING", jobs.job("no model"), priority=0)
+        assert not scheduler.submit("EURUSD", "TRENDING", jobs.job("duplicate"))
+        _wait_until(lambda: scheduler.stats_snapshot()["paused"] >= 3)
+        assert jobs.order == [] and scheduler.is_scheduled("EURUSD", "TRENDING")
+
+        governor.allowed = 1
+        _wait_until(lambda: not scheduler.has_pending())
+    finally:
+        scheduler.shutdown(wait=True)
+    assert jobs.order == ["no model", "refresh"]
+
+
+def test_failed_job_is_counted_and_frees_its_key(scheduler_cls):
+    scheduler = scheduler_cls(governor=_Governor(2), config=CONFIG)
+    jobs = _Jobs()
+    try:
+        scheduler.submit("EURUSD", "TRENDING", jobs.job("bad", error=RuntimeError("boom")))
+        _wait_until(lambda: not scheduler.has_pending())
+        assert scheduler.submit("EURUSD", "TRENDING", jobs.job("retry"))
+        _wait_until(lambda: not scheduler.has_pending())
+    finally:
+        scheduler.shutdown(wait=True)
+    stats = scheduler.stats_snapshot()
+    assert stats["failed"] == 1 and stats["completed"] == 1
+
+
+def test_shutdown_drops_queued_jobs(scheduler_cls):
+    scheduler = scheduler_cls(governor=_Governor(0), config=CONFIG)
+    jobs = _Jobs()
+    scheduler.submit("EURUSD", "TRENDING", jobs.job("never"))
+    scheduler.shutdown(wait=True)
+    assert not scheduler.has_pending() and not scheduler.submit("XAUUSD", "RANGING", jobs.job("late"))
+    assert jobs.order == []
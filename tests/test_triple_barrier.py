@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from source_loader import load, synthetic_ohlcv
+
+
+@pytest.fixture(scope="module")
+def labels():
+    return load("triple_barrier_labels")["triple_barrier_labels"]
+
+
+def _reference(high, low, close, atr, tp_mult, sl_mult, horizon, tie_break="sl"):
+    """Per-row loop over the forward bars."""
+    n = len(close)
+    side, bars, ret = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    for i in range(n):
+        if not (np.isfinite(atr[i]) and atr[i] > 0 and np.isfinite(close[i])):
+            continue
+        upper, lower = close[i] + tp_mult * atr[i], close[i] - sl_mult * atr[i]
+        for k in range(1, horizon + 1):
+            if i + k >= n:
+                break
+            up, down = high[i + k] >= upper, low[i + k] <= lower
+            if up and down:
+                up, down = tie_break == "tp", tie_break != "tp"
+            if up:
+                side[i], bars[i], ret[i] = 1, k, tp_mult * atr[i] / close[i]
+                break
+            if down:
+                side[i], bars[i], ret[i] = -1, k, -sl_mult * atr[i] / close[i]
+                break
+        else:
+            side[i], bars[i], ret[i] = 0, horizon, close[i + horizon] / close[i] - 1
+    return side, bars, ret
+
+
+def _bars(close, high=None, low=None):
+    close = np.asarray(close, dtype=float)
+    high = close if high is None else np.asarray(high, dtype=float)
+    low = close if low is None else np.asarray(low, dtype=float)
+    return high, low, close
+
+
+@pytest.mark.parametrize("tie_break", ["sl", "tp"])
+@pytest.mark.parametrize("chunk_rows", [7, 20000])
+def test_matches_reference_loop(labels, tie_break, chunk_rows):
+    df = synthetic_ohlcv(1500, seed=4)
+    atr = (df["high"] - df["low"]).rolling(14).mean().to_numpy().copy()
+    atr[100] = 0.0
+    atr[200] = np.nan
+    args = (df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), atr, 1.5, 1.0, 12)
+    got = labels(*args, tie_break=tie_break, chunk_rows=chunk_rows)
+    for g, e in zip(got, _reference(*args, tie_break=tie_break)):
+        np.testing.assert_allclose(g, e, rtol=1e-12, equal_nan=True)
+    assert {-1.0, 0.0, 1.0} <= set(np.unique(got[0][np.isfinite(got[0])]))
+
+
+def test_degenerate_inputs_are_unknown(labels):
+    for args in ((*_bars([100.0]), [1.0], 2, 1, 5), (*_bars([100.0, 101.0, 102.0]), [1.0] * 3, 2, 1, 0)):
+        side, bars, ret = labels(*args)
+        assert np.isnan(side).all() and np.isnan(bars).all() and np.isnan(ret).all()
+
+
+def test_bad_atr_rows_are_unknown(labels):
+    close = np.full(10, 100.0)
+    atr = np.array([0.0, np.nan, -1.0, np.inf] + [1.0] * 6)
+    side, bars, _ = labels(*_bars(close), atr, 2, 1, 3)
+    assert np.isnan(side[:4]).all() and np.isnan(bars[:4]).all()
+    assert (side[4:7] == 0).all()
+
+
+def test_barrier_touch_is_inclusive_and_counts_bars(labels):
+    # Entry 100, ATR 1: TP at 102, SL at 99; the high reaches exactly 102 on the third bar
+    close = [100.0, 100.5, 100.2, 101.0, 100.0, 100.0]
+    high = [100.0, 101.0, 101.5, 102.0, 100.0, 100.0]
+    low = [100.0, 99.5, 99.8, 100.5, 100.0, 100.0]
+    side, bars, ret = labels(*_bars(close, high, low), [1.0] * 6, 2, 1, 4)
+    assert side[0] == 1 and bars[0] == 3 and ret[0] == pytest.approx(0.02)
+
+
+@pytest.mark.parametrize("tie_break, expected", [("sl", -1.0), ("tp", 1.0)])
+def test_same_bar_tie_break(labels, tie_break, expected):
+    close = [100.0, 100.0, 100.0]
+    high = [100.0, 103.0, 100.0]
+    low = [100.0, 98.0, 100.0]
+    side, bars, _ = labels(*_bars(close, high, low), [1.0] * 3, 2, 1, 2, tie_break=tie_break)
+    assert side[0] == expected and bars[0] == 1
+
+
+def test_short_tail_only_labels_early_touches(labels):
+    # Horizon 3 on 7 bars: rows 4-6 cannot see a full horizon; only bar 6 spikes to 103
+    close = np.full(7, 100.0)
+    high = close.copy()
+    high[6] = 103.0
+    atr = [1.0, 1.0, 1.0, 5.0, 1.0, 5.0, 1.0]
+    side, bars, ret = labels(*_bars(close, high, close), atr, 2, 1, 3)
+    assert side[3] == 0 and bars[3] == 3 and ret[3] == 0.0   # full horizon, no touch
+    assert side[4] == 1 and bars[4] == 2                      # TP touched inside the visible tail
+    assert np.isnan(side[5]) and np.isnan(bars[5]) and np.isnan(ret[5])  # no touch, horizon cut off
+    assert np.isnan(side[6])
@@ -0,0 +1,187 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from source_loader import base_namespace, load, load_methods
+
+
+@pytest.fixture(scope="module")
+def ns():
+    return load("shutdown_executor")
+
+
+def test_shutdown_executor_terminates_stuck_workers(ns):
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn"))
+    running = executor.submit(time.sleep, 60)
+    queued = executor.submit(time.sleep, 60)
+    deadline = time.monotonic() + 30
+    while not running.running() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    started = time.monotonic()
+    assert ns["shutdown_executor"](executor, timeout=0.5) is False
+    assert time.monotonic() - started < 10
+    assert running.done() and queued.done()
+
+
+def test_shutdown_executor_waits_for_running_tasks(ns):
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(time.sleep, 0.3)
+    assert ns["shutdown_executor"](executor, timeout=10) is True
+    assert future.done()
+
+
+def test_cut_off_optuna_trials_are_marked_failed():
+    optuna = pytest.importorskip("optuna")
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    ns = load("EnsembleModel", namespace=base_namespace(optuna=optuna))
+
+    study = optuna.create_study()
+    study.tell(study.ask(), 0.5)
+    orphan = study.ask()  # A trial a terminated worker never reported
+
+    ns["EnsembleModel"]._fail_orphaned_trials(study, "xgb")
+
+    states = [t.state for t in study.trials]
+    assert states == [optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.FAIL]
+    assert study.trials[orphan.number].state == optuna.trial.TrialState.FAIL
+    assert study.best_value == 0.5
+
+
+class _InlineScheduler:
+    """Runs each submitted job at once (the TrainingScheduler worker thread is not under test)."""
+
+    def __init__(self):
+        self.stopped = False
+
+    def submit(self, symbol, regime, job, priority=0):
+        job()
+        return True
+
+    def shutdown(self, wait=True):
+        self.stopped = True
+
+
+@pytest.fixture()
+def bot_cls():
+    saved = {}
+    ns = base_namespace(
+        queue=queue, FuturesTimeoutError=FuturesTimeoutError, BrokenProcessPool=BrokenProcessPool,
+        save_model_with_metadata=lambda symbol, model_data, model_type: f"{model_type}_model_{symbol}_1.pkl",
+        # The announced file is read back with its own metadata in the real bot
+        model_file_matches=lambda path, symbol, model_type: path.startswith(f"{model_type}_model_{symbol}_"),
+        load_model_file=lambda path, symbol, model_type: saved.get(path),
+    )
+    load("ML_CONFIG", "FEATURE_POOL_CONFIG", "TRAINING_SCHEDULER_CONFIG", "shutdown_executor", namespace=ns)
+    cls = load_methods("EnhancedTradingBot", "_schedule_regime_training", "shutdown_worker_pools",
+                       "_apply_model_updates", namespace=ns)
+    cls.saved = saved
+    return cls, ns
+
+
+def _bot(cls):
+    bot = cls()
+    bot.training_scheduler = _InlineScheduler()
+    bot.training_pool = None
+    bot._training_pool_lock = threading.Lock()
+    bot._training_state_lock = threading.Lock()
+    bot.model_updates = queue.Queue()
+    bot.trending_models, bot.ranging_models = {"EURUSD": {"ensemble": "old"}}, {}
+    bot.active_symbols = set()
+    return bot
+
+
+def _train_fn(symbol, df, model_type):
+    return {"ensemble": f"new {symbol} {model_type}"}
+
+
+def test_finished_job_is_swapped_in_through_model_updates(bot_cls):
+    cls, _ = bot_cls
+    bot = _bot(cls)
+    cls.saved["ensemble_trending_model_EURUSD_1.pkl"] = {"ensemble": "new EURUSD TRENDING"}
+    cls.saved["ensemble_ranging_model_XAUUSD_1.pkl"] = {"ensemble": "new XAUUSD RANGING"}
+    old_trending = bot.trending_models
+
+    for symbol, regime in (("EURUSD", "TRENDING"), ("XAUUSD", "RANGING")):
+        assert bot._schedule_regime_training(symbol, regime, None, {"hash": "x"}, _train_fn, lambda *a: True)
+    # Nothing is installed until the trading loop drains the queue between cycles
+    assert bot.trending_models["EURUSD"]["ensemble"] == "old" and bot.model_updates.qsize() == 2
+
+    assert bot._apply_model_updates() == 2
+    assert bot.trending_models["EURUSD"]["ensemble"] == "new EURUSD TRENDING"
+    assert bot.ranging_models["XAUUSD"]["ensemble"] == "new XAUUSD RANGING"
+    assert old_trending["EURUSD"]["ensemble"] == "old"  # rebound, not mutated under readers
+    assert bot.active_symbols == {"EURUSD", "XAUUSD"}
+    assert bot._apply_model_updates() == 0
+
+
+def test_mismatched_or_gated_jobs_are_not_installed(bot_cls):
+    cls, _ = bot_cls
+    bot = _bot(cls)
+    bot._schedule_regime_training("EURUSD", "TRENDING", None, {}, _train_fn, lambda *a: False)
+    assert bot.model_updates.empty()
+
+    bot.model_updates.put(("EURUSD", "TRENDING", "ensemble_ranging_model_EURUSD_1.pkl"))
+    assert bot._apply_model_updates() == 0
+    assert bot.trending_models["EURUSD"]["ensemble"] == "old"
+
+
+def test_broken_worker_pool_falls_back_to_in_process_training(bot_cls, monkeypatch):
+    cls, ns = bot_cls
+    monkeypatch.setitem(ns["TRAINING_SCHEDULER_CONFIG"], "PROCESS_WORKERS", True)
+    bot = _bot(cls)
+    broken = ThreadPoolExecutor(max_workers=1)
+    bot.training_pool = broken
+
+    def _worker_dies(*args):
+        raise BrokenProcessPool("worker exited")
+
+    bot._train_in_worker_process = _worker_dies
+    bot._schedule_regime_training("EURUSD", "TRENDING", None, {"hash": "x"}, _train_fn, lambda *a: True)
+
+    assert bot.training_pool is None and broken._shutdown
+    assert bot.model_updates.get_nowait() == ("EURUSD", "TRENDING", "ensemble_trending_model_EURUSD_1.pkl")
+
+
+def test_timed_out_worker_job_is_dropped(bot_cls, monkeypatch):
+    cls, ns = bot_cls
+    monkeypatch.setitem(ns["TRAINING_SCHEDULER_CONFIG"], "PROCESS_WORKERS", True)
+    bot = _bot(cls)
+
+    def _worker_hangs(*args):
+        raise FuturesTimeoutError()
+
+    bot._train_in_worker_process = _worker_hangs
+    bot._schedule_regime_training("EURUSD", "TRENDING", None, {}, lambda *a: pytest.fail("retrained inline"),
+                                  lambda *a: True)
+    assert bot.model_updates.empty()
+
+
+def test_shutdown_stops_scheduler_feature_stage_and_training_pool(bot_cls):
+    cls, _ = bot_cls
+    bot = _bot(cls)
+    stopped = []
+
+    class _FeatureStage:
+        def shutdown(self, timeout=None):
+            stopped.append(timeout)
+
+    class _DataManager:
+        feature_stage = _FeatureStage()
+
+    bot.data_manager = _DataManager()
+    pool = ThreadPoolExecutor(max_workers=1)
+    running = pool.submit(time.sleep, 0.2)
+    bot.training_pool = pool
+
+    bot.shutdown_worker_pools()
+
+    assert stopped and bot.training_scheduler.stopped
+    assert bot.training_pool is None and running.done() and pool._shutdown
+    bot.shutdown_worker_pools()  # Idempotent: nothing left to stop